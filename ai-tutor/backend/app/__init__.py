@@ -65,6 +65,10 @@ def create_app(config_name=None):
     from app.api import bp as api_bp
     app.register_blueprint(api_bp)
     
+    # AI usage records are written from the AI event loop thread, outside any request
+    from app.ai.providers import provider_manager
+    provider_manager.init_app(app)
+    
     # Create a route to test the app
     @app.route('/health')
     def health_check():
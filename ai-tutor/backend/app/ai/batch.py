@@ -0,0 +1,351 @@
+"""
+Provider batch APIs for offline AI jobs
+Requests are written as JSONL, submitted as one provider batch (billed at
+the batch discount and outside the realtime rate limits) and their results
+read back once the batch has finished. A local file-based stub simulates
+batch turnaround so the whole flow can run offline.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from .event_loop import run_async
+from .providers import DEFAULT_SYSTEM_PROMPT
+from .token_accounting import TokenUsage, count_message_tokens, count_tokens, usage_from_anthropic
+
+logger = logging.getLogger(__name__)
+
+# Batch APIs bill at half the on-demand price
+BATCH_PRICE_MULTIPLIER = 0.5
+
+# Batch states returned by poll()
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+@dataclass
+class BatchResult:
+    """One request's outcome from a finished batch"""
+    custom_id: str
+    text: Optional[str] = None
+    usage: Optional[TokenUsage] = None
+    error: Optional[str] = None
+
+
+def _openai_usage(usage: Optional[Dict[str, Any]]) -> Optional[TokenUsage]:
+    """TokenUsage from a batch output line's usage dict (prompt_tokens includes cached)"""
+    if not usage:
+        return None
+    cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+    return TokenUsage(
+        input_tokens=(usage.get('prompt_tokens') or 0) - cached,
+        output_tokens=usage.get('completion_tokens') or 0,
+        cache_read_tokens=cached,
+        source='usage'
+    )
+
+
+def _parse_openai_output_line(line: str) -> BatchResult:
+    """Parse one line of an OpenAI-format batch output file"""
+    data = json.loads(line)
+    custom_id = data.get('custom_id')
+    if data.get('error'):
+        return BatchResult(custom_id, error=str(data['error'].get('message') or data['error']))
+
+    response = data.get('response') or {}
+    if response.get('status_code') != 200:
+        return BatchResult(custom_id, error=f"HTTP {response.get('status_code')}: {response.get('body')}")
+
+    body = response.get('body') or {}
+    try:
+        text = body['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return BatchResult(custom_id, error="Response has no message content")
+    return BatchResult(custom_id, text=text, usage=_openai_usage(body.get('usage')))
+
+
+class BatchProvider(ABC):
+    """Submits JSONL request files to a provider batch API"""
+
+    name = 'batch'
+
+    def __init__(self, provider):
+        # The realtime provider supplies model, limits and structured-output options
+        self.provider = provider
+        self.model = provider.model
+
+    @abstractmethod
+    def build_request(self, custom_id: str, task: str, prompt: str,
+                      system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Build one JSONL request line"""
+        pass
+
+    @abstractmethod
+    def submit(self, jsonl_path: str) -> str:
+        """Submit a JSONL request file and return the provider batch ID"""
+        pass
+
+    @abstractmethod
+    def poll(self, batch_id: str) -> str:
+        """Batch state: IN_PROGRESS, COMPLETED or FAILED"""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Results of a completed batch"""
+        pass
+
+    def estimate_usage(self, request: Dict[str, Any]) -> TokenUsage:
+        """Pre-flight token count of a request line"""
+        body = request.get('body') or request.get('params') or {}
+        messages = list(body.get('messages', []))
+        if body.get('system'):
+            messages.append(body['system'])
+        return TokenUsage(input_tokens=count_message_tokens(messages, self.model))
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """OpenAI Batch API (/v1/batches, 24h completion window)"""
+
+    name = 'openai'
+
+    def build_request(self, custom_id: str, task: str, prompt: str,
+                      system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        messages = [
+            {"role": "system", "content": system_prompt or DEFAULT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        body = {"model": self.model, "messages": messages}
+        if "o3" in self.model.lower():
+            body["max_completion_tokens"] = self.provider.max_tokens
+        else:
+            body["temperature"] = self.provider.temperature
+            body["max_tokens"] = self.provider.max_tokens
+
+        response_format = self.provider._get_response_format(task, messages)
+        if response_format:
+            body["response_format"] = response_format
+
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+    def submit(self, jsonl_path: str) -> str:
+        client = self.provider.client
+        with open(jsonl_path, 'rb') as f:
+            input_file = run_async(client.files.create(file=f, purpose='batch'))
+        batch = run_async(client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        ))
+        return batch.id
+
+    def poll(self, batch_id: str) -> str:
+        batch = run_async(self.provider.client.batches.retrieve(batch_id))
+        if batch.status == 'completed':
+            return COMPLETED
+        if batch.status in ('failed', 'expired', 'cancelled'):
+            return FAILED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        client = self.provider.client
+        batch = run_async(client.batches.retrieve(batch_id))
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = run_async(client.files.content(file_id))
+            for line in content.text.splitlines():
+                if line.strip():
+                    yield _parse_openai_output_line(line)
+
+
+class AnthropicBatchProvider(BatchProvider):
+    """Anthropic Message Batches API"""
+
+    name = 'anthropic'
+
+    def build_request(self, custom_id: str, task: str, prompt: str,
+                      system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        params = {
+            "model": self.model,
+            "max_tokens": self.provider.max_tokens,
+            "temperature": self.provider.temperature,
+            "system": system_prompt or DEFAULT_SYSTEM_PROMPT,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        params.update(self.provider._get_tool_options(task))
+        return {"custom_id": custom_id, "params": params}
+
+    def submit(self, jsonl_path: str) -> str:
+        with open(jsonl_path, encoding='utf-8') as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        batch = run_async(self.provider.client.messages.batches.create(requests=requests))
+        return batch.id
+
+    def poll(self, batch_id: str) -> str:
+        batch = run_async(self.provider.client.messages.batches.retrieve(batch_id))
+        if batch.processing_status == 'ended':
+            return COMPLETED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        async def collect():
+            entries = []
+            async for entry in await self.provider.client.messages.batches.results(batch_id):
+                entries.append(entry)
+            return entries
+
+        for entry in run_async(collect()):
+            if entry.result.type != 'succeeded':
+                yield BatchResult(entry.custom_id, error=f"Request {entry.result.type}")
+                continue
+            message = entry.result.message
+            text, _ = self.provider._get_response_text(message)
+            yield BatchResult(entry.custom_id, text=text, usage=usage_from_anthropic(message.usage))
+
+
+# Canned responses per task for the stub provider; they pass the consumers' validators
+STUB_RESPONSES = {
+    'tutor_assessment': {
+        "assessment-of-ai-tutor": "Stub batch assessment: the tutor kept the session on track.",
+        "suggested-changes": "Stub batch suggestion: check understanding more often."
+    },
+    'post_session_update': {
+        "profile_updates": {"narrative_changes": None, "trait_updates": {}},
+        "memory_updates": {"personal_fact": {}, "game_state": {}, "strategy_log": {}},
+        "mastery_updates": {"goal_patches": [], "kc_patches": []},
+        "should_create_new_profile_version": False,
+        "update_reasoning": "Stub batch update: no changes",
+        "confidence_score": 0.5
+    }
+}
+
+
+class LocalStubBatchProvider(OpenAIBatchProvider):
+    """
+    File-based stand-in for a provider batch API
+
+    A submitted batch is copied to <directory>/<batch_id>/input.jsonl and
+    completes once turnaround_seconds have passed, producing an
+    OpenAI-format output.jsonl with canned responses per task.
+    """
+
+    name = 'stub'
+
+    def __init__(self, provider=None, directory: str = None, turnaround_seconds: float = None):
+        self.provider = provider
+        self.model = getattr(provider, 'model', 'stub-model')
+        self.directory = directory or os.getenv('AI_BATCH_STUB_DIR', 'data/batches/stub')
+        self.turnaround_seconds = float(turnaround_seconds if turnaround_seconds is not None
+                                        else os.getenv('AI_BATCH_STUB_TURNAROUND', '60'))
+
+    def build_request(self, custom_id: str, task: str, prompt: str,
+                      system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        messages = [
+            {"role": "system", "content": system_prompt or DEFAULT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                "body": {"model": self.model, "messages": messages, "metadata": {"task": task}}}
+
+    def submit(self, jsonl_path: str) -> str:
+        batch_id = f"stub_{uuid.uuid4().hex[:16]}"
+        batch_dir = os.path.join(self.directory, batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        shutil.copyfile(jsonl_path, os.path.join(batch_dir, 'input.jsonl'))
+        with open(os.path.join(batch_dir, 'batch.json'), 'w', encoding='utf-8') as f:
+            json.dump({'id': batch_id, 'submitted_at': time.time()}, f)
+        return batch_id
+
+    def poll(self, batch_id: str) -> str:
+        batch_dir = os.path.join(self.directory, batch_id)
+        if os.path.exists(os.path.join(batch_dir, 'output.jsonl')):
+            return COMPLETED
+        try:
+            with open(os.path.join(batch_dir, 'batch.json'), encoding='utf-8') as f:
+                submitted_at = json.load(f)['submitted_at']
+        except (OSError, ValueError, KeyError):
+            return FAILED
+        if time.time() - submitted_at < self.turnaround_seconds:
+            return IN_PROGRESS
+
+        self._write_output(batch_dir)
+        return COMPLETED
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        with open(os.path.join(self.directory, batch_id, 'output.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield _parse_openai_output_line(line)
+
+    def _write_output(self, batch_dir: str) -> None:
+        """Answer every request with its task's canned response"""
+        lines = []
+        with open(os.path.join(batch_dir, 'input.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                task = (request['body'].get('metadata') or {}).get('task')
+                if task not in STUB_RESPONSES:
+                    lines.append({"custom_id": request['custom_id'], "response": None,
+                                  "error": {"message": f"Stub has no response for task {task}"}})
+                    continue
+                content = json.dumps(STUB_RESPONSES[task])
+                lines.append({
+                    "custom_id": request['custom_id'],
+                    "response": {"status_code": 200, "body": {
+                        "choices": [{"message": {"role": "assistant", "content": content}}],
+                        "usage": {
+                            "prompt_tokens": count_message_tokens(request['body']['messages'], self.model),
+                            "completion_tokens": count_tokens(content, self.model)
+                        }
+                    }},
+                    "error": None
+                })
+
+        tmp_path = os.path.join(batch_dir, 'output.jsonl.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(line) + '\n' for line in lines)
+        os.replace(tmp_path, os.path.join(batch_dir, 'output.jsonl'))
+
+
+def get_batch_provider(name: Optional[str] = None) -> BatchProvider:
+    """
+    Batch provider by name ('openai', 'anthropic', 'stub')
+
+    Defaults to AI_BATCH_PROVIDER, then the current realtime provider.
+    """
+    from .providers import provider_manager
+
+    name = (name or os.getenv('AI_BATCH_PROVIDER') or provider_manager.get_current_provider()).lower()
+    if name == 'stub':
+        return LocalStubBatchProvider(provider_manager.providers.get(provider_manager.get_current_provider()))
+
+    provider = provider_manager.providers.get(name)
+    if provider is None:
+        raise ValueError(f"Batch provider {name} not available. Available: "
+                         f"{provider_manager.get_available_providers() + ['stub']}")
+    if name == 'openai':
+        return OpenAIBatchProvider(provider)
+    if name == 'anthropic':
+        return AnthropicBatchProvider(provider)
+    raise ValueError(f"Unsupported batch provider: {name}")
+
+
+def write_jsonl(path: str, requests: List[Dict[str, Any]]) -> str:
+    """Write request lines to a JSONL file (atomically) and return its path"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(request) + '\n' for request in requests)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,192 @@
+"""
+Bayesian Knowledge Tracing
+A local alternative to LLM-reported mastery: each knowledge component is a
+two-state hidden Markov model (not known / known) with per-KC parameters
+fitted offline by EM from observed correct/incorrect answers. Updates and
+fitting are vectorised with numpy over every student x KC sequence in a batch.
+
+Sequences are padded into (rows, steps) arrays; `mask` marks real steps.
+Within a session only answer counts are known, so a session's incorrect
+answers are placed before its correct ones.
+
+numpy is optional: BKT_AVAILABLE is False without it.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    BKT_AVAILABLE = True
+except ImportError:
+    np = None
+    BKT_AVAILABLE = False
+    logger.info("numpy not installed; Bayesian Knowledge Tracing is unavailable")
+
+# Parameters for KCs without enough history to fit
+DEFAULT_P_INIT = 0.2
+DEFAULT_P_LEARN = 0.15
+DEFAULT_P_SLIP = 0.1
+DEFAULT_P_GUESS = 0.2
+
+# Guess and slip above these make "correct" stop meaning "known" (degenerate fits)
+MAX_P_SLIP = 0.3
+MAX_P_GUESS = 0.3
+MIN_PROBABILITY = 1e-4
+
+
+@dataclass
+class BKTParameters:
+    """One KC's BKT parameters"""
+    p_init: float = DEFAULT_P_INIT  # P(known) before any practice
+    p_learn: float = DEFAULT_P_LEARN  # P(not known -> known) per answer
+    p_slip: float = DEFAULT_P_SLIP  # P(incorrect | known)
+    p_guess: float = DEFAULT_P_GUESS  # P(correct | not known)
+
+    def clipped(self) -> 'BKTParameters':
+        low, high = MIN_PROBABILITY, 1 - MIN_PROBABILITY
+        return BKTParameters(
+            p_init=min(max(self.p_init, low), high),
+            p_learn=min(max(self.p_learn, low), high),
+            p_slip=min(max(self.p_slip, low), MAX_P_SLIP),
+            p_guess=min(max(self.p_guess, low), MAX_P_GUESS)
+        )
+
+
+def observation_counts(patch: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(correct, incorrect) answer counts from a KC patch, or None if it has none"""
+    try:
+        correct = max(int(patch.get('correct') or 0), 0)
+        incorrect = max(int(patch.get('incorrect') or 0), 0)
+    except (TypeError, ValueError):
+        return None
+    if correct + incorrect == 0:
+        return None
+    return correct, incorrect
+
+
+def session_observations(correct: int, incorrect: int) -> List[int]:
+    """One session's answers as a 0/1 sequence, incorrect answers first"""
+    return [0] * incorrect + [1] * correct
+
+
+def pad_sequences(sequences: Sequence[Sequence[int]]):
+    """(observations int8, mask bool) arrays of shape (len(sequences), longest sequence)"""
+    steps = max((len(sequence) for sequence in sequences), default=0)
+    observations = np.zeros((len(sequences), steps), dtype=np.int8)
+    mask = np.zeros((len(sequences), steps), dtype=bool)
+    for row, sequence in enumerate(sequences):
+        observations[row, :len(sequence)] = sequence
+        mask[row, :len(sequence)] = True
+    return observations, mask
+
+
+def trace(p_known, observations, mask, p_learn, p_slip, p_guess):
+    """
+    Filter P(known) through each row's observations
+
+    Args:
+        p_known: (rows,) P(known) before the first observation
+        observations: (rows, steps) 0/1 answers
+        mask: (rows, steps) real steps
+        p_learn, p_slip, p_guess: (rows,) or scalar parameters per row
+
+    Returns:
+        (rows,) P(known) after the last real observation
+    """
+    p_known = np.array(p_known, dtype=np.float64)
+    for step in range(observations.shape[1]):
+        correct = observations[:, step] == 1
+        if_known = np.where(correct, 1 - p_slip, p_slip)
+        if_unknown = np.where(correct, p_guess, 1 - p_guess)
+        posterior = p_known * if_known / (p_known * if_known + (1 - p_known) * if_unknown)
+        p_known = np.where(mask[:, step], posterior + (1 - posterior) * p_learn, p_known)
+    return p_known
+
+
+def _emissions(observations, p_slip, p_guess):
+    """(rows, steps, 2) P(observation | not known, known)"""
+    correct = observations == 1
+    return np.stack([np.where(correct, p_guess, 1 - p_guess), np.where(correct, 1 - p_slip, p_slip)], axis=-1)
+
+
+def fit_em(observations, mask, initial: Optional[BKTParameters] = None, max_iterations: int = 50,
+           tolerance: float = 1e-4) -> Tuple[BKTParameters, float]:
+    """
+    Fit one KC's parameters to its students' sequences with Baum-Welch EM
+
+    Forward-backward runs vectorised over all sequences; padding steps carry
+    the state through unchanged. Slip and guess are capped each iteration.
+
+    Args:
+        observations: (sequences, steps) 0/1 answers for one KC
+        mask: (sequences, steps) real steps (sequences are left-aligned)
+        initial: Starting parameters (defaults if None)
+        max_iterations: EM iteration cap
+        tolerance: Stop when the log-likelihood improves by less than this
+
+    Returns:
+        Fitted parameters and the final log-likelihood
+    """
+    params = (initial or BKTParameters()).clipped()
+    rows, steps = observations.shape
+    started = mask[:, 0] if steps else np.zeros(rows, dtype=bool)
+    if not started.any():
+        return params, 0.0
+
+    previous_likelihood = -np.inf
+    log_likelihood = 0.0
+    for _ in range(max_iterations):
+        emissions = _emissions(observations, params.p_slip, params.p_guess)
+        learn = params.p_learn
+
+        # Forward pass with per-step scaling
+        alpha = np.empty((rows, steps, 2))
+        scale = np.ones((rows, steps))
+        alpha[:, 0] = np.array([1 - params.p_init, params.p_init]) * emissions[:, 0]
+        scale[:, 0] = np.where(mask[:, 0], alpha[:, 0].sum(axis=1), 1.0)
+        alpha[:, 0] /= scale[:, 0, None]
+        for step in range(1, steps):
+            before = alpha[:, step - 1]
+            predicted = np.stack([before[:, 0] * (1 - learn), before[:, 0] * learn + before[:, 1]], axis=1)
+            current = predicted * emissions[:, step]
+            total = current.sum(axis=1)
+            real = mask[:, step]
+            scale[:, step] = np.where(real, total, 1.0)
+            alpha[:, step] = np.where(real[:, None], current / np.where(real, total, 1.0)[:, None], before)
+
+        # Backward pass; beta is 1 at and after each sequence's last step
+        beta = np.ones((rows, steps, 2))
+        for step in range(steps - 2, -1, -1):
+            following = emissions[:, step + 1] * beta[:, step + 1]
+            back = np.stack([(1 - learn) * following[:, 0] + learn * following[:, 1], following[:, 1]], axis=1)
+            real = mask[:, step + 1]
+            beta[:, step] = np.where(real[:, None], back / scale[:, step + 1, None], 1.0)
+
+        gamma = alpha * beta
+        gamma /= gamma.sum(axis=2, keepdims=True)
+        weights = mask[:, :, None] * gamma
+
+        # Expected not-known -> known transitions between consecutive real steps
+        transitions = mask[:, 1:]
+        learned = (alpha[:, :-1, 0] * learn * emissions[:, 1:, 1] * beta[:, 1:, 1] / scale[:, 1:]) * transitions
+        unknown_before = gamma[:, :-1, 0] * transitions
+
+        correct = observations == 1
+        updated = BKTParameters(
+            p_init=float(gamma[started, 0, 1].mean()),
+            p_learn=float(learned.sum() / max(unknown_before.sum(), MIN_PROBABILITY)),
+            p_slip=float((weights[:, :, 1] * ~correct).sum() / max(weights[:, :, 1].sum(), MIN_PROBABILITY)),
+            p_guess=float((weights[:, :, 0] * correct).sum() / max(weights[:, :, 0].sum(), MIN_PROBABILITY))
+        ).clipped()
+
+        log_likelihood = float(np.log(scale[mask]).sum())
+        params = updated
+        if log_likelihood - previous_likelihood < tolerance:
+            break
+        previous_likelihood = log_likelihood
+
+    return params, log_likelihood
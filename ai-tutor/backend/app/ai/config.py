@@ -13,6 +13,8 @@ class AIConfig:
         self.ai_provider = os.getenv('AI_PROVIDER', 'openai')
         self.cost_limit_daily = float(os.getenv('DAILY_COST_LIMIT_USD', '10.0'))
         self.max_retries = int(os.getenv('AI_MAX_RETRIES', '2'))
+        # Request JSON mode / schema-constrained output from providers that support it
+        self.structured_output = os.getenv('AI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
         
     def get_openai_config(self) -> Dict[str, Any]:
         """Get OpenAI configuration"""
@@ -0,0 +1,241 @@
+"""
+Token-budgeted prompt context
+Student context (profile, memories, mastery, recent sessions, curriculum
+atlas) grows with the student's history. The assembler fits it into a token
+budget: sections are taken in priority order, list items are ranked by
+relevance and recency, and whatever doesn't fit is truncated, summarised or
+dropped - deterministically, with a report of what was cut.
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.ai.token_accounting import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Section outcomes
+FULL = 'full'
+TRUNCATED = 'truncated'
+SUMMARISED = 'summarised'
+DROPPED = 'dropped'
+
+# Context token budgets (context data only; the transcript and template are extra)
+DEFAULT_UPDATE_BUDGET = 3000
+DEFAULT_SESSION_BUDGET = 6000
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def get_token_budget(env_var: str, default: int) -> int:
+    """Token budget from an environment variable; 0 or negative disables budgeting"""
+    try:
+        return int(os.getenv(env_var, default))
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid {env_var}={os.getenv(env_var)!r}; using {default}")
+        return default
+
+
+def render(content: Any) -> str:
+    """Render section content the way it is embedded in prompts (compact JSON, strings as-is)"""
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def first_sentences(text: Optional[str], count: int) -> str:
+    """The first sentences of a text"""
+    if not text:
+        return ''
+    return ' '.join(_SENTENCE_END.split(text.strip())[:count])
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+def rank_items(items: List[Dict[str, Any]], timestamp_key: Optional[str] = None,
+               relevance: Optional[Callable[[Dict[str, Any]], float]] = None,
+               recency_share: float = 0.5, half_life_days: float = 30.0) -> List[Dict[str, Any]]:
+    """
+    Order items most useful first by a blend of relevance and recency
+
+    Recency decays with age relative to the newest item rather than the clock,
+    so the same items always rank the same way. Ties keep the input order.
+
+    Args:
+        items: Items to rank
+        timestamp_key: Key of an ISO timestamp used for recency (None: relevance only)
+        relevance: Item -> 0..1 relevance (None: recency only)
+        recency_share: Weight of recency in the blended score
+        half_life_days: Age at which an item's recency weight halves
+
+    Returns:
+        New list in ranked order
+    """
+    if not items:
+        return []
+    if relevance is None:
+        recency_share = 1.0
+    if timestamp_key is None:
+        recency_share = 0.0
+
+    timestamps = [_parse_timestamp(item.get(timestamp_key)) if timestamp_key else None for item in items]
+    known = [ts for ts in timestamps if ts is not None]
+    newest = max(known) if known else None
+
+    def score(index: int) -> float:
+        recency = 0.0
+        if newest is not None and timestamps[index] is not None:
+            age_days = (newest - timestamps[index]).total_seconds() / 86400
+            recency = 0.5 ** (age_days / half_life_days)
+        relevant = relevance(items[index]) if relevance else 0.0
+        return recency_share * recency + (1 - recency_share) * relevant
+
+    order = sorted(range(len(items)), key=lambda index: (-score(index), index))
+    return [items[index] for index in order]
+
+
+@dataclass
+class ContextSection:
+    """
+    One block of prompt context
+
+    List content is assumed to be ranked already (see rank_items) and is
+    truncated from the tail; string content is truncated by sentence. Other
+    content is kept whole, replaced by its summary, or dropped.
+    """
+    name: str
+    content: Any
+    priority: int = 50  # Higher priorities are kept first
+    summary: Any = None  # Compact fallback when the content doesn't fit
+    min_items: int = 1  # A list truncated below this many items is summarised or dropped instead
+
+
+@dataclass
+class AssembledContext:
+    """Sections that made it into the budget, plus what happened to each"""
+    sections: Dict[str, Any] = field(default_factory=dict)
+    report: Dict[str, Any] = field(default_factory=dict)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.sections.get(name, default)
+
+    def describe_cuts(self) -> str:
+        """One-line note of truncated/summarised/dropped sections for the prompt ('' if nothing was cut)"""
+        notes = []
+        for name, outcome in self.report.get('sections', {}).items():
+            if outcome['status'] == TRUNCATED and 'total_items' in outcome:
+                notes.append(f"{name} (most relevant {outcome['kept_items']} of {outcome['total_items']})")
+            elif outcome['status'] != FULL:
+                notes.append(f"{name} ({outcome['status']})")
+        if not notes:
+            return ''
+        return "Context trimmed to fit the token budget: " + ', '.join(notes)
+
+
+class ContextAssembler:
+    """Fits context sections into a token budget"""
+
+    def __init__(self, budget_tokens: int, model: Optional[str] = None):
+        self.budget_tokens = budget_tokens
+        self.model = model
+
+    def count(self, content: Any) -> int:
+        return count_tokens(render(content), self.model)
+
+    def assemble(self, sections: List[ContextSection]) -> AssembledContext:
+        """
+        Fit sections into the budget, most important first
+
+        Each section is kept whole if it fits, otherwise truncated, then
+        summarised, then dropped. A budget of 0 or less keeps everything.
+
+        Args:
+            sections: Candidate sections
+
+        Returns:
+            AssembledContext with the kept content and a report
+        """
+        assembled = AssembledContext()
+        outcomes = {}
+        remaining = self.budget_tokens if self.budget_tokens > 0 else None
+
+        for section in sorted(sections, key=lambda s: (-s.priority, s.name)):
+            content, outcome = self._fit(section, remaining)
+            outcomes[section.name] = outcome
+            if content is not None:
+                assembled.sections[section.name] = content
+                if remaining is not None:
+                    remaining -= outcome['tokens']
+
+        used = sum(outcome['tokens'] for outcome in outcomes.values())
+        assembled.report = {
+            'budget_tokens': self.budget_tokens,
+            'used_tokens': used,
+            # Report in the caller's section order
+            'sections': {section.name: outcomes[section.name] for section in sections},
+            'truncated': [s.name for s in sections if outcomes[s.name]['status'] == TRUNCATED],
+            'summarised': [s.name for s in sections if outcomes[s.name]['status'] == SUMMARISED],
+            'dropped': [s.name for s in sections if outcomes[s.name]['status'] == DROPPED]
+        }
+        return assembled
+
+    def _fit(self, section: ContextSection, remaining: Optional[int]):
+        """(content, outcome) for one section given the tokens left (None: unlimited)"""
+        content = section.content
+        tokens = self.count(content)
+        if remaining is None or tokens <= remaining:
+            outcome = {'status': FULL, 'tokens': tokens}
+            if isinstance(content, list):
+                outcome.update(kept_items=len(content), total_items=len(content))
+            return content, outcome
+
+        if isinstance(content, list):
+            kept = self._fit_prefix(content, remaining)
+            if kept >= max(section.min_items, 1):
+                truncated = content[:kept]
+                return truncated, {'status': TRUNCATED, 'tokens': self.count(truncated),
+                                   'kept_items': kept, 'total_items': len(content)}
+        elif isinstance(content, str):
+            sentences = _SENTENCE_END.split(content.strip())
+            kept = self._fit_prefix(sentences, remaining, join=True)
+            if kept:
+                truncated = ' '.join(sentences[:kept])
+                return truncated, {'status': TRUNCATED, 'tokens': self.count(truncated)}
+
+        if section.summary is not None:
+            summary_tokens = self.count(section.summary)
+            if summary_tokens <= remaining:
+                return section.summary, {'status': SUMMARISED, 'tokens': summary_tokens}
+
+        outcome = {'status': DROPPED, 'tokens': 0}
+        if isinstance(content, list):
+            outcome.update(kept_items=0, total_items=len(content))
+        return None, outcome
+
+    def _fit_prefix(self, parts: List[Any], remaining: int, join: bool = False) -> int:
+        """Largest k such that parts[:k] fits in the remaining tokens (binary search; cost grows with k)"""
+        def cost(k: int) -> int:
+            return self.count(' '.join(parts[:k]) if join else parts[:k])
+
+        low, high = 0, len(parts)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if cost(middle) <= remaining:
+                low = middle
+            else:
+                high = middle - 1
+        return low
@@ -9,6 +9,8 @@ from typing import List, Optional, Dict, Any
 import json
 import logging
 
+from .structured_output import extract_json
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -126,28 +128,8 @@ class AIExtractedProfile:
         except json.JSONDecodeError:
             pass
         
-        # Extract JSON from text using regex
-        import re
-        json_pattern = r'```json\s*(\{.*?\})\s*```|```\s*(\{.*?\})\s*```|(\{[\s\S]*\})'
-        matches = re.findall(json_pattern, response, re.DOTALL)
-        
-        for match in matches:
-            for group in match:
-                if group.strip():
-                    try:
-                        return json.loads(group.strip())
-                    except json.JSONDecodeError:
-                        continue
-        
-        # Try to find JSON-like structure without code blocks
-        json_match = re.search(r'(\{[\s\S]*\})', response)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except json.JSONDecodeError:
-                pass
-        
-        raise ValueError(f"No valid JSON found in response: {response[:200]}...")
+        # Extract JSON from surrounding text (code fences, prose)
+        return extract_json(response)
     
     @staticmethod
     def _extract_name_field(data: Dict, field_name: str) -> Optional[str]:
@@ -0,0 +1,106 @@
+"""
+Background event loop for synchronous callers of the async AI providers
+Flask request threads and Celery workers submit coroutines to one long-lived
+loop per process instead of building and tearing down a loop per call, so the
+providers' async HTTP clients keep their connection pools between calls
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """One asyncio loop running in a daemon thread, restarted after fork"""
+
+    def __init__(self, name: str = 'ai-event-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it isn't running in this process yet"""
+        with self._lock:
+            # Threads don't survive fork (Celery prefork, gunicorn): start a fresh loop in the child
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                ready = threading.Event()
+                loop = asyncio.new_event_loop()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._loop = loop
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                logger.info(f"Started background event loop {self.name} in process {self._pid}")
+            return self._loop
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on the background loop (thread-safe)
+
+        Args:
+            coro: Coroutine to run
+
+        Returns:
+            A concurrent.futures.Future for the coroutine's result
+        """
+        loop = self._ensure_running()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the background loop and block until it finishes
+
+        Args:
+            coro: Coroutine to run
+            timeout: Seconds to wait before giving up (None waits forever)
+
+        Returns:
+            The coroutine's result (its exception is re-raised here)
+        """
+        if self._thread is not None and threading.current_thread() is self._thread:
+            # Blocking the loop on itself would deadlock
+            coro.close()
+            raise RuntimeError("BackgroundEventLoop.run() called from the event loop thread; await instead")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def is_running(self) -> bool:
+        """Check whether the loop thread is running in this process"""
+        return (self._loop is not None and self._pid == os.getpid()
+                and self._thread is not None and self._thread.is_alive())
+
+    def stop(self) -> None:
+        """Stop the loop thread (mainly for tests and shutdown)"""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+
+# Global background loop shared by every synchronous AI caller in the process
+background_loop = BackgroundEventLoop()
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared background loop from synchronous code"""
+    return background_loop.run(coro, timeout)
@@ -3,13 +3,110 @@ File-based prompt management system
 Loads prompts from individual markdown files for better organization
 """
 
+import json
 import os
 import re
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Iterator
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 
+# Placeholders are {identifier}; {{ and }} are escaped braces. Any other brace
+# (e.g. JSON examples written with single braces) is literal text.
+PLACEHOLDER_PATTERN = re.compile(r'\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)\}')
+METADATA_PATTERN = re.compile(r'\*\*(Version|Description|Use Case):\*\*\s*(.+)')
+PARAMETER_PATTERN = re.compile(r'- `([^`]+)`:\s*(.+)')
+
+# Bump when the index layout changes so stale cache files are ignored
+INDEX_FORMAT_VERSION = 1
+
+# Values used for optional parameters the caller doesn't provide
+DEFAULT_PARAMETERS = {
+    'transcript': '',
+    'phone_number': 'Unknown',
+    'call_duration': 'Unknown',
+    'call_datetime': 'Unknown',
+    'student_name': 'Student',
+    'student_age': 'Unknown',
+    'student_grade': 'Unknown',
+    'subject_focus': 'General',
+    'learning_style': 'Mixed',
+    'primary_interests': 'Various',
+    'motivational_triggers': 'Achievement'
+}
+
+class CompiledTemplate:
+    """
+    Render plan for a prompt template: alternating literal and placeholder segments,
+    split once at load time so rendering is a single join with no re-parsing
+    """
+    
+    def __init__(self, segments: List[Tuple[str, Optional[str]]]):
+        # Each segment is (literal_text, None) or ('', placeholder_name)
+        self.segments = segments
+        self.placeholders = [name for _, name in segments if name]
+    
+    @classmethod
+    def compile(cls, template: str) -> 'CompiledTemplate':
+        """Split a template into literal and placeholder segments"""
+        segments = []
+        literal = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(template):
+            literal.append(template[position:match.start()])
+            token = match.group(0)
+            if token == '{{':
+                literal.append('{')
+            elif token == '}}':
+                literal.append('}')
+            else:
+                if any(literal):
+                    segments.append((''.join(literal), None))
+                literal = []
+                segments.append(('', match.group(1)))
+            position = match.end()
+        literal.append(template[position:])
+        if any(literal):
+            segments.append((''.join(literal), None))
+        return cls(segments)
+    
+    def iter_render(self, params: Dict[str, Any], defaults: Dict[str, Any] = None) -> Iterator[str]:
+        """
+        Yield the rendered prompt piece by piece without building it
+        
+        Values are looked up in params, then defaults; large values such as
+        transcripts are yielded as-is rather than copied.
+        
+        Raises:
+            KeyError: If a placeholder has no value
+        """
+        defaults = defaults or {}
+        for literal, name in self.segments:
+            if name is None:
+                yield literal
+                continue
+            if name in params:
+                value = params[name]
+            elif name in defaults:
+                value = defaults[name]
+            else:
+                raise KeyError(name)
+            yield value if isinstance(value, str) else str(value)
+    
+    def render(self, params: Dict[str, Any], defaults: Dict[str, Any] = None) -> str:
+        """Render the prompt in a single join"""
+        return ''.join(self.iter_render(params, defaults))
+    
+    def to_list(self) -> List[List[Optional[str]]]:
+        """Serializable form for the on-disk index"""
+        return [[literal, name] for literal, name in self.segments]
+    
+    @classmethod
+    def from_list(cls, data: List[List[Optional[str]]]) -> 'CompiledTemplate':
+        """Rebuild from the on-disk index"""
+        return cls([(literal, name) for literal, name in data])
+
 @dataclass
 class PromptTemplate:
     """Template for AI prompts with metadata"""
@@ -23,11 +120,56 @@ class PromptTemplate:
     file_path: str
     created_date: datetime
     last_updated: datetime
+    compiled: Optional[CompiledTemplate] = field(default=None, repr=False)
+    file_mtime: float = 0.0
+    file_size: int = 0
+    
+    def __post_init__(self):
+        if self.compiled is None:
+            self.compiled = CompiledTemplate.compile(self.user_prompt_template)
+    
+    def to_index_entry(self) -> Dict[str, Any]:
+        """Serialize for the on-disk prompt index"""
+        return {
+            'name': self.name,
+            'version': self.version,
+            'description': self.description,
+            'use_case': self.use_case,
+            'system_prompt': self.system_prompt,
+            'user_prompt_template': self.user_prompt_template,
+            'parameters': self.parameters,
+            'file_path': self.file_path,
+            'created_date': self.created_date.isoformat(),
+            'last_updated': self.last_updated.isoformat(),
+            'compiled': self.compiled.to_list(),
+            'file_mtime': self.file_mtime,
+            'file_size': self.file_size
+        }
+    
+    @classmethod
+    def from_index_entry(cls, entry: Dict[str, Any]) -> 'PromptTemplate':
+        """Rebuild from an on-disk prompt index entry"""
+        return cls(**{
+            **entry,
+            'created_date': datetime.fromisoformat(entry['created_date']),
+            'last_updated': datetime.fromisoformat(entry['last_updated']),
+            'compiled': CompiledTemplate.from_list(entry['compiled'])
+        })
 
 class FileBasedPromptManager:
     """Manages prompts loaded from individual markdown files with call-type support"""
     
-    def __init__(self, prompts_dir: str = None):
+    # Map of file names to prompt keys
+    PROMPT_FILES = {
+        'introductory_analysis.md': 'introductory_analysis',
+        'session_analysis.md': 'session_analysis',
+        'quick_assessment.md': 'quick_assessment',
+        'math_analysis.md': 'math_analysis',
+        'reading_analysis.md': 'reading_analysis',
+        'progress_tracking.md': 'progress_tracking'
+    }
+    
+    def __init__(self, prompts_dir: str = None, index_path: str = None):
         if prompts_dir is None:
             # Default to prompts directory relative to this file
             current_dir = Path(__file__).parent
@@ -35,140 +177,158 @@ class FileBasedPromptManager:
         else:
             self.prompts_dir = Path(prompts_dir)
         
+        # Parsed prompts are cached on disk and reused while the source files are unchanged
+        cache_dir = os.getenv('STATIC_CONTEXT_CACHE_DIR', 'data/cache')
+        self.index_path = Path(index_path or os.getenv('PROMPT_INDEX_PATH', os.path.join(cache_dir, 'prompt_index.json')))
+        
         self.prompts = {}
+        self._lock = threading.Lock()
         self.call_type_prompts = {
             'introductory': ['introductory_analysis'],
             'tutoring': ['session_analysis', 'math_analysis', 'reading_analysis', 'quick_assessment', 'progress_tracking']
         }
         self._load_all_prompts()
     
-    def _load_all_prompts(self):
-        """Load all prompts from markdown files"""
+    def _load_all_prompts(self, use_index: bool = True):
+        """Load all prompts, reusing on-disk index entries whose files haven't changed"""
         if not self.prompts_dir.exists():
             print(f"Warning: Prompts directory {self.prompts_dir} does not exist")
             return
         
-        # Map of file names to prompt keys
-        prompt_files = {
-            'introductory_analysis.md': 'introductory_analysis',
-            'session_analysis.md': 'session_analysis',
-            'quick_assessment.md': 'quick_assessment',
-            'math_analysis.md': 'math_analysis',
-            'reading_analysis.md': 'reading_analysis',
-            'progress_tracking.md': 'progress_tracking'
-        }
+        index = self._read_index() if use_index else {}
+        index_changed = False
         
-        for filename, prompt_key in prompt_files.items():
+        for filename, prompt_key in self.PROMPT_FILES.items():
             file_path = self.prompts_dir / filename
-            if file_path.exists():
-                try:
-                    prompt = self._load_prompt_from_file(file_path, prompt_key)
-                    if prompt:
-                        self.prompts[prompt_key] = prompt
-                        print(f"Loaded prompt: {prompt_key} from {filename}")
-                except Exception as e:
-                    print(f"Error loading prompt from {filename}: {e}")
-            else:
+            if not file_path.exists():
                 print(f"Prompt file not found: {filename}")
+                continue
+            
+            try:
+                stat = file_path.stat()
+                entry = index.get(prompt_key)
+                if entry and entry.get('file_path') == str(file_path) \
+                        and entry.get('file_mtime') == stat.st_mtime and entry.get('file_size') == stat.st_size:
+                    self.prompts[prompt_key] = PromptTemplate.from_index_entry(entry)
+                    continue
+                
+                prompt = self._load_prompt_from_file(file_path, prompt_key)
+                if prompt:
+                    self.prompts[prompt_key] = prompt
+                    index_changed = True
+                    print(f"Loaded prompt: {prompt_key} from {filename}")
+            except Exception as e:
+                print(f"Error loading prompt from {filename}: {e}")
+        
+        if index_changed:
+            self._write_index()
+    
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Read the on-disk prompt index (empty if missing, unreadable or outdated)"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format_version') != INDEX_FORMAT_VERSION:
+                return {}
+            return data.get('prompts', {})
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_index(self):
+        """Persist parsed prompts so other processes can skip parsing"""
+        data = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'prompts': {key: prompt.to_index_entry() for key, prompt in self.prompts.items()}
+        }
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            # Read-only deployments just parse on startup
+            print(f"Warning: could not write prompt index {self.index_path}: {e}")
+    
+    def _refresh_if_changed(self, prompt_name: str):
+        """Re-parse a prompt whose file changed on disk since it was loaded"""
+        prompt = self.prompts.get(prompt_name)
+        if not prompt:
+            return
+        try:
+            stat = os.stat(prompt.file_path)
+        except OSError:
+            return
+        if stat.st_mtime == prompt.file_mtime and stat.st_size == prompt.file_size:
+            return
+        
+        with self._lock:
+            current = self.prompts.get(prompt_name)
+            if current and (current.file_mtime != stat.st_mtime or current.file_size != stat.st_size):
+                updated = self._load_prompt_from_file(Path(prompt.file_path), prompt_name)
+                if updated:
+                    self.prompts[prompt_name] = updated
+                    self._write_index()
+                    print(f"Reloaded changed prompt: {prompt_name}")
     
     def _load_prompt_from_file(self, file_path: Path, prompt_key: str) -> Optional[PromptTemplate]:
-        """Load a single prompt from a markdown file"""
+        """Load a single prompt from a markdown file in one pass over its lines"""
         try:
+            stat = file_path.stat()
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Parse markdown content
-            lines = content.split('\n')
+            name = None
+            metadata = {}
+            sections = {}
+            current_section = None
             
-            # Extract title (first line starting with #)
-            name = "Unknown"
-            for line in lines:
-                if line.startswith('# '):
+            for line in content.split('\n'):
+                if line.startswith('## '):
+                    current_section = line.strip()
+                    sections.setdefault(current_section, [])
+                    continue
+                if name is None and line.startswith('# '):
                     name = line[2:].strip()
-                    break
-            
-            # Extract metadata
-            version = self._extract_metadata(content, 'Version')
-            description = self._extract_metadata(content, 'Description')
-            use_case = self._extract_metadata(content, 'Use Case')
+                if '**' in line:
+                    match = METADATA_PATTERN.search(line)
+                    if match and match.group(1) not in metadata:
+                        metadata[match.group(1)] = match.group(2).strip()
+                if current_section is not None:
+                    sections[current_section].append(line)
             
-            # Extract system prompt
-            system_prompt = self._extract_section(content, '## System Prompt')
+            system_prompt = '\n'.join(sections.get('## System Prompt', [])).strip()
+            user_prompt_template = '\n'.join(sections.get('## User Prompt Template', [])).strip()
             
-            # Extract user prompt template
-            user_prompt_template = self._extract_section(content, '## User Prompt Template')
-            
-            # Extract parameters
-            parameters = self._extract_parameters(content)
-            
-            # File modification time as last updated
-            stat = file_path.stat()
-            last_updated = datetime.fromtimestamp(stat.st_mtime)
-            created_date = datetime.fromtimestamp(stat.st_ctime)
+            # Parse parameter lines (format: - `param_name`: Description)
+            parameters = {}
+            for line in sections.get('## Required Parameters', []):
+                match = PARAMETER_PATTERN.match(line.strip())
+                if match:
+                    parameters[match.group(1)] = match.group(2)
             
             return PromptTemplate(
-                name=name,
-                version=version or "1.0",
-                description=description or "No description",
-                use_case=use_case or "General use",
-                system_prompt=system_prompt or "",
-                user_prompt_template=user_prompt_template or "",
+                name=name or "Unknown",
+                version=metadata.get('Version') or "1.0",
+                description=metadata.get('Description') or "No description",
+                use_case=metadata.get('Use Case') or "General use",
+                system_prompt=system_prompt,
+                user_prompt_template=user_prompt_template,
                 parameters=parameters,
                 file_path=str(file_path),
-                created_date=created_date,
-                last_updated=last_updated
+                created_date=datetime.fromtimestamp(stat.st_ctime),
+                last_updated=datetime.fromtimestamp(stat.st_mtime),
+                file_mtime=stat.st_mtime,
+                file_size=stat.st_size
             )
             
         except Exception as e:
             print(f"Error parsing prompt file {file_path}: {e}")
             return None
     
-    def _extract_metadata(self, content: str, field: str) -> Optional[str]:
-        """Extract metadata field from markdown"""
-        pattern = rf'\*\*{field}:\*\*\s*(.+?)(?:\n|$)'
-        match = re.search(pattern, content)
-        return match.group(1).strip() if match else None
-    
-    def _extract_section(self, content: str, header: str) -> str:
-        """Extract content between markdown headers"""
-        lines = content.split('\n')
-        in_section = False
-        section_lines = []
-        
-        for line in lines:
-            if line.strip() == header:
-                in_section = True
-                continue
-            elif in_section and line.startswith('## '):
-                # Hit next section, stop
-                break
-            elif in_section:
-                section_lines.append(line)
-        
-        return '\n'.join(section_lines).strip()
-    
-    def _extract_parameters(self, content: str) -> Dict[str, str]:
-        """Extract parameters from the Required Parameters section"""
-        parameters = {}
-        
-        # Find the Required Parameters section
-        param_section = self._extract_section(content, '## Required Parameters')
-        
-        # Parse parameter lines (format: - `param_name`: Description)
-        for line in param_section.split('\n'):
-            line = line.strip()
-            if line.startswith('- `') and ':' in line:
-                # Extract parameter name and description
-                match = re.match(r'- `([^`]+)`:\s*(.+)', line)
-                if match:
-                    param_name = match.group(1)
-                    param_desc = match.group(2)
-                    parameters[param_name] = param_desc
-        
-        return parameters
-    
     def get_prompt(self, prompt_name: str) -> Optional[PromptTemplate]:
-        """Get a specific prompt template"""
+        """Get a specific prompt template, re-parsing it if its file changed"""
+        self._refresh_if_changed(prompt_name)
         return self.prompts.get(prompt_name)
     
     def get_available_prompts(self) -> Dict[str, str]:
@@ -185,23 +345,8 @@ class FileBasedPromptManager:
             return None
         
         try:
-            # Provide default values for optional parameters
-            safe_kwargs = {
-                'transcript': kwargs.get('transcript', ''),
-                'phone_number': kwargs.get('phone_number', 'Unknown'),
-                'call_duration': kwargs.get('call_duration', 'Unknown'),
-                'call_datetime': kwargs.get('call_datetime', 'Unknown'),
-                'student_name': kwargs.get('student_name', 'Student'),
-                'student_age': kwargs.get('student_age', 'Unknown'),
-                'student_grade': kwargs.get('student_grade', 'Unknown'),
-                'subject_focus': kwargs.get('subject_focus', 'General'),
-                'learning_style': kwargs.get('learning_style', 'Mixed'),
-                'primary_interests': kwargs.get('primary_interests', 'Various'),
-                'motivational_triggers': kwargs.get('motivational_triggers', 'Achievement'),
-                **kwargs  # Override with any provided values
-            }
-            
-            formatted_user_prompt = prompt.user_prompt_template.format(**safe_kwargs)
+            # Render from the precompiled plan; defaults fill in optional parameters
+            formatted_user_prompt = prompt.compiled.render(kwargs, DEFAULT_PARAMETERS)
             return {
                 'system_prompt': prompt.system_prompt,
                 'user_prompt': formatted_user_prompt,
@@ -217,9 +362,11 @@ class FileBasedPromptManager:
             raise ValueError(f"Error formatting prompt '{prompt_name}': {str(e)}")
     
     def reload_prompts(self):
-        """Reload all prompts from files (useful for development)"""
-        self.prompts.clear()
-        self._load_all_prompts()
+        """Force a re-parse of all prompt files (changed files are also picked up automatically)"""
+        with self._lock:
+            self.prompts.clear()
+            self._load_all_prompts(use_index=False)
+            self._write_index()
     
     def get_prompt_info(self, prompt_name: str) -> Dict[str, Any]:
         """Get detailed information about a prompt"""
@@ -10,15 +10,22 @@ import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from .config import ai_config
 from .prompts_file_loader import file_prompt_manager
+from .structured_output import structured_output
+from .token_accounting import (TokenUsage, count_tokens, count_message_tokens,
+                               usage_from_openai, usage_from_anthropic)
+from .usage_limits import create_usage_backend, CostBudget, ProviderRateLimits
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# System prompt for custom prompts when the caller doesn't supply one
+DEFAULT_SYSTEM_PROMPT = "You are an expert educational data analyst. Always respond with valid JSON."
+
 @dataclass
 class BasicAnalysis:
     """Simplified analysis structure for POC"""
@@ -32,6 +39,10 @@ class BasicAnalysis:
     cost_estimate: float
     timestamp: datetime
     raw_response: Optional[str] = None
+    parsed_response: Optional[Any] = None
+    usage: Optional[TokenUsage] = None  # Provider-reported tokens (tokenizer counts if not reported)
+    estimated_usage: Optional[TokenUsage] = None  # Local tokenizer counts
+    estimated_cost: float = 0.0  # Cost of estimated_usage; cost_estimate is the cost of usage
 
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -53,8 +64,8 @@ class SimpleAIProvider(ABC):
         pass
     
     @abstractmethod
-    def estimate_cost(self, transcript_length: int) -> float:
-        """Simple cost estimation"""
+    def estimate_cost(self, usage: TokenUsage) -> float:
+        """Price a call's token usage in USD"""
         pass
 
 class OpenAIProvider(SimpleAIProvider):
@@ -71,7 +82,8 @@ class OpenAIProvider(SimpleAIProvider):
             self.temperature = self.config['temperature']
             self.timeout = self.config['timeout']
             
-            # Initialize async client for proper async support
+            # Async client with a pooled HTTP connection; sync callers run it on the
+            # shared background loop (app.ai.event_loop) so the pool is reused across calls
             self.client = openai.AsyncOpenAI(api_key=self.api_key)
             
             logger.info(f"OpenAI provider initialized with model: {self.model}")
@@ -93,9 +105,10 @@ class OpenAIProvider(SimpleAIProvider):
                 prompt = student_context['prompt']
                 logger.info(f"Using custom prompt for OpenAI: {prompt[:50]}...")
                 
-                # Create messages for the API call
+                # Create messages for the API call; a caller-supplied system prompt is the
+                # stable prefix that OpenAI's automatic prompt caching can reuse
                 messages = [
-                    {"role": "system", "content": "You are an expert educational data analyst. Always respond with valid JSON."},
+                    {"role": "system", "content": student_context.get('system_prompt') or DEFAULT_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ]
                 
@@ -132,6 +145,9 @@ class OpenAIProvider(SimpleAIProvider):
                 
                 prompt_type = "session_analysis"
             
+            # Pre-flight token count (static segments such as the system prompt are cached)
+            estimated_input_tokens = count_message_tokens(messages, self.model)
+            
             # Make the API call
             logger.info(f"Calling OpenAI API with {prompt_type} prompt and model: {self.model}")
             
@@ -142,6 +158,12 @@ class OpenAIProvider(SimpleAIProvider):
                 "timeout": self.timeout
             }
             
+            # Ask for JSON output natively; the API requires the word "JSON" in the messages
+            task = student_context.get('task') or prompt_type
+            response_format = self._get_response_format(task, messages)
+            if response_format:
+                api_params["response_format"] = response_format
+            
             # Handle temperature parameter - o3 models only support default temperature (1.0)
             if "o3" in self.model.lower():
                 # o3 models don't support custom temperature, use default (1.0)
@@ -159,8 +181,13 @@ class OpenAIProvider(SimpleAIProvider):
             raw_response = response.choices[0].message.content
             logger.info(f"Received response from OpenAI: {raw_response[:100]}...")
             
-            # All prompts now generate JSON - parse the response
-            parsed_json = self._parse_json_response(raw_response)
+            estimated_usage = TokenUsage(input_tokens=estimated_input_tokens,
+                                         output_tokens=count_tokens(raw_response, self.model))
+            usage = usage_from_openai(getattr(response, 'usage', None)) or estimated_usage
+            
+            # All prompts now generate JSON - parse and validate the response once
+            parse_result = structured_output.parse(raw_response, task, native=bool(response_format))
+            parsed_json = parse_result.data if isinstance(parse_result.data, dict) else {}
             
             # Extract analysis components based on JSON structure
             analysis_data = self._extract_analysis_from_json(parsed_json, prompt_type)
@@ -175,9 +202,13 @@ class OpenAIProvider(SimpleAIProvider):
                 confidence_score=analysis_data.get('confidence', 0.9),
                 provider_used="openai",
                 processing_time=processing_time,
-                cost_estimate=self.estimate_cost(len(transcript)),
+                cost_estimate=self.estimate_cost(usage),
                 timestamp=datetime.now(),
-                raw_response=raw_response
+                raw_response=raw_response,
+                parsed_response=parse_result.data,
+                usage=usage,
+                estimated_usage=estimated_usage,
+                estimated_cost=self.estimate_cost(estimated_usage)
             )
             
         except Exception as e:
@@ -217,24 +248,22 @@ class OpenAIProvider(SimpleAIProvider):
         
         return content
     
-    def _parse_json_response(self, raw_response: str) -> dict:
-        """Parse JSON response from AI provider with fallback handling"""
-        try:
-            # Try to parse the entire response as JSON
-            return json.loads(raw_response)
-        except json.JSONDecodeError:
-            # If that fails, try to extract JSON from the text
-            import re
-            json_match = re.search(r'({[\s\S]*})', raw_response)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except json.JSONDecodeError:
-                    logger.error("Failed to parse extracted JSON from OpenAI response")
-                    return {}
-            else:
-                logger.error("Could not extract JSON from OpenAI response")
-                return {}
+    def _get_response_format(self, task: str, messages: list) -> Optional[Dict[str, Any]]:
+        """Structured output mode for a request: the task's JSON schema, or plain JSON mode"""
+        if not ai_config.structured_output:
+            return None
+        if not any('json' in message['content'].lower() for message in messages):
+            return None
+        
+        schema = structured_output.get_schema(task)
+        model = self.model.lower()
+        # json_schema needs gpt-4o-era models; older ones only have JSON mode
+        if schema and not (model.startswith('gpt-3.5') or model in ('gpt-4', 'gpt-4-turbo')):
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": task, "schema": schema, "strict": False}
+            }
+        return {"type": "json_object"}
     
     def _extract_analysis_from_json(self, parsed_json: dict, prompt_type: str) -> dict:
         """Extract analysis components from parsed JSON response"""
@@ -281,21 +310,9 @@ class OpenAIProvider(SimpleAIProvider):
     def get_provider_name(self) -> str:
         return f"OpenAI ({self.model})"
     
-    def estimate_cost(self, transcript_length: int) -> float:
-        # Approximate cost estimation based on model and input length
-        # These rates should be updated based on current OpenAI pricing
-        model_rates = {
-            "gpt-4o": 0.00005,  # $0.05 per 1K tokens
-            "gpt-4o-mini": 0.00001,  # $0.01 per 1K tokens
-            "gpt-3.5-turbo": 0.000001  # $0.001 per 1K tokens
-        }
-        
-        # Default to gpt-3.5-turbo rate if model not found
-        rate = model_rates.get(self.model, 0.000001)
-        
-        # Rough estimate: 1 token ≈ 4 characters
-        estimated_tokens = transcript_length / 4
-        return (estimated_tokens / 1000) * rate
+    def estimate_cost(self, usage: TokenUsage) -> float:
+        """Price token usage with the model's input/output rates (cached input discounted)"""
+        return usage.cost('openai', self.model)
 
 class AnthropicProvider(SimpleAIProvider):
     """Real Anthropic provider implementation"""
@@ -311,8 +328,8 @@ class AnthropicProvider(SimpleAIProvider):
             self.temperature = self.config['temperature']
             self.timeout = self.config['timeout']
             
-            # Initialize client
-            self.client = anthropic.Anthropic(api_key=self.api_key)
+            # Async client with a pooled HTTP connection, reused on the shared background loop
+            self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
             
             logger.info(f"Anthropic provider initialized with model: {self.model}")
         except ImportError:
@@ -333,21 +350,34 @@ class AnthropicProvider(SimpleAIProvider):
                 prompt = student_context['prompt']
                 logger.info(f"Using custom prompt for Anthropic: {prompt[:50]}...")
                 
+                # A caller-supplied system prompt is a large static prefix: mark it cacheable
+                if student_context.get('system_prompt'):
+                    system = [{
+                        "type": "text",
+                        "text": student_context['system_prompt'],
+                        "cache_control": {"type": "ephemeral"}
+                    }]
+                else:
+                    system = DEFAULT_SYSTEM_PROMPT
+                
+                prompt_type = "custom"
+                task = student_context.get('task') or prompt_type
+                tool_options = self._get_tool_options(task)
+                
                 # Create a coroutine for the API call
                 async def call_anthropic():
                     response = await self.client.messages.create(
                         model=self.model,
                         max_tokens=self.max_tokens,
                         temperature=self.temperature,
-                        system="You are an expert educational data analyst. Always respond with valid JSON.",
+                        system=system,
                         messages=[
                             {"role": "user", "content": prompt}
-                        ]
+                        ],
+                        **tool_options
                     )
                     return response
                 
-                prompt_type = "custom"
-                
             else:
                 # Standard session analysis using file-based prompt system
                 logger.info("No custom prompt provided, using session_analysis prompt template")
@@ -371,6 +401,10 @@ class AnthropicProvider(SimpleAIProvider):
                     
                 logger.info("Successfully formatted session_analysis prompt")
                 
+                prompt_type = "session_analysis"
+                task = student_context.get('task') or prompt_type
+                tool_options = self._get_tool_options(task)
+                
                 # Create a coroutine for the API call
                 async def call_anthropic():
                     response = await self.client.messages.create(
@@ -380,11 +414,17 @@ class AnthropicProvider(SimpleAIProvider):
                         system=formatted_prompt['system_prompt'],
                         messages=[
                             {"role": "user", "content": formatted_prompt['user_prompt']}
-                        ]
+                        ],
+                        **tool_options
                     )
                     return response
-                
-                prompt_type = "session_analysis"
+            
+            # Pre-flight token count (static segments such as the system prompt are cached)
+            if prompt_type == "custom":
+                estimated_input_tokens = count_message_tokens([system, prompt], self.model)
+            else:
+                estimated_input_tokens = count_message_tokens(
+                    [formatted_prompt['system_prompt'], formatted_prompt['user_prompt']], self.model)
             
             # Make the API call
             logger.info(f"Calling Anthropic API with {prompt_type} prompt and model: {self.model}")
@@ -393,11 +433,16 @@ class AnthropicProvider(SimpleAIProvider):
             response = await asyncio.wait_for(call_anthropic(), timeout=self.timeout)
             
             # Extract the response content
-            raw_response = response.content[0].text
+            raw_response, from_tool = self._get_response_text(response)
             logger.info(f"Received response from Anthropic: {raw_response[:100]}...")
             
-            # All prompts now generate JSON - parse the response
-            parsed_json = self._parse_json_response(raw_response)
+            estimated_usage = TokenUsage(input_tokens=estimated_input_tokens,
+                                         output_tokens=count_tokens(raw_response, self.model))
+            usage = usage_from_anthropic(getattr(response, 'usage', None)) or estimated_usage
+            
+            # All prompts now generate JSON - parse and validate the response once
+            parse_result = structured_output.parse(raw_response, task, native=from_tool)
+            parsed_json = parse_result.data if isinstance(parse_result.data, dict) else {}
             
             # Extract analysis components based on JSON structure
             analysis_data = self._extract_analysis_from_json(parsed_json, prompt_type)
@@ -412,9 +457,13 @@ class AnthropicProvider(SimpleAIProvider):
                 confidence_score=analysis_data.get('confidence', 0.9),
                 provider_used="anthropic",
                 processing_time=processing_time,
-                cost_estimate=self.estimate_cost(len(transcript)),
+                cost_estimate=self.estimate_cost(usage),
                 timestamp=datetime.now(),
-                raw_response=raw_response
+                raw_response=raw_response,
+                parsed_response=parse_result.data,
+                usage=usage,
+                estimated_usage=estimated_usage,
+                estimated_cost=self.estimate_cost(estimated_usage)
             )
             
         except Exception as e:
@@ -454,24 +503,26 @@ class AnthropicProvider(SimpleAIProvider):
         
         return content
     
-    def _parse_json_response(self, raw_response: str) -> dict:
-        """Parse JSON response from AI provider with fallback handling"""
-        try:
-            # Try to parse the entire response as JSON
-            return json.loads(raw_response)
-        except json.JSONDecodeError:
-            # If that fails, try to extract JSON from the text
-            import re
-            json_match = re.search(r'({[\s\S]*})', raw_response)
-            if json_match:
-                try:
-                    return json.loads(json_match.group(1))
-                except json.JSONDecodeError:
-                    logger.error("Failed to parse extracted JSON from Anthropic response")
-                    return {}
-            else:
-                logger.error("Could not extract JSON from Anthropic response")
-                return {}
+    def _get_tool_options(self, task: str) -> Dict[str, Any]:
+        """Force a tool call whose input schema is the task's response schema"""
+        schema = structured_output.get_schema(task)
+        if not ai_config.structured_output or not schema:
+            return {}
+        return {
+            "tools": [{
+                "name": task,
+                "description": f"Record the {task.replace('_', ' ')} result",
+                "input_schema": schema
+            }],
+            "tool_choice": {"type": "tool", "name": task}
+        }
+    
+    def _get_response_text(self, response) -> Tuple[str, bool]:
+        """Response text and whether it came from a tool call (already schema-shaped JSON)"""
+        for block in response.content:
+            if getattr(block, 'type', None) == 'tool_use':
+                return json.dumps(block.input), True
+        return response.content[0].text, False
     
     def _extract_analysis_from_json(self, parsed_json: dict, prompt_type: str) -> dict:
         """Extract analysis components from parsed JSON response"""
@@ -518,21 +569,9 @@ class AnthropicProvider(SimpleAIProvider):
     def get_provider_name(self) -> str:
         return f"Anthropic ({self.model})"
     
-    def estimate_cost(self, transcript_length: int) -> float:
-        # Approximate cost estimation based on model and input length
-        # These rates should be updated based on current Anthropic pricing
-        model_rates = {
-            "claude-3-opus-20240229": 0.00003,  # $0.03 per 1K tokens
-            "claude-3-sonnet-20240229": 0.00001,  # $0.01 per 1K tokens
-            "claude-3-haiku-20240307": 0.000003  # $0.003 per 1K tokens
-        }
-        
-        # Default to haiku rate if model not found
-        rate = model_rates.get(self.model, 0.000003)
-        
-        # Rough estimate: 1 token ≈ 4 characters
-        estimated_tokens = transcript_length / 4
-        return (estimated_tokens / 1000) * rate
+    def estimate_cost(self, usage: TokenUsage) -> float:
+        """Price token usage with the model's input/output rates (cache reads/writes adjusted)"""
+        return usage.cost('anthropic', self.model)
 
 class ProviderManager:
     """Provider manager for AI analysis"""
@@ -540,7 +579,12 @@ class ProviderManager:
     def __init__(self):
         self.providers = {}
         self.current_provider = ai_config.ai_provider
-        self.daily_cost_tracking = 0.0
+        self.app = None
+        
+        # Spend, tokens and rate limits are shared by every worker process (Redis when available)
+        self.usage_backend = create_usage_backend()
+        self.cost_budget = CostBudget(self.usage_backend, ai_config.cost_limit_daily)
+        self.rate_limits = ProviderRateLimits(self.usage_backend)
         
         # Initialize available providers
         self._initialize_providers()
@@ -586,18 +630,26 @@ class ProviderManager:
         if self.current_provider not in self.providers:
             raise ValueError(f"Provider {self.current_provider} not available. Available: {list(self.providers.keys())}")
         
-        # Check daily cost limit
-        if self.daily_cost_tracking >= ai_config.cost_limit_daily:
-            raise ValueError(f"Daily cost limit of ${ai_config.cost_limit_daily} reached")
+        # Check the shared daily cost limit
+        self.cost_budget.check()
         
         provider = self.providers[self.current_provider]
         logger.info(f"Starting analysis with {provider.get_provider_name()}")
         
+        # Wait for (or shed on) provider capacity; the TPM bucket counts input plus
+        # max output tokens, as the provider does
+        input_tokens = count_tokens(student_context.get('prompt') or transcript, provider.model) + \
+            count_tokens(student_context.get('system_prompt'), provider.model)
+        await self.rate_limits.acquire(self.current_provider, provider.model,
+                                       input_tokens + provider.max_tokens,
+                                       student_context.get('rate_limit_mode'))
+        
         try:
             analysis = await provider.analyze_session(transcript, student_context)
             
-            # Track costs
-            self.daily_cost_tracking += analysis.cost_estimate
+            # Track costs (actual usage as reported by the provider)
+            self.cost_budget.record(analysis.cost_estimate, analysis.usage.total_tokens if analysis.usage else 0)
+            self._record_usage(provider, analysis, student_context)
             
             # Log detailed information about the AI usage
             from system_logger import log_ai_analysis
@@ -624,6 +676,44 @@ class ProviderManager:
             
             raise
     
+    def init_app(self, app):
+        """Keep the Flask app so usage records can be written from the AI event loop thread"""
+        self.app = app
+    
+    def _record_usage(self, provider: SimpleAIProvider, analysis: BasicAnalysis,
+                      student_context: Dict[str, Any]) -> None:
+        """Store estimated vs actual usage of a call without blocking the event loop"""
+        if self.app is None or analysis.usage is None:
+            return
+        
+        estimated = analysis.estimated_usage or TokenUsage()
+        usage_data = {
+            'provider': self.current_provider,
+            'model': provider.model,
+            'task': student_context.get('task') or student_context.get('prompt_type'),
+            'session_id': student_context.get('session_id'),
+            'student_id': student_context.get('student_id'),
+            'estimated_input_tokens': estimated.input_tokens,
+            'estimated_output_tokens': estimated.output_tokens,
+            'estimated_cost': analysis.estimated_cost,
+            'input_tokens': analysis.usage.input_tokens,
+            'output_tokens': analysis.usage.output_tokens,
+            'cache_read_tokens': analysis.usage.cache_read_tokens,
+            'cache_write_tokens': analysis.usage.cache_write_tokens,
+            'actual_cost': analysis.cost_estimate,
+            'usage_source': analysis.usage.source
+        }
+        
+        def write():
+            try:
+                from app.repositories import ai_usage_repository
+                with self.app.app_context():
+                    ai_usage_repository.create(usage_data)
+            except Exception as e:
+                logger.warning(f"Could not record AI usage: {e}")
+        
+        asyncio.get_running_loop().run_in_executor(None, write)
+    
     def switch_provider(self, new_provider: str) -> bool:
         """Switch to different provider"""
         
@@ -656,17 +746,18 @@ class ProviderManager:
             'current': provider_name == self.current_provider
         }
     
+    @property
+    def daily_cost_tracking(self) -> float:
+        """Today's spend across all workers"""
+        return self.cost_budget.summary()['daily_cost']
+    
     def get_cost_summary(self) -> Dict[str, float]:
         """Get cost tracking summary"""
-        return {
-            'daily_cost': self.daily_cost_tracking,
-            'daily_limit': ai_config.cost_limit_daily,
-            'remaining_budget': ai_config.cost_limit_daily - self.daily_cost_tracking
-        }
+        return self.cost_budget.summary()
     
     def reset_daily_costs(self):
         """Reset daily cost tracking (for testing)"""
-        self.daily_cost_tracking = 0.0
+        self.cost_budget.reset()
         logger.info("Daily cost tracking reset")
 
 # Global provider manager instance
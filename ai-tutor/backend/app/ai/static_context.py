@@ -0,0 +1,151 @@
+"""
+Cached static prompt context
+Large reference documents (tutor guidelines, the tutor prompt system) are read
+once per process and only re-read when the file's mtime changes, instead of
+being opened for every LLM call. Optionally a condensed digest of a document
+is built once and used in its place.
+"""
+
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from .token_accounting import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Token count of a prompt segment from the local tokenizer (cached per segment)"""
+    return count_tokens(text)
+
+
+def condense_markdown(text: str, max_chars: int = 12000) -> str:
+    """
+    Build an extractive digest of a markdown document
+
+    Keeps every heading, the first sentence of each paragraph and the lead
+    sentence of each list item, then truncates at a line boundary.
+
+    Args:
+        text: Markdown source
+        max_chars: Upper bound on the digest length
+
+    Returns:
+        The condensed markdown
+    """
+    lines = []
+    for block in re.split(r'\n\s*\n', text):
+        block = block.strip()
+        if not block:
+            continue
+
+        paragraph = []
+        for line in block.splitlines():
+            stripped = line.strip()
+            if stripped.startswith('#'):
+                lines.append(stripped)
+            elif re.match(r'^([-*+]|\d+\.)\s+', stripped):
+                lines.append(_first_sentence(stripped))
+            elif stripped:
+                paragraph.append(stripped)
+
+        if paragraph:
+            lines.append(_first_sentence(' '.join(paragraph)))
+
+    digest = []
+    length = 0
+    for line in lines:
+        if length + len(line) + 1 > max_chars:
+            break
+        digest.append(line)
+        length += len(line) + 1
+    return '\n'.join(digest)
+
+
+def _first_sentence(text: str) -> str:
+    """Return text up to the end of its first sentence"""
+    match = re.match(r'^(.+?[.!?])(\s|$)', text)
+    return match.group(1) if match else text
+
+
+class CachedTextFile:
+    """Text file cached in memory and reloaded when its mtime changes"""
+
+    def __init__(self, path: Union[str, Path], digest: bool = False, digest_max_chars: int = 12000,
+                 cache_dir: Union[str, Path] = None):
+        self.path = Path(path)
+        self.digest = digest
+        self.digest_max_chars = digest_max_chars
+        self.cache_dir = Path(cache_dir or os.getenv('STATIC_CONTEXT_CACHE_DIR', 'data/cache'))
+        self.source_size = 0
+        self._source_tokens = None
+        self._content = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def digest_path(self) -> Path:
+        """Location of the precomputed digest in the cache directory"""
+        return self.cache_dir / f"{self.path.stem}.digest{self.path.suffix}"
+
+    @property
+    def source_tokens(self) -> int:
+        """Tokens of the full source file (what was sent before any digest)"""
+        if self._source_tokens is not None:
+            return self._source_tokens
+        # Digest was loaded from the cache without reading the source: approximate from its size
+        return (self.source_size + 3) // 4
+
+    def read(self) -> Optional[str]:
+        """
+        Get the file content (or its digest), re-reading only if the file changed
+
+        Returns:
+            The cached text, or None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(self.path)
+            mtime = stat.st_mtime
+        except OSError:
+            logger.error(f"Static context file not found at {self.path}")
+            return None
+
+        if self._content is not None and mtime == self._mtime:
+            return self._content
+
+        with self._lock:
+            if self._content is None or mtime != self._mtime:
+                self._content = self._load(mtime)
+                self._mtime = mtime
+                self.source_size = stat.st_size
+                logger.info(f"Loaded static context {self.path.name} "
+                            f"({estimate_tokens(self._content)} tokens{', digest' if self.digest else ''})")
+            return self._content
+
+    def _load(self, mtime: float) -> str:
+        """Read the source, or a digest that is at least as new as the source"""
+        self._source_tokens = None
+        if self.digest:
+            try:
+                if os.stat(self.digest_path).st_mtime >= mtime:
+                    return self.digest_path.read_text(encoding='utf-8')
+            except OSError:
+                pass
+
+        content = self.path.read_text(encoding='utf-8')
+        self._source_tokens = count_tokens(content)
+        if not self.digest:
+            return content
+
+        digest = condense_markdown(content, self.digest_max_chars)
+        try:
+            self.digest_path.parent.mkdir(parents=True, exist_ok=True)
+            self.digest_path.write_text(digest, encoding='utf-8')
+        except OSError as e:
+            # Read-only deployments just keep the digest in memory
+            logger.warning(f"Could not write digest {self.digest_path}: {e}")
+        return digest
@@ -0,0 +1,452 @@
+"""
+Structured AI output
+Shared response layer for every prompt that expects JSON back: per-task
+response schemas (sent to the provider as JSON-mode / tool definitions where
+supported), schemas compiled once into single-pass validators plus local-only
+rules, an extractor for JSON embedded in free text, and parse statistics per
+prompt.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NULLABLE_STRING = {'type': ['string', 'null']}
+_NULLABLE_OBJECT = {'type': ['object', 'null']}
+_STRING_LIST = {'type': 'array', 'items': {'type': 'string'}}
+_CONFIDENCE = {'type': 'number', 'minimum': 0, 'maximum': 1}
+
+PROFILE_EXTRACTION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'first_name': _NULLABLE_STRING,
+        'last_name': _NULLABLE_STRING,
+        'age': {'type': ['integer', 'null']},
+        'grade': {'type': ['integer', 'null']},
+        'interests': _STRING_LIST,
+        'learning_preferences': _STRING_LIST,
+        'favorite_subjects': _STRING_LIST,
+        'challenging_subjects': _STRING_LIST,
+        'confidence_score': _CONFIDENCE
+    }
+}
+
+_MASTERY_PATCHES = {'type': ['array', 'null'], 'items': {'type': 'object'}}
+
+POST_SESSION_UPDATE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'profile_updates': _NULLABLE_OBJECT,
+        'memory_updates': _NULLABLE_OBJECT,
+        'mastery_updates': {
+            'type': ['object', 'null'],
+            'properties': {
+                'goal_patches': _MASTERY_PATCHES,
+                'kc_patches': _MASTERY_PATCHES
+            }
+        },
+        'should_create_new_profile_version': {'type': 'boolean'},
+        'update_reasoning': {'type': 'string'},
+        'confidence_score': _CONFIDENCE
+    }
+}
+
+POST_SESSION_UPDATE_SECTIONS = ('profile_updates', 'memory_updates', 'mastery_updates')
+
+TUTOR_ASSESSMENT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'assessment-of-ai-tutor': {'type': 'string', 'minLength': 1},
+        'suggested-changes': {'type': 'string', 'minLength': 1}
+    },
+    'required': ['assessment-of-ai-tutor', 'suggested-changes']
+}
+
+SESSION_SUMMARY_SCHEMA = {
+    'type': 'object',
+    'properties': {'summary': {'type': 'string', 'minLength': 1}},
+    'required': ['summary']
+}
+
+# Sections are validated individually by their consumers, so none is required here
+COMBINED_ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'profile_extraction': PROFILE_EXTRACTION_SCHEMA,
+        'post_session_update': POST_SESSION_UPDATE_SCHEMA,
+        'tutor_assessment': TUTOR_ASSESSMENT_SCHEMA
+    }
+}
+
+# Response schema per provider 'task'
+RESPONSE_SCHEMAS = {
+    'profile_extraction': PROFILE_EXTRACTION_SCHEMA,
+    'post_session_update': POST_SESSION_UPDATE_SCHEMA,
+    'tutor_assessment': TUTOR_ASSESSMENT_SCHEMA,
+    'session_summary': SESSION_SUMMARY_SCHEMA,
+    'combined_session_analysis': COMBINED_ANALYSIS_SCHEMA
+}
+
+
+def _require_update_section(value: Any, path: str, errors: List[str]) -> None:
+    """A post-session update must contain at least one update section"""
+    if isinstance(value, dict) and not any(name in value for name in POST_SESSION_UPDATE_SECTIONS):
+        errors.append(f"{path}: needs at least one of {', '.join(POST_SESSION_UPDATE_SECTIONS)}")
+
+
+# Rules checked only by the local validator. They are kept out of the schemas sent
+# to providers, since Anthropic tool input schemas reject a top-level anyOf.
+LOCAL_CHECKS = {
+    'post_session_update': _require_update_section
+}
+
+_TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None
+}
+
+Validator = Callable[[Any, str, List[str]], None]
+
+# Brace matching for extract_json: structural characters, and the rest of a string literal
+_STRUCTURE_PATTERN = re.compile(r'[{}"]')
+_STRING_BODY_PATTERN = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_NOT_FOUND = object()
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile a JSON schema into a validator function
+
+    Supports the subset the response schemas use: type (single or list),
+    properties, required, items, enum, minimum, maximum, minLength and anyOf.
+    Unknown keywords are ignored. The returned validator walks the data once
+    and appends "path: message" strings to the errors list.
+
+    Args:
+        schema: JSON schema dictionary
+
+    Returns:
+        Validator called as validator(value, path, errors)
+    """
+    checks = []
+
+    types = schema.get('type')
+    if types:
+        type_names = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[name] for name in type_names]
+        expected = ' or '.join(type_names)
+
+        def check_type(value, path, errors):
+            if not any(check(value) for check in type_checks):
+                errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+                return False
+            return True
+    else:
+        def check_type(value, path, errors):
+            return True
+
+    if 'enum' in schema:
+        allowed = list(schema['enum'])
+        checks.append(lambda v, p, e: v in allowed or e.append(f"{p}: {v!r} not in {allowed}"))
+
+    if 'minimum' in schema or 'maximum' in schema:
+        minimum, maximum = schema.get('minimum'), schema.get('maximum')
+
+        def check_range(value, path, errors):
+            if not _TYPE_CHECKS['number'](value):
+                return
+            if minimum is not None and value < minimum:
+                errors.append(f"{path}: {value} is below minimum {minimum}")
+            if maximum is not None and value > maximum:
+                errors.append(f"{path}: {value} is above maximum {maximum}")
+        checks.append(check_range)
+
+    if 'minLength' in schema:
+        min_length = schema['minLength']
+        checks.append(lambda v, p, e: not isinstance(v, str) or len(v.strip()) >= min_length
+                      or e.append(f"{p}: shorter than {min_length} characters"))
+
+    if 'required' in schema:
+        required = list(schema['required'])
+
+        def check_required(value, path, errors):
+            if isinstance(value, dict):
+                for key in required:
+                    if key not in value:
+                        errors.append(f"{path}: missing required field '{key}'")
+        checks.append(check_required)
+
+    if 'properties' in schema:
+        properties = {name: compile_schema(sub) for name, sub in schema['properties'].items()}
+
+        def check_properties(value, path, errors):
+            if isinstance(value, dict):
+                for name, validate in properties.items():
+                    if name in value:
+                        validate(value[name], f"{path}.{name}", errors)
+        checks.append(check_properties)
+
+    if 'items' in schema:
+        validate_item = compile_schema(schema['items'])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    validate_item(item, f"{path}[{index}]", errors)
+        checks.append(check_items)
+
+    if 'anyOf' in schema:
+        alternatives = [compile_schema(sub) for sub in schema['anyOf']]
+
+        def check_any_of(value, path, errors):
+            for validate in alternatives:
+                alternative_errors = []
+                validate(value, path, alternative_errors)
+                if not alternative_errors:
+                    return
+            errors.append(f"{path}: does not match any allowed form")
+        checks.append(check_any_of)
+
+    def validate(value, path, errors):
+        if check_type(value, path, errors):
+            for check in checks:
+                check(value, path, errors)
+
+    return validate
+
+
+def extract_json(text: str) -> Any:
+    """
+    Find and decode the first JSON object embedded in free text
+
+    Scans the text once from the first "{", skipping string literals (with
+    their escapes) and pairing each "{" with the "}" that closes it. The
+    outermost balanced spans are decoded in order, so markdown code fences
+    and surrounding prose are skipped naturally. A stray "{" in prose never
+    closes and doesn't hide an object after it. Each character is scanned
+    once and each outermost span decoded at most once, so the cost is linear
+    in the length of the text.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        The decoded JSON value
+
+    Raises:
+        ValueError: If no decodable JSON object is found
+    """
+    decoder = json.JSONDecoder()
+    open_braces = []  # Positions of "{" not closed yet
+    spans = []  # Closed spans not inside another closed span, in order
+    position = text.find('{')
+
+    while position != -1:
+        # Jump between structural characters; string literals are skipped whole
+        match = _STRUCTURE_PATTERN.search(text, position)
+        if not match:
+            break
+        char = match.group()
+        position = match.end()
+        if char == '"':
+            if not open_braces:
+                continue  # A quote in prose between objects
+            string_end = _STRING_BODY_PATTERN.match(text, position)
+            if not string_end:
+                break  # Unterminated string: nothing after it can close
+            position = string_end.end()
+        elif char == '{':
+            open_braces.append(match.start())
+        elif open_braces:
+            start = open_braces.pop()
+            while spans and spans[-1][0] > start:
+                spans.pop()
+            spans.append((start, position))
+            if not open_braces:
+                # Nothing still open can enclose these spans, so they are final
+                value = _decode_first(decoder, text, spans)
+                if value is not _NOT_FOUND:
+                    return value
+                spans.clear()
+
+    # Spans left inside a "{" that never closed
+    value = _decode_first(decoder, text, spans)
+    if value is not _NOT_FOUND:
+        return value
+    raise ValueError(f"No valid JSON found in response: {text[:200]}...")
+
+
+def _decode_first(decoder: json.JSONDecoder, text: str, spans: List[Tuple[int, int]]) -> Any:
+    """Decode the first span that is valid JSON, or return _NOT_FOUND"""
+    for start, end in spans:
+        try:
+            value, _ = decoder.raw_decode(text[start:end])
+            return value
+        except json.JSONDecodeError:
+            continue
+    return _NOT_FOUND
+
+
+@dataclass
+class ParseResult:
+    """Outcome of parsing one model response"""
+    data: Any = None
+    method: str = 'failed'
+    errors: List[str] = field(default_factory=list)
+    parse_ms: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        """Parsed and schema-valid"""
+        return self.data is not None and not self.errors
+
+
+class ParseStats:
+    """Thread-safe per-prompt parse counters and timings"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, prompt: str, result: ParseResult) -> None:
+        """Add one parse outcome for a prompt"""
+        with self._lock:
+            stats = self._stats.setdefault(prompt, {
+                'total': 0,
+                'parse_failures': 0,
+                'schema_failures': 0,
+                'methods': {},
+                'total_ms': 0.0,
+                'max_ms': 0.0
+            })
+            stats['total'] += 1
+            if result.data is None:
+                stats['parse_failures'] += 1
+            elif result.errors:
+                stats['schema_failures'] += 1
+            stats['methods'][result.method] = stats['methods'].get(result.method, 0) + 1
+            stats['total_ms'] += result.parse_ms
+            stats['max_ms'] = max(stats['max_ms'], result.parse_ms)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Failure rates and parse times per prompt"""
+        with self._lock:
+            summary = {}
+            for prompt, stats in self._stats.items():
+                total = stats['total']
+                summary[prompt] = {
+                    'total': total,
+                    'parse_failures': stats['parse_failures'],
+                    'schema_failures': stats['schema_failures'],
+                    'failure_rate': (stats['parse_failures'] + stats['schema_failures']) / total if total else 0.0,
+                    'methods': dict(stats['methods']),
+                    'avg_parse_ms': round(stats['total_ms'] / total, 3) if total else 0.0,
+                    'max_parse_ms': round(stats['max_ms'], 3)
+                }
+            return summary
+
+    def reset(self) -> None:
+        """Clear all counters"""
+        with self._lock:
+            self._stats.clear()
+
+
+class StructuredOutputParser:
+    """Parses model responses against the registered response schemas"""
+
+    def __init__(self, schemas: Dict[str, Dict[str, Any]] = None,
+                 local_checks: Dict[str, Validator] = None):
+        self.schemas = dict(RESPONSE_SCHEMAS if schemas is None else schemas)
+        self.local_checks = dict(LOCAL_CHECKS if local_checks is None else local_checks)
+        self.stats = ParseStats()
+        self._validators = {task: compile_schema(schema) for task, schema in self.schemas.items()}
+
+    def get_schema(self, task: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Response schema registered for a task, if any"""
+        return self.schemas.get(task) if task else None
+
+    def register_schema(self, task: str, schema: Dict[str, Any]) -> None:
+        """Register (or replace) the response schema for a task"""
+        self._validators[task] = compile_schema(schema)
+        self.schemas[task] = schema
+
+    def validate(self, task: Optional[str], data: Any) -> List[str]:
+        """
+        Validate data against a task's schema and its local-only rules
+
+        Returns:
+            List of validation errors (empty if valid or no schema is registered)
+        """
+        validator = self._validators.get(task) if task else None
+        if validator is None:
+            return []
+        errors = []
+        validator(data, '$', errors)
+        local_check = self.local_checks.get(task)
+        if local_check and not errors:
+            local_check(data, '$', errors)
+        return errors
+
+    def parse(self, response: Any, task: Optional[str] = None, native: bool = False,
+              record: bool = True) -> ParseResult:
+        """
+        Parse a model response and validate it against the task schema
+
+        Args:
+            response: Response text, or an already-decoded value (e.g. tool input)
+            task: Task name used for the schema and the statistics
+            native: Whether the provider returned schema-constrained output
+            record: Whether to count this parse in the statistics
+
+        Returns:
+            ParseResult with data (None if nothing could be decoded), method and errors
+        """
+        started = time.perf_counter()
+        result = ParseResult()
+
+        if isinstance(response, (dict, list)):
+            result.data, result.method = response, 'native'
+        elif response and response.strip():
+            text = response.strip()
+            try:
+                result.data = json.loads(text)
+                result.method = 'native' if native else 'direct'
+            except json.JSONDecodeError:
+                try:
+                    result.data = extract_json(text)
+                    result.method = 'extracted'
+                except ValueError as e:
+                    result.errors.append(str(e))
+        else:
+            result.errors.append("Empty response")
+
+        if result.data is not None:
+            result.errors = self.validate(task, result.data)
+        result.parse_ms = (time.perf_counter() - started) * 1000
+
+        if record:
+            self.stats.record(task or 'unknown', result)
+        if result.errors:
+            logger.warning(f"Structured output for {task or 'unknown'} ({result.method}): "
+                           f"{'; '.join(result.errors[:3])}")
+        return result
+
+
+# Global parser shared by the providers and services
+structured_output = StructuredOutputParser()
+
+
+def get_parse_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-prompt parse failure rates and times for this process"""
+    return structured_output.stats.summary()
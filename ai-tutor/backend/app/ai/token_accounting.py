@@ -0,0 +1,226 @@
+"""
+Token counting and pricing for AI calls
+Pre-flight token counts come from a local tokenizer (tiktoken when installed,
+otherwise a pre-tokenizing heuristic), cached per prompt segment digest so
+static blocks are tokenized once without the cache holding their text. Actual counts come from the provider's usage
+fields; both are priced with the same per-model table.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+    logger.info("tiktoken not installed; using heuristic token counts for pre-flight estimates")
+
+# USD per 1M tokens: (input, output). Matched by longest model-name prefix.
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+    'o3-mini': (1.10, 4.40),
+    'o4-mini': (1.10, 4.40),
+    'o3': (2.00, 8.00),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'claude-3-haiku': (0.25, 1.25),
+    'claude-3-5-haiku': (0.80, 4.00),
+    'claude-3-sonnet': (3.00, 15.00),
+    'claude-3-5-sonnet': (3.00, 15.00),
+    'claude-3-7-sonnet': (3.00, 15.00),
+    'claude-sonnet-4': (3.00, 15.00),
+    'claude-3-opus': (15.00, 75.00),
+    'claude-opus-4': (15.00, 75.00)
+}
+DEFAULT_PRICE = MODEL_PRICES['gpt-4o-mini']
+
+# Cached input is billed relative to the input price: OpenAI reads at 50%,
+# Anthropic reads at 10% and writes the cache at 125%
+CACHE_READ_MULTIPLIER = {'openai': 0.5, 'anthropic': 0.1}
+CACHE_WRITE_MULTIPLIER = {'openai': 1.0, 'anthropic': 1.25}
+
+# Chat formatting overhead per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Heuristic pre-tokenization: words, up to 3-digit number groups, punctuation runs, whitespace
+_PIECE_PATTERN = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\w\s]+|\s+")
+
+# Segment token counts keyed by (text digest, encoding), least recently used evicted first
+SEGMENT_CACHE_SIZE = 256
+_segment_counts = OrderedDict()
+_segment_counts_lock = threading.Lock()
+
+
+def get_model_price(model: Optional[str]) -> Tuple[float, float]:
+    """(input, output) USD per 1M tokens for a model"""
+    name = (model or '').lower()
+    matches = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    if not matches:
+        return DEFAULT_PRICE
+    return MODEL_PRICES[max(matches, key=len)]
+
+
+def _encoding_name(model: Optional[str]) -> str:
+    """Tokenizer used for a model; Anthropic models are approximated with cl100k"""
+    if not TIKTOKEN_AVAILABLE:
+        return 'heuristic'
+    name = (model or '').lower()
+    if name.startswith(('gpt-4o', 'gpt-4.1', 'o1', 'o3', 'o4')):
+        return 'o200k_base'
+    return 'cl100k_base'
+
+
+def _heuristic_count(text: str) -> int:
+    """Approximate BPE token count without a tokenizer"""
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        if piece.isspace():
+            tokens += 1
+        elif piece.isascii():
+            stripped = piece.lstrip()
+            if stripped[:1].isalpha():
+                # Common English words are one token, long ones split every ~8 characters
+                tokens += 1 + len(stripped) // 8
+            else:
+                tokens += math.ceil(len(stripped) / 2) if not stripped.isdigit() else 1
+        else:
+            # Non-Latin and accented text splits into byte-level pieces: ~3 UTF-8 bytes per token
+            tokens += max(1, math.ceil(len(piece.strip().encode('utf-8')) / 3))
+    return tokens
+
+
+def _count_segment(text: str, encoding_name: str) -> int:
+    """Token count of one prompt segment, cached by a digest of its text"""
+    key = (hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest(), encoding_name)
+    with _segment_counts_lock:
+        count = _segment_counts.get(key)
+        if count is not None:
+            _segment_counts.move_to_end(key)
+            return count
+
+    count = _tokenize_count(text, encoding_name)
+    with _segment_counts_lock:
+        _segment_counts[key] = count
+        if len(_segment_counts) > SEGMENT_CACHE_SIZE:
+            _segment_counts.popitem(last=False)
+    return count
+
+
+def _tokenize_count(text: str, encoding_name: str) -> int:
+    """Token count of text with the named encoding, falling back to the heuristic"""
+    if encoding_name == 'heuristic':
+        return _heuristic_count(text)
+    try:
+        return len(_get_encoding(encoding_name).encode(text, disallowed_special=()))
+    except Exception as e:
+        # e.g. encoding files unavailable offline and not in TIKTOKEN_CACHE_DIR
+        logger.warning(f"tiktoken {encoding_name} unavailable ({e}); using heuristic count")
+        return _heuristic_count(text)
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(encoding_name: str):
+    """Load a tiktoken encoding once"""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text segment for a model
+
+    Args:
+        text: Segment text (system prompt, user prompt, response)
+        model: Model name, used to pick the tokenizer
+
+    Returns:
+        Token count (0 for empty text)
+    """
+    if not text:
+        return 0
+    return _count_segment(text, _encoding_name(model))
+
+
+def count_message_tokens(messages, model: Optional[str] = None) -> int:
+    """Token count of chat messages ({'role', 'content'} dicts or plain strings), with per-message overhead"""
+    total = 0
+    for message in messages:
+        content = message.get('content') if isinstance(message, dict) else message
+        if isinstance(content, list):
+            # Anthropic-style content blocks
+            total += sum(count_tokens(block.get('text'), model) for block in content if isinstance(block, dict))
+        else:
+            total += count_tokens(content, model)
+        total += MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+@dataclass
+class TokenUsage:
+    """Token counts of one call. input_tokens excludes cached input."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    source: str = 'tokenizer'  # 'usage' when reported by the provider
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_read_tokens + self.cache_write_tokens
+
+    def cost(self, provider: str, model: str) -> float:
+        """Price these tokens in USD"""
+        input_price, output_price = get_model_price(model)
+        cached_input = (self.cache_read_tokens * CACHE_READ_MULTIPLIER.get(provider, 1.0)
+                        + self.cache_write_tokens * CACHE_WRITE_MULTIPLIER.get(provider, 1.0))
+        return ((self.input_tokens + cached_input) * input_price + self.output_tokens * output_price) / 1_000_000
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cache_read_tokens': self.cache_read_tokens,
+            'cache_write_tokens': self.cache_write_tokens,
+            'source': self.source
+        }
+
+
+def usage_from_openai(usage) -> Optional[TokenUsage]:
+    """TokenUsage from an OpenAI chat completion's usage field (prompt_tokens includes cached)"""
+    if usage is None:
+        return None
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+    return TokenUsage(
+        input_tokens=(usage.prompt_tokens or 0) - cached,
+        output_tokens=usage.completion_tokens or 0,
+        cache_read_tokens=cached,
+        source='usage'
+    )
+
+
+def usage_from_anthropic(usage) -> Optional[TokenUsage]:
+    """TokenUsage from an Anthropic message's usage field (input_tokens excludes cache reads/writes)"""
+    if usage is None:
+        return None
+    return TokenUsage(
+        input_tokens=usage.input_tokens or 0,
+        output_tokens=usage.output_tokens or 0,
+        cache_read_tokens=getattr(usage, 'cache_read_input_tokens', 0) or 0,
+        cache_write_tokens=getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        source='usage'
+    )
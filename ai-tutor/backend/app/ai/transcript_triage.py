@@ -0,0 +1,372 @@
+"""
+Pre-LLM transcript triage
+Scores how much the student actually said on a call before any LLM call is
+made. Silence, hang-ups and calls where the child only gives a name, age or
+grade skip the LLM; their name/age/grade come from rule-based extractors
+instead, and every LLM call skipped this way is counted.
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from .data_models import AIExtractedProfile
+from .usage_limits import UsageBackend, MemoryUsageBackend, DAILY_KEY_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# LLM calls a low-information call can skip
+AVOIDABLE_TASKS = ('profile_extraction', 'combined_analysis', 'session_summary',
+                   'tutor_assessment', 'post_session_update')
+
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'resources', 'triage_corpus.json')
+
+STUDENT_SPEAKERS = {'user', 'student', 'customer', 'caller'}
+
+# "AI: ..." / "User: ..." turn markers, at line starts or inline after sentence punctuation
+_SPEAKER_PATTERN = re.compile(
+    r'(?:^|(?<=[.!?\n]))\s*(User|Student|Customer|Caller|AI|Assistant|Tutor|Bot|Agent|System)\s*:\s*',
+    re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?|\d+")
+
+NUMBER_WORDS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13,
+    'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19
+}
+ORDINAL_WORDS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6, 'seventh': 7,
+    'eighth': 8, 'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12
+}
+_NUMBER = r'(\d{1,2}|' + '|'.join(NUMBER_WORDS) + r')'
+_ORDINAL = r'(\d{1,2}(?:st|nd|rd|th)|' + '|'.join(ORDINAL_WORDS) + r')'
+_NAME = r"([A-Z][a-z]+(?:[-'][A-Z]?[a-z]+)?)"
+
+_NAME_PATTERNS = [
+    re.compile(r"(?i:\bmy name is|\bmy name's|\bcall me)\s+" + _NAME + r"(?:\s+" + _NAME + r")?"),
+    re.compile(r"(?i:\bI'm|\bI am|\bthis is|\bit's)\s+" + _NAME + r"(?:\s+" + _NAME + r")?"),
+]
+_AGE_PATTERNS = [
+    re.compile(r'\b' + _NUMBER + r'\s+years?\s+old\b', re.IGNORECASE),
+    re.compile(r"\b(?:I'm|I am|im|age is|I turned)\s+" + _NUMBER + r'\b(?!\s*(?:st|nd|rd|th|grade|year|minutes?|%))',
+               re.IGNORECASE),
+]
+_GRADE_PATTERNS = [
+    re.compile(r'\b' + _ORDINAL + r'\s+grade(?:r)?\b', re.IGNORECASE),
+    re.compile(r'\b(?:grade|year)\s+' + _NUMBER + r'\b', re.IGNORECASE),
+]
+_KINDERGARTEN_PATTERN = re.compile(r'\bkindergarten\b', re.IGNORECASE)
+
+# Words after "I'm"/"this is" that aren't names
+_NOT_NAMES = {
+    'Good', 'Fine', 'Great', 'Okay', 'Ok', 'Not', 'Sure', 'Here', 'Ready', 'In', 'At', 'On', 'A', 'An',
+    'The', 'So', 'Just', 'Still', 'Also', 'Very', 'Really', 'Doing', 'Having', 'Going', 'Trying',
+    'Learning', 'Working', 'Calling', 'Sorry', 'Done', 'Back', 'Home', 'Bored', 'Tired', 'Stuck',
+    'Confused', 'Happy', 'Excited', 'Your', 'My', 'Me', 'It', 'That', 'This', 'Is', 'And', 'But',
+    'Hello', 'Hi', 'Hey', 'Yes', 'No', 'Well', 'Um', 'Uh', 'Like', 'Grade', 'Year'
+} | {word.capitalize() for word in list(NUMBER_WORDS) + list(ORDINAL_WORDS)}
+# Second word of a name that ends the name rather than being a last name
+_NOT_LAST_NAMES = _NOT_NAMES | {'I', 'Im', 'Years', 'Nice'}
+
+# Greetings, fillers and function words that carry no analysable content
+_FILLER_WORDS = {
+    'hi', 'hello', 'hey', 'bye', 'goodbye', 'yes', 'yeah', 'yep', 'no', 'nope', 'ok', 'okay', 'um', 'uh',
+    'hmm', 'mm', 'oh', 'ah', 'thanks', 'thank', 'you', 'sure', 'fine', 'good', 'great', 'cool', 'alright',
+    'i', "i'm", 'im', 'am', 'me', 'my', 'is', 'are', 'was', 'a', 'an', 'the', 'and', 'or', 'but', 'so',
+    'it', "it's", 'this', 'that', 'in', 'on', 'at', 'to', 'of', 'for', 'with', 'what', 'who', 'do',
+    'name', "name's", 'years', 'old', 'grade', 'year', 'there', 'here', 'sorry', 'wrong', 'number', 'again',
+    'hear', 'can', "can't", 'now', 'just', 'well', 'like', 'call', 'called'
+}
+
+# Subjects and learning talk; mentioning these marks a call worth analysing
+_TOPIC_WORDS = {
+    'math', 'maths', 'fraction', 'fractions', 'multiply', 'multiplication', 'divide', 'division',
+    'algebra', 'geometry', 'equation', 'equations', 'numbers', 'reading', 'read', 'book',
+    'books', 'writing', 'spelling', 'english', 'science', 'history', 'geography', 'homework', 'exam',
+    'learn', 'learning', 'understand', 'solve', 'explain', 'question', 'problem', 'problems',
+    'practice', 'subject', 'subjects', 'school', 'teacher', 'story', 'words', 'vocabulary', 'physics',
+    'chemistry', 'biology', 'coding', 'art', 'music', 'language', 'languages', 'swedish', 'spanish'
+}
+
+
+@dataclass
+class TriageResult:
+    """Outcome of triaging one transcript"""
+    score: float
+    skip_llm: bool
+    reason: str
+    signals: Dict[str, Any] = field(default_factory=dict)
+    profile: Dict[str, Any] = field(default_factory=dict)  # Rule-based extraction ({} if nothing found)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'score': round(self.score, 3),
+            'skip_llm': self.skip_llm,
+            'reason': self.reason,
+            'signals': self.signals,
+            'profile': self.profile
+        }
+
+
+def split_turns(transcript: str) -> List[Tuple[str, str]]:
+    """
+    Split a transcript into (speaker, text) turns
+
+    Unlabelled text (e.g. the webhook's raw user transcript) is attributed to the student.
+    """
+    if not transcript:
+        return []
+
+    matches = list(_SPEAKER_PATTERN.finditer(transcript))
+    if not matches:
+        return [('user', transcript.strip())] if transcript.strip() else []
+
+    turns = []
+    if transcript[:matches[0].start()].strip():
+        turns.append(('user', transcript[:matches[0].start()].strip()))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        text = transcript[match.end():next_match.start() if next_match else len(transcript)].strip()
+        if text:
+            turns.append((match.group(1).lower(), text))
+    return turns
+
+
+def _to_number(token: str) -> Optional[int]:
+    token = token.lower()
+    digits = re.match(r'\d+', token)
+    if digits:
+        return int(digits.group())
+    return NUMBER_WORDS.get(token, ORDINAL_WORDS.get(token))
+
+
+def extract_basic_profile(student_text: str) -> Tuple[Dict[str, Any], List[Tuple[int, int]]]:
+    """
+    Rule-based name, age and grade extraction from what the student said
+
+    Args:
+        student_text: The student's turns joined together
+
+    Returns:
+        Tuple of (fields found, character spans the matches covered)
+    """
+    found = {}
+    spans = []
+
+    for pattern in _NAME_PATTERNS:
+        for match in pattern.finditer(student_text):
+            first_name, last_name = match.group(1), match.group(2)
+            if first_name in _NOT_NAMES:
+                continue
+            found['first_name'] = first_name
+            spans.append(match.span())
+            if last_name and last_name not in _NOT_LAST_NAMES:
+                found['last_name'] = last_name
+            break
+        if 'first_name' in found:
+            break
+
+    for pattern in _AGE_PATTERNS:
+        match = pattern.search(student_text)
+        if match:
+            age = _to_number(match.group(1))
+            if age is not None and 3 <= age <= 19:
+                found['age'] = age
+                spans.append(match.span())
+                break
+
+    for pattern in _GRADE_PATTERNS:
+        match = pattern.search(student_text)
+        if match:
+            grade = _to_number(match.group(1))
+            if grade is not None and 1 <= grade <= 13:
+                found['grade'] = grade
+                spans.append(match.span())
+                break
+    else:
+        match = _KINDERGARTEN_PATTERN.search(student_text)
+        if match:
+            found['grade'] = 0
+            spans.append(match.span())
+
+    return found, spans
+
+
+class TriageStats:
+    """Daily counts of triaged calls and avoided LLM calls, shared via the usage backend"""
+
+    def __init__(self, backend: Optional[UsageBackend] = None, prefix: str = 'ai:triage'):
+        self._backend = backend
+        self.prefix = prefix
+
+    @property
+    def backend(self) -> UsageBackend:
+        if self._backend is None:
+            from .providers import provider_manager
+            self._backend = provider_manager.usage_backend
+        return self._backend
+
+    def _key(self, name: str, day: Optional[str] = None) -> str:
+        day = day or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        return f"{self.prefix}:{day}:{name}"
+
+    def _incr(self, name: str) -> None:
+        try:
+            self.backend.incr(self._key(name), 1, DAILY_KEY_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not record triage stat {name}: {e}")
+
+    def record_call(self, result: TriageResult) -> None:
+        """Count one triaged call"""
+        self._incr('triaged')
+        if result.skip_llm:
+            self._incr('skipped')
+            if result.profile:
+                self._incr('rule_extractions')
+
+    def record_avoided(self, task: str) -> None:
+        """Count one LLM call that triage made unnecessary"""
+        self._incr(f"avoided:{task}")
+
+    def summary(self) -> Dict[str, Any]:
+        """Today's counts"""
+        get = lambda name: int(self.backend.get(self._key(name)))
+        avoided = {task: get(f"avoided:{task}") for task in AVOIDABLE_TASKS}
+        triaged = get('triaged')
+        skipped = get('skipped')
+        return {
+            'triaged_calls': triaged,
+            'skipped_calls': skipped,
+            'skip_rate': skipped / triaged if triaged else 0.0,
+            'rule_extractions': get('rule_extractions'),
+            'llm_calls_avoided': sum(avoided.values()),
+            'avoided_by_task': avoided
+        }
+
+
+class TranscriptTriage:
+    """Scores transcript content and decides whether post-call LLM analysis is worth running"""
+
+    def __init__(self, stats: Optional[TriageStats] = None, min_score: Optional[float] = None):
+        self.stats = stats or TriageStats()
+        self.enabled = os.getenv('AI_TRIAGE', 'true').lower() == 'true'
+        self.min_score = min_score if min_score is not None else float(os.getenv('AI_TRIAGE_MIN_SCORE', '0.25'))
+
+    def triage(self, transcript: Optional[str]) -> TriageResult:
+        """
+        Score a transcript without calling any model
+
+        The score combines how many content words the student said (greetings,
+        fillers and the name/age/grade statements themselves don't count), how
+        many times they spoke and whether any subject or learning talk came up.
+
+        Args:
+            transcript: Call transcript
+
+        Returns:
+            TriageResult; skip_llm is True below AI_TRIAGE_MIN_SCORE
+        """
+        turns = split_turns((transcript or '').replace('\u2019', "'"))
+        student_text = ' '.join(text for speaker, text in turns if speaker in STUDENT_SPEAKERS)
+        extracted, spans = extract_basic_profile(student_text)
+
+        # Statements already captured by the extractors carry no further information
+        remaining = student_text
+        for start, end in sorted(spans, reverse=True):
+            remaining = remaining[:start] + ' ' + remaining[end:]
+        words = [word.lower() for word in _WORD_PATTERN.findall(remaining)]
+        content_words = [word for word in words if word not in _FILLER_WORDS and not word.isdigit()]
+        topic_hits = {word for word in words if word in _TOPIC_WORDS}
+        student_turns = sum(1 for speaker, _ in turns if speaker in STUDENT_SPEAKERS)
+
+        score = (0.5 * min(1.0, len(content_words) / 40)
+                 + 0.2 * min(1.0, student_turns / 5)
+                 + 0.3 * min(1.0, len(topic_hits) / 2))
+
+        signals = {
+            'student_turns': student_turns,
+            'student_words': len(_WORD_PATTERN.findall(student_text)),
+            'content_words': len(content_words),
+            'topics': sorted(topic_hits),
+            'extracted_fields': sorted(extracted)
+        }
+
+        profile = {}
+        if extracted:
+            profile = AIExtractedProfile(
+                first_name=extracted.get('first_name'),
+                last_name=extracted.get('last_name'),
+                age=extracted.get('age'),
+                grade=extracted.get('grade'),
+                confidence_score=0.8,
+                extraction_source='rule_extraction'
+            ).to_dict()
+            profile['_analysis_metadata'] = {'prompt_used': 'rule_extraction', 'triage_score': round(score, 3)}
+
+        if not self.enabled:
+            return TriageResult(score, False, 'Triage disabled', signals, profile)
+        if not student_text:
+            return TriageResult(0.0, True, 'Student said nothing', signals, profile)
+        if score < self.min_score:
+            reason = ('Only introduction details' if extracted else 'Too little content') + f" (score {score:.2f})"
+            return TriageResult(score, True, reason, signals, profile)
+        return TriageResult(score, False, f"Enough content (score {score:.2f})", signals, profile)
+
+    def record_call(self, result: TriageResult) -> None:
+        self.stats.record_call(result)
+
+    def record_avoided(self, task: str) -> None:
+        self.stats.record_avoided(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.stats.summary()
+
+
+def evaluate_corpus(path: str = DEFAULT_CORPUS_PATH, triage: Optional[TranscriptTriage] = None) -> Dict[str, Any]:
+    """
+    Check triage decisions and rule-based extractions against a labelled corpus
+
+    Each corpus entry has an id, a transcript and labels (first_name,
+    last_name, age, grade and skip_llm; a missing field means "not stated").
+
+    Args:
+        path: Corpus JSON file
+        triage: Triage instance to evaluate (a fresh default one if None)
+
+    Returns:
+        Per-field accuracy and the mismatching entries
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    triage = triage or TranscriptTriage(stats=TriageStats(backend=MemoryUsageBackend()))
+    fields = ('first_name', 'last_name', 'age', 'grade', 'skip_llm')
+    correct = {name: 0 for name in fields}
+    mismatches = []
+
+    for entry in corpus:
+        result = triage.triage(entry['transcript'])
+        labels = entry['labels']
+        predicted = {name: result.profile.get(name) for name in fields[:4]}
+        predicted['skip_llm'] = result.skip_llm
+        for name in fields:
+            if predicted[name] == labels.get(name):
+                correct[name] += 1
+            else:
+                mismatches.append({'id': entry['id'], 'field': name,
+                                   'expected': labels.get(name), 'predicted': predicted[name],
+                                   'score': round(result.score, 3)})
+
+    total = len(corpus)
+    return {
+        'entries': total,
+        'accuracy': {name: correct[name] / total if total else 0.0 for name in fields},
+        'mismatches': mismatches
+    }
+
+
+# Global triage instance
+transcript_triage = TranscriptTriage()
@@ -0,0 +1,364 @@
+"""
+Shared AI usage limits
+Daily spend/token budget and per provider/model request and token rate
+limits, kept in Redis so every gunicorn worker and Celery process shares
+them. An in-memory backend with the same semantics can be selected with
+AI_USAGE_BACKEND=memory for tests and single-process deployments.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Daily counters outlive their day by this much so late readers still see the total
+DAILY_KEY_TTL_SECONDS = 2 * 24 * 3600
+
+# Atomically refill a bucket and take `amount` tokens if available.
+# KEYS[1] bucket hash; ARGV capacity, refill per second, amount, now (seconds), ttl (ms)
+# Returns seconds to wait before `amount` tokens will be available (0 when taken)
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+if now > ts then
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    ts = now
+end
+local wait = 0
+if tokens >= amount then
+    tokens = tokens - amount
+else
+    wait = (amount - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', KEYS[1], ARGV[5])
+return tostring(wait)
+"""
+
+
+class BudgetExceededError(ValueError):
+    """The shared daily cost budget is used up"""
+    pass
+
+
+class UsageBackendUnavailable(BudgetExceededError):
+    """The shared usage counters can't be reached, so AI calls are denied"""
+    pass
+
+
+class RateLimitExceeded(Exception):
+    """A request was shed because the provider rate limit has no capacity"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UsageBackend(ABC):
+    """Atomic counters and token buckets shared by all workers"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: float, ttl_seconds: int) -> float:
+        """Atomically add to a counter and return the new total"""
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> float:
+        """Current counter value (0 if unset)"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a counter or bucket"""
+        pass
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_per_second: float, amount: float) -> float:
+        """
+        Take tokens from a bucket if it holds enough
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds until they will be available
+        """
+        pass
+
+
+class MemoryUsageBackend(UsageBackend):
+    """Process-local backend for tests and single-process deployments"""
+
+    def __init__(self):
+        self._counters = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, amount: float, ttl_seconds: int) -> float:
+        now = time.time()
+        with self._lock:
+            value, expires = self._counters.get(key, (0.0, None))
+            if expires is not None and expires <= now:
+                value = 0.0
+            value += amount
+            self._counters[key] = (value, now + ttl_seconds)
+            return value
+
+    def get(self, key: str) -> float:
+        with self._lock:
+            value, expires = self._counters.get(key, (0.0, None))
+            if expires is not None and expires <= time.time():
+                return 0.0
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._counters.pop(key, None)
+            self._buckets.pop(key, None)
+
+    def take(self, key: str, capacity: float, refill_per_second: float, amount: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            if now > ts:
+                tokens = min(capacity, tokens + (now - ts) * refill_per_second)
+                ts = now
+            wait = 0.0
+            if tokens >= amount:
+                tokens -= amount
+            else:
+                wait = (amount - tokens) / refill_per_second
+            self._buckets[key] = (tokens, ts)
+            return wait
+
+
+class UnavailableUsageBackend(UsageBackend):
+    """Stands in for an unreachable Redis outside production: every operation denies the call"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def _deny(self):
+        raise UsageBackendUnavailable(f"AI usage counters unavailable ({self.reason}); "
+                                      f"start Redis and restart, or set AI_USAGE_BACKEND=memory")
+
+    def incr(self, key: str, amount: float, ttl_seconds: int) -> float:
+        self._deny()
+
+    def get(self, key: str) -> float:
+        self._deny()
+
+    def delete(self, key: str) -> None:
+        self._deny()
+
+    def take(self, key: str, capacity: float, refill_per_second: float, amount: float) -> float:
+        self._deny()
+
+
+class RedisUsageBackend(UsageBackend):
+    """Redis backend shared across processes and hosts"""
+
+    def __init__(self, client):
+        self.client = client
+        self._take_script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def incr(self, key: str, amount: float, ttl_seconds: int) -> float:
+        pipe = self.client.pipeline()
+        pipe.incrbyfloat(key, amount)
+        pipe.expire(key, ttl_seconds)
+        value, _ = pipe.execute()
+        return float(value)
+
+    def get(self, key: str) -> float:
+        value = self.client.get(key)
+        return float(value) if value is not None else 0.0
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def take(self, key: str, capacity: float, refill_per_second: float, amount: float) -> float:
+        # Time to refill an empty bucket (plus a minute) bounds how long idle state is kept
+        ttl_ms = int((capacity / refill_per_second + 60) * 1000)
+        wait = self._take_script(keys=[key], args=[capacity, refill_per_second, amount, time.time(), ttl_ms])
+        return float(wait)
+
+
+def create_usage_backend() -> UsageBackend:
+    """
+    Create the configured usage backend
+
+    Redis at REDIS_URL is used unless AI_USAGE_BACKEND=memory opts in to
+    per-process counters. If Redis can't be reached this raises in
+    production; elsewhere it logs an error and every AI call is denied.
+
+    Raises:
+        RuntimeError: If Redis is unreachable and FLASK_ENV is production
+    """
+    backend = os.getenv('AI_USAGE_BACKEND', 'redis').lower()
+    if backend == 'memory':
+        logger.info("AI usage limits use per-process counters (AI_USAGE_BACKEND=memory)")
+        return MemoryUsageBackend()
+    if backend != 'redis':
+        raise ValueError(f"Unsupported AI usage backend: {backend}")
+
+    try:
+        import redis
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+                                      decode_responses=True, socket_timeout=2)
+        client.ping()
+        logger.info("AI usage limits shared via Redis")
+        return RedisUsageBackend(client)
+    except Exception as e:
+        if os.getenv('FLASK_ENV', 'development') == 'production':
+            raise RuntimeError(f"Redis is required for AI usage limits but is not available: {e}") from e
+        logger.error(f"Redis not available for AI usage limits ({e}); AI calls will be denied. "
+                     f"Start Redis and restart, or set AI_USAGE_BACKEND=memory")
+        return UnavailableUsageBackend(str(e))
+
+
+class CostBudget:
+    """Shared daily spend and token counters with a spend limit (UTC days)"""
+
+    def __init__(self, backend: UsageBackend, daily_limit: float, prefix: str = 'ai:usage'):
+        self.backend = backend
+        self.daily_limit = daily_limit
+        self.prefix = prefix
+
+    def _keys(self, day: Optional[str] = None) -> Tuple[str, str]:
+        day = day or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        return f"{self.prefix}:cost:{day}", f"{self.prefix}:tokens:{day}"
+
+    def check(self) -> None:
+        """Raise BudgetExceededError if today's spend has reached the limit"""
+        spent = self.backend.get(self._keys()[0])
+        if spent >= self.daily_limit:
+            raise BudgetExceededError(f"Daily cost limit of ${self.daily_limit} reached")
+
+    def record(self, cost: float, tokens: int = 0) -> float:
+        """
+        Add a call's spend and tokens to today's totals
+
+        Returns:
+            Today's total spend after this call
+        """
+        cost_key, tokens_key = self._keys()
+        total = self.backend.incr(cost_key, cost, DAILY_KEY_TTL_SECONDS)
+        if tokens:
+            self.backend.incr(tokens_key, tokens, DAILY_KEY_TTL_SECONDS)
+        return total
+
+    def summary(self) -> Dict[str, float]:
+        """Today's spend, tokens and remaining budget"""
+        cost_key, tokens_key = self._keys()
+        spent = self.backend.get(cost_key)
+        return {
+            'daily_cost': spent,
+            'daily_tokens': int(self.backend.get(tokens_key)),
+            'daily_limit': self.daily_limit,
+            'remaining_budget': self.daily_limit - spent
+        }
+
+    def reset(self) -> None:
+        """Clear today's counters"""
+        for key in self._keys():
+            self.backend.delete(key)
+
+
+class TokenBucketLimiter:
+    """Distributed token bucket refilled continuously at `per_minute`"""
+
+    def __init__(self, backend: UsageBackend, key: str, per_minute: float, burst: Optional[float] = None):
+        self.backend = backend
+        self.key = key
+        self.per_minute = per_minute
+        self.capacity = burst or per_minute
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """
+        Take capacity without waiting
+
+        Returns:
+            0 if acquired, otherwise seconds until enough capacity is available
+        """
+        # Requests larger than the bucket could never fit; let them through at full capacity
+        amount = min(amount, self.capacity)
+        return self.backend.take(self.key, self.capacity, self.per_minute / 60.0, amount)
+
+
+class ProviderRateLimits:
+    """Requests-per-minute and tokens-per-minute buckets for each provider/model"""
+
+    def __init__(self, backend: UsageBackend, prefix: str = 'ai:ratelimit'):
+        self.backend = backend
+        self.prefix = prefix
+        self.mode = os.getenv('AI_RATE_LIMIT_MODE', 'wait').lower()
+        self.max_wait = float(os.getenv('AI_RATE_LIMIT_MAX_WAIT', '30'))
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def _get_limiters(self, provider: str, model: str) -> Tuple[Optional[TokenBucketLimiter], Optional[TokenBucketLimiter]]:
+        """Limiters for a provider/model from {PROVIDER}_RPM and {PROVIDER}_TPM (0 = unlimited)"""
+        with self._lock:
+            if (provider, model) not in self._limiters:
+                rpm = float(os.getenv(f'{provider.upper()}_RPM', '0'))
+                tpm = float(os.getenv(f'{provider.upper()}_TPM', '0'))
+                base = f"{self.prefix}:{provider}:{model}"
+                self._limiters[(provider, model)] = (
+                    TokenBucketLimiter(self.backend, f"{base}:requests", rpm) if rpm > 0 else None,
+                    TokenBucketLimiter(self.backend, f"{base}:tokens", tpm) if tpm > 0 else None
+                )
+            return self._limiters[(provider, model)]
+
+    async def acquire(self, provider: str, model: str, tokens: int, mode: Optional[str] = None) -> float:
+        """
+        Wait for (or shed on) request and token capacity for one call
+
+        Args:
+            provider: Provider name ('openai', 'anthropic')
+            model: Model name
+            tokens: Tokens the call is expected to use
+            mode: 'wait' to sleep until capacity is free (up to AI_RATE_LIMIT_MAX_WAIT),
+                'shed' to fail immediately; defaults to AI_RATE_LIMIT_MODE
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            RateLimitExceeded: If shedding, or the wait would exceed the maximum
+        """
+        mode = (mode or self.mode).lower()
+        waited = 0.0
+
+        for limiter, amount in zip(self._get_limiters(provider, model), (1, tokens)):
+            if limiter is None:
+                continue
+            while True:
+                wait = limiter.try_acquire(amount)
+                if wait <= 0:
+                    break
+                if mode == 'shed' or waited + wait > self.max_wait:
+                    raise RateLimitExceeded(
+                        f"Rate limit for {provider}/{model} reached ({limiter.key.rsplit(':', 1)[-1]})",
+                        retry_after=wait)
+                await asyncio.sleep(wait)
+                waited += wait
+
+        if waited:
+            logger.info(f"Waited {waited:.2f}s for {provider}/{model} rate limit capacity")
+        return waited
+
+    def reset(self) -> None:
+        """Clear all bucket state (mainly for tests)"""
+        with self._lock:
+            for limiters in self._limiters.values():
+                for limiter in limiters:
+                    if limiter is not None:
+                        self.backend.delete(limiter.key)
@@ -8,6 +8,7 @@ from typing import Dict, Any, List
 from dataclasses import dataclass
 
 from .providers import BasicAnalysis
+from .transcript_triage import transcript_triage
 
 @dataclass
 class ValidationResult:
@@ -250,6 +251,10 @@ class BasicValidator:
         if not any(keyword in transcript.lower() for keyword in educational_keywords):
             warnings.append("Transcript may not contain educational content")
         
+        triage = transcript_triage.triage(transcript)
+        if triage.skip_llm:
+            warnings.append(f"Low-information transcript: {triage.reason}")
+        
         score = 1.0 if len(issues) == 0 else 0.0
         
         return ValidationResult(
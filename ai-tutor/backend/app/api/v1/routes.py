@@ -3,8 +3,6 @@ API Blueprint
 RESTful API endpoints for the AI Tutor system
 """
 
-import os
-import json
 import hmac
 import hashlib
 import asyncio
@@ -36,6 +34,11 @@ from app.services.ai_service import AIService
 from app.services.mcp_interaction_service import MCPInteractionService
 from app.services.tutor_assessment_service import TutorAssessmentService
 from app.services.student_profile_ai_service import StudentProfileAIService
+from app.services.combined_analysis_service import CombinedAnalysisService
+from app.services.batch_analysis_service import BatchAnalysisService
+from app.ai.transcript_triage import transcript_triage
+from app.storage import artifact_manager
+from app.repositories import session_repository
 
 # Import the blueprint from parent module
 from app.api import bp as api
@@ -47,6 +50,7 @@ ai_service = AIService()
 mcp_interaction_service = MCPInteractionService()
 tutor_assessment_service = TutorAssessmentService()
 student_profile_ai_service = StudentProfileAIService()
+combined_analysis_service = CombinedAnalysisService()
 
 # Authentication helper (kept for backward compatibility)
 def check_auth():
@@ -68,6 +72,103 @@ def api_ai_stats():
     
     return jsonify(session_processor.get_processing_stats())
 
+@api.route('/admin/api/ai-parse-stats')
+@token_or_session_auth(required_scope='admin:read')
+def api_ai_parse_stats():
+    """Get structured output parse failure rates and parse times per prompt"""
+    from app.ai.structured_output import get_parse_stats
+    return jsonify(get_parse_stats())
+
+@api.route('/admin/api/ai-usage')
+@token_or_session_auth(required_scope='admin:read')
+def api_ai_usage():
+    """Get estimated vs actual AI tokens and spend per provider, model and task"""
+    from app.ai.providers import provider_manager as ai_provider_manager
+    from app.repositories import ai_usage_repository
+    days = request.args.get('days', 7, type=int)
+    return jsonify({
+        'days': days,
+        'budget': ai_provider_manager.get_cost_summary(),
+        'usage': ai_usage_repository.get_summary(days),
+        'triage': transcript_triage.get_stats()
+    })
+
+@api.route('/admin/api/ai-batches')
+@token_or_session_auth(required_scope='admin:read')
+def api_ai_batches():
+    """Get recent offline AI batches with their status and results"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        'batch_mode': BatchAnalysisService.is_enabled(),
+        'batches': BatchAnalysisService().get_batches(limit)
+    })
+
+@api.route('/admin/api/cohort-mastery')
+@token_or_session_auth(required_scope='admin:read')
+def api_cohort_mastery():
+    """Get KC mastery distributions, hardest KCs and struggling students for a cohort"""
+    from app.services.cohort_analytics_service import cohort_analytics_service
+    result = cohort_analytics_service.get_cohort_mastery(
+        school_id=request.args.get('school_id', type=int),
+        grade_level=request.args.get('grade_level', type=int),
+        curriculum_id=request.args.get('curriculum_id', type=int),
+        subject=request.args.get('subject') or None,
+        limit=min(request.args.get('limit', 50, type=int), 500)
+    )
+    if not result['success']:
+        return jsonify(result), 503 if not cohort_analytics_service.is_available() else 500
+    return jsonify(result)
+
+@api.route('/admin/api/students/search')
+@token_or_session_auth(required_scope='admin:read')
+def api_search_students():
+    """Fuzzy search students by name or phone number"""
+    query = (request.args.get('q') or '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    results = student_service.search_students(query, limit=limit) if query else []
+    return jsonify({'status': 'success', 'data': {'results': results, 'count': len(results), 'query': query}})
+
+@api.route('/admin/api/students/roster')
+@token_or_session_auth(required_scope='admin:read')
+def api_student_roster():
+    """List students by grade, school and age range"""
+    from app.repositories import student_repository
+    students = student_repository.get_roster(
+        grade_level=request.args.get('grade_level', type=int),
+        school_id=request.args.get('school_id', type=int),
+        min_age=request.args.get('min_age', type=int),
+        max_age=request.args.get('max_age', type=int)
+    )
+    return jsonify({'status': 'success', 'data': {'students': students, 'count': len(students)}})
+
+@api.route('/admin/api/curriculum/goals/search')
+@token_or_session_auth(required_scope='admin:read')
+def api_search_goals():
+    """Fuzzy search curriculum goals by title or code; autocomplete=1 returns light suggestions"""
+    from app import db
+    from app.repositories.curriculum_goal_repository import CurriculumGoalRepository
+    query = (request.args.get('q') or '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    repository = CurriculumGoalRepository(db.session)
+    if not query:
+        results = []
+    elif request.args.get('autocomplete', type=int):
+        results = repository.autocomplete_goals(query, limit=limit)
+    else:
+        results = [goal.to_dict() for goal in repository.search_goals(query, limit=limit)]
+    return jsonify({'status': 'success', 'data': {'results': results, 'count': len(results), 'query': query}})
+
+@api.route('/admin/api/curriculum/knowledge-components/search')
+@token_or_session_auth(required_scope='admin:read')
+def api_search_knowledge_components():
+    """Fuzzy search knowledge components by name"""
+    from app import db
+    from app.repositories.curriculum_goal_repository import CurriculumGoalRepository
+    query = (request.args.get('q') or '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    results = CurriculumGoalRepository(db.session).search_knowledge_components(query, limit=limit) if query else []
+    return jsonify({'status': 'success', 'data': {'results': results, 'count': len(results), 'query': query}})
+
 @api.route('/admin/api/task/<task_id>')
 @token_or_session_auth(required_scope='tasks:read')
 def api_task_status(task_id):
@@ -330,18 +431,40 @@ def handle_end_of_call_api_driven(message: Dict[Any, Any]) -> None:
                  call_id=call_id if 'call_id' in locals() else None)
         print(f"❌ API-driven handler error: {e}")
 
+def run_combined_analysis(student_id, transcript: str, call_id: str,
+                          session_info: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Run the single combined post-call analysis when AI_COMBINED_ANALYSIS is enabled
+    
+    Returns:
+        Validated sections keyed by consumer; missing sections fall back to separate calls
+    """
+    if not combined_analysis_service.is_enabled() or not transcript or len(transcript) <= 100:
+        return {}
+    
+    try:
+        result = combined_analysis_service.analyze(int(student_id), transcript, session_info)
+        if result.get('sections'):
+            log_webhook('combined-analysis-completed', f"Combined analysis completed for call {call_id}",
+                       call_id=call_id, student_id=student_id,
+                       valid_sections=list(result['sections'].keys()),
+                       failed_sections=result.get('failed_sections', []))
+        else:
+            log_webhook('combined-analysis-failed', f"Combined analysis produced no valid sections for call {call_id}",
+                       call_id=call_id, student_id=student_id, error=result.get('error'))
+        return result.get('sections', {})
+    except Exception as e:
+        log_error('COMBINED_ANALYSIS', f"Error running combined analysis for call {call_id}", e,
+                 call_id=call_id, student_id=student_id)
+        return {}
+
 def save_vapi_session(call_id, student_id, phone, duration, user_transcript, assistant_transcript, full_message):
-    """Save VAPI session data to student directory"""
+    """Save VAPI session data to the artifact store"""
     try:
-        # Create student directory if it doesn't exist
-        student_dir = f'data/students/{student_id}'
-        sessions_dir = f'{student_dir}/sessions'
-        os.makedirs(sessions_dir, exist_ok=True)
-        
         # Generate session filename with timestamp
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        session_file = f'{sessions_dir}/{timestamp}_vapi_session.json'
-        transcript_file = f'{sessions_dir}/{timestamp}_vapi_transcript.txt'
+        session_file = f'{timestamp}_vapi_session.json'
+        transcript_file = f'{timestamp}_vapi_transcript.txt'
         
         # Create session data
         session_data = {
@@ -358,8 +481,7 @@ def save_vapi_session(call_id, student_id, phone, duration, user_transcript, ass
         }
         
         # Save session metadata
-        with open(session_file, 'w', encoding='utf-8') as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
+        artifact_manager.save_json(student_id, session_file, session_data, kind='session', call_id=call_id)
         
         # Save combined transcript
         combined_transcript = f"=== VAPI Call Transcript ===\n"
@@ -370,8 +492,7 @@ def save_vapi_session(call_id, student_id, phone, duration, user_transcript, ass
         combined_transcript += f"=== User Transcript ===\n{user_transcript}\n\n"
         combined_transcript += f"=== Assistant Transcript ===\n{assistant_transcript}\n"
         
-        with open(transcript_file, 'w', encoding='utf-8') as f:
-            f.write(combined_transcript)
+        artifact_manager.save(student_id, transcript_file, combined_transcript, kind='transcript', call_id=call_id)
         
         # Analyze transcript and update student profile
         if user_transcript:
@@ -579,15 +700,10 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
                            duration: int, transcript: str, call_data: Dict[Any, Any]):
     """Save VAPI session data using API-fetched data"""
     try:
-        # Create student directory if it doesn't exist
-        student_dir = f'data/students/{student_id}'
-        sessions_dir = f'{student_dir}/sessions'
-        os.makedirs(sessions_dir, exist_ok=True)
-        
         # Generate session filename with timestamp
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        session_file = f'{sessions_dir}/{timestamp}_vapi_session.json'
-        transcript_file = f'{sessions_dir}/{timestamp}_vapi_transcript.txt'
+        session_file = f'{timestamp}_vapi_session.json'
+        transcript_file = f'{timestamp}_vapi_transcript.txt'
         
         # Create session data using API metadata
         metadata = vapi_client.extract_call_metadata(call_data)
@@ -623,17 +739,32 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
             'analysis_data': metadata.get('analysis_structured_data', {})
         }
         
-        # Save session metadata
-        with open(session_file, 'w', encoding='utf-8') as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
+        # Save session metadata (blob write happens off the request thread)
+        artifact_manager.save_json(student_id, session_file, session_data, kind='session', call_id=call_id)
+        
+        # Pre-LLM triage: silence, hang-ups and calls with only a name/age/grade skip the LLM
+        triage = transcript_triage.triage(transcript)
+        transcript_triage.record_call(triage)
+        if triage.skip_llm:
+            log_webhook('transcript-triage-skip', f"Skipping LLM analysis for low-information call {call_id}: {triage.reason}",
+                       call_id=call_id, student_id=student_id, triage=triage.to_dict())
+            print(f"✂️ Skipping LLM analysis for call {call_id}: {triage.reason}")
+            if combined_analysis_service.is_enabled():
+                transcript_triage.record_avoided('combined_analysis')
+        
+        # One combined LLM pass for all post-call analyses when enabled
+        combined_sections = {} if triage.skip_llm else run_combined_analysis(student_id, transcript, call_id, {
+            'duration': effective_duration,
+            'session_type': 'phone',
+            'start_datetime': metadata.get('created_at')
+        })
         
         # Save transcript and analyze regardless of duration
         if transcript:
-            with open(transcript_file, 'w', encoding='utf-8') as f:
-                f.write(transcript)
+            artifact_manager.save(student_id, transcript_file, transcript, kind='transcript', call_id=call_id)
             
             # Always analyze transcript for profile information if there's content
-            if len(transcript) > 100:  # Only analyze if there's meaningful content
+            if len(transcript) > 100 or triage.profile:  # Low-information calls use rule-based extraction
                 try:
                     from transcript_analyzer import TranscriptAnalyzer
                     analyzer = TranscriptAnalyzer()
@@ -642,7 +773,7 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
                                transcript_length=len(transcript))
                     print(f"🔍 Analyzing transcript for student {student_id} profile information...")
                     
-                    extracted_info = analyzer.analyze_transcript(transcript)
+                    extracted_info = combined_sections.get('profile_extraction') or analyzer.analyze_transcript(transcript)
                     if extracted_info:
                         analyzer.update_student_profile(student_id, extracted_info)
                         log_webhook('profile-updated', f"Updated student profile from transcript",
@@ -684,7 +815,9 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
             
             # Ensure session summary exists using SessionService
             session_summary = metadata.get('analysis_summary', '')
-            if not session_summary and transcript:
+            if not session_summary and transcript and triage.skip_llm:
+                transcript_triage.record_avoided('session_summary')
+            elif not session_summary and transcript:
                 try:
                     # Generate session summary if missing
                     session_summary = session_service.ensure_session_summary(transcript, call_id)
@@ -697,6 +830,11 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
                     print(f"⚠️ Error generating session summary: {summary_error}")
                     session_summary = ''
             
+            # Sessions updated inline below are inserted already claimed, so queue workers skip them
+            process_inline = not (BatchAnalysisService.is_enabled() and not combined_sections)
+            lease_owner = session_repository.new_lease_owner('webhook')
+            claim = session_repository.claimed_state(lease_owner) if process_inline else {}
+            
             # Create Session model record
             session_record = Session(
                 student_id=int(student_id),
@@ -705,7 +843,8 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
                 start_datetime=start_datetime,
                 duration=effective_duration,  # Use effective duration
                 transcript=transcript[:10000] if transcript else None,  # Truncate very long transcripts
-                summary=session_summary[:5000] if session_summary else None
+                summary=session_summary[:5000] if session_summary else None,
+                **claim
             )
             
             db.session.add(session_record)
@@ -718,54 +857,67 @@ def save_api_driven_session(call_id: str, student_id: str, phone: str,
                        duration=effective_duration)
             print(f"✅ Created Session DB record ID {session_record.id} for call {call_id}")
             
-            # TUTOR ASSESSMENT: Trigger AI tutor performance assessment for tutoring sessions
-            try:
-                assessment_result = tutor_assessment_service.assess_tutor_performance(session_record.id)
-                if assessment_result.get('success'):
-                    if assessment_result.get('skipped'):
-                        log_webhook('tutor-assessment-skipped', f"Tutor assessment skipped: {assessment_result.get('reason')}",
-                                   call_id=call_id, session_db_id=session_record.id)
-                        print(f"📋 Tutor assessment skipped for session {session_record.id}: {assessment_result.get('reason')}")
+            # Batch mode: assessment and profile update run later through the provider batch API
+            if not process_inline:
+                log_webhook('ai-analysis-deferred', f"AI assessment and profile update for session {session_record.id} deferred to batch",
+                           call_id=call_id, session_db_id=session_record.id)
+                print(f"📦 AI assessment and profile update for session {session_record.id} deferred to batch")
+            else:
+                # TUTOR ASSESSMENT: Trigger AI tutor performance assessment for tutoring sessions
+                try:
+                    assessment_result = tutor_assessment_service.assess_tutor_performance(
+                        session_record.id, precomputed_response=combined_sections.get('tutor_assessment'))
+                    if assessment_result.get('success'):
+                        if assessment_result.get('skipped'):
+                            log_webhook('tutor-assessment-skipped', f"Tutor assessment skipped: {assessment_result.get('reason')}",
+                                       call_id=call_id, session_db_id=session_record.id)
+                            print(f"📋 Tutor assessment skipped for session {session_record.id}: {assessment_result.get('reason')}")
+                        else:
+                            log_webhook('tutor-assessment-completed', f"Tutor assessment completed for session {session_record.id}",
+                                       call_id=call_id, session_db_id=session_record.id)
+                            print(f"✅ Tutor assessment completed for session {session_record.id}")
                     else:
-                        log_webhook('tutor-assessment-completed', f"Tutor assessment completed for session {session_record.id}",
-                                   call_id=call_id, session_db_id=session_record.id)
-                        print(f"✅ Tutor assessment completed for session {session_record.id}")
-                else:
-                    log_error('TUTOR_ASSESSMENT', f"Tutor assessment failed for session {session_record.id}: {assessment_result.get('error')}",
-                             ValueError(assessment_result.get('error', 'Unknown error')),
+                        log_error('TUTOR_ASSESSMENT', f"Tutor assessment failed for session {session_record.id}: {assessment_result.get('error')}",
+                                 ValueError(assessment_result.get('error', 'Unknown error')),
+                                 call_id=call_id, session_db_id=session_record.id)
+                        print(f"⚠️ Tutor assessment failed for session {session_record.id}: {assessment_result.get('error')}")
+                except Exception as assessment_error:
+                    log_error('TUTOR_ASSESSMENT', f"Error triggering tutor assessment for session {session_record.id}", assessment_error,
                              call_id=call_id, session_db_id=session_record.id)
-                    print(f"⚠️ Tutor assessment failed for session {session_record.id}: {assessment_result.get('error')}")
-            except Exception as assessment_error:
-                log_error('TUTOR_ASSESSMENT', f"Error triggering tutor assessment for session {session_record.id}", assessment_error,
-                         call_id=call_id, session_db_id=session_record.id)
-                print(f"⚠️ Error triggering tutor assessment for session {session_record.id}: {assessment_error}")
+                    print(f"⚠️ Error triggering tutor assessment for session {session_record.id}: {assessment_error}")
             
-            # STUDENT PROFILE & MEMORY UPDATE: Trigger AI-driven post-session updates
-            try:
-                log_webhook('student-profile-ai-update-start', f"Starting AI-driven profile and memory update for session {session_record.id}",
-                           call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                print(f"🧠 Starting AI-driven profile and memory update for session {session_record.id}")
+                # STUDENT PROFILE & MEMORY UPDATE: Trigger AI-driven post-session updates
+                try:
+                    log_webhook('student-profile-ai-update-start', f"Starting AI-driven profile and memory update for session {session_record.id}",
+                               call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                    print(f"🧠 Starting AI-driven profile and memory update for session {session_record.id}")
                 
-                update_result = student_profile_ai_service.post_session_ai_update(session_record.id)
+                    update_result = student_profile_ai_service.post_session_ai_update(
+                        session_record.id, precomputed_response=combined_sections.get('post_session_update'))
                 
-                if update_result.get('success'):
-                    log_webhook('student-profile-ai-update-completed', f"AI-driven profile and memory update completed for session {session_record.id}",
-                               call_id=call_id, session_db_id=session_record.id, student_id=student_id,
-                               profile_updated=update_result.get('profile_updated', False),
-                               memory_updated=update_result.get('memory_updated', False))
-                    print(f"✅ AI-driven profile and memory update completed for session {session_record.id}")
-                    print(f"   Profile updated: {update_result.get('profile_updated', False)}")
-                    print(f"   Memory updated: {update_result.get('memory_updated', False)}")
-                else:
-                    log_error('STUDENT_PROFILE_AI_UPDATE', f"AI-driven update failed for session {session_record.id}: {update_result.get('error')}",
-                             ValueError(update_result.get('error', 'Unknown error')),
-                             call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                    print(f"⚠️ AI-driven update failed for session {session_record.id}: {update_result.get('error')}")
+                    # Record the outcome so queue workers only pick this session up if the inline update failed
+                    session_service.complete_session_processing(session_record.id, lease_owner,
+                                                                bool(update_result.get('success')),
+                                                                update_result.get('error'))
+                
+                    if update_result.get('success'):
+                        log_webhook('student-profile-ai-update-completed', f"AI-driven profile and memory update completed for session {session_record.id}",
+                                   call_id=call_id, session_db_id=session_record.id, student_id=student_id,
+                                   profile_updated=update_result.get('profile_updated', False),
+                                   memory_updated=update_result.get('memory_updated', False))
+                        print(f"✅ AI-driven profile and memory update completed for session {session_record.id}")
+                        print(f"   Profile updated: {update_result.get('profile_updated', False)}")
+                        print(f"   Memory updated: {update_result.get('memory_updated', False)}")
+                    else:
+                        log_error('STUDENT_PROFILE_AI_UPDATE', f"AI-driven update failed for session {session_record.id}: {update_result.get('error')}",
+                                 ValueError(update_result.get('error', 'Unknown error')),
+                                 call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                        print(f"⚠️ AI-driven update failed for session {session_record.id}: {update_result.get('error')}")
                     
-            except Exception as ai_update_error:
-                log_error('STUDENT_PROFILE_AI_UPDATE', f"Error triggering AI-driven update for session {session_record.id}", ai_update_error,
-                         call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                print(f"⚠️ Error triggering AI-driven update for session {session_record.id}: {ai_update_error}")
+                except Exception as ai_update_error:
+                    log_error('STUDENT_PROFILE_AI_UPDATE', f"Error triggering AI-driven update for session {session_record.id}", ai_update_error,
+                             call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                    print(f"⚠️ Error triggering AI-driven update for session {session_record.id}: {ai_update_error}")
             
         except Exception as db_error:
             db.session.rollback()
@@ -849,6 +1001,11 @@ def handle_end_of_call_webhook_fallback(message: Dict[Any, Any]) -> None:
                     print(f"⚠️ Error generating session summary for webhook fallback: {summary_error}")
                     session_summary = None
             
+            # Sessions updated inline below are inserted already claimed, so queue workers skip them
+            process_inline = not BatchAnalysisService.is_enabled()
+            lease_owner = session_repository.new_lease_owner('webhook')
+            claim = session_repository.claimed_state(lease_owner) if process_inline else {}
+            
             # Create Session model record
             session_record = Session(
                 student_id=int(student_id),
@@ -857,7 +1014,8 @@ def handle_end_of_call_webhook_fallback(message: Dict[Any, Any]) -> None:
                 start_datetime=datetime.now(),  # Use current time for webhook fallback
                 duration=effective_duration,
                 transcript=combined_transcript[:10000] if combined_transcript else None,  # Truncate very long transcripts
-                summary=session_summary[:5000] if session_summary else None
+                summary=session_summary[:5000] if session_summary else None,
+                **claim
             )
             
             db.session.add(session_record)
@@ -870,54 +1028,65 @@ def handle_end_of_call_webhook_fallback(message: Dict[Any, Any]) -> None:
                        duration=effective_duration)
             print(f"✅ Created Session DB record ID {session_record.id} for webhook fallback call {call_id}")
             
-            # TUTOR ASSESSMENT: Trigger AI tutor performance assessment for tutoring sessions
-            try:
-                assessment_result = tutor_assessment_service.assess_tutor_performance(session_record.id)
-                if assessment_result.get('success'):
-                    if assessment_result.get('skipped'):
-                        log_webhook('tutor-assessment-skipped', f"Tutor assessment skipped: {assessment_result.get('reason')}",
-                                   call_id=call_id, session_db_id=session_record.id)
-                        print(f"📋 Tutor assessment skipped for webhook fallback session {session_record.id}: {assessment_result.get('reason')}")
+            # Batch mode: assessment and profile update run later through the provider batch API
+            if not process_inline:
+                log_webhook('ai-analysis-deferred', f"AI assessment and profile update for webhook fallback session {session_record.id} deferred to batch",
+                           call_id=call_id, session_db_id=session_record.id)
+                print(f"📦 AI assessment and profile update for webhook fallback session {session_record.id} deferred to batch")
+            else:
+                # TUTOR ASSESSMENT: Trigger AI tutor performance assessment for tutoring sessions
+                try:
+                    assessment_result = tutor_assessment_service.assess_tutor_performance(session_record.id)
+                    if assessment_result.get('success'):
+                        if assessment_result.get('skipped'):
+                            log_webhook('tutor-assessment-skipped', f"Tutor assessment skipped: {assessment_result.get('reason')}",
+                                       call_id=call_id, session_db_id=session_record.id)
+                            print(f"📋 Tutor assessment skipped for webhook fallback session {session_record.id}: {assessment_result.get('reason')}")
+                        else:
+                            log_webhook('tutor-assessment-completed', f"Tutor assessment completed for webhook fallback session {session_record.id}",
+                                       call_id=call_id, session_db_id=session_record.id)
+                            print(f"✅ Tutor assessment completed for webhook fallback session {session_record.id}")
                     else:
-                        log_webhook('tutor-assessment-completed', f"Tutor assessment completed for webhook fallback session {session_record.id}",
-                                   call_id=call_id, session_db_id=session_record.id)
-                        print(f"✅ Tutor assessment completed for webhook fallback session {session_record.id}")
-                else:
-                    log_error('TUTOR_ASSESSMENT', f"Tutor assessment failed for webhook fallback session {session_record.id}: {assessment_result.get('error')}",
-                             ValueError(assessment_result.get('error', 'Unknown error')),
+                        log_error('TUTOR_ASSESSMENT', f"Tutor assessment failed for webhook fallback session {session_record.id}: {assessment_result.get('error')}",
+                                 ValueError(assessment_result.get('error', 'Unknown error')),
+                                 call_id=call_id, session_db_id=session_record.id)
+                        print(f"⚠️ Tutor assessment failed for webhook fallback session {session_record.id}: {assessment_result.get('error')}")
+                except Exception as assessment_error:
+                    log_error('TUTOR_ASSESSMENT', f"Error triggering tutor assessment for webhook fallback session {session_record.id}", assessment_error,
                              call_id=call_id, session_db_id=session_record.id)
-                    print(f"⚠️ Tutor assessment failed for webhook fallback session {session_record.id}: {assessment_result.get('error')}")
-            except Exception as assessment_error:
-                log_error('TUTOR_ASSESSMENT', f"Error triggering tutor assessment for webhook fallback session {session_record.id}", assessment_error,
-                         call_id=call_id, session_db_id=session_record.id)
-                print(f"⚠️ Error triggering tutor assessment for webhook fallback session {session_record.id}: {assessment_error}")
+                    print(f"⚠️ Error triggering tutor assessment for webhook fallback session {session_record.id}: {assessment_error}")
             
-            # STUDENT PROFILE & MEMORY UPDATE: Trigger AI-driven post-session updates for webhook fallback
-            try:
-                log_webhook('student-profile-ai-update-start-fallback', f"Starting AI-driven profile and memory update for webhook fallback session {session_record.id}",
-                           call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                print(f"🧠 Starting AI-driven profile and memory update for webhook fallback session {session_record.id}")
+                # STUDENT PROFILE & MEMORY UPDATE: Trigger AI-driven post-session updates for webhook fallback
+                try:
+                    log_webhook('student-profile-ai-update-start-fallback', f"Starting AI-driven profile and memory update for webhook fallback session {session_record.id}",
+                               call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                    print(f"🧠 Starting AI-driven profile and memory update for webhook fallback session {session_record.id}")
                 
-                update_result = student_profile_ai_service.post_session_ai_update(session_record.id)
+                    update_result = student_profile_ai_service.post_session_ai_update(session_record.id)
                 
-                if update_result.get('success'):
-                    log_webhook('student-profile-ai-update-completed-fallback', f"AI-driven profile and memory update completed for webhook fallback session {session_record.id}",
-                               call_id=call_id, session_db_id=session_record.id, student_id=student_id,
-                               profile_updated=update_result.get('profile_updated', False),
-                               memory_updated=update_result.get('memory_updated', False))
-                    print(f"✅ AI-driven profile and memory update completed for webhook fallback session {session_record.id}")
-                    print(f"   Profile updated: {update_result.get('profile_updated', False)}")
-                    print(f"   Memory updated: {update_result.get('memory_updated', False)}")
-                else:
-                    log_error('STUDENT_PROFILE_AI_UPDATE', f"AI-driven update failed for webhook fallback session {session_record.id}: {update_result.get('error')}",
-                             ValueError(update_result.get('error', 'Unknown error')),
-                             call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                    print(f"⚠️ AI-driven update failed for webhook fallback session {session_record.id}: {update_result.get('error')}")
+                    # Record the outcome so queue workers only pick this session up if the inline update failed
+                    session_service.complete_session_processing(session_record.id, lease_owner,
+                                                                bool(update_result.get('success')),
+                                                                update_result.get('error'))
+                
+                    if update_result.get('success'):
+                        log_webhook('student-profile-ai-update-completed-fallback', f"AI-driven profile and memory update completed for webhook fallback session {session_record.id}",
+                                   call_id=call_id, session_db_id=session_record.id, student_id=student_id,
+                                   profile_updated=update_result.get('profile_updated', False),
+                                   memory_updated=update_result.get('memory_updated', False))
+                        print(f"✅ AI-driven profile and memory update completed for webhook fallback session {session_record.id}")
+                        print(f"   Profile updated: {update_result.get('profile_updated', False)}")
+                        print(f"   Memory updated: {update_result.get('memory_updated', False)}")
+                    else:
+                        log_error('STUDENT_PROFILE_AI_UPDATE', f"AI-driven update failed for webhook fallback session {session_record.id}: {update_result.get('error')}",
+                                 ValueError(update_result.get('error', 'Unknown error')),
+                                 call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                        print(f"⚠️ AI-driven update failed for webhook fallback session {session_record.id}: {update_result.get('error')}")
                     
-            except Exception as ai_update_error:
-                log_error('STUDENT_PROFILE_AI_UPDATE', f"Error triggering AI-driven update for webhook fallback session {session_record.id}", ai_update_error,
-                         call_id=call_id, session_db_id=session_record.id, student_id=student_id)
-                print(f"⚠️ Error triggering AI-driven update for webhook fallback session {session_record.id}: {ai_update_error}")
+                except Exception as ai_update_error:
+                    log_error('STUDENT_PROFILE_AI_UPDATE', f"Error triggering AI-driven update for webhook fallback session {session_record.id}", ai_update_error,
+                             call_id=call_id, session_db_id=session_record.id, student_id=student_id)
+                    print(f"⚠️ Error triggering AI-driven update for webhook fallback session {session_record.id}: {ai_update_error}")
             
         except Exception as db_error:
             db.session.rollback()
@@ -1077,6 +1246,43 @@ def api_session_logs():
             'message': f"Error retrieving session logs: {str(e)}"
         }), 500
 
+@api.route('/admin/api/sessions/search')
+@token_or_session_auth(required_scope='admin:read')
+def api_search_sessions():
+    """Ranked full-text search over session transcripts and summaries"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({
+                'status': 'error',
+                'message': "Missing search query parameter 'q'"
+            }), 400
+
+        limit = min(request.args.get('limit', 20, type=int), 100)  # Max 100 results per page
+        cursor = request.args.get('cursor')
+        student_id = request.args.get('student_id', type=int)
+
+        try:
+            page = session_service.search_sessions(query, limit=limit, cursor=cursor, student_id=student_id)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'results': page['results'],
+                'count': len(page['results']),
+                'next_cursor': page['next_cursor'],
+                'query': query
+            }
+        })
+    except Exception as e:
+        log_error('API', f"Error searching sessions: {str(e)}", e)
+        return jsonify({
+            'status': 'error',
+            'message': f"Failed to search sessions: {str(e)}"
+        }), 500
+
 # Token verification API endpoint
 @api.route('/admin/api/verify-token')
 @token_or_session_auth(required_scope='api:read')
@@ -2,6 +2,43 @@
 Celery application configuration for background task processing.
 """
 from celery import Celery
+from celery.schedules import crontab
+
+# Task modules every worker registers
+TASK_MODULES = [
+    'app.tasks.ai_tasks',
+    'app.tasks.maintenance_tasks',
+    'app.tasks.analytics_tasks',
+]
+
+# Periodic tasks run by `celery beat`
+BEAT_SCHEDULE = {
+    # Post-session AI updates the webhook didn't finish (no-op in batch mode)
+    'process-pending-sessions': {
+        'task': 'app.tasks.ai_tasks.process_pending_sessions',
+        'schedule': 60.0,
+    },
+    # Offline batch mode: collect pending jobs hourly, apply finished batches
+    'submit-ai-batch': {
+        'task': 'app.tasks.ai_tasks.submit_ai_batch',
+        'schedule': crontab(minute=0),
+    },
+    'poll-ai-batches': {
+        'task': 'app.tasks.ai_tasks.poll_ai_batches',
+        'schedule': crontab(minute='*/10'),
+    },
+    # Yesterday's stats, then a refresh of every cached dashboard range
+    'aggregate-daily-stats': {
+        'task': 'app.tasks.analytics_tasks.aggregate_daily_stats',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    # Resumes from its checkpoint; a no-op once every session has a summary
+    'backfill-session-summaries': {
+        'task': 'app.tasks.ai_tasks.backfill_session_summaries',
+        'schedule': crontab(hour=3, minute=0),
+        'kwargs': {'max_sessions': 2000},
+    },
+}
 
 def create_celery_app(app=None):
     """
@@ -16,9 +53,11 @@ def create_celery_app(app=None):
     celery = Celery(
         app.import_name,
         backend=app.config['CELERY_RESULT_BACKEND'],
-        broker=app.config['CELERY_BROKER_URL']
+        broker=app.config['CELERY_BROKER_URL'],
+        include=TASK_MODULES
     )
-    celery.conf.update(app.config)
+    # The app config uses the old-style CELERY_* names, which can't be mixed with new-style ones
+    celery.conf.update(app.config, CELERYBEAT_SCHEDULE=BEAT_SCHEDULE)
 
     class ContextTask(celery.Task):
         """Task that runs within Flask application context"""
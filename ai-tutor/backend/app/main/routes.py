@@ -7,7 +7,6 @@ import os
 import json
 import hashlib
 from datetime import datetime
-import asyncio
 from flask import Blueprint, render_template, session, redirect, request, flash, url_for, jsonify, send_file
 from flask import current_app
 
@@ -21,6 +20,7 @@ try:
     from ai.session_processor import session_processor
     from ai.providers import provider_manager
     from ai.validator import validator
+    from app.ai.event_loop import run_async
     AI_POC_AVAILABLE = True
 except ImportError as e:
     AI_POC_AVAILABLE = False
@@ -436,7 +436,11 @@ def admin_files():
     files = []
     directories = []
     
-    if os.path.exists(path):
+    artifact_listing = _list_session_artifacts(path)
+    if artifact_listing is not None:
+        # Session artifacts are listed from the metadata index, not the disk
+        directories, files = artifact_listing
+    elif os.path.exists(path):
         for item in os.listdir(path):
             item_path = os.path.join(path, item)
             if os.path.isdir(item_path):
@@ -480,6 +484,15 @@ def admin_files():
     # Combine directories and files for unified display
     items = []
     for d in directories:
+        if 'count' in d:
+            items.append({
+                'name': d['name'],
+                'type': 'directory',
+                'size': f"{d['count']} items",
+                'modified': d.get('modified', 'Unknown'),
+                'count': d['count']
+            })
+            continue
         items.append({
             'name': d['name'],
             'type': 'directory',
@@ -503,6 +516,60 @@ def admin_files():
                          breadcrumb_parts=breadcrumb_parts,
                          parent_path=parent_path)
 
+def _list_session_artifacts(path):
+    """
+    List data/students and data/students/<id>/sessions from the artifact index
+    
+    Returns:
+        (directories, files) tuple, or None if path is not an artifact path
+    """
+    from app.repositories import session_artifact_repository
+    
+    parts = path.strip('/').split('/')
+    
+    if parts == ['data', 'students']:
+        directories = [{
+            'name': summary['student_id'],
+            'path': f"data/students/{summary['student_id']}/sessions",
+            'type': 'directory',
+            'count': summary['count'],
+            'modified': summary['last_created'][:16].replace('T', ' ') if summary['last_created'] else 'Unknown'
+        } for summary in session_artifact_repository.get_student_summaries()]
+        return directories, []
+
+    if len(parts) == 3 and parts[:2] == ['data', 'students']:
+        artifacts = session_artifact_repository.get_by_student_id(parts[2])
+        if not artifacts:
+            return None
+        return [{
+            'name': 'sessions',
+            'path': f"{path.rstrip('/')}/sessions",
+            'type': 'directory',
+            'count': len(artifacts),
+            'modified': artifacts[0]['created_at'][:16].replace('T', ' ') if artifacts[0]['created_at'] else 'Unknown'
+        }], []
+
+    if len(parts) == 4 and parts[:2] == ['data', 'students'] and parts[3] == 'sessions':
+        files = [{
+            'name': artifact['name'],
+            'path': f"{path.rstrip('/')}/{artifact['name']}",
+            'type': 'file',
+            'size': artifact['size_bytes'],
+            'modified': artifact['created_at'][:19].replace('T', ' ') if artifact['created_at'] else 'Unknown'
+        } for artifact in session_artifact_repository.get_by_student_id(parts[2])]
+        return [], files
+    
+    return None
+
+def _read_session_artifact(file_path):
+    """Read data/students/<id>/sessions/<name> from the artifact store, or None"""
+    from app.storage import artifact_manager
+    
+    parts = file_path.strip('/').split('/')
+    if len(parts) == 5 and parts[:2] == ['data', 'students'] and parts[3] == 'sessions':
+        return artifact_manager.load_text(parts[2], parts[4])
+    return None
+
 @main.route('/admin/files/view')
 def admin_file_view():
     if not check_auth():
@@ -513,13 +580,16 @@ def admin_file_view():
         flash('Invalid file path', 'error')
         return redirect(url_for('main.admin_files'))
     
-    if not os.path.exists(file_path):
+    content = _read_session_artifact(file_path)
+    
+    if content is None and not os.path.exists(file_path):
         flash('File not found', 'error')
         return redirect(url_for('main.admin_files'))
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
         
         # Try to parse as JSON for pretty display
         try:
@@ -852,11 +922,8 @@ def test_sample_analysis():
         # Use the sample data from session_processor
         from ai.session_processor import SAMPLE_TRANSCRIPT, SAMPLE_STUDENT_CONTEXT
         
-        # Run async analysis
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        analysis, validation = loop.run_until_complete(
+        # Run async analysis on the shared background loop
+        analysis, validation = run_async(
             session_processor.process_session_transcript(
                 transcript=SAMPLE_TRANSCRIPT,
                 student_context=SAMPLE_STUDENT_CONTEXT,
@@ -864,8 +931,6 @@ def test_sample_analysis():
             )
         )
         
-        loop.close()
-        
         flash('Sample analysis completed successfully!', 'success')
         
         return render_template('ai_analysis_result.html',
@@ -890,16 +955,11 @@ def analyze_student_session(student_id):
         return redirect(url_for('main.ai_analysis_dashboard'))
     
     try:
-        # Run async analysis for real student session
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        analysis, validation = loop.run_until_complete(
+        # Run async analysis for real student session on the shared background loop
+        analysis, validation = run_async(
             session_processor.process_student_session_file(student_id)
         )
         
-        loop.close()
-        
         flash(f'Analysis completed for {student_id}!', 'success')
         
         return render_template('ai_analysis_result.html',
@@ -1827,24 +1887,21 @@ def admin_curriculum():
     from app.models.curriculum import Curriculum, CurriculumDetail
     
     try:
-        from app.models.curriculum import Subject
+        from sqlalchemy import func
         
-        # Get all curriculums with their details count and subjects count
-        curriculums = db.session.query(Curriculum).all()
+        # Get all curriculums with their details count and subjects count in one grouped query
+        curriculums = db.session.query(Curriculum,
+                                       func.count(CurriculumDetail.id),
+                                       func.count(func.distinct(CurriculumDetail.subject_id)))\
+                                .outerjoin(CurriculumDetail, CurriculumDetail.curriculum_id == Curriculum.id)\
+                                .group_by(Curriculum.id)\
+                                .all()
         
         curriculum_data = []
         total_details = 0
         default_curriculum = None
         
-        for curriculum in curriculums:
-            details_count = db.session.query(CurriculumDetail).filter_by(curriculum_id=curriculum.id).count()
-            
-            # Get unique subjects for this curriculum
-            subjects_count = db.session.query(Subject.id)\
-                                    .join(CurriculumDetail, Subject.id == CurriculumDetail.subject_id)\
-                                    .filter(CurriculumDetail.curriculum_id == curriculum.id)\
-                                    .distinct().count()
-            
+        for curriculum, details_count, subjects_count in curriculums:
             total_details += details_count
             
             curriculum_info = {
@@ -1899,6 +1956,7 @@ def curriculum_details(curriculum_id):
         from app import db
         from app.models.curriculum import Curriculum, CurriculumDetail
         from app.models.curriculum import Subject
+        from sqlalchemy.orm import contains_eager
         
         curriculum = db.session.query(Curriculum).get(curriculum_id)
         if not curriculum:
@@ -1910,6 +1968,7 @@ def curriculum_details(curriculum_id):
         # Get curriculum details with eager loading of subject relationship
         details = db.session.query(CurriculumDetail)\
                            .join(Subject, CurriculumDetail.subject_id == Subject.id)\
+                           .options(contains_eager(CurriculumDetail.subject))\
                            .filter(CurriculumDetail.curriculum_id == curriculum_id)\
                            .order_by(CurriculumDetail.grade_level)\
                            .all()
@@ -8,12 +8,19 @@ from .curriculum import Curriculum
 from .session import Session
 from .assessment import StudentSubject
 from .system_log import SystemLog
-from .analytics import SessionMetrics, DailyStats
+from .analytics import SessionMetrics, DailyStats, StudentProgress
 from .token import Token
 from .mcp_interaction import MCPInteraction
 from .student_profile import StudentProfile
 from .student_memory import StudentMemory, MemoryScope
-from .mastery_tracking import CurriculumGoal, GoalKC, StudentGoalProgress, StudentKCProgress, GoalPrerequisite
+from .mastery_tracking import (
+    CurriculumGoal, GoalKC, StudentGoalProgress, StudentKCProgress, GoalPrerequisite,
+    MasteryEvent, MasteryWeeklySnapshot, KCBKTParameters
+)
+from .job_checkpoint import JobCheckpoint
+from .session_artifact import SessionArtifact
+from .ai_usage import AIUsageRecord
+from .ai_batch import AIBatch, AIBatchRequest
 
 __all__ = [
     'Student',
@@ -24,6 +31,7 @@ __all__ = [
     'SystemLog',
     'SessionMetrics',
     'DailyStats',
+    'StudentProgress',
     'Token',
     'MCPInteraction',
     'StudentProfile',
@@ -33,5 +41,13 @@ __all__ = [
     'GoalKC',
     'StudentGoalProgress',
     'StudentKCProgress',
-    'GoalPrerequisite'
+    'GoalPrerequisite',
+    'MasteryEvent',
+    'MasteryWeeklySnapshot',
+    'KCBKTParameters',
+    'JobCheckpoint',
+    'SessionArtifact',
+    'AIUsageRecord',
+    'AIBatch',
+    'AIBatchRequest'
 ]
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+AIBatch and AIBatchRequest models - offline AI jobs submitted to provider batch APIs
+"""
+
+import enum
+from app import db
+from sqlalchemy.sql import func
+
+class BatchStatus(enum.Enum):
+    """Lifecycle of a submitted batch"""
+    submitted = "submitted"  # Waiting for the provider to finish
+    applied = "applied"      # Results applied to sessions
+    failed = "failed"        # Provider batch failed or expired
+
+class BatchRequestStatus(enum.Enum):
+    """Lifecycle of one request in a batch"""
+    submitted = "submitted"  # In a batch that hasn't been applied yet
+    applied = "applied"      # Result written to the session
+    failed = "failed"        # No usable result; eligible for another batch while attempts remain
+
+class AIBatch(db.Model):
+    """One provider batch (JSONL request file) of offline AI jobs"""
+    __tablename__ = 'ai_batches'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)  # 'openai', 'anthropic', 'stub'
+    provider_batch_id = db.Column(db.String(100), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default=BatchStatus.submitted.value, index=True)
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+    input_path = db.Column(db.String(500), nullable=True)  # Local JSONL request file
+    error = db.Column(db.Text, nullable=True)
+    results = db.Column(db.JSON, nullable=True)  # Applied/failed counts and spend once applied
+    submitted_at = db.Column(db.DateTime, server_default=func.now())
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    requests = db.relationship('AIBatchRequest', backref='batch', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<AIBatch {self.provider}:{self.provider_batch_id} {self.status}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'provider': self.provider,
+            'provider_batch_id': self.provider_batch_id,
+            'status': self.status,
+            'request_count': self.request_count,
+            'input_path': self.input_path,
+            'error': self.error,
+            'results': self.results,
+            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class AIBatchRequest(db.Model):
+    """
+    One job (kind + session) in a batch. There is a single row per job; a
+    failed job is moved to a later batch, and results are only applied while
+    the row is still submitted in that batch, so re-applying is a no-op.
+    """
+    __tablename__ = 'ai_batch_requests'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('ai_batches.id'), nullable=True, index=True)
+    kind = db.Column(db.String(30), nullable=False)  # Provider task: 'tutor_assessment', 'post_session_update'
+    session_id = db.Column(db.Integer, db.ForeignKey('sessions.id'), nullable=False)
+    custom_id = db.Column(db.String(64), nullable=False)  # '<kind>-<session_id>'
+    status = db.Column(db.String(20), nullable=False, default=BatchRequestStatus.submitted.value)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'session_id', name='uix_ai_batch_request_kind_session'),
+    )
+    
+    def __repr__(self):
+        return f'<AIBatchRequest {self.custom_id} {self.status}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'batch_id': self.batch_id,
+            'kind': self.kind,
+            'session_id': self.session_id,
+            'custom_id': self.custom_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
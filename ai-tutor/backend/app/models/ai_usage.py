@@ -0,0 +1,59 @@
+"""
+AIUsageRecord model - per-call token usage and spend of AI provider calls
+"""
+
+from app import db
+from sqlalchemy.sql import func
+
+class AIUsageRecord(db.Model):
+    """
+    Token counts and cost of one AI provider call, as estimated before the call
+    by the local tokenizer and as reported by the provider afterwards
+    """
+    __tablename__ = 'ai_usage_records'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)  # 'openai', 'anthropic'
+    model = db.Column(db.String(100), nullable=False)
+    task = db.Column(db.String(50), nullable=True)  # Provider task, e.g. 'post_session_update'
+    session_id = db.Column(db.Integer, nullable=True, index=True)
+    student_id = db.Column(db.Integer, nullable=True)
+    
+    # Local tokenizer estimate
+    estimated_input_tokens = db.Column(db.Integer, nullable=False, default=0)
+    estimated_output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    estimated_cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Provider-reported usage (input excludes cached input)
+    input_tokens = db.Column(db.Integer, nullable=False, default=0)
+    output_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cache_read_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cache_write_tokens = db.Column(db.Integer, nullable=False, default=0)
+    actual_cost = db.Column(db.Float, nullable=False, default=0.0)
+    usage_source = db.Column(db.String(20), nullable=False, default='usage')  # 'usage' or 'tokenizer' if not reported
+    
+    created_at = db.Column(db.DateTime, server_default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f'<AIUsageRecord {self.provider}/{self.model} {self.task} ${self.actual_cost:.5f}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'provider': self.provider,
+            'model': self.model,
+            'task': self.task,
+            'session_id': self.session_id,
+            'student_id': self.student_id,
+            'estimated_input_tokens': self.estimated_input_tokens,
+            'estimated_output_tokens': self.estimated_output_tokens,
+            'estimated_cost': self.estimated_cost,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cache_read_tokens': self.cache_read_tokens,
+            'cache_write_tokens': self.cache_write_tokens,
+            'actual_cost': self.actual_cost,
+            'usage_source': self.usage_source,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
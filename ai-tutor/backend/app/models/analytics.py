@@ -59,6 +59,35 @@ class DailyStats(db.Model):
         return f"<DailyStats(date={self.date}, total_sessions={self.total_sessions})>"
 
 
+class StudentProgress(db.Model):
+    """
+    Per-student, per-subject progress over a trailing window, computed by the
+    progress fan-out task so the analytics pages read it without recomputation.
+    One row per student, subject and day.
+    """
+    __tablename__ = 'student_progress'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'subject', 'date', name='uq_student_progress_student_subject_date'),
+        db.Index('ix_student_progress_student_date', 'student_id', 'date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False)
+    subject = db.Column(db.String(100), nullable=False)  # Topic prefix, e.g. 'Math' from 'Math: Fractions'
+    date = db.Column(db.Date, nullable=False)  # Day the window ends on
+    window_days = db.Column(db.Integer, nullable=False, default=30)
+    sessions_count = db.Column(db.Integer, nullable=False, default=0)
+    total_time_spent = db.Column(db.Integer, nullable=False, default=0)  # Seconds
+    percentage_of_total = db.Column(db.Float, nullable=True)  # Share of the student's time in the window
+    avg_engagement = db.Column(db.Float, nullable=True)
+    avg_satisfaction = db.Column(db.Float, nullable=True)
+    top_topics = db.Column(db.JSON, nullable=True)  # topic: count within this subject
+    proficiency_level = db.Column(db.Float, nullable=True)  # Set by AnalyticsService.update_student_progress
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<StudentProgress(student_id={self.student_id}, subject={self.subject}, date={self.date})>"
 
 
 # Backward compatibility alias
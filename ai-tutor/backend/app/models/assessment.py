@@ -33,9 +33,11 @@ class StudentSubject(db.Model):
     student = db.relationship('Student', back_populates='student_subjects')
     curriculum_detail = db.relationship('CurriculumDetail', back_populates='student_subjects')
     
-    # Composite unique constraint
+    # Composite unique constraint and indexes for active-enrollment analytics
     __table_args__ = (
         db.UniqueConstraint('student_id', 'curriculum_detail_id', name='uix_student_curriculum_detail'),
+        db.Index('ix_student_subjects_detail_in_use', 'curriculum_detail_id', 'is_in_use'),
+        db.Index('ix_student_subjects_student_in_use', 'student_id', 'is_in_use'),
     )
     
     def __repr__(self):
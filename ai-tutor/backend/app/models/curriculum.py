@@ -91,9 +91,11 @@ class CurriculumDetail(db.Model):
     curriculum = db.relationship('Curriculum', back_populates='curriculum_details')
     subject = db.relationship('Subject', back_populates='curriculum_details')
     student_subjects = db.relationship('StudentSubject', back_populates='curriculum_detail', lazy='dynamic')
-    # Composite unique constraint
+    # Composite unique constraint and lookup indexes for subject/grade analytics
     __table_args__ = (
         db.UniqueConstraint('curriculum_id', 'subject_id', 'grade_level', name='uix_curriculum_subject_grade'),
+        db.Index('ix_curriculum_details_subject_grade', 'subject_id', 'grade_level'),
+        db.Index('ix_curriculum_details_grade', 'grade_level'),
     )
     
     def __repr__(self):
@@ -0,0 +1,43 @@
+"""
+JobCheckpoint model for resumable background jobs
+"""
+
+from app import db
+from sqlalchemy.sql import func
+
+class JobCheckpoint(db.Model):
+    """Progress marker for long-running batch jobs so they can resume where they stopped"""
+    __tablename__ = 'job_checkpoints'
+    
+    job_name = db.Column(db.String(100), primary_key=True)  # e.g. 'session_summary_backfill'
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # Highest row ID fully processed (keyset cursor)
+    processed_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.JSON, nullable=True)  # Job-specific state (last run stats, etc.)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f'<JobCheckpoint {self.job_name} last_id={self.last_id}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'job_name': self.job_name,
+            'last_id': self.last_id,
+            'processed_count': self.processed_count,
+            'failed_count': self.failed_count,
+            'data': self.data,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @classmethod
+    def get_or_create(cls, job_name):
+        """Get the checkpoint for a job, creating an empty one if needed"""
+        checkpoint = cls.query.get(job_name)
+        if not checkpoint:
+            checkpoint = cls(job_name=job_name, last_id=0, processed_count=0, failed_count=0)
+            db.session.add(checkpoint)
+            db.session.flush()
+        return checkpoint
@@ -85,6 +85,11 @@ class StudentGoalProgress(db.Model):
     """
     Student Goal Progress model tracking mastery percentage for each goal per student.
     Each student can have progress on multiple goals.
+    
+    For goals with knowledge components the row is a rollup of the student's
+    KC rows (mastery_source 'kc'), recomputed whenever those KC rows change;
+    goals without KCs are set directly (mastery_source 'direct'). Goal code,
+    title, subject and grade are copied in so mastery maps read one table.
     """
     __tablename__ = 'student_goal_progress'
     
@@ -93,10 +98,23 @@ class StudentGoalProgress(db.Model):
     mastery_percentage = db.Column(db.Float, nullable=False, default=0.0)  # 0.0 to 100.0
     last_updated = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
+    # KC rollup: mastery_percentage is the mean over all the goal's KCs (unpractised KCs count as 0)
+    mastery_source = db.Column(db.String(10), nullable=False, default='direct')  # 'kc' or 'direct'
+    total_kcs = db.Column(db.Integer, nullable=False, default=0)
+    kcs_with_progress = db.Column(db.Integer, nullable=False, default=0)
+    kc_average_mastery = db.Column(db.Float, nullable=True)  # Mean over practised KCs only
+    
+    # Denormalized from curriculum_goals
+    goal_code = db.Column(db.String(50), nullable=True)
+    goal_title = db.Column(db.String(200), nullable=True)
+    subject = db.Column(db.String(50), nullable=True)
+    grade_level = db.Column(db.Integer, nullable=True)
+    
     # Composite primary key and constraints
     __table_args__ = (
         db.PrimaryKeyConstraint('student_id', 'goal_id', name='pk_student_goal_progress'),
         db.CheckConstraint('mastery_percentage >= 0.0 AND mastery_percentage <= 100.0', name='ck_goal_mastery_range'),
+        db.Index('ix_student_goal_progress_student_subject', 'student_id', 'subject', 'grade_level', 'goal_code'),
     )
     
     # Relationships
@@ -112,9 +130,12 @@ class StudentGoalProgress(db.Model):
             'student_id': self.student_id,
             'student_name': self.student.full_name if self.student else None,
             'goal_id': self.goal_id,
-            'goal_code': self.goal.goal_code if self.goal else None,
-            'goal_title': self.goal.title if self.goal else None,
+            'goal_code': self.goal_code or (self.goal.goal_code if self.goal else None),
+            'goal_title': self.goal_title or (self.goal.title if self.goal else None),
             'mastery_percentage': self.mastery_percentage,
+            'mastery_source': self.mastery_source,
+            'total_kcs': self.total_kcs,
+            'kcs_with_progress': self.kcs_with_progress,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
@@ -200,4 +221,135 @@ class GoalPrerequisite(db.Model):
             'prerequisite_goal_id': self.prerequisite_goal_id,
             'prerequisite_goal_code': self.prerequisite_goal.goal_code if self.prerequisite_goal else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class MasteryEvent(db.Model):
+    """
+    Append-only history of mastery changes: one row per KC (or KC-less goal)
+    per session, written in bulk with each AI mastery delta. Rows are never
+    updated; trajectory queries read the weekly snapshots compacted from them.
+    """
+    __tablename__ = 'mastery_events'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False)
+    goal_id = db.Column(db.Integer, db.ForeignKey('curriculum_goals.id', ondelete='CASCADE'), nullable=False)
+    kc_code = db.Column(db.String(100), nullable=True)  # NULL for goal-level patches on goals without KCs
+    session_id = db.Column(db.Integer, db.ForeignKey('sessions.id', ondelete='SET NULL'), nullable=True)
+    mastery_percentage = db.Column(db.Float, nullable=False)
+    previous_percentage = db.Column(db.Float, nullable=True)  # NULL when first recorded
+    correct_count = db.Column(db.Integer, nullable=True)  # Answers observed in the session (BKT input)
+    incorrect_count = db.Column(db.Integer, nullable=True)
+    recorded_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        db.Index('ix_mastery_events_student_recorded', 'student_id', 'recorded_at'),
+        # One event per student, session, goal and KC: re-applying a session's delta adds nothing
+        db.Index('uix_mastery_events_session_kc', 'student_id', 'session_id', 'goal_id',
+                 func.coalesce(kc_code, ''), unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<MasteryEvent student_id={self.student_id} goal_id={self.goal_id} kc_code={self.kc_code} mastery={self.mastery_percentage}%>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'student_id': self.student_id,
+            'goal_id': self.goal_id,
+            'kc_code': self.kc_code,
+            'session_id': self.session_id,
+            'mastery_percentage': self.mastery_percentage,
+            'previous_percentage': self.previous_percentage,
+            'correct_count': self.correct_count,
+            'incorrect_count': self.incorrect_count,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None
+        }
+
+
+class MasteryWeeklySnapshot(db.Model):
+    """
+    Per-student, per-subject KC mastery state at the end of each week with
+    activity, compacted from mastery_events for trajectory charts.
+    """
+    __tablename__ = 'mastery_weekly_snapshots'
+    
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)  # Monday
+    subject = db.Column(db.String(50), nullable=False)
+    avg_mastery = db.Column(db.Float, nullable=False, default=0.0)  # Mean latest mastery of tracked KCs
+    kcs_tracked = db.Column(db.Integer, nullable=False, default=0)  # KCs with any event up to the week's end
+    kcs_mastered = db.Column(db.Integer, nullable=False, default=0)  # Of those, at or above the mastery threshold
+    events_count = db.Column(db.Integer, nullable=False, default=0)  # Events during the week
+    sessions_count = db.Column(db.Integer, nullable=False, default=0)  # Sessions with events during the week
+    mastery_change = db.Column(db.Float, nullable=False, default=0.0)  # Net change of the week's events
+    compacted_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        db.PrimaryKeyConstraint('student_id', 'week_start', 'subject', name='pk_mastery_weekly_snapshots'),
+    )
+    
+    def __repr__(self):
+        return f'<MasteryWeeklySnapshot student_id={self.student_id} week={self.week_start} subject={self.subject}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'student_id': self.student_id,
+            'week_start': self.week_start.isoformat() if self.week_start else None,
+            'subject': self.subject,
+            'avg_mastery': self.avg_mastery,
+            'kcs_tracked': self.kcs_tracked,
+            'kcs_mastered': self.kcs_mastered,
+            'events_count': self.events_count,
+            'sessions_count': self.sessions_count,
+            'mastery_change': self.mastery_change
+        }
+
+
+class KCBKTParameters(db.Model):
+    """
+    Bayesian Knowledge Tracing parameters per knowledge component, fitted
+    offline by EM from the answer counts on mastery_events.
+    """
+    __tablename__ = 'kc_bkt_parameters'
+    
+    goal_id = db.Column(db.Integer, nullable=False)
+    kc_code = db.Column(db.String(100), nullable=False)
+    p_init = db.Column(db.Float, nullable=False)
+    p_learn = db.Column(db.Float, nullable=False)
+    p_slip = db.Column(db.Float, nullable=False)
+    p_guess = db.Column(db.Float, nullable=False)
+    sequences = db.Column(db.Integer, nullable=False, default=0)  # Student sequences fitted on
+    observations = db.Column(db.Integer, nullable=False, default=0)  # Answers fitted on
+    log_likelihood = db.Column(db.Float, nullable=True)
+    fitted_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        db.PrimaryKeyConstraint('goal_id', 'kc_code', name='pk_kc_bkt_parameters'),
+        db.ForeignKeyConstraint(
+            ['goal_id', 'kc_code'],
+            ['goal_kcs.goal_id', 'goal_kcs.kc_code'],
+            name='fk_kc_bkt_parameters_goal_kc',
+            ondelete='CASCADE'
+        ),
+    )
+    
+    def __repr__(self):
+        return f'<KCBKTParameters goal_id={self.goal_id} kc_code={self.kc_code}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'goal_id': self.goal_id,
+            'kc_code': self.kc_code,
+            'p_init': self.p_init,
+            'p_learn': self.p_learn,
+            'p_slip': self.p_slip,
+            'p_guess': self.p_guess,
+            'sequences': self.sequences,
+            'observations': self.observations,
+            'log_likelihood': self.log_likelihood,
+            'fitted_at': self.fitted_at.isoformat() if self.fitted_at else None
+        }
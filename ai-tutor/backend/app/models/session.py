@@ -2,8 +2,42 @@
 Session model
 """
 
+import enum
 from app import db
+from sqlalchemy import event, DDL
 from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+# Weighted full-text document for a session: summary matches rank above transcript matches
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce({prefix}summary, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({prefix}transcript, '')), 'B')"
+)
+
+# Keeps sessions.search_vector current on insert and whenever transcript/summary change
+SEARCH_VECTOR_TRIGGER_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION sessions_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {SEARCH_VECTOR_EXPRESSION.format(prefix='NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS sessions_search_vector_trigger ON sessions",
+    """
+    CREATE TRIGGER sessions_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF transcript, summary ON sessions
+    FOR EACH ROW EXECUTE FUNCTION sessions_search_vector_update()
+    """
+]
+
+class ProcessingState(enum.Enum):
+    """Post-session AI processing state for the session work queue"""
+    pending = "pending"          # Waiting to be claimed by a worker
+    processing = "processing"    # Claimed by a worker, lease in processing_lease_expires_at
+    done = "done"                # AI profile/memory/mastery update completed
+    failed = "failed"            # Gave up after too many attempts
 
 class Session(db.Model):
     """Session model for tutoring sessions"""
@@ -35,6 +69,24 @@ class Session(db.Model):
     tutor_assessment = db.Column(db.Text, nullable=True)  # AI-generated assessment of tutor performance
     prompt_suggestions = db.Column(db.Text, nullable=True)  # AI-generated suggestions for prompt improvements
     
+    # AI Processing Work-Queue Fields - Claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED
+    processing_state = db.Column(db.String(20), nullable=False, default=ProcessingState.pending.value,
+                                 server_default=ProcessingState.pending.value)
+    processing_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    processing_lease_owner = db.Column(db.String(100), nullable=True)  # Worker holding the claim; only it can complete it
+    processing_lease_expires_at = db.Column(db.DateTime, nullable=True)  # Claim expires and can be reclaimed after this
+    processing_error = db.Column(db.Text, nullable=True)  # Last processing error, if any
+    
+    # Full-text search document over summary and transcript, maintained by a database trigger
+    search_vector = db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'), nullable=True)
+    
+    # Partial index so claiming only scans the open part of the queue; GIN index for full-text search
+    __table_args__ = (
+        db.Index('ix_sessions_processing_queue', 'processing_state', 'id',
+                 postgresql_where=db.text("processing_state IN ('pending', 'processing')")),
+        db.Index('ix_sessions_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+    
     # Relationships
     student = db.relationship('Student', back_populates='sessions')
     metrics = db.relationship('SessionMetrics', back_populates='session', uselist=False)
@@ -61,6 +113,8 @@ class Session(db.Model):
             'has_transcript': bool(self.transcript),
             'has_summary': bool(self.summary),
             'transcript_length': len(self.transcript) if self.transcript else 0,
+            'processing_state': self.processing_state,
+            'processing_attempts': self.processing_attempts,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -109,4 +163,8 @@ class Session(db.Model):
                 'has_response': bool(self.ai_response_3)
             })
         
-        return steps
\ No newline at end of file
+        return steps
+
+# Install the search vector trigger whenever create_all() builds the sessions table
+for _statement in SEARCH_VECTOR_TRIGGER_DDL:
+    event.listen(Session.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -0,0 +1,50 @@
+"""
+SessionArtifact model - metadata index for session files kept in the artifact store
+"""
+
+from app import db
+from sqlalchemy.sql import func
+
+class SessionArtifact(db.Model):
+    """
+    Metadata for a session artifact (session JSON, transcript, analysis).
+    The content lives in the artifact store under a content-addressed key;
+    listings are served from this table so they never touch the disk.
+    """
+    __tablename__ = 'session_artifacts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.String(50), nullable=False)  # Student ID as used in legacy data/students/<id> paths
+    call_id = db.Column(db.String(50), nullable=True, index=True)
+    name = db.Column(db.String(255), nullable=False)  # Logical file name, e.g. "2025-07-17_04-18-00_vapi_session.json"
+    kind = db.Column(db.String(30), nullable=False)  # 'session', 'transcript', 'analysis'
+    content_type = db.Column(db.String(50), nullable=False, default='application/json')
+    storage_key = db.Column(db.String(100), nullable=False)  # Content hash used as the store key
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='stored', server_default='stored')  # 'pending', 'stored', 'failed'
+    error = db.Column(db.String(500), nullable=True)  # Blob write error when status is 'failed'
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'name', name='uix_session_artifact_student_name'),
+        db.Index('ix_session_artifacts_student_created', 'student_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<SessionArtifact {self.student_id}/{self.name}>'
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'student_id': self.student_id,
+            'call_id': self.call_id,
+            'name': self.name,
+            'kind': self.kind,
+            'content_type': self.content_type,
+            'storage_key': self.storage_key,
+            'size_bytes': self.size_bytes,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
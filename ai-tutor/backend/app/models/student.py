@@ -2,10 +2,39 @@
 Student model
 """
 
+import re
 from datetime import date
+from typing import List, Optional, Tuple
 from app import db
 from sqlalchemy.sql import func
 
+
+def split_profile_attributes(preferences: Optional[List[str]]) -> Tuple[Optional[int], Optional[int], List[str]]:
+    """
+    Pull legacy "age:12" / "grade:7th" entries out of a learning_preferences list
+    
+    Keys are matched case-insensitively and ignoring surrounding whitespace,
+    so entries like "Age: 12" are parsed too.
+    
+    Returns:
+        (age, grade, remaining preferences); unparseable entries stay in the list
+    """
+    age = grade = None
+    remaining = []
+    for pref in preferences or []:
+        key, _, value = pref.partition(':')
+        key = key.strip().lower()
+        match = re.search(r'\d+', value)
+        if key in ('age', 'grade') and match:
+            if key == 'age':
+                age = int(match.group())
+            else:
+                grade = int(match.group())
+        else:
+            remaining.append(pref)
+    return age, grade, remaining
+
+
 class Student(db.Model):
     """Student model"""
     __tablename__ = 'students'
@@ -13,9 +42,9 @@ class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    date_of_birth = db.Column(db.Date, nullable=True)
+    date_of_birth = db.Column(db.Date, nullable=True, index=True)  # Age is derived from this
     phone_number = db.Column(db.String(20), nullable=True, unique=True, index=True)
-    grade_level = db.Column(db.Integer, nullable=True)
+    grade_level = db.Column(db.Integer, nullable=True, index=True)
     student_type = db.Column(db.String(20), default='foreign')  # 'foreign' or 'local' for international schools
     school_id = db.Column(db.Integer, db.ForeignKey('schools.id'), nullable=True)
     
@@ -27,6 +56,11 @@ class Student(db.Model):
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
+    # Roster lookups ("grade 4 at this school")
+    __table_args__ = (
+        db.Index('ix_students_school_grade', 'school_id', 'grade_level'),
+    )
+    
     # Relationships
     school = db.relationship('School', back_populates='students')
     sessions = db.relationship('Session', back_populates='student', lazy='dynamic', cascade='all, delete-orphan')
@@ -37,17 +71,7 @@ class Student(db.Model):
     
     @property
     def age(self):
-        """Calculate age from date of birth or get from learning_preferences"""
-        # First try to get age from learning_preferences (stored as "age:12")
-        if self.learning_preferences:
-            for pref in self.learning_preferences:
-                if pref.startswith('age:'):
-                    try:
-                        return int(pref.split(':')[1])
-                    except (ValueError, IndexError):
-                        pass
-        
-        # Otherwise calculate from date_of_birth
+        """Calculate age from date of birth"""
         if not self.date_of_birth:
             return None
         today = date.today()
@@ -55,21 +79,13 @@ class Student(db.Model):
             (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
         )
     
+    def set_age(self, age: int):
+        """Record an age without a known birthday as a date of birth (January 1st)"""
+        self.date_of_birth = date(date.today().year - age, 1, 1)
+    
     def get_grade(self):
-        """Get grade from grade_level field or learning_preferences (stored as "grade:7th")"""
-        # First try the grade_level field
-        if self.grade_level:
-            return str(self.grade_level)
-            
-        # Fallback to learning_preferences for backward compatibility
-        if self.learning_preferences:
-            for pref in self.learning_preferences:
-                if pref.startswith('grade:'):
-                    try:
-                        return pref.split(':', 1)[1]
-                    except IndexError:
-                        pass
-        return None
+        """Get grade from grade_level field"""
+        return str(self.grade_level) if self.grade_level else None
     
     @property
     def full_name(self):
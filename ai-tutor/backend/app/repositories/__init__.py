@@ -13,6 +13,10 @@ from . import token_repository
 from . import school_repository
 from . import curriculum_repository
 from . import assessment_repository
+from . import session_artifact_repository
+from . import ai_usage_repository
+from . import ai_batch_repository
+from . import mastery_event_repository
 
 # Create repository instances for easy import
 __all__ = [
@@ -25,5 +29,9 @@ __all__ = [
     'token_repository',
     'school_repository',
     'curriculum_repository',
-    'assessment_repository'
+    'assessment_repository',
+    'session_artifact_repository',
+    'ai_usage_repository',
+    'ai_batch_repository',
+    'mastery_event_repository'
 ]
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+AI batch repository for database operations
+Tracks offline AI jobs submitted to provider batch APIs
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from sqlalchemy import func, or_
+
+from app import db
+from app.models.ai_batch import AIBatch, AIBatchRequest, BatchStatus, BatchRequestStatus
+from app.models.session import Session
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+def get_pending_assessment_session_ids(limit: int = 100, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[int]:
+    """
+    Get sessions that still need a tutor assessment and aren't in a batch
+
+    Sessions skipped as empty or low-information have a "Not assessed" note
+    as their assessment and are not returned. Sessions whose preparation
+    failed for another reason are still pending and are returned again.
+
+    Args:
+        limit: Maximum number of session IDs
+        max_attempts: Sessions whose batch request failed this often are skipped
+
+    Returns:
+        Session IDs, oldest first
+    """
+    taken = db.session.query(AIBatchRequest.session_id).filter(
+        AIBatchRequest.kind == 'tutor_assessment',
+        or_(
+            AIBatchRequest.status != BatchRequestStatus.failed.value,
+            AIBatchRequest.attempts >= max_attempts
+        )
+    )
+
+    rows = db.session.query(Session.id).filter(
+        Session.tutor_assessment.is_(None),
+        Session.student_id.isnot(None),
+        Session.transcript.isnot(None),
+        func.length(Session.transcript) >= 50,
+        ~Session.id.in_(taken)
+    ).order_by(Session.id).limit(limit).all()
+    return [row[0] for row in rows]
+
+def create_batch(provider: str, provider_batch_id: str, input_path: str,
+                 jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Record a submitted batch and its jobs
+
+    A job that failed in an earlier batch is moved to this one.
+
+    Args:
+        provider: Batch provider name
+        provider_batch_id: ID returned by the provider
+        input_path: Local JSONL request file
+        jobs: Dicts with kind, session_id and custom_id
+
+    Returns:
+        The created batch
+    """
+    try:
+        batch = AIBatch(provider=provider, provider_batch_id=provider_batch_id,
+                        input_path=input_path, request_count=len(jobs),
+                        status=BatchStatus.submitted.value)
+        db.session.add(batch)
+        db.session.flush()
+
+        existing = {
+            (request.kind, request.session_id): request
+            for request in AIBatchRequest.query.filter(
+                AIBatchRequest.session_id.in_([job['session_id'] for job in jobs])
+            ).all()
+        }
+        for job in jobs:
+            request = existing.get((job['kind'], job['session_id']))
+            if request is None:
+                request = AIBatchRequest(kind=job['kind'], session_id=job['session_id'], attempts=0)
+                db.session.add(request)
+            request.batch_id = batch.id
+            request.custom_id = job['custom_id']
+            request.status = BatchRequestStatus.submitted.value
+            request.attempts = (request.attempts or 0) + 1
+            request.error = None
+
+        db.session.commit()
+        return batch.to_dict()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating AI batch: {e}")
+        raise e
+
+def get_open_batches() -> List[Dict[str, Any]]:
+    """
+    Get batches that were submitted and not yet applied or failed
+
+    Returns:
+        List of batch dictionaries, oldest first
+    """
+    batches = AIBatch.query.filter_by(status=BatchStatus.submitted.value).order_by(AIBatch.id).all()
+    return [batch.to_dict() for batch in batches]
+
+def get_batches(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Get the most recent batches
+
+    Args:
+        limit: Maximum number of batches
+
+    Returns:
+        List of batch dictionaries, newest first
+    """
+    batches = AIBatch.query.order_by(AIBatch.id.desc()).limit(limit).all()
+    return [batch.to_dict() for batch in batches]
+
+def get_submitted_requests(batch_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Get a batch's requests that are still waiting for their result
+
+    Args:
+        batch_id: The batch ID
+
+    Returns:
+        Dictionary of custom_id -> request
+    """
+    requests = AIBatchRequest.query.filter_by(
+        batch_id=batch_id, status=BatchRequestStatus.submitted.value
+    ).all()
+    return {request.custom_id: request.to_dict() for request in requests}
+
+def mark_request(request_id: int, status: str, error: Optional[str] = None) -> bool:
+    """
+    Set a batch request's status
+
+    Only requests that are still submitted change, so applying a batch's
+    results twice has no effect.
+
+    Args:
+        request_id: The request ID
+        status: New status
+        error: Error message for failed requests
+
+    Returns:
+        True if the request was updated
+    """
+    try:
+        updated = AIBatchRequest.query.filter_by(
+            id=request_id, status=BatchRequestStatus.submitted.value
+        ).update({'status': status, 'error': (error or '')[:2000] or None}, synchronize_session=False)
+        db.session.commit()
+        return updated > 0
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating AI batch request {request_id}: {e}")
+        raise e
+
+def mark_batch(batch_id: int, status: str, error: Optional[str] = None,
+               results: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Set a batch's final status
+
+    Args:
+        batch_id: The batch ID
+        status: 'applied' or 'failed'
+        error: Error message for failed batches
+        results: Applied/failed counts and spend
+
+    Returns:
+        True if updated, False if not found
+    """
+    try:
+        batch = AIBatch.query.get(batch_id)
+        if not batch:
+            return False
+        batch.status = status
+        batch.error = error
+        batch.results = results
+        batch.completed_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating AI batch {batch_id}: {e}")
+        raise e
@@ -0,0 +1,76 @@
+"""
+AI usage repository for database operations
+Per-call token usage and spend, estimated vs actual
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Any
+from sqlalchemy import func
+
+from app import db
+from app.models.ai_usage import AIUsageRecord
+
+def create(usage_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record the usage of one AI call
+
+    Args:
+        usage_data: Provider, model, task and estimated/actual token and cost fields
+
+    Returns:
+        The created usage record
+    """
+    try:
+        record = AIUsageRecord(**usage_data)
+        db.session.add(record)
+        db.session.commit()
+        return record.to_dict()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating AI usage record: {e}")
+        raise e
+
+def get_summary(days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Estimated vs actual tokens and spend per provider, model and task
+
+    Args:
+        days: Number of days to include
+
+    Returns:
+        One row per provider/model/task with totals and the estimate error
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = db.session.query(
+        AIUsageRecord.provider,
+        AIUsageRecord.model,
+        AIUsageRecord.task,
+        func.count(AIUsageRecord.id),
+        func.sum(AIUsageRecord.estimated_input_tokens + AIUsageRecord.estimated_output_tokens),
+        func.sum(AIUsageRecord.input_tokens + AIUsageRecord.output_tokens
+                 + AIUsageRecord.cache_read_tokens + AIUsageRecord.cache_write_tokens),
+        func.sum(AIUsageRecord.estimated_cost),
+        func.sum(AIUsageRecord.actual_cost)
+    ).filter(
+        AIUsageRecord.created_at >= since
+    ).group_by(
+        AIUsageRecord.provider, AIUsageRecord.model, AIUsageRecord.task
+    ).all()
+
+    summary = []
+    for provider, model, task, calls, estimated_tokens, actual_tokens, estimated_cost, actual_cost in rows:
+        estimated_tokens, actual_tokens = estimated_tokens or 0, actual_tokens or 0
+        estimated_cost, actual_cost = estimated_cost or 0.0, actual_cost or 0.0
+        summary.append({
+            'provider': provider,
+            'model': model,
+            'task': task,
+            'calls': calls,
+            'estimated_tokens': int(estimated_tokens),
+            'actual_tokens': int(actual_tokens),
+            'token_error_pct': round((estimated_tokens - actual_tokens) / actual_tokens * 100, 1) if actual_tokens else None,
+            'estimated_cost': estimated_cost,
+            'actual_cost': actual_cost,
+            'cost_error_pct': round((estimated_cost - actual_cost) / actual_cost * 100, 1) if actual_cost else None
+        })
+    return summary
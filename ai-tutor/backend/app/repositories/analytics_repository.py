@@ -2,12 +2,13 @@
 Repository for analytics data access.
 """
 
-from sqlalchemy import func, desc, and_
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from sqlalchemy import func, desc, and_, text
+from sqlalchemy.dialects.postgresql import insert
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
 
 from app import db
-from app.models.analytics import SessionMetrics, DailyStats
+from app.models.analytics import SessionMetrics, DailyStats, StudentProgress
 
 class AnalyticsRepository:
     """Repository class for analytics data access."""
@@ -55,18 +56,27 @@ class AnalyticsRepository:
         """Get system performance metrics for the dashboard."""
         return get_system_performance_metrics(days)
     
-    # Student Progress Methods (stubs for missing functionality)
-    def get_student_progress(self, student_id: str) -> List:
-        """Get student progress records - stub implementation."""
-        return []
+    def get_dashboard_rollup(self, start_date: datetime, end_date: datetime, top_topics: int = 10) -> dict:
+        """Get daily stats, merged topics and totals for a date range in one query."""
+        return get_dashboard_rollup(start_date, end_date, top_topics)
     
-    def get_latest_student_progress(self, student_id: str, subject: str) -> Optional[Any]:
-        """Get latest student progress - stub implementation."""
-        return None
+    # Student Progress Methods
+    def get_student_progress(self, student_id: str) -> List[StudentProgress]:
+        """Get a student's stored progress records, oldest first."""
+        return get_student_progress(student_id)
     
-    def create_student_progress(self, progress_data: dict) -> bool:
-        """Create student progress record - stub implementation."""
-        return True
+    def get_latest_student_progress(self, student_id: str, subject: str) -> Optional[StudentProgress]:
+        """Get the most recent progress record for a student and subject."""
+        return get_latest_student_progress(student_id, subject)
+    
+    def create_student_progress(self, progress_data: dict) -> StudentProgress:
+        """Create or update the progress record for a student, subject and day."""
+        return create_student_progress(progress_data)
+    
+    def compute_student_progress(self, student_ids: List[int], start_date: datetime,
+                                 end_date: datetime, top_topics: int = 5) -> Dict[int, dict]:
+        """Compute per-subject progress for students in one query."""
+        return compute_student_progress(student_ids, start_date, end_date, top_topics)
 
 # Standalone functions (maintained for backward compatibility)
 
@@ -182,22 +192,318 @@ def get_student_engagement_over_time(student_id: str, days: int = 90) -> List[Se
 def get_system_performance_metrics(days: int = 30) -> dict:
     """Get system performance metrics for the dashboard."""
     cutoff_date = datetime.utcnow() - timedelta(days=days)
+    rollup = get_dashboard_rollup(cutoff_date, datetime.utcnow())
     
-    # Get daily stats for the period
-    stats = get_daily_stats_range(cutoff_date, datetime.utcnow())
+    return {
+        'total_sessions': rollup['totals']['total_sessions'],
+        'total_users': rollup['totals']['total_users'],
+        'avg_duration': rollup['totals']['avg_duration'],
+        'daily_sessions': [(stat['date'], stat['total_sessions']) for stat in rollup['daily_stats']],
+        'popular_topics': rollup['popular_topics']
+    }
+
+# Single query behind the dashboard: the range is read once, topics are merged
+# with jsonb_each and the totals are computed over the same rows
+DASHBOARD_ROLLUP_SQL = text("""
+    WITH range_stats AS (
+        SELECT date, total_sessions, avg_duration, total_users,
+               avg_satisfaction, avg_engagement, popular_topics::jsonb AS topics
+        FROM daily_stats
+        WHERE date BETWEEN :start_date AND :end_date
+    ),
+    merged_topics AS (
+        SELECT topic.key AS topic, SUM((topic.value #>> '{}')::numeric) AS topic_count
+        FROM range_stats
+        CROSS JOIN LATERAL jsonb_each(
+            CASE WHEN jsonb_typeof(range_stats.topics) = 'object' THEN range_stats.topics ELSE '{}'::jsonb END
+        ) AS topic
+        WHERE jsonb_typeof(topic.value) = 'number'
+        GROUP BY topic.key
+        ORDER BY topic_count DESC, topic.key
+        LIMIT :top_topics
+    )
+    SELECT
+        (SELECT COALESCE(json_agg(json_build_object(
+                    'date', to_char(date, 'YYYY-MM-DD'),
+                    'total_sessions', total_sessions,
+                    'avg_duration', avg_duration,
+                    'total_users', total_users,
+                    'avg_satisfaction', avg_satisfaction,
+                    'avg_engagement', avg_engagement
+                ) ORDER BY date), '[]'::json)
+         FROM range_stats) AS daily_stats,
+        (SELECT COALESCE(json_agg(json_build_array(topic, topic_count) ORDER BY topic_count DESC, topic), '[]'::json)
+         FROM merged_topics) AS popular_topics,
+        (SELECT json_build_object(
+                    'total_sessions', COALESCE(SUM(total_sessions), 0),
+                    'total_users', COALESCE(SUM(total_users), 0),
+                    'avg_duration', COALESCE(SUM(avg_duration * total_sessions) / NULLIF(SUM(total_sessions), 0), 0),
+                    'avg_satisfaction', AVG(avg_satisfaction),
+                    'avg_engagement', AVG(avg_engagement)
+                )
+         FROM range_stats) AS totals
+""")
+
+def get_dashboard_rollup(start_date: datetime, end_date: datetime, top_topics: int = 10) -> dict:
+    """
+    Get the analytics dashboard payload for a date range in one query.
     
-    # Calculate aggregate metrics
-    total_sessions = sum(stat.total_sessions for stat in stats)
-    total_users = sum(stat.total_users for stat in stats)
-    avg_duration = sum(stat.avg_duration * stat.total_sessions for stat in stats) / total_sessions if total_sessions > 0 else 0
+    Args:
+        start_date: Start of the range (inclusive)
+        end_date: End of the range (inclusive)
+        top_topics: Number of most frequent topics to return
+        
+    Returns:
+        Dictionary with daily_stats (list per day), popular_topics (topic: count,
+        most frequent first) and totals (sessions, users, weighted average duration,
+        average satisfaction and engagement)
+    """
+    row = db.session.execute(DASHBOARD_ROLLUP_SQL, {
+        'start_date': start_date,
+        'end_date': end_date,
+        'top_topics': top_topics
+    }).one()
     
-    # Get daily session counts for the chart
-    daily_sessions = [(stat.date.strftime('%Y-%m-%d'), stat.total_sessions) for stat in stats]
+    popular_topics = {}
+    for topic, count in row.popular_topics:
+        popular_topics[topic] = int(count) if float(count).is_integer() else float(count)
     
     return {
-        'total_sessions': total_sessions,
-        'total_users': total_users,
-        'avg_duration': avg_duration,
-        'daily_sessions': daily_sessions,
-        'popular_topics': get_popular_topics(days)
-    }
\ No newline at end of file
+        'daily_stats': row.daily_stats,
+        'popular_topics': popular_topics,
+        'totals': row.totals
+    }
+
+
+# Student Progress Methods
+
+def get_student_progress(student_id) -> List[StudentProgress]:
+    """Get a student's stored progress records, oldest first."""
+    return StudentProgress.query.filter_by(student_id=int(student_id))\
+                                .order_by(StudentProgress.date, StudentProgress.subject).all()
+
+def get_latest_student_progress(student_id, subject: str) -> Optional[StudentProgress]:
+    """Get the most recent progress record for a student and subject."""
+    return StudentProgress.query.filter_by(student_id=int(student_id), subject=subject)\
+                                .order_by(StudentProgress.date.desc()).first()
+
+def create_student_progress(progress_data: dict) -> StudentProgress:
+    """Create or update the progress record for a student, subject and day."""
+    try:
+        progress_date = progress_data.get('date') or datetime.utcnow()
+        if isinstance(progress_date, datetime):
+            progress_date = progress_date.date()
+        
+        progress = StudentProgress.query.filter_by(
+            student_id=int(progress_data['student_id']), subject=progress_data['subject'], date=progress_date
+        ).first()
+        if not progress:
+            progress = StudentProgress(student_id=int(progress_data['student_id']),
+                                       subject=progress_data['subject'], date=progress_date)
+            db.session.add(progress)
+        
+        for key, value in progress_data.items():
+            if key not in ('student_id', 'subject', 'date') and hasattr(progress, key):
+                setattr(progress, key, value)
+        
+        db.session.commit()
+        return progress
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating student progress: {e}")
+        raise e
+
+# Per-subject progress for a set of students in one pass: topics_covered is
+# unnested, the subject is the prefix before ':' ('Math: Fractions' -> 'Math'),
+# and each session counts once per subject however many of its topics match
+STUDENT_PROGRESS_SQL = text("""
+    WITH window_sessions AS (
+        SELECT id, student_id, COALESCE(duration, 0) AS duration
+        FROM sessions
+        WHERE student_id = ANY(:student_ids)
+          AND created_at BETWEEN :start_date AND :end_date
+    ),
+    totals AS (
+        SELECT student_id, COUNT(*) AS total_sessions, SUM(duration) AS total_duration
+        FROM window_sessions
+        GROUP BY student_id
+    ),
+    session_topics AS (
+        SELECT ws.student_id, ws.id AS session_id, ws.duration,
+               m.student_engagement, m.student_satisfaction,
+               topic.value AS topic,
+               left(CASE WHEN position(':' IN topic.value) > 0
+                         THEN btrim(split_part(topic.value, ':', 1))
+                         ELSE topic.value END, 100) AS subject
+        FROM window_sessions ws
+        JOIN session_metrics m ON m.session_id = ws.id
+        CROSS JOIN LATERAL json_array_elements_text(
+            CASE WHEN json_typeof(m.topics_covered) = 'array' THEN m.topics_covered ELSE '[]'::json END
+        ) AS topic(value)
+    ),
+    session_subjects AS (
+        SELECT student_id, session_id, subject, MAX(duration) AS duration,
+               AVG(student_engagement) AS engagement, AVG(student_satisfaction) AS satisfaction
+        FROM session_topics
+        GROUP BY student_id, session_id, subject
+    ),
+    subject_topics AS (
+        SELECT student_id, subject,
+               json_object_agg(topic, topic_count ORDER BY topic_count DESC, topic) AS topics
+        FROM (
+            SELECT student_id, subject, topic, COUNT(*) AS topic_count
+            FROM session_topics
+            GROUP BY student_id, subject, topic
+        ) counted
+        GROUP BY student_id, subject
+    ),
+    subject_stats AS (
+        SELECT student_id, subject, COUNT(*) AS sessions, SUM(duration) AS duration,
+               AVG(engagement) AS avg_engagement, AVG(satisfaction) AS avg_satisfaction
+        FROM session_subjects
+        GROUP BY student_id, subject
+    ),
+    top_topics AS (
+        SELECT student_id,
+               json_object_agg(topic, topic_count ORDER BY topic_count DESC, topic)
+                   FILTER (WHERE topic_rank <= :top_topics) AS topics
+        FROM (
+            SELECT student_id, topic, COUNT(*) AS topic_count,
+                   row_number() OVER (PARTITION BY student_id ORDER BY COUNT(*) DESC, topic) AS topic_rank
+            FROM session_topics
+            GROUP BY student_id, topic
+        ) ranked
+        GROUP BY student_id
+    )
+    SELECT t.student_id, t.total_sessions, t.total_duration,
+           ss.subject, ss.sessions AS subject_sessions, ss.duration AS subject_duration,
+           ss.avg_engagement, ss.avg_satisfaction,
+           st.topics AS subject_topics, tt.topics AS top_topics
+    FROM totals t
+    LEFT JOIN subject_stats ss ON ss.student_id = t.student_id
+    LEFT JOIN subject_topics st ON st.student_id = ss.student_id AND st.subject = ss.subject
+    LEFT JOIN top_topics tt ON tt.student_id = t.student_id
+    ORDER BY t.student_id, ss.subject
+""")
+
+def compute_student_progress(student_ids: List[int], start_date: datetime, end_date: datetime,
+                             top_topics: int = 5) -> Dict[int, dict]:
+    """
+    Compute per-subject progress for a set of students in one query.
+    
+    Args:
+        student_ids: Students to compute
+        start_date: Start of the window
+        end_date: End of the window
+        top_topics: Number of most frequent topics per student
+        
+    Returns:
+        Dictionary of student_id -> progress (total_sessions, total_duration,
+        progress_by_subject, top_topics) for students with sessions in the window
+    """
+    if not student_ids:
+        return {}
+    
+    rows = db.session.execute(STUDENT_PROGRESS_SQL, {
+        'student_ids': [int(student_id) for student_id in student_ids],
+        'start_date': start_date,
+        'end_date': end_date,
+        'top_topics': top_topics
+    })
+    
+    progress = {}
+    for row in rows:
+        total_duration = int(row.total_duration or 0)
+        result = progress.setdefault(row.student_id, {
+            'student_id': row.student_id,
+            'total_sessions': row.total_sessions,
+            'total_duration': total_duration,
+            'progress_by_subject': {},
+            'top_topics': row.top_topics or {}
+        })
+        if row.subject is None:
+            continue
+        subject_duration = int(row.subject_duration or 0)
+        result['progress_by_subject'][row.subject] = {
+            'sessions': row.subject_sessions,
+            'total_duration': subject_duration,
+            'avg_engagement': row.avg_engagement,
+            'avg_satisfaction': row.avg_satisfaction,
+            'percentage_of_total': (subject_duration / total_duration * 100) if total_duration > 0 else 0,
+            'top_topics': row.subject_topics or {}
+        }
+    return progress
+
+def get_active_student_ids(start_date: datetime, end_date: datetime, after_id: int = 0,
+                           limit: Optional[int] = None) -> List[int]:
+    """
+    Get IDs of students with sessions in a window, in ID order.
+    
+    Args:
+        start_date: Start of the window
+        end_date: End of the window
+        after_id: Only return IDs greater than this (keyset pagination)
+        limit: Maximum number of IDs
+        
+    Returns:
+        List of student IDs
+    """
+    from app.models.session import Session
+    
+    query = db.session.query(Session.student_id).filter(
+        Session.created_at.between(start_date, end_date),
+        Session.student_id > after_id
+    ).distinct().order_by(Session.student_id)
+    if limit:
+        query = query.limit(limit)
+    return [student_id for (student_id,) in query.all()]
+
+def save_student_progress(progress: Dict[int, dict], as_of: date, window_days: int) -> int:
+    """
+    Upsert computed progress, one row per student and subject for the day.
+    
+    Existing rows for the day keep their proficiency_level.
+    
+    Args:
+        progress: Output of compute_student_progress
+        as_of: Day the window ends on
+        window_days: Window length in days
+        
+    Returns:
+        Number of rows written
+    """
+    rows = []
+    for student_id, result in progress.items():
+        for subject, data in result['progress_by_subject'].items():
+            rows.append({
+                'student_id': student_id,
+                'subject': subject,
+                'date': as_of,
+                'window_days': window_days,
+                'sessions_count': data['sessions'],
+                'total_time_spent': data['total_duration'],
+                'percentage_of_total': data['percentage_of_total'],
+                'avg_engagement': data['avg_engagement'],
+                'avg_satisfaction': data['avg_satisfaction'],
+                'top_topics': data['top_topics']
+            })
+    if not rows:
+        return 0
+    
+    try:
+        statement = insert(StudentProgress).values(rows)
+        updates = {column: statement.excluded[column] for column in (
+            'window_days', 'sessions_count', 'total_time_spent', 'percentage_of_total',
+            'avg_engagement', 'avg_satisfaction', 'top_topics'
+        )}
+        updates['updated_at'] = func.now()
+        statement = statement.on_conflict_do_update(
+            constraint='uq_student_progress_student_subject_date', set_=updates
+        )
+        db.session.execute(statement)
+        db.session.commit()
+        return len(rows)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error saving student progress: {e}")
+        raise e
@@ -5,10 +5,12 @@ Manages StudentSubject assessments and progress tracking
 
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy import and_, or_, func, desc, distinct, tuple_
+from sqlalchemy.orm import joinedload
 
 from app import db
 from app.models.assessment import StudentSubject
+from app.models.curriculum import CurriculumDetail
 
 def get_all() -> List[Dict[str, Any]]:
     """
@@ -432,6 +434,10 @@ def unenroll_student_from_subject(student_id, subject_id) -> bool:
         print(f"Error unenrolling student from subject: {e}")
         raise e
 
+def _average_performance_column():
+    """Average progress as a 0-100 score, ignoring enrollments with no progress yet"""
+    return func.avg(StudentSubject.progress_percentage * 100).filter(StudentSubject.progress_percentage > 0)
+
 def get_student_progress_summary(student_id) -> Dict[str, Any]:
     """
     Get a comprehensive progress summary for a student
@@ -445,13 +451,19 @@ def get_student_progress_summary(student_id) -> Dict[str, Any]:
     try:
         student_id_int = int(student_id)
         
-        # Get all active subjects
-        active_subjects = StudentSubject.query.filter_by(
-            student_id=student_id_int,
-            is_in_use=True
-        ).all()
-        
-        if not active_subjects:
+        # One grouped query per mastery level; totals are additive across the groups
+        rows = db.session.query(
+            StudentSubject.mastery_level,
+            func.count(StudentSubject.id),
+            func.sum(StudentSubject.progress_percentage * 100).filter(StudentSubject.progress_percentage > 0),
+            func.count(StudentSubject.id).filter(StudentSubject.progress_percentage > 0),
+            func.max(StudentSubject.updated_at)
+        ).filter(
+            StudentSubject.student_id == student_id_int,
+            StudentSubject.is_in_use.is_(True)
+        ).group_by(StudentSubject.mastery_level).all()
+        
+        if not rows:
             return {
                 'student_id': student_id_int,
                 'total_subjects': 0,
@@ -461,22 +473,23 @@ def get_student_progress_summary(student_id) -> Dict[str, Any]:
                 'subjects': []
             }
         
-        # Calculate summary statistics
-        total_subjects = len(active_subjects)
+        total_subjects = sum(count for _, count, _, _, _ in rows)
+        performance_sum = sum(perf_sum or 0.0 for _, _, perf_sum, _, _ in rows)
+        performance_count = sum(perf_count for _, _, _, perf_count, _ in rows)
+        average_performance = performance_sum / performance_count if performance_count else 0.0
+        mastery_counts = {(level or 'unknown'): count for level, count, _, _, _ in rows}
+        last_updated = max((updated for *_, updated in rows if updated), default=None)
+        
         # Note: session_count and total_time_minutes not available in current model
         total_sessions = 0  # Default to 0 since session tracking not implemented
-        total_time_minutes = 0  # Default to 0 since time tracking not implemented
-        total_time_hours = total_time_minutes / 60.0
+        total_time_hours = 0.0  # Default to 0 since time tracking not implemented
         
-        # Calculate average performance using progress_percentage (excluding 0 scores)
-        performance_scores = [ss.progress_percentage * 100 for ss in active_subjects if ss.progress_percentage and ss.progress_percentage > 0]
-        average_performance = sum(performance_scores) / len(performance_scores) if performance_scores else 0.0
-        
-        # Count mastery levels
-        mastery_counts = {}
-        for ss in active_subjects:
-            level = ss.mastery_level if ss.mastery_level else 'unknown'
-            mastery_counts[level] = mastery_counts.get(level, 0) + 1
+        # Per-subject detail for this student, with the relationships to_dict() reads loaded up front
+        active_subjects = StudentSubject.query.options(
+            joinedload(StudentSubject.student),
+            joinedload(StudentSubject.curriculum_detail).joinedload(CurriculumDetail.subject),
+            joinedload(StudentSubject.curriculum_detail).joinedload(CurriculumDetail.curriculum)
+        ).filter_by(student_id=student_id_int, is_in_use=True).all()
         
         return {
             'student_id': student_id_int,
@@ -486,7 +499,7 @@ def get_student_progress_summary(student_id) -> Dict[str, Any]:
             'total_time_hours': round(total_time_hours, 2),
             'mastery_distribution': mastery_counts,
             'subjects': [ss.to_dict() for ss in active_subjects],
-            'last_updated': max(ss.updated_at for ss in active_subjects if ss.updated_at).isoformat() if active_subjects and any(ss.updated_at for ss in active_subjects) else None
+            'last_updated': last_updated.isoformat() if last_updated else None
         }
     except (ValueError, TypeError):
         return {'error': 'Invalid student_id'}
@@ -504,13 +517,33 @@ def get_subject_performance_stats(subject_id) -> Dict[str, Any]:
     try:
         subject_id_int = int(subject_id)
         
-        # Get all active enrollments for this subject
-        enrollments = StudentSubject.query.filter_by(
-            subject_id=subject_id_int,
-            is_in_use=True
+        # Single pass: GROUPING SETS yields the mastery histogram, the grade histogram
+        # and the overall totals from one scan of the matching enrollments
+        grouping_id = func.grouping(StudentSubject.mastery_level, CurriculumDetail.grade_level)
+        rows = db.session.query(
+            grouping_id,
+            StudentSubject.mastery_level,
+            CurriculumDetail.grade_level,
+            func.count(StudentSubject.id),
+            func.count(distinct(StudentSubject.student_id)),
+            _average_performance_column()
+        ).join(
+            CurriculumDetail, StudentSubject.curriculum_detail_id == CurriculumDetail.id
+        ).filter(
+            CurriculumDetail.subject_id == subject_id_int,
+            StudentSubject.is_in_use.is_(True)
+        ).group_by(
+            func.grouping_sets(
+                tuple_(StudentSubject.mastery_level),
+                tuple_(CurriculumDetail.grade_level),
+                tuple_()
+            )
         ).all()
         
-        if not enrollments:
+        # grouping() bitmask: 1 = grouped by mastery level, 2 = by grade level, 3 = grand total
+        totals = next((row for row in rows if row[0] == 3), None)
+        
+        if not totals or not totals[3]:
             return {
                 'subject_id': subject_id_int,
                 'total_students': 0,
@@ -519,27 +552,13 @@ def get_subject_performance_stats(subject_id) -> Dict[str, Any]:
                 'grade_distribution': {}
             }
         
-        # Calculate statistics
-        total_students = len(enrollments)
-        performance_scores = [e.progress_percentage * 100 for e in enrollments if e.progress_percentage and e.progress_percentage > 0]
-        average_performance = sum(performance_scores) / len(performance_scores) if performance_scores else 0.0
-        
-        # Mastery level distribution
-        mastery_counts = {}
-        for enrollment in enrollments:
-            level = enrollment.mastery_level if enrollment.mastery_level else 'unknown'
-            mastery_counts[level] = mastery_counts.get(level, 0) + 1
-        
-        # Grade level distribution
-        grade_counts = {}
-        for enrollment in enrollments:
-            grade = enrollment.grade_level
-            grade_counts[grade] = grade_counts.get(grade, 0) + 1
+        mastery_counts = {(row[1] or 'unknown'): row[3] for row in rows if row[0] == 1}
+        grade_counts = {row[2]: row[3] for row in rows if row[0] == 2}
         
         return {
             'subject_id': subject_id_int,
-            'total_students': total_students,
-            'average_performance': round(average_performance, 2),
+            'total_students': totals[4],
+            'average_performance': round(float(totals[5] or 0.0), 2),
             'mastery_distribution': mastery_counts,
             'grade_distribution': grade_counts,
             'total_sessions': 0,  # Session tracking not implemented in current model
@@ -560,19 +579,24 @@ def get_class_analytics(grade_level: int = None, subject_id = None) -> Dict[str,
         Class analytics data
     """
     try:
-        # Build query
-        query = StudentSubject.query.filter_by(is_in_use=True)
+        query = db.session.query(
+            func.count(StudentSubject.id),
+            func.count(distinct(StudentSubject.student_id)),
+            _average_performance_column()
+        ).filter(StudentSubject.is_in_use.is_(True))
+        
+        if grade_level is not None or subject_id is not None:
+            query = query.join(CurriculumDetail, StudentSubject.curriculum_detail_id == CurriculumDetail.id)
         
         if grade_level is not None:
-            query = query.filter_by(grade_level=grade_level)
+            query = query.filter(CurriculumDetail.grade_level == int(grade_level))
         
         if subject_id is not None:
-            subject_id_int = int(subject_id)
-            query = query.filter_by(subject_id=subject_id_int)
+            query = query.filter(CurriculumDetail.subject_id == int(subject_id))
         
-        enrollments = query.all()
+        total_enrollments, unique_students, average_performance = query.one()
         
-        if not enrollments:
+        if not total_enrollments:
             return {
                 'total_enrollments': 0,
                 'unique_students': 0,
@@ -583,15 +607,10 @@ def get_class_analytics(grade_level: int = None, subject_id = None) -> Dict[str,
                 }
             }
         
-        # Calculate analytics
-        unique_students = len(set(e.student_id for e in enrollments))
-        performance_scores = [e.progress_percentage * 100 for e in enrollments if e.progress_percentage and e.progress_percentage > 0]
-        average_performance = sum(performance_scores) / len(performance_scores) if performance_scores else 0.0
-        
         return {
-            'total_enrollments': len(enrollments),
+            'total_enrollments': total_enrollments,
             'unique_students': unique_students,
-            'average_performance': round(average_performance, 2),
+            'average_performance': round(float(average_performance or 0.0), 2),
             'total_sessions': 0,  # Session tracking not implemented in current model
             'total_time_hours': 0.0,  # Time tracking not implemented in current model
             'filters': {
@@ -600,4 +619,4 @@ def get_class_analytics(grade_level: int = None, subject_id = None) -> Dict[str,
             }
         }
     except (ValueError, TypeError):
-        return {'error': 'Invalid parameters'}
\ No newline at end of file
+        return {'error': 'Invalid parameters'}
@@ -4,9 +4,11 @@ Manages curriculum goals and their knowledge components (read-only operations)
 """
 
 from typing import Dict, List, Optional, Any
+from sqlalchemy import func, literal, or_
 from sqlalchemy.orm import Session
 
 from app.models.mastery_tracking import CurriculumGoal, GoalKC
+from app.repositories.trigram import LIKE_ESCAPE, MIN_FUZZY_LENGTH, prefix_pattern, set_word_similarity_threshold
 
 
 class CurriculumGoalRepository:
@@ -149,23 +151,31 @@ class CurriculumGoalRepository:
             List of dictionaries with goal data and KCs
         """
         try:
-            # Build base query
-            query = self.session.query(CurriculumGoal)
+            # Goals and their KCs in one outer-joined query (goals without KCs included)
+            query = self.session.query(CurriculumGoal, GoalKC)\
+                                .outerjoin(GoalKC, GoalKC.goal_id == CurriculumGoal.id)
             
             if subject:
-                query = query.filter_by(subject=subject)
+                query = query.filter(CurriculumGoal.subject == subject)
             if grade_level:
-                query = query.filter_by(grade_level=grade_level)
-            
-            goals = query.order_by(CurriculumGoal.goal_code).all()
+                query = query.filter(CurriculumGoal.grade_level == grade_level)
             
             result = []
-            for goal in goals:
-                kcs = self.get_knowledge_components(goal.id)
-                
-                goal_data = goal.to_dict()
-                goal_data['knowledge_components'] = [kc.to_dict() for kc in kcs]
-                result.append(goal_data)
+            goal_data = None
+            for goal, kc in query.order_by(CurriculumGoal.goal_code, GoalKC.kc_code):
+                if goal_data is None or goal_data['id'] != goal.id:
+                    goal_data = goal.to_dict()
+                    goal_data['knowledge_components'] = []
+                    result.append(goal_data)
+                if kc is not None:
+                    goal_data['knowledge_components'].append({
+                        'goal_id': goal.id,
+                        'goal_code': goal.goal_code,
+                        'kc_code': kc.kc_code,
+                        'kc_name': kc.kc_name,
+                        'description': kc.description,
+                        'created_at': kc.created_at.isoformat() if kc.created_at else None
+                    })
             
             return result
             
@@ -173,30 +183,111 @@ class CurriculumGoalRepository:
             print(f"Error getting goals with KCs: {e}")
             return []
     
-    def search_goals(self, search_term: str) -> List[CurriculumGoal]:
+    def search_goals(self, search_term: str, limit: int = 20) -> List[CurriculumGoal]:
         """
-        Search goals by title, description, or goal code
+        Fuzzy search goals by title or goal code, best matches first
+        
+        Goals whose code or title starts with the term come first, then
+        trigram word-similarity matches (which tolerate misspellings). Both
+        are index-backed and the limit is applied in SQL.
         
         Args:
             search_term: The search term
+            limit: Maximum number of goals
             
         Returns:
             List of matching CurriculumGoal objects
         """
         try:
-            search_pattern = f"%{search_term}%"
-            return self.session.query(CurriculumGoal)\
-                              .filter(
-                                  (CurriculumGoal.title.ilike(search_pattern)) |
-                                  (CurriculumGoal.description.ilike(search_pattern)) |
-                                  (CurriculumGoal.goal_code.ilike(search_pattern))
-                              )\
-                              .order_by(CurriculumGoal.goal_code)\
-                              .all()
+            term = search_term.strip()
+            if not term:
+                return []
+            
+            prefix = prefix_pattern(term)
+            is_prefix = or_(func.lower(CurriculumGoal.goal_code).like(prefix, escape=LIKE_ESCAPE),
+                            func.lower(CurriculumGoal.title).like(prefix, escape=LIKE_ESCAPE))
+            query = self.session.query(CurriculumGoal)
+            
+            if len(term) < MIN_FUZZY_LENGTH:
+                return query.filter(is_prefix)\
+                            .order_by(CurriculumGoal.goal_code)\
+                            .limit(limit)\
+                            .all()
+            
+            set_word_similarity_threshold(self.session)
+            score = func.greatest(func.word_similarity(term, CurriculumGoal.title),
+                                  func.word_similarity(term, CurriculumGoal.goal_code))
+            return query.filter(or_(is_prefix,
+                                    literal(term).op('<%')(CurriculumGoal.title),
+                                    literal(term).op('<%')(CurriculumGoal.goal_code)))\
+                        .order_by(is_prefix.desc(), score.desc(), CurriculumGoal.goal_code)\
+                        .limit(limit)\
+                        .all()
         except Exception as e:
             print(f"Error searching goals with term '{search_term}': {e}")
             return []
     
+    def autocomplete_goals(self, search_term: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Typeahead suggestions for goals, as light dictionaries
+        
+        Args:
+            search_term: What has been typed so far
+            limit: Maximum number of suggestions
+            
+        Returns:
+            List of dictionaries with id, goal_code, title, subject and grade_level
+        """
+        return [{
+            'id': goal.id,
+            'goal_code': goal.goal_code,
+            'title': goal.title,
+            'subject': goal.subject,
+            'grade_level': goal.grade_level
+        } for goal in self.search_goals(search_term, limit=limit)]
+    
+    def search_knowledge_components(self, search_term: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Fuzzy search knowledge components by name, best matches first
+        
+        Args:
+            search_term: The search term
+            limit: Maximum number of knowledge components
+            
+        Returns:
+            List of KC dictionaries with their goal code and title
+        """
+        try:
+            term = search_term.strip()
+            if not term:
+                return []
+            
+            is_prefix = func.lower(GoalKC.kc_name).like(prefix_pattern(term), escape=LIKE_ESCAPE)
+            query = self.session.query(GoalKC, CurriculumGoal)\
+                                .join(CurriculumGoal, GoalKC.goal_id == CurriculumGoal.id)
+            
+            if len(term) < MIN_FUZZY_LENGTH:
+                query = query.filter(is_prefix)\
+                             .order_by(GoalKC.kc_name, CurriculumGoal.goal_code)
+            else:
+                set_word_similarity_threshold(self.session)
+                query = query.filter(or_(is_prefix, literal(term).op('<%')(GoalKC.kc_name)))\
+                             .order_by(is_prefix.desc(),
+                                       func.word_similarity(term, GoalKC.kc_name).desc(),
+                                       CurriculumGoal.goal_code, GoalKC.kc_code)
+            
+            return [{
+                'goal_id': goal.id,
+                'goal_code': goal.goal_code,
+                'goal_title': goal.title,
+                'kc_code': kc.kc_code,
+                'kc_name': kc.kc_name,
+                'description': kc.description
+            } for kc, goal in query.limit(limit).all()]
+        except Exception as e:
+            print(f"Error searching knowledge components with term '{search_term}': {e}")
+            return []
+    
     def get_statistics(self) -> Dict[str, Any]:
         """
         Get curriculum goal statistics
@@ -205,32 +296,28 @@ class CurriculumGoalRepository:
             Dictionary with goal statistics
         """
         try:
-            from sqlalchemy import func, distinct
+            # KC counts per goal, then one grouped pass over goals by subject and grade
+            kc_counts = self.session.query(GoalKC.goal_id, func.count().label('kc_count'))\
+                                    .group_by(GoalKC.goal_id)\
+                                    .subquery()
+            rows = self.session.query(CurriculumGoal.subject,
+                                      CurriculumGoal.grade_level,
+                                      func.count(CurriculumGoal.id),
+                                      func.coalesce(func.sum(kc_counts.c.kc_count), 0))\
+                               .outerjoin(kc_counts, kc_counts.c.goal_id == CurriculumGoal.id)\
+                               .group_by(CurriculumGoal.subject, CurriculumGoal.grade_level)\
+                               .all()
             
-            # Total goals
-            total_goals = self.session.query(func.count(CurriculumGoal.id)).scalar()
-            
-            # Unique subjects
-            unique_subjects = self.session.query(func.count(distinct(CurriculumGoal.subject))).scalar()
-            
-            # Goals by subject
             subject_counts = {}
-            subjects = self.session.query(distinct(CurriculumGoal.subject)).all()
-            for (subject,) in subjects:
-                count = self.session.query(func.count(CurriculumGoal.id))\
-                                   .filter_by(subject=subject).scalar()
-                subject_counts[subject] = count
-            
-            # Goals by grade level
             grade_counts = {}
-            grades = self.session.query(distinct(CurriculumGoal.grade_level)).all()
-            for (grade,) in grades:
-                count = self.session.query(func.count(CurriculumGoal.id))\
-                                   .filter_by(grade_level=grade).scalar()
-                grade_counts[grade] = count
-            
-            # Total knowledge components
-            total_kcs = self.session.query(func.count(GoalKC.goal_id)).scalar()
+            total_goals = 0
+            total_kcs = 0
+            for subject, grade, goal_count, kc_count in rows:
+                subject_counts[subject] = subject_counts.get(subject, 0) + goal_count
+                grade_counts[grade] = grade_counts.get(grade, 0) + goal_count
+                total_goals += goal_count
+                total_kcs += int(kc_count)
+            unique_subjects = len(subject_counts)
             
             # Average KCs per goal
             avg_kcs = total_kcs / total_goals if total_goals > 0 else 0
@@ -4,6 +4,7 @@ Curriculum repository for database operations
 
 from typing import Dict, List, Optional, Any
 from sqlalchemy import and_, text
+from sqlalchemy.orm import joinedload
 import json
 import redis
 
@@ -106,8 +107,9 @@ def get_with_details(curriculum_id) -> Optional[Dict[str, Any]]:
         # Get curriculum data
         curriculum_data = curriculum.to_dict()
         
-        # Get all curriculum details
-        details = CurriculumDetail.query.filter_by(curriculum_id=curriculum_id_int).all()
+        # Get all curriculum details with their subjects in one query
+        details = CurriculumDetail.query.options(joinedload(CurriculumDetail.subject))\
+                                        .filter_by(curriculum_id=curriculum_id_int).all()
         curriculum_data['details'] = [detail.to_dict() for detail in details]
         
         # Group details by grade and subject for easier access
@@ -126,9 +128,8 @@ def get_with_details(curriculum_id) -> Optional[Dict[str, Any]]:
             # Collect unique subjects
             if detail.subject_id not in subject_ids:
                 subject_ids.add(detail.subject_id)
-                subject = Subject.query.get(detail.subject_id)
-                if subject:
-                    curriculum_data['subjects'].append(subject.to_dict())
+                if detail.subject:
+                    curriculum_data['subjects'].append(detail.subject.to_dict())
         
         return curriculum_data
     except (ValueError, TypeError):
@@ -446,15 +447,15 @@ def get_subjects_for_grade(curriculum_id, grade_level: int) -> List[Dict[str, An
     try:
         curriculum_id_int = int(curriculum_id)
         
-        # Get curriculum details for the grade
-        details = CurriculumDetail.query.filter_by(
+        # Get curriculum details for the grade with their subjects in one query
+        details = CurriculumDetail.query.options(joinedload(CurriculumDetail.subject)).filter_by(
             curriculum_id=curriculum_id_int,
             grade_level=grade_level
         ).all()
         
         subjects = []
         for detail in details:
-            subject = Subject.query.get(detail.subject_id)
+            subject = detail.subject
             if subject:
                 subject_data = subject.to_dict()
                 subject_data['curriculum_detail'] = detail.to_dict()
@@ -0,0 +1,193 @@
+"""
+Mastery event repository for database operations
+Appends mastery history events in bulk and compacts them into weekly
+per-student snapshots for trajectory queries
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.mastery_tracking import MasteryEvent, MasteryWeeklySnapshot
+
+COMPACTION_JOB = 'mastery_snapshot_compaction'
+
+# KC mastery at or above this counts as mastered in snapshots
+MASTERED_THRESHOLD = 80.0
+
+# For every student and week with KC events in [from_date, to_date): the latest
+# mastery of each KC as of the week's end, rolled up per subject with the
+# week's own activity, and upserted as snapshots
+COMPACT_SNAPSHOTS_SQL = text("""
+    WITH active_weeks AS (
+        SELECT DISTINCT student_id, date_trunc('week', recorded_at)::date AS week_start
+        FROM mastery_events
+        WHERE kc_code IS NOT NULL
+          AND recorded_at >= :from_date AND recorded_at < :to_date
+    ),
+    kc_state AS (
+        SELECT DISTINCT ON (aw.student_id, aw.week_start, e.goal_id, e.kc_code)
+               aw.student_id, aw.week_start, e.goal_id, e.mastery_percentage
+        FROM active_weeks aw
+        JOIN mastery_events e
+          ON e.student_id = aw.student_id
+         AND e.kc_code IS NOT NULL
+         AND e.recorded_at < aw.week_start + 7
+        ORDER BY aw.student_id, aw.week_start, e.goal_id, e.kc_code, e.recorded_at DESC, e.id DESC
+    ),
+    state AS (
+        SELECT ks.student_id, ks.week_start, g.subject,
+               AVG(ks.mastery_percentage) AS avg_mastery,
+               COUNT(*) AS kcs_tracked,
+               COUNT(*) FILTER (WHERE ks.mastery_percentage >= :mastered_threshold) AS kcs_mastered
+        FROM kc_state ks
+        JOIN curriculum_goals g ON g.id = ks.goal_id
+        GROUP BY ks.student_id, ks.week_start, g.subject
+    ),
+    activity AS (
+        SELECT e.student_id, date_trunc('week', e.recorded_at)::date AS week_start, g.subject,
+               COUNT(*) AS events_count,
+               COUNT(DISTINCT e.session_id) AS sessions_count,
+               SUM(e.mastery_percentage - COALESCE(e.previous_percentage, 0)) AS mastery_change
+        FROM mastery_events e
+        JOIN curriculum_goals g ON g.id = e.goal_id
+        WHERE e.kc_code IS NOT NULL
+          AND e.recorded_at >= :from_date AND e.recorded_at < :to_date
+        GROUP BY e.student_id, date_trunc('week', e.recorded_at)::date, g.subject
+    )
+    INSERT INTO mastery_weekly_snapshots (
+        student_id, week_start, subject, avg_mastery, kcs_tracked, kcs_mastered,
+        events_count, sessions_count, mastery_change, compacted_at
+    )
+    SELECT s.student_id, s.week_start, s.subject, s.avg_mastery, s.kcs_tracked, s.kcs_mastered,
+           COALESCE(a.events_count, 0), COALESCE(a.sessions_count, 0), COALESCE(a.mastery_change, 0), now()
+    FROM state s
+    LEFT JOIN activity a
+           ON a.student_id = s.student_id AND a.week_start = s.week_start AND a.subject = s.subject
+    ON CONFLICT ON CONSTRAINT pk_mastery_weekly_snapshots DO UPDATE SET
+        avg_mastery = EXCLUDED.avg_mastery,
+        kcs_tracked = EXCLUDED.kcs_tracked,
+        kcs_mastered = EXCLUDED.kcs_mastered,
+        events_count = EXCLUDED.events_count,
+        sessions_count = EXCLUDED.sessions_count,
+        mastery_change = EXCLUDED.mastery_change,
+        compacted_at = EXCLUDED.compacted_at
+""")
+
+def record_events(events: List[Dict[str, Any]]) -> int:
+    """
+    Append mastery events in one statement, inside the caller's transaction
+
+    Events already recorded for the same student, session, goal and KC are
+    skipped, so re-applying a session's delta doesn't duplicate history.
+
+    Args:
+        events: Dicts with student_id, goal_id, kc_code (None for goal-level),
+                session_id, mastery_percentage and previous_percentage
+
+    Returns:
+        Number of events submitted
+    """
+    if not events:
+        return 0
+    db.session.execute(insert(MasteryEvent).values(events).on_conflict_do_nothing())
+    return len(events)
+
+def get_events(student_id: int, start_date: Optional[datetime] = None,
+               end_date: Optional[datetime] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Get a student's raw mastery events, newest first
+
+    Args:
+        student_id: The student ID
+        start_date: Only events at or after this time
+        end_date: Only events before this time
+        limit: Maximum number of events
+
+    Returns:
+        List of event dictionaries
+    """
+    query = MasteryEvent.query.filter(MasteryEvent.student_id == student_id)
+    if start_date:
+        query = query.filter(MasteryEvent.recorded_at >= start_date)
+    if end_date:
+        query = query.filter(MasteryEvent.recorded_at < end_date)
+    events = query.order_by(MasteryEvent.recorded_at.desc(), MasteryEvent.id.desc()).limit(limit).all()
+    return [event.to_dict() for event in events]
+
+def get_trajectory(student_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                   subject: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get a student's weekly mastery trajectory from the compacted snapshots
+
+    Args:
+        student_id: The student ID
+        start_date: First week to include (defaults to all)
+        end_date: Last day to include (defaults to all)
+        subject: Only this subject
+
+    Returns:
+        Dictionary of subject -> weekly snapshots, oldest first
+    """
+    query = MasteryWeeklySnapshot.query.filter(MasteryWeeklySnapshot.student_id == student_id)
+    if start_date:
+        query = query.filter(MasteryWeeklySnapshot.week_start >= start_date - timedelta(days=start_date.weekday()))
+    if end_date:
+        query = query.filter(MasteryWeeklySnapshot.week_start <= end_date)
+    if subject:
+        query = query.filter(MasteryWeeklySnapshot.subject == subject)
+
+    trajectory = {}
+    for snapshot in query.order_by(MasteryWeeklySnapshot.subject, MasteryWeeklySnapshot.week_start).all():
+        trajectory.setdefault(snapshot.subject, []).append(snapshot.to_dict())
+    return trajectory
+
+def compact_weekly_snapshots(since: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Build or refresh weekly snapshots from mastery events
+
+    Starts from the week of the last compaction (which may have been partial)
+    unless a start date is given, so regular runs only touch recent weeks.
+
+    Args:
+        since: Recompact weeks from this date (None resumes from the checkpoint)
+
+    Returns:
+        Dictionary with the compacted range and the number of snapshot rows written
+    """
+    try:
+        checkpoint = JobCheckpoint.get_or_create(COMPACTION_JOB)
+        if since is None:
+            last_week = (checkpoint.data or {}).get('last_week')
+            if last_week:
+                since = date.fromisoformat(last_week)
+            else:
+                first_event = db.session.query(func.min(MasteryEvent.recorded_at)).scalar()
+                if first_event is None:
+                    return {'from_date': None, 'to_date': None, 'snapshots': 0}
+                since = first_event.date()
+
+        from_date = since - timedelta(days=since.weekday())
+        today = datetime.utcnow().date()
+        current_week = today - timedelta(days=today.weekday())
+        to_date = current_week + timedelta(days=7)
+
+        written = db.session.execute(COMPACT_SNAPSHOTS_SQL, {
+            'from_date': from_date,
+            'to_date': to_date,
+            'mastered_threshold': MASTERED_THRESHOLD
+        }).rowcount
+
+        checkpoint.processed_count = (checkpoint.processed_count or 0) + written
+        checkpoint.data = {'last_week': current_week.isoformat(), 'last_run_snapshots': written}
+        db.session.commit()
+
+        return {'from_date': from_date.isoformat(), 'to_date': to_date.isoformat(), 'snapshots': written}
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error compacting mastery snapshots: {e}")
+        raise e
@@ -0,0 +1,121 @@
+"""
+Session artifact repository for database operations
+Metadata index over the artifact store, used for listings and name lookups
+"""
+
+from typing import Dict, List, Optional, Any
+from sqlalchemy import func
+
+from app import db
+from app.models.session_artifact import SessionArtifact
+
+def create(artifact_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record a new artifact, replacing any previous artifact with the same name
+
+    Args:
+        artifact_data: Artifact metadata (student_id, name, kind, storage_key, ...)
+
+    Returns:
+        The created artifact
+    """
+    try:
+        existing = SessionArtifact.query.filter_by(
+            student_id=str(artifact_data['student_id']),
+            name=artifact_data['name']
+        ).first()
+
+        if existing:
+            for key, value in artifact_data.items():
+                if hasattr(existing, key):
+                    setattr(existing, key, value)
+            artifact = existing
+        else:
+            artifact = SessionArtifact(**{**artifact_data, 'student_id': str(artifact_data['student_id'])})
+            db.session.add(artifact)
+
+        db.session.commit()
+        return artifact.to_dict()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating session artifact: {e}")
+        raise e
+
+def set_status(artifact_id: int, storage_key: str, status: str, error: str = None) -> bool:
+    """
+    Record the outcome of an artifact's blob write
+
+    Only applies while the artifact still points at storage_key, so a late
+    result for replaced content is ignored.
+
+    Args:
+        artifact_id: The artifact ID
+        storage_key: Store key the write was for
+        status: 'stored' or 'failed'
+        error: Write error message for failed artifacts
+
+    Returns:
+        True if updated, False if not found or replaced
+    """
+    try:
+        updated = SessionArtifact.query.filter_by(id=artifact_id, storage_key=storage_key).update({
+            'status': status,
+            'error': error[:500] if error else None
+        }, synchronize_session=False)
+        db.session.commit()
+        return updated > 0
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating session artifact {artifact_id} status: {e}")
+        raise e
+
+def get_by_name(student_id, name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get an artifact by student and logical file name
+
+    Args:
+        student_id: The student ID (int or str)
+        name: The artifact file name
+
+    Returns:
+        Artifact dictionary or None if not found
+    """
+    artifact = SessionArtifact.query.filter_by(student_id=str(student_id), name=name).first()
+    return artifact.to_dict() if artifact else None
+
+def get_by_student_id(student_id, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Get artifacts for a student, newest first
+
+    Args:
+        student_id: The student ID (int or str)
+        limit: Maximum number of artifacts to return
+
+    Returns:
+        List of artifact dictionaries
+    """
+    artifacts = SessionArtifact.query.filter_by(student_id=str(student_id))\
+                                     .order_by(SessionArtifact.created_at.desc())\
+                                     .limit(limit).all()
+    return [artifact.to_dict() for artifact in artifacts]
+
+def get_student_summaries() -> List[Dict[str, Any]]:
+    """
+    Get one row per student with artifact count, total size and latest write
+
+    Returns:
+        List of dictionaries with student_id, count, total_size and last_created
+    """
+    results = db.session.query(
+        SessionArtifact.student_id,
+        func.count(SessionArtifact.id),
+        func.coalesce(func.sum(SessionArtifact.size_bytes), 0),
+        func.max(SessionArtifact.created_at)
+    ).group_by(SessionArtifact.student_id).order_by(SessionArtifact.student_id).all()
+
+    return [{
+        'student_id': student_id,
+        'count': count,
+        'total_size': int(total_size),
+        'last_created': last_created.isoformat() if last_created else None
+    } for student_id, count, total_size, last_created in results]
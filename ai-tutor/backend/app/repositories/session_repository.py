@@ -2,11 +2,24 @@
 Session repository for database operations
 """
 
+import os
+import socket
+import uuid
 from typing import Dict, List, Optional, Any
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import Float, func, or_, and_, text
 
 from app import db
-from app.models.session import Session
+from app.models.session import Session, ProcessingState, SEARCH_VECTOR_EXPRESSION
+from app.models.student import Student
+
+# Default claim lease and retry budget for the AI processing work queue
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+# ts_headline options for search snippets
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2'
 
 def get_all() -> List[Dict[str, Any]]:
     """
@@ -200,4 +213,283 @@ def get_sessions_by_day() -> Dict[str, int]:
     ).all()
     
     # Convert to dictionary
-    return {str(day): count for day, count in results}
\ No newline at end of file
+    return {str(day): count for day, count in results}
+
+def new_lease_owner(prefix: Optional[str] = None) -> str:
+    """
+    Generate a unique owner token for processing claims
+    
+    Args:
+        prefix: Optional label for where the claim was made (e.g. 'webhook')
+        
+    Returns:
+        Owner token including host and process for debugging
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+    return f"{prefix}:{owner}" if prefix else owner
+
+def claimed_state(owner: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> Dict[str, Any]:
+    """
+    Session column values for a session that is inserted already claimed
+    
+    Used when the creating request processes the session itself, so queue
+    workers don't pick it up while the inline update is running.
+    
+    Args:
+        owner: Lease owner token from new_lease_owner
+        lease_seconds: How long the claim is held before it can be reclaimed
+        
+    Returns:
+        Dictionary of Session column values
+    """
+    return {
+        'processing_state': ProcessingState.processing.value,
+        'processing_attempts': 1,
+        'processing_lease_owner': owner,
+        'processing_lease_expires_at': datetime.utcnow() + timedelta(seconds=lease_seconds)
+    }
+
+def claim_processing_batch(owner: str, batch_size: int = 10, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+                           max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[int]:
+    """
+    Claim a batch of sessions for AI post-session processing
+    
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never claim
+    the same rows. Pending sessions and processing sessions whose lease has
+    expired (crashed worker) are both eligible.
+    
+    Args:
+        owner: Lease owner token; only this owner can complete the claim
+        batch_size: Maximum number of sessions to claim
+        lease_seconds: How long the claim is held before it can be reclaimed
+        max_attempts: Sessions with this many attempts are no longer claimed
+        
+    Returns:
+        List of claimed session IDs
+    """
+    try:
+        now = datetime.utcnow()
+        
+        candidates = db.session.query(Session).filter(
+            db.or_(
+                Session.processing_state == ProcessingState.pending.value,
+                db.and_(
+                    Session.processing_state == ProcessingState.processing.value,
+                    Session.processing_lease_expires_at < now
+                )
+            ),
+            Session.processing_attempts < max_attempts
+        ).order_by(Session.id).limit(batch_size).with_for_update(skip_locked=True).all()
+        
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        claimed_ids = []
+        for session in candidates:
+            session.processing_state = ProcessingState.processing.value
+            session.processing_attempts = (session.processing_attempts or 0) + 1
+            session.processing_lease_owner = owner
+            session.processing_lease_expires_at = lease_expires_at
+            claimed_ids.append(session.id)
+        
+        # Committing releases the row locks; the lease now protects the claim
+        db.session.commit()
+        return claimed_ids
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error claiming session processing batch: {e}")
+        raise e
+
+def mark_processing_done(session_id: int, owner: str) -> bool:
+    """
+    Mark a session's AI processing as completed
+    
+    Only the current lease owner can complete a claim, so a worker whose
+    lease expired and was reclaimed can't overwrite the newer claim.
+    
+    Args:
+        session_id: The session ID
+        owner: Lease owner token the session was claimed with
+        
+    Returns:
+        True if updated, False if not found or no longer claimed by owner
+    """
+    try:
+        updated = Session.query.filter_by(id=int(session_id), processing_lease_owner=owner).update({
+            'processing_state': ProcessingState.done.value,
+            'processing_lease_owner': None,
+            'processing_lease_expires_at': None,
+            'processing_error': None
+        }, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            print(f"⚠️ Session {session_id} is no longer claimed by {owner}; not marking it processed")
+        return updated > 0
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error marking session {session_id} as processed: {e}")
+        raise e
+
+def mark_processing_failed(session_id: int, error: str, owner: str,
+                           max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+    """
+    Record a failed processing attempt
+    
+    The session goes back to pending for another worker while it has attempts
+    left, and to failed once the retry budget is exhausted. Only the current
+    lease owner can record the outcome.
+    
+    Args:
+        session_id: The session ID
+        error: Error message from the failed attempt
+        owner: Lease owner token the session was claimed with
+        max_attempts: Attempt count at which the session is marked failed
+        
+    Returns:
+        True if updated, False if not found or no longer claimed by owner
+    """
+    try:
+        session = Session.query.filter_by(id=int(session_id), processing_lease_owner=owner)\
+                               .with_for_update().first()
+        if not session:
+            db.session.rollback()
+            print(f"⚠️ Session {session_id} is no longer claimed by {owner}; not recording failure")
+            return False
+        
+        if (session.processing_attempts or 0) >= max_attempts:
+            session.processing_state = ProcessingState.failed.value
+        else:
+            session.processing_state = ProcessingState.pending.value
+        session.processing_lease_owner = None
+        session.processing_lease_expires_at = None
+        session.processing_error = (error or '')[:2000]
+        
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error marking session {session_id} as failed: {e}")
+        raise e
+
+def get_processing_state_counts() -> Dict[str, int]:
+    """
+    Get the number of sessions in each processing state
+    
+    Returns:
+        Dictionary of state -> count
+    """
+    from sqlalchemy import func
+    
+    results = db.session.query(
+        Session.processing_state,
+        func.count(Session.id)
+    ).group_by(Session.processing_state).all()
+    
+    counts = {state.value: 0 for state in ProcessingState}
+    counts.update({state: count for state, count in results})
+    return counts
+
+def search(query: str, limit: int = 20, after_rank: float = None, after_id: int = None,
+           student_id: int = None) -> List[Dict[str, Any]]:
+    """
+    Full-text search over session summaries and transcripts, best matches first
+    
+    Uses the GIN-indexed search_vector column. Results are keyset-paged on
+    (rank, id): pass the rank and id of the last row of the previous page to
+    get the next one. Snippets are only built for the rows on the page.
+    
+    Args:
+        query: Search text (web search syntax: quotes, OR, -exclude)
+        limit: Maximum number of results
+        after_rank: Rank of the last result on the previous page
+        after_id: Session ID of the last result on the previous page
+        student_id: Optionally restrict the search to one student
+        
+    Returns:
+        List of result dictionaries with rank and highlighted snippets
+    """
+    tsquery = func.websearch_to_tsquery('english', query)
+    
+    # ts_rank_cd returns real; as double precision the rank round-trips through
+    # the float cursor exactly, so tied ranks compare equal on the next page
+    matches = db.session.query(
+        Session.id.label('id'),
+        func.ts_rank_cd(Session.search_vector, tsquery).cast(Float).label('rank')
+    ).filter(Session.search_vector.op('@@')(tsquery))
+    if student_id is not None:
+        matches = matches.filter(Session.student_id == student_id)
+    matches = matches.subquery()
+    
+    page = db.session.query(matches.c.id, matches.c.rank)
+    if after_rank is not None and after_id is not None:
+        page = page.filter(or_(
+            matches.c.rank < after_rank,
+            and_(matches.c.rank == after_rank, matches.c.id < after_id)
+        ))
+    page = page.order_by(matches.c.rank.desc(), matches.c.id.desc()).limit(limit).subquery()
+    
+    rows = db.session.query(
+        page.c.id,
+        page.c.rank,
+        Session.student_id,
+        Session.start_datetime,
+        Student.first_name,
+        Student.last_name,
+        func.ts_headline('english', func.coalesce(Session.summary, ''), tsquery,
+                         SEARCH_HEADLINE_OPTIONS).label('summary_snippet'),
+        func.ts_headline('english', func.coalesce(Session.transcript, ''), tsquery,
+                         SEARCH_HEADLINE_OPTIONS).label('transcript_snippet')
+    ).join(Session, Session.id == page.c.id)\
+     .outerjoin(Student, Student.id == Session.student_id)\
+     .order_by(page.c.rank.desc(), page.c.id.desc()).all()
+    
+    return [{
+        'session_id': row.id,
+        'rank': row.rank,
+        'student_id': row.student_id,
+        'student_name': f"{row.first_name} {row.last_name}" if row.first_name else None,
+        'start_datetime': row.start_datetime.isoformat() if row.start_datetime else None,
+        'summary_snippet': row.summary_snippet,
+        'transcript_snippet': row.transcript_snippet
+    } for row in rows]
+
+def backfill_search_vectors(after_id: int = 0, batch_size: int = 500) -> Optional[Dict[str, int]]:
+    """
+    Fill in search_vector for the next batch of sessions that don't have one
+    
+    Args:
+        after_id: Only consider sessions after this ID (keyset cursor)
+        batch_size: Maximum number of sessions to update
+        
+    Returns:
+        Dictionary with last_id and updated count, or None when nothing is left
+    """
+    try:
+        ids = [row.id for row in db.session.query(Session.id).filter(
+            Session.id > after_id,
+            Session.search_vector.is_(None)
+        ).order_by(Session.id).limit(batch_size).all()]
+        if not ids:
+            return None
+        
+        result = db.session.execute(
+            text(f"UPDATE sessions SET search_vector = {SEARCH_VECTOR_EXPRESSION.format(prefix='')} "
+                 "WHERE id BETWEEN :first_id AND :last_id AND search_vector IS NULL"),
+            {'first_id': ids[0], 'last_id': ids[-1]}
+        )
+        db.session.commit()
+        return {'last_id': ids[-1], 'updated': result.rowcount}
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error backfilling session search vectors: {e}")
+        raise e
+
+def count_missing_search_vectors(after_id: int = 0) -> int:
+    """
+    Count sessions that still have no search vector
+    
+    Args:
+        after_id: Only count sessions after this ID
+        
+    Returns:
+        Number of sessions without a search vector
+    """
+    return Session.query.filter(Session.id > after_id, Session.search_vector.is_(None)).count()
@@ -6,9 +6,103 @@ Manages student mastery progress on curriculum goals with UPSERT operations
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text
 
-from app.models.mastery_tracking import StudentGoalProgress, CurriculumGoal
+from app.models.mastery_tracking import StudentGoalProgress, CurriculumGoal, GoalKC
+
+
+# Recompute the KC rollup for the given goals of one student: mean mastery over
+# all of a goal's KCs (unpractised KCs count as 0), upserted in one statement
+ROLLUP_UPSERT_SQL = text("""
+    INSERT INTO student_goal_progress (
+        student_id, goal_id, mastery_percentage, mastery_source, total_kcs, kcs_with_progress,
+        kc_average_mastery, goal_code, goal_title, subject, grade_level, last_updated
+    )
+    SELECT :student_id, g.id,
+           LEAST(100.0, COALESCE(SUM(p.mastery_percentage), 0) / COUNT(gk.kc_code)),
+           'kc', COUNT(gk.kc_code), COUNT(p.kc_code), AVG(p.mastery_percentage),
+           g.goal_code, g.title, g.subject, g.grade_level, now()
+    FROM curriculum_goals g
+    JOIN goal_kcs gk ON gk.goal_id = g.id
+    LEFT JOIN student_kc_progress p
+           ON p.student_id = :student_id AND p.goal_id = gk.goal_id AND p.kc_code = gk.kc_code
+    WHERE g.id = ANY(:goal_ids)
+    GROUP BY g.id, g.goal_code, g.title, g.subject, g.grade_level
+    HAVING COUNT(p.kc_code) > 0
+    ON CONFLICT ON CONSTRAINT pk_student_goal_progress DO UPDATE SET
+        mastery_percentage = EXCLUDED.mastery_percentage,
+        mastery_source = EXCLUDED.mastery_source,
+        total_kcs = EXCLUDED.total_kcs,
+        kcs_with_progress = EXCLUDED.kcs_with_progress,
+        kc_average_mastery = EXCLUDED.kc_average_mastery,
+        goal_code = EXCLUDED.goal_code,
+        goal_title = EXCLUDED.goal_title,
+        subject = EXCLUDED.subject,
+        grade_level = EXCLUDED.grade_level,
+        last_updated = EXCLUDED.last_updated
+""")
+
+# Rollup rows whose goal no longer has any KC progress for the student
+ROLLUP_DELETE_ORPHANS_SQL = text("""
+    DELETE FROM student_goal_progress sgp
+    WHERE sgp.student_id = :student_id
+      AND sgp.goal_id = ANY(:goal_ids)
+      AND sgp.mastery_source = 'kc'
+      AND NOT EXISTS (
+          SELECT 1 FROM student_kc_progress p
+          JOIN goal_kcs gk ON gk.goal_id = p.goal_id AND gk.kc_code = p.kc_code
+          WHERE p.student_id = sgp.student_id AND p.goal_id = sgp.goal_id
+      )
+""")
+
+# Full recomputation of every rollup row, compared with what is stored
+ROLLUP_CONSISTENCY_SQL = text("""
+    WITH practised AS (
+        SELECT DISTINCT student_id, goal_id
+        FROM student_kc_progress
+        WHERE CAST(:student_id AS INTEGER) IS NULL OR student_id = :student_id
+    ),
+    expected AS (
+        SELECT pr.student_id, g.id AS goal_id,
+               LEAST(100.0, COALESCE(SUM(p.mastery_percentage), 0) / COUNT(gk.kc_code)) AS mastery_percentage,
+               COUNT(gk.kc_code) AS total_kcs, COUNT(p.kc_code) AS kcs_with_progress,
+               g.goal_code, g.title AS goal_title, g.subject, g.grade_level
+        FROM practised pr
+        JOIN curriculum_goals g ON g.id = pr.goal_id
+        JOIN goal_kcs gk ON gk.goal_id = g.id
+        LEFT JOIN student_kc_progress p
+               ON p.student_id = pr.student_id AND p.goal_id = gk.goal_id AND p.kc_code = gk.kc_code
+        GROUP BY pr.student_id, g.id, g.goal_code, g.title, g.subject, g.grade_level
+        HAVING COUNT(p.kc_code) > 0
+    ),
+    stored AS (
+        SELECT * FROM student_goal_progress
+        WHERE mastery_source = 'kc'
+          AND (CAST(:student_id AS INTEGER) IS NULL OR student_id = :student_id)
+    )
+    SELECT COALESCE(e.student_id, s.student_id) AS student_id,
+           COALESCE(e.goal_id, s.goal_id) AS goal_id,
+           e.mastery_percentage AS expected_mastery, s.mastery_percentage AS stored_mastery,
+           e.kcs_with_progress AS expected_kcs_with_progress, s.kcs_with_progress AS stored_kcs_with_progress,
+           e.total_kcs AS expected_total_kcs, s.total_kcs AS stored_total_kcs,
+           CASE WHEN s.student_id IS NULL THEN 'missing'
+                WHEN e.student_id IS NULL THEN 'orphaned'
+                WHEN abs(s.mastery_percentage - e.mastery_percentage) > :tolerance
+                  OR s.total_kcs <> e.total_kcs
+                  OR s.kcs_with_progress <> e.kcs_with_progress THEN 'mismatch'
+                ELSE 'stale_metadata' END AS problem
+    FROM expected e
+    FULL OUTER JOIN stored s ON s.student_id = e.student_id AND s.goal_id = e.goal_id
+    WHERE s.student_id IS NULL OR e.student_id IS NULL
+       OR abs(s.mastery_percentage - e.mastery_percentage) > :tolerance
+       OR s.total_kcs <> e.total_kcs
+       OR s.kcs_with_progress <> e.kcs_with_progress
+       OR s.goal_code IS DISTINCT FROM e.goal_code
+       OR s.goal_title IS DISTINCT FROM e.goal_title
+       OR s.subject IS DISTINCT FROM e.subject
+       OR s.grade_level IS DISTINCT FROM e.grade_level
+    ORDER BY 1, 2
+""")
 
 
 class StudentGoalProgressRepository:
@@ -113,7 +207,8 @@ class StudentGoalProgressRepository:
             print(f"Error getting incomplete goals for student {student_id}: {e}")
             return []
     
-    def upsert(self, student_id: int, goal_id: int, mastery_percentage: float) -> StudentGoalProgress:
+    def upsert(self, student_id: int, goal_id: int, mastery_percentage: float,
+               commit: bool = True) -> StudentGoalProgress:
         """
         Insert or update goal progress for a student (UPSERT operation)
         
@@ -121,6 +216,7 @@ class StudentGoalProgressRepository:
             student_id: The student ID
             goal_id: The goal ID
             mastery_percentage: The mastery percentage (0.0 to 100.0)
+            commit: Commit the transaction (False to only flush when the caller commits)
             
         Returns:
             The created/updated StudentGoalProgress object
@@ -130,15 +226,19 @@ class StudentGoalProgressRepository:
             if not (0.0 <= mastery_percentage <= 100.0):
                 raise ValueError(f"Mastery percentage must be between 0.0 and 100.0, got {mastery_percentage}")
             
+            goal = self.session.query(CurriculumGoal).filter_by(id=goal_id).first()
+            
             # Check for existing progress
             existing = self.get(student_id, goal_id)
             
             if existing:
                 # Update existing progress
                 existing.mastery_percentage = mastery_percentage
+                existing.mastery_source = 'direct'
+                self._copy_goal_metadata(existing, goal)
                 existing.last_updated = datetime.utcnow()
                 
-                self.session.commit()
+                self._finish_write(commit)
                 
                 print(f"✅ Updated goal progress for student {student_id}, goal {goal_id}: {mastery_percentage}%")
                 return existing
@@ -147,11 +247,13 @@ class StudentGoalProgressRepository:
                 new_progress = StudentGoalProgress(
                     student_id=student_id,
                     goal_id=goal_id,
-                    mastery_percentage=mastery_percentage
+                    mastery_percentage=mastery_percentage,
+                    mastery_source='direct'
                 )
+                self._copy_goal_metadata(new_progress, goal)
                 
                 self.session.add(new_progress)
-                self.session.commit()
+                self._finish_write(commit)
                 
                 print(f"✅ Created goal progress for student {student_id}, goal {goal_id}: {mastery_percentage}%")
                 return new_progress
@@ -161,6 +263,13 @@ class StudentGoalProgressRepository:
             print(f"Error upserting goal progress for student {student_id}, goal {goal_id}: {e}")
             raise e
     
+    def _finish_write(self, commit: bool) -> None:
+        """Commit, or flush only when the caller owns the transaction"""
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
+    
     def upsert_multiple(self, student_id: int, goal_progress_updates: Dict[int, float]) -> List[StudentGoalProgress]:
         """
         Batch upsert multiple goal progress records
@@ -186,20 +295,37 @@ class StudentGoalProgressRepository:
             print(f"Error batch upserting goal progress for student {student_id}: {e}")
             raise e
     
-    def update_from_ai_delta(self, student_id: int, goal_patches: List[Dict[str, Any]]) -> List[StudentGoalProgress]:
+    def update_from_ai_delta(self, student_id: int, goal_patches: List[Dict[str, Any]],
+                             session_id: Optional[int] = None) -> List[StudentGoalProgress]:
         """
         Update goal progress based on AI-generated delta changes
         
+        Only goals without knowledge components are written directly; mastery of
+        goals with KCs is the rollup of their KC rows (see refresh_rollup), so
+        patches for those goals are skipped.
+        
         Args:
             student_id: The student ID
             goal_patches: List of goal progress updates from AI
                          Example: [{"goal_code": "4.NBT.A.1", "mastery_percentage": 75.0}]
+            session_id: Session the delta came from (recorded on the mastery events)
             
         Returns:
             List of updated StudentGoalProgress objects
         """
+        from app.repositories import mastery_event_repository
+        
         try:
             results = []
+            events = []
+            
+            goal_codes = [patch.get('goal_code') for patch in goal_patches if patch.get('goal_code')]
+            goals = {goal.goal_code: goal for goal in
+                     self.session.query(CurriculumGoal).filter(CurriculumGoal.goal_code.in_(goal_codes)).all()}
+            goals_with_kcs = {goal_id for (goal_id,) in
+                              self.session.query(GoalKC.goal_id)
+                                          .filter(GoalKC.goal_id.in_([goal.id for goal in goals.values()]))
+                                          .distinct().all()}
             
             for patch in goal_patches:
                 goal_code = patch.get('goal_code')
@@ -210,26 +336,118 @@ class StudentGoalProgressRepository:
                     continue
                 
                 # Find goal by code
-                goal = self.session.query(CurriculumGoal).filter_by(goal_code=goal_code).first()
+                goal = goals.get(goal_code)
                 if not goal:
                     print(f"⚠️ Goal not found: {goal_code}")
                     continue
                 
-                # Upsert progress
-                result = self.upsert(student_id, goal.id, mastery_percentage)
+                if goal.id in goals_with_kcs:
+                    print(f"ℹ️ Goal {goal_code} mastery is derived from its KCs; skipping direct patch")
+                    continue
+                
+                # Upsert progress; goal rows and their events are committed together below
+                existing = self.get(student_id, goal.id)
+                previous = existing.mastery_percentage if existing else None
+                result = self.upsert(student_id, goal.id, mastery_percentage, commit=False)
                 results.append(result)
+                events.append({
+                    'student_id': student_id,
+                    'goal_id': goal.id,
+                    'kc_code': None,
+                    'session_id': session_id,
+                    'mastery_percentage': mastery_percentage,
+                    'previous_percentage': previous
+                })
+            
+            mastery_event_repository.record_events(events)
+            self.session.commit()
             
             print(f"✅ Updated {len(results)} goal progress records from AI delta for student {student_id}")
             return results
             
         except Exception as e:
+            self.session.rollback()
             print(f"Error updating goal progress from AI delta for student {student_id}: {e}")
             raise e
     
+    def refresh_rollup(self, student_id: int, goal_ids: List[int], commit: bool = True) -> int:
+        """
+        Recompute goal mastery from KC rows for the touched goals only
+        
+        Called by the KC repository after its writes, in the same transaction.
+        
+        Args:
+            student_id: The student ID
+            goal_ids: Goals whose KC rows changed
+            commit: Commit the transaction (False when the caller commits)
+            
+        Returns:
+            Number of goal rows upserted
+        """
+        goal_ids = sorted({int(goal_id) for goal_id in goal_ids})
+        if not goal_ids:
+            return 0
+        
+        try:
+            params = {'student_id': student_id, 'goal_ids': goal_ids}
+            upserted = self.session.execute(ROLLUP_UPSERT_SQL, params).rowcount
+            self.session.execute(ROLLUP_DELETE_ORPHANS_SQL, params)
+            if commit:
+                self.session.commit()
+            return upserted
+            
+        except Exception as e:
+            self.session.rollback()
+            print(f"Error refreshing goal rollup for student {student_id}, goals {goal_ids}: {e}")
+            raise e
+    
+    def check_rollup_consistency(self, student_id: Optional[int] = None, tolerance: float = 0.01,
+                                 fix: bool = False) -> Dict[str, Any]:
+        """
+        Verify stored goal rollups against a full recomputation from KC rows
+        
+        Args:
+            student_id: Limit the check to one student (None checks everyone)
+            tolerance: Allowed mastery difference in percentage points
+            fix: Recompute the rollup for every inconsistent goal
+            
+        Returns:
+            Dictionary with problem counts, up to 100 sample rows and the number fixed
+        """
+        rows = self.session.execute(ROLLUP_CONSISTENCY_SQL, {
+            'student_id': student_id,
+            'tolerance': tolerance
+        }).mappings().all()
+        
+        problems = {}
+        goals_by_student = {}
+        for row in rows:
+            problems[row['problem']] = problems.get(row['problem'], 0) + 1
+            goals_by_student.setdefault(row['student_id'], []).append(row['goal_id'])
+        
+        fixed = 0
+        if fix:
+            for problem_student_id, goal_ids in goals_by_student.items():
+                self.refresh_rollup(problem_student_id, goal_ids, commit=False)
+                fixed += len(goal_ids)
+            self.session.commit()
+        
+        return {
+            'consistent': not rows,
+            'inconsistent_rows': len(rows),
+            'problems': problems,
+            'samples': [dict(row) for row in rows[:100]],
+            'fixed': fixed,
+            'checked_at': datetime.utcnow().isoformat()
+        }
+    
     def get_mastery_map(self, student_id: int) -> Dict[str, Any]:
         """
         Get a comprehensive mastery map for a student
         
+        Reads student_goal_progress only: goal details are stored on the
+        progress rows alongside the rollup.
+        
         Args:
             student_id: The student ID
             
@@ -237,11 +455,10 @@ class StudentGoalProgressRepository:
             Dictionary with mastery map data
         """
         try:
-            # Get all progress with goal details
-            results = self.session.query(StudentGoalProgress, CurriculumGoal)\
-                                 .join(CurriculumGoal, StudentGoalProgress.goal_id == CurriculumGoal.id)\
+            results = self.session.query(StudentGoalProgress)\
                                  .filter(StudentGoalProgress.student_id == student_id)\
-                                 .order_by(CurriculumGoal.subject, CurriculumGoal.grade_level, CurriculumGoal.goal_code)\
+                                 .order_by(StudentGoalProgress.subject, StudentGoalProgress.grade_level,
+                                           StudentGoalProgress.goal_code)\
                                  .all()
             
             # Group by subject and grade
@@ -249,9 +466,9 @@ class StudentGoalProgressRepository:
             total_goals = 0
             total_mastery = 0.0
             
-            for progress, goal in results:
-                subject = goal.subject
-                grade = goal.grade_level
+            for progress in results:
+                subject = progress.subject
+                grade = progress.grade_level
                 
                 if subject not in mastery_by_subject:
                     mastery_by_subject[subject] = {}
@@ -259,11 +476,13 @@ class StudentGoalProgressRepository:
                     mastery_by_subject[subject][grade] = []
                 
                 goal_data = {
-                    'goal_id': goal.id,
-                    'goal_code': goal.goal_code,
-                    'title': goal.title,
-                    'description': goal.description,
+                    'goal_id': progress.goal_id,
+                    'goal_code': progress.goal_code,
+                    'title': progress.goal_title,
                     'mastery_percentage': progress.mastery_percentage,
+                    'mastery_source': progress.mastery_source,
+                    'total_kcs': progress.total_kcs,
+                    'kcs_with_progress': progress.kcs_with_progress,
                     'last_updated': progress.last_updated.isoformat() if progress.last_updated else None
                 }
                 
@@ -293,6 +512,14 @@ class StudentGoalProgressRepository:
                 'error': str(e)
             }
     
+    def _copy_goal_metadata(self, progress: StudentGoalProgress, goal: Optional[CurriculumGoal]) -> None:
+        """Copy goal code, title, subject and grade onto a progress row"""
+        if goal:
+            progress.goal_code = goal.goal_code
+            progress.goal_title = goal.title
+            progress.subject = goal.subject
+            progress.grade_level = goal.grade_level
+    
     def delete_all_for_student(self, student_id: int) -> int:
         """
         Delete all goal progress for a student (GDPR compliance)
@@ -327,25 +554,16 @@ class StudentGoalProgressRepository:
         try:
             from sqlalchemy import distinct
             
-            # Total progress records
-            total_records = self.session.query(func.count(StudentGoalProgress.student_id)).scalar()
-            
-            # Unique students with progress
-            students_with_progress = self.session.query(func.count(distinct(StudentGoalProgress.student_id))).scalar()
-            
-            # Average mastery percentage
-            avg_mastery = self.session.query(func.avg(StudentGoalProgress.mastery_percentage)).scalar()
-            
-            # Mastery distribution
-            high_mastery = self.session.query(func.count(StudentGoalProgress.student_id))\
-                                      .filter(StudentGoalProgress.mastery_percentage >= 80.0).scalar()
-            
-            medium_mastery = self.session.query(func.count(StudentGoalProgress.student_id))\
-                                        .filter(StudentGoalProgress.mastery_percentage >= 50.0,
-                                               StudentGoalProgress.mastery_percentage < 80.0).scalar()
-            
-            low_mastery = self.session.query(func.count(StudentGoalProgress.student_id))\
-                                     .filter(StudentGoalProgress.mastery_percentage < 50.0).scalar()
+            # Totals, averages and the mastery distribution in one aggregate query
+            row = self.session.query(
+                func.count(StudentGoalProgress.student_id),
+                func.count(distinct(StudentGoalProgress.student_id)),
+                func.avg(StudentGoalProgress.mastery_percentage),
+                func.count().filter(StudentGoalProgress.mastery_percentage >= 80.0),
+                func.count().filter(StudentGoalProgress.mastery_percentage >= 50.0, StudentGoalProgress.mastery_percentage < 80.0),
+                func.count().filter(StudentGoalProgress.mastery_percentage < 50.0)
+            ).one()
+            total_records, students_with_progress, avg_mastery, high_mastery, medium_mastery, low_mastery = row
             
             return {
                 'total_progress_records': total_records,
@@ -1,6 +1,7 @@
 """
 Student Knowledge Component Progress repository for database operations
-Manages student mastery progress on individual knowledge components with UPSERT operations
+Manages student mastery progress on individual knowledge components with UPSERT operations.
+Every write also recomputes the goal rollup of the touched goals in the same transaction.
 """
 
 from typing import Dict, List, Optional, Any, Tuple
@@ -8,7 +9,10 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.models.mastery_tracking import StudentKCProgress, CurriculumGoal, GoalKC
+from app.ai.bkt import observation_counts
+from app.models.mastery_tracking import StudentKCProgress, StudentGoalProgress, CurriculumGoal, GoalKC
+from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+from app.repositories import mastery_event_repository
 
 
 class StudentKCProgressRepository:
@@ -133,43 +137,10 @@ class StudentKCProgressRepository:
             The created/updated StudentKCProgress object
         """
         try:
-            # Validate mastery percentage
-            if not (0.0 <= mastery_percentage <= 100.0):
-                raise ValueError(f"Mastery percentage must be between 0.0 and 100.0, got {mastery_percentage}")
-            
-            # Verify that the KC exists for this goal
-            goal_kc = self.session.query(GoalKC)\
-                                 .filter_by(goal_id=goal_id, kc_code=kc_code)\
-                                 .first()
-            if not goal_kc:
-                raise ValueError(f"Knowledge component {kc_code} does not exist for goal {goal_id}")
-            
-            # Check for existing progress
-            existing = self.get(student_id, goal_id, kc_code)
-            
-            if existing:
-                # Update existing progress
-                existing.mastery_percentage = mastery_percentage
-                existing.last_updated = datetime.utcnow()
-                
-                self.session.commit()
-                
-                print(f"✅ Updated KC progress for student {student_id}, goal {goal_id}, KC {kc_code}: {mastery_percentage}%")
-                return existing
-            else:
-                # Create new progress record
-                new_progress = StudentKCProgress(
-                    student_id=student_id,
-                    goal_id=goal_id,
-                    kc_code=kc_code,
-                    mastery_percentage=mastery_percentage
-                )
-                
-                self.session.add(new_progress)
-                self.session.commit()
-                
-                print(f"✅ Created KC progress for student {student_id}, goal {goal_id}, KC {kc_code}: {mastery_percentage}%")
-                return new_progress
+            progress, _ = self._set(student_id, goal_id, kc_code, mastery_percentage)
+            StudentGoalProgressRepository(self.session).refresh_rollup(student_id, [goal_id], commit=False)
+            self.session.commit()
+            return progress
                 
         except Exception as e:
             self.session.rollback()
@@ -192,30 +163,46 @@ class StudentKCProgressRepository:
             results = []
             
             for kc_code, mastery_percentage in kc_progress_updates.items():
-                result = self.upsert(student_id, goal_id, kc_code, mastery_percentage)
+                result, _ = self._set(student_id, goal_id, kc_code, mastery_percentage)
                 results.append(result)
             
+            StudentGoalProgressRepository(self.session).refresh_rollup(student_id, [goal_id], commit=False)
+            self.session.commit()
+            
             print(f"✅ Batch updated {len(kc_progress_updates)} KC progress records for student {student_id}, goal {goal_id}")
             return results
             
         except Exception as e:
+            self.session.rollback()
             print(f"Error batch upserting KC progress for student {student_id}, goal {goal_id}: {e}")
             raise e
     
-    def update_from_ai_delta(self, student_id: int, kc_patches: List[Dict[str, Any]]) -> List[StudentKCProgress]:
+    def update_from_ai_delta(self, student_id: int, kc_patches: List[Dict[str, Any]],
+                             session_id: Optional[int] = None) -> List[StudentKCProgress]:
         """
         Update KC progress based on AI-generated delta changes
         
+        All KC rows are written, the touched goals re-rolled up and the mastery
+        events appended in one transaction.
+        
         Args:
             student_id: The student ID
             kc_patches: List of KC progress updates from AI
-                       Example: [{"goal_code": "4.NBT.A.1", "kc_code": "place-value", "mastery_percentage": 85.0}]
+                       Example: [{"goal_code": "4.NBT.A.1", "kc_code": "place-value", "mastery_percentage": 85.0,
+                                  "correct": 3, "incorrect": 1}]
+            session_id: Session the delta came from (recorded on the mastery events with the answer counts)
             
         Returns:
             List of updated StudentKCProgress objects
         """
         try:
             results = []
+            events = []
+            touched_goal_ids = set()
+            
+            goal_codes = [patch.get('goal_code') for patch in kc_patches if patch.get('goal_code')]
+            goals = {goal.goal_code: goal for goal in
+                     self.session.query(CurriculumGoal).filter(CurriculumGoal.goal_code.in_(goal_codes)).all()}
             
             for patch in kc_patches:
                 goal_code = patch.get('goal_code')
@@ -227,22 +214,84 @@ class StudentKCProgressRepository:
                     continue
                 
                 # Find goal by code
-                goal = self.session.query(CurriculumGoal).filter_by(goal_code=goal_code).first()
+                goal = goals.get(goal_code)
                 if not goal:
                     print(f"⚠️ Goal not found: {goal_code}")
                     continue
                 
                 # Upsert KC progress
-                result = self.upsert(student_id, goal.id, kc_code, mastery_percentage)
+                result, previous = self._set(student_id, goal.id, kc_code, mastery_percentage)
                 results.append(result)
+                touched_goal_ids.add(goal.id)
+                correct, incorrect = observation_counts(patch) or (None, None)
+                events.append({
+                    'student_id': student_id,
+                    'goal_id': goal.id,
+                    'kc_code': kc_code,
+                    'session_id': session_id,
+                    'mastery_percentage': mastery_percentage,
+                    'previous_percentage': previous,
+                    'correct_count': correct,
+                    'incorrect_count': incorrect
+                })
+            
+            StudentGoalProgressRepository(self.session).refresh_rollup(student_id, touched_goal_ids, commit=False)
+            mastery_event_repository.record_events(events)
+            self.session.commit()
             
             print(f"✅ Updated {len(results)} KC progress records from AI delta for student {student_id}")
             return results
             
         except Exception as e:
+            self.session.rollback()
             print(f"Error updating KC progress from AI delta for student {student_id}: {e}")
             raise e
     
+    def _set(self, student_id: int, goal_id: int, kc_code: str,
+             mastery_percentage: float) -> Tuple[StudentKCProgress, Optional[float]]:
+        """
+        Write one KC progress row without committing (callers refresh the goal rollup and commit)
+        
+        Returns:
+            The progress row and its previous mastery (None if it was just created)
+        """
+        # Validate mastery percentage
+        if not (0.0 <= mastery_percentage <= 100.0):
+            raise ValueError(f"Mastery percentage must be between 0.0 and 100.0, got {mastery_percentage}")
+        
+        # Verify that the KC exists for this goal
+        goal_kc = self.session.query(GoalKC)\
+                             .filter_by(goal_id=goal_id, kc_code=kc_code)\
+                             .first()
+        if not goal_kc:
+            raise ValueError(f"Knowledge component {kc_code} does not exist for goal {goal_id}")
+        
+        # Check for existing progress
+        existing = self.get(student_id, goal_id, kc_code)
+        
+        if existing:
+            # Update existing progress
+            previous = existing.mastery_percentage
+            existing.mastery_percentage = mastery_percentage
+            existing.last_updated = datetime.utcnow()
+            self.session.flush()
+            
+            print(f"✅ Updated KC progress for student {student_id}, goal {goal_id}, KC {kc_code}: {mastery_percentage}%")
+            return existing, previous
+        
+        # Create new progress record
+        new_progress = StudentKCProgress(
+            student_id=student_id,
+            goal_id=goal_id,
+            kc_code=kc_code,
+            mastery_percentage=mastery_percentage
+        )
+        self.session.add(new_progress)
+        self.session.flush()
+        
+        print(f"✅ Created KC progress for student {student_id}, goal {goal_id}, KC {kc_code}: {mastery_percentage}%")
+        return new_progress, None
+    
     def get_kc_mastery_map(self, student_id: int) -> Dict[str, Any]:
         """
         Get a comprehensive knowledge component mastery map for a student
@@ -325,6 +374,9 @@ class StudentKCProgressRepository:
         """
         Get KC mastery summary for a specific goal
         
+        Goal-level figures come from the student's goal rollup row; the KC
+        list is the goal's KCs with the student's progress on each.
+        
         Args:
             student_id: The student ID
             goal_id: The goal ID
@@ -333,55 +385,54 @@ class StudentKCProgressRepository:
             Dictionary with goal KC summary
         """
         try:
-            # Get goal details
-            goal = self.session.query(CurriculumGoal).filter_by(id=goal_id).first()
-            if not goal:
-                return {'error': f'Goal {goal_id} not found'}
-            
-            # Get all KCs for this goal
-            goal_kcs = self.session.query(GoalKC).filter_by(goal_id=goal_id).all()
-            
-            # Get student progress for these KCs
-            kc_progress = self.get_for_goal(student_id, goal_id)
-            progress_dict = {p.kc_code: p for p in kc_progress}
-            
-            # Build KC summary
-            kcs_summary = []
-            total_mastery = 0.0
-            kcs_with_progress = 0
+            rollup = self.session.query(StudentGoalProgress)\
+                                 .filter_by(student_id=student_id, goal_id=goal_id, mastery_source='kc')\
+                                 .first()
+            if rollup:
+                goal_code, goal_title = rollup.goal_code, rollup.goal_title
+            else:
+                goal = self.session.query(CurriculumGoal).filter_by(id=goal_id).first()
+                if not goal:
+                    return {'error': f'Goal {goal_id} not found'}
+                goal_code, goal_title = goal.goal_code, goal.title
+            
+            # The goal's KCs with the student's progress on each
+            results = self.session.query(GoalKC, StudentKCProgress)\
+                                 .outerjoin(StudentKCProgress,
+                                            (StudentKCProgress.goal_id == GoalKC.goal_id) &
+                                            (StudentKCProgress.kc_code == GoalKC.kc_code) &
+                                            (StudentKCProgress.student_id == student_id))\
+                                 .filter(GoalKC.goal_id == goal_id)\
+                                 .order_by(GoalKC.kc_code)\
+                                 .all()
             
-            for goal_kc in goal_kcs:
-                kc_code = goal_kc.kc_code
-                progress = progress_dict.get(kc_code)
-                
-                kc_data = {
-                    'kc_code': kc_code,
+            kcs_summary = [
+                {
+                    'kc_code': goal_kc.kc_code,
                     'kc_name': goal_kc.kc_name,
                     'kc_description': goal_kc.description,
                     'mastery_percentage': progress.mastery_percentage if progress else 0.0,
                     'has_progress': progress is not None,
                     'last_updated': progress.last_updated.isoformat() if progress and progress.last_updated else None
                 }
-                
-                kcs_summary.append(kc_data)
-                
-                if progress:
-                    total_mastery += progress.mastery_percentage
-                    kcs_with_progress += 1
+                for goal_kc, progress in results
+            ]
             
-            # Calculate averages
-            avg_mastery = total_mastery / kcs_with_progress if kcs_with_progress > 0 else 0.0
-            progress_coverage = (kcs_with_progress / len(goal_kcs)) * 100 if goal_kcs else 0.0
+            total_kcs = rollup.total_kcs if rollup else len(kcs_summary)
+            kcs_with_progress = rollup.kcs_with_progress if rollup else 0
+            avg_mastery = (rollup.kc_average_mastery or 0.0) if rollup else 0.0
+            progress_coverage = (kcs_with_progress / total_kcs) * 100 if total_kcs else 0.0
             
             return {
                 'student_id': student_id,
                 'goal_id': goal_id,
-                'goal_code': goal.goal_code,
-                'goal_title': goal.title,
-                'total_kcs': len(goal_kcs),
+                'goal_code': goal_code,
+                'goal_title': goal_title,
+                'total_kcs': total_kcs,
                 'kcs_with_progress': kcs_with_progress,
                 'progress_coverage_percentage': round(progress_coverage, 2),
                 'average_mastery_percentage': round(avg_mastery, 2),
+                'goal_mastery_percentage': round(rollup.mastery_percentage, 2) if rollup else 0.0,
                 'knowledge_components': kcs_summary
             }
             
@@ -403,6 +454,10 @@ class StudentKCProgressRepository:
             deleted_count = self.session.query(StudentKCProgress)\
                                        .filter_by(student_id=student_id)\
                                        .delete()
+            # Goal rollups derived from the deleted rows go with them
+            self.session.query(StudentGoalProgress)\
+                        .filter_by(student_id=student_id, mastery_source='kc')\
+                        .delete()
             self.session.commit()
             
             print(f"✅ Deleted {deleted_count} KC progress records for student {student_id}")
@@ -423,28 +478,17 @@ class StudentKCProgressRepository:
         try:
             from sqlalchemy import distinct
             
-            # Total KC progress records
-            total_records = self.session.query(func.count(StudentKCProgress.student_id)).scalar()
-            
-            # Unique students with KC progress
-            students_with_progress = self.session.query(func.count(distinct(StudentKCProgress.student_id))).scalar()
-            
-            # Average KC mastery percentage
-            avg_mastery = self.session.query(func.avg(StudentKCProgress.mastery_percentage)).scalar()
-            
-            # KC mastery distribution
-            high_mastery = self.session.query(func.count(StudentKCProgress.student_id))\
-                                      .filter(StudentKCProgress.mastery_percentage >= 80.0).scalar()
-            
-            medium_mastery = self.session.query(func.count(StudentKCProgress.student_id))\
-                                        .filter(StudentKCProgress.mastery_percentage >= 50.0,
-                                               StudentKCProgress.mastery_percentage < 80.0).scalar()
-            
-            low_mastery = self.session.query(func.count(StudentKCProgress.student_id))\
-                                     .filter(StudentKCProgress.mastery_percentage < 50.0).scalar()
-            
-            # Unique KCs being tracked
-            unique_kcs = self.session.query(func.count(distinct(StudentKCProgress.kc_code))).scalar()
+            # Totals, averages and the mastery distribution in one aggregate query
+            row = self.session.query(
+                func.count(StudentKCProgress.student_id),
+                func.count(distinct(StudentKCProgress.student_id)),
+                func.count(distinct(StudentKCProgress.kc_code)),
+                func.avg(StudentKCProgress.mastery_percentage),
+                func.count().filter(StudentKCProgress.mastery_percentage >= 80.0),
+                func.count().filter(StudentKCProgress.mastery_percentage >= 50.0, StudentKCProgress.mastery_percentage < 80.0),
+                func.count().filter(StudentKCProgress.mastery_percentage < 50.0)
+            ).one()
+            total_records, students_with_progress, unique_kcs, avg_mastery, high_mastery, medium_mastery, low_mastery = row
             
             return {
                 'total_kc_progress_records': total_records,
@@ -2,10 +2,17 @@
 Student repository for database operations
 """
 
+import re
+from datetime import date
 from typing import Dict, List, Optional, Any
+from sqlalchemy import func, literal, literal_column, or_
+from sqlalchemy.orm import joinedload
 
 from app import db
 from app.models.student import Student
+from app.repositories.trigram import (
+    LIKE_ESCAPE, MIN_FUZZY_LENGTH, contains_pattern, prefix_pattern, set_word_similarity_threshold
+)
 
 def get_all() -> List[Dict[str, Any]]:
     """
@@ -48,6 +55,89 @@ def get_by_phone(phone: str) -> Optional[Dict[str, Any]]:
     student = Student.query.filter_by(phone_number=phone).first()
     return student.to_dict() if student else None
 
+def _years_before(today: date, years: int) -> date:
+    """The same calendar day `years` years before today (Feb 29 becomes Feb 28)"""
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
+
+def get_roster(grade_level: Optional[int] = None, school_id: Optional[int] = None,
+               min_age: Optional[int] = None, max_age: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get students filtered by grade, school and age, ordered by name
+    
+    Filters run on the indexed grade_level, school_id and date_of_birth
+    columns; ages are turned into a date of birth range.
+    
+    Args:
+        grade_level: Only students in this grade
+        school_id: Only students at this school
+        min_age: Only students at least this old
+        max_age: Only students at most this old
+        
+    Returns:
+        List of student dictionaries
+    """
+    query = Student.query.options(joinedload(Student.school))
+    if grade_level is not None:
+        query = query.filter(Student.grade_level == grade_level)
+    if school_id is not None:
+        query = query.filter(Student.school_id == school_id)
+    
+    today = date.today()
+    if min_age is not None:
+        query = query.filter(Student.date_of_birth <= _years_before(today, min_age))
+    if max_age is not None:
+        query = query.filter(Student.date_of_birth > _years_before(today, max_age + 1))
+    
+    students = query.order_by(Student.last_name, Student.first_name, Student.id).all()
+    return [student.to_dict() for student in students]
+
+def search(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Fuzzy search students by full name or phone number, best matches first
+    
+    Names starting with the query come first, then trigram word-similarity
+    matches (which tolerate misspellings); queries that look like a phone
+    number also match on its digits. The limit is applied in SQL.
+    
+    Args:
+        query: Name or phone number fragment
+        limit: Maximum number of students
+        
+    Returns:
+        List of dictionaries with id, full_name, phone_number and grade_level
+    """
+    term = query.strip()
+    if not term:
+        return []
+    
+    # Same expression as the trigram and prefix indexes; parenthesised so <% binds to all of it
+    full_name = literal_column("(students.first_name || ' ' || students.last_name)")
+    is_prefix = func.lower(full_name).like(prefix_pattern(term), escape=LIKE_ESCAPE)
+    conditions = [is_prefix]
+    
+    digits = re.sub(r'\D', '', term)
+    if len(digits) >= MIN_FUZZY_LENGTH and len(digits) * 2 >= len(term):
+        conditions.append(Student.phone_number.like(contains_pattern(digits), escape=LIKE_ESCAPE))
+    
+    students = Student.query
+    if len(term) < MIN_FUZZY_LENGTH:
+        students = students.filter(or_(*conditions)).order_by(full_name, Student.id)
+    else:
+        set_word_similarity_threshold(db.session)
+        conditions.append(literal(term).op('<%')(full_name))
+        students = students.filter(or_(*conditions))\
+                           .order_by(is_prefix.desc(), func.word_similarity(term, full_name).desc(), Student.id)
+    
+    return [{
+        'id': student.id,
+        'full_name': student.full_name,
+        'phone_number': student.phone_number,
+        'grade_level': student.grade_level
+    } for student in students.limit(limit).all()]
+
 def assign_default_curriculum_to_student(student_id: int) -> int:
     """
     Assign the default curriculum to a student by creating StudentSubject records.
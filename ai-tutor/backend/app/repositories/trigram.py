@@ -0,0 +1,70 @@
+"""
+Shared pg_trgm helpers for fuzzy search
+Index DDL and query helpers used by the goal, knowledge component and
+student searches. Matching uses word similarity (`term <% column`), which
+tolerates misspellings and partial words and is served by the GIN trigram
+indexes; exact prefixes are ranked first and served by the btree
+text_pattern_ops indexes, which also cover terms too short for trigrams.
+
+The indexes need the pg_trgm extension, so they are created by
+migrate_trigram_search.py rather than declared on the models (db.create_all
+would fail on databases without the extension).
+"""
+
+from typing import Any
+
+from sqlalchemy import text
+
+# Student names are searched as "first last", matching Student.full_name
+STUDENT_FULL_NAME_SQL = "(first_name || ' ' || last_name)"
+
+TRIGRAM_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_curriculum_goals_title_trgm "
+    "ON curriculum_goals USING GIN (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_curriculum_goals_goal_code_trgm "
+    "ON curriculum_goals USING GIN (goal_code gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_curriculum_goals_title_prefix "
+    "ON curriculum_goals (lower(title) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_curriculum_goals_goal_code_prefix "
+    "ON curriculum_goals (lower(goal_code) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_goal_kcs_kc_name_trgm "
+    "ON goal_kcs USING GIN (kc_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_goal_kcs_kc_name_prefix "
+    "ON goal_kcs (lower(kc_name) text_pattern_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_students_full_name_trgm "
+    f"ON students USING GIN ({STUDENT_FULL_NAME_SQL} gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_students_full_name_prefix "
+    f"ON students (lower{STUDENT_FULL_NAME_SQL} text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_students_phone_number_trgm "
+    "ON students USING GIN (phone_number gin_trgm_ops)",
+]
+
+# pg_trgm's default word similarity threshold (0.6) misses common misspellings
+WORD_SIMILARITY_THRESHOLD = 0.3
+
+# Trigram matching needs at least this many characters; shorter terms are prefix-only
+MIN_FUZZY_LENGTH = 3
+
+# Escape character for the LIKE patterns below (pass as escape=LIKE_ESCAPE)
+LIKE_ESCAPE = '/'
+
+
+def _escape_like(term: str) -> str:
+    return term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def prefix_pattern(term: str) -> str:
+    """Lower-cased LIKE pattern matching values that start with term"""
+    return f"{_escape_like(term.lower())}%"
+
+
+def contains_pattern(term: str) -> str:
+    """LIKE pattern matching values that contain term"""
+    return f"%{_escape_like(term)}%"
+
+
+def set_word_similarity_threshold(session: Any, threshold: float = WORD_SIMILARITY_THRESHOLD) -> None:
+    """Set the `<%` match threshold for the rest of the current transaction"""
+    session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                    {'threshold': str(threshold)})
@@ -4,11 +4,116 @@ Service for analytics functionality.
 
 from datetime import datetime, timedelta
 import json
+import logging
+import os
+import threading
+import time
 from typing import Dict, List, Any, Optional
 
+from flask import current_app
+
+from app import db
 from app.repositories.analytics_repository import AnalyticsRepository
 from app.tasks.analytics_tasks import aggregate_daily_stats
 
+logger = logging.getLogger(__name__)
+
+# Dashboard time ranges and how many days back each covers
+TIME_RANGE_DAYS = {'week': 7, 'month': 30, 'quarter': 90, 'year': 365}
+
+
+class DashboardCache:
+    """
+    Dashboard payloads per time range, in Redis when reachable (shared by all
+    workers) and otherwise in process memory.
+    
+    Entries never expire on their own; they are stale after ttl_seconds or
+    once the day they were computed on has passed, and are replaced by
+    refresh_dashboard_data.
+    """
+    
+    KEY_PREFIX = 'analytics:dashboard'
+    
+    def __init__(self, ttl_seconds: Optional[int] = None, refresh_lock_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('ANALYTICS_CACHE_TTL', '3600'))
+        self.refresh_lock_seconds = refresh_lock_seconds
+        self._client = None
+        self._connected = False
+        self._entries = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Redis client, or None to use process memory (connection is attempted once)"""
+        if not self._connected:
+            self._connected = True
+            try:
+                import redis
+                client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+                                              decode_responses=True, socket_timeout=2)
+                client.ping()
+                self._client = client
+            except Exception as e:
+                logger.warning(f"Redis not available for the dashboard cache ({e}); caching per process")
+        return self._client
+    
+    def get(self, time_range: str) -> Optional[Dict[str, Any]]:
+        """Cached entry ({'data', 'cached_at', 'day'}) for a range, or None"""
+        if self.client is not None:
+            try:
+                raw = self.client.get(f"{self.KEY_PREFIX}:{time_range}")
+                return json.loads(raw) if raw else None
+            except Exception as e:
+                logger.warning(f"Dashboard cache read failed: {e}")
+                return None
+        with self._lock:
+            return self._entries.get(time_range)
+    
+    def set(self, time_range: str, data: Dict[str, Any]) -> None:
+        entry = {'data': data, 'cached_at': time.time(), 'day': datetime.utcnow().strftime('%Y-%m-%d')}
+        if self.client is not None:
+            try:
+                self.client.set(f"{self.KEY_PREFIX}:{time_range}", json.dumps(entry))
+            except Exception as e:
+                logger.warning(f"Dashboard cache write failed: {e}")
+            return
+        with self._lock:
+            self._entries[time_range] = entry
+    
+    def is_stale(self, entry: Dict[str, Any]) -> bool:
+        return (time.time() - entry['cached_at'] > self.ttl_seconds
+                or entry['day'] != datetime.utcnow().strftime('%Y-%m-%d'))
+    
+    def acquire_refresh(self, time_range: str) -> bool:
+        """Claim the refresh of a range; False if another refresh is already running"""
+        if self.client is not None:
+            try:
+                return bool(self.client.set(f"{self.KEY_PREFIX}:{time_range}:refreshing", '1',
+                                            nx=True, ex=self.refresh_lock_seconds))
+            except Exception as e:
+                logger.warning(f"Dashboard refresh lock failed: {e}")
+                return False
+        with self._lock:
+            now = time.time()
+            if self._refreshing.get(time_range, 0) > now:
+                return False
+            self._refreshing[time_range] = now + self.refresh_lock_seconds
+            return True
+    
+    def release_refresh(self, time_range: str) -> None:
+        if self.client is not None:
+            try:
+                self.client.delete(f"{self.KEY_PREFIX}:{time_range}:refreshing")
+            except Exception as e:
+                logger.warning(f"Dashboard refresh unlock failed: {e}")
+            return
+        with self._lock:
+            self._refreshing.pop(time_range, None)
+
+
+dashboard_cache = DashboardCache()
+
 class AnalyticsService:
     """Service for analytics functionality."""
     
@@ -20,60 +125,89 @@ class AnalyticsService:
         """
         Get data for the analytics dashboard.
         
+        Served from the per-range cache, which aggregate_daily_stats refreshes
+        when it finishes. A stale entry (past its TTL or computed on an earlier
+        day) is still returned while a background refresh runs, so only a cold
+        cache makes the caller wait for the query.
+        
         Args:
             time_range: 'week', 'month', 'quarter', or 'year'
             
         Returns:
             Dictionary with dashboard data
         """
-        today = datetime.utcnow().date()
-        
-        # Determine date range based on time_range
-        if time_range == 'week':
-            start_date = today - timedelta(days=7)
-        elif time_range == 'month':
-            start_date = today - timedelta(days=30)
-        elif time_range == 'quarter':
-            start_date = today - timedelta(days=90)
-        elif time_range == 'year':
-            start_date = today - timedelta(days=365)
-        else:
+        if time_range not in TIME_RANGE_DAYS:
             # Default to week
-            start_date = today - timedelta(days=7)
             time_range = 'week'
         
-        # Get daily stats for the date range
-        daily_stats = self.repository.get_daily_stats_range(
+        entry = dashboard_cache.get(time_range)
+        if entry is None:
+            return self.refresh_dashboard_data(time_range)
+        
+        if dashboard_cache.is_stale(entry):
+            self._schedule_dashboard_refresh(time_range)
+        return entry['data']
+    
+    def refresh_dashboard_data(self, time_range: str) -> Dict[str, Any]:
+        """
+        Recompute the dashboard payload for a time range and cache it.
+        
+        Args:
+            time_range: 'week', 'month', 'quarter', or 'year'
+            
+        Returns:
+            Dictionary with dashboard data
+        """
+        data = self._build_dashboard_data(time_range)
+        dashboard_cache.set(time_range, data)
+        return data
+    
+    def _build_dashboard_data(self, time_range: str) -> Dict[str, Any]:
+        """Build the dashboard payload from one rollup query over the range."""
+        today = datetime.utcnow().date()
+        start_date = today - timedelta(days=TIME_RANGE_DAYS[time_range])
+        
+        rollup = self.repository.get_dashboard_rollup(
             datetime.combine(start_date, datetime.min.time()),
             datetime.combine(today, datetime.max.time())
         )
         
-        # Get popular topics for the same period
-        days = (today - start_date).days
-        popular_topics = self.repository.get_popular_topics(days=days)
-        
-        # Get system performance metrics
-        performance_metrics = self.repository.get_system_performance_metrics(days=days)
-        
-        # Format data for the dashboard
-        formatted_stats = []
-        for stat in daily_stats:
-            formatted_stats.append({
-                'date': stat.date.strftime('%Y-%m-%d'),
-                'total_sessions': stat.total_sessions,
-                'avg_duration': stat.avg_duration,
-                'total_users': stat.total_users,
-                'avg_satisfaction': stat.avg_satisfaction,
-                'avg_engagement': stat.avg_engagement
-            })
+        daily_stats = rollup['daily_stats']
+        performance_metrics = dict(rollup['totals'])
+        performance_metrics['daily_sessions'] = [(stat['date'], stat['total_sessions']) for stat in daily_stats]
+        performance_metrics['popular_topics'] = rollup['popular_topics']
         
         return {
-            'daily_stats': formatted_stats,
-            'popular_topics': popular_topics,
+            'daily_stats': daily_stats,
+            'popular_topics': rollup['popular_topics'],
             'performance_metrics': performance_metrics,
-            'time_range': time_range
+            'time_range': time_range,
+            'generated_at': datetime.utcnow().isoformat()
         }
     
+    def _schedule_dashboard_refresh(self, time_range: str) -> None:
+        """Refresh a stale range in the background, at most one refresh per range at a time."""
+        if not dashboard_cache.acquire_refresh(time_range):
+            return
+        try:
+            from app.tasks.analytics_tasks import refresh_dashboard_cache
+            refresh_dashboard_cache.delay(time_range)
+        except Exception as e:
+            # No broker: refresh in a thread so this request still doesn't wait
+            logger.warning(f"Could not queue dashboard refresh ({e}); refreshing in a thread")
+            app = current_app._get_current_object()
+            
+            def refresh():
+                with app.app_context():
+                    try:
+                        AnalyticsService(db.session).refresh_dashboard_data(time_range)
+                    except Exception as refresh_error:
+                        logger.error(f"Dashboard refresh for {time_range} failed: {refresh_error}")
+                    finally:
+                        dashboard_cache.release_refresh(time_range)
+            
+            threading.Thread(target=refresh, daemon=True).start()
+    
     def get_student_analytics(self, student_id: str) -> Dict[str, Any]:
         """
         Get analytics data for a specific student.
@@ -101,7 +235,9 @@ class AnalyticsService:
                 'date': record.date.strftime('%Y-%m-%d'),
                 'proficiency_level': record.proficiency_level,
                 'sessions_count': record.sessions_count,
-                'total_time_spent': record.total_time_spent
+                'total_time_spent': record.total_time_spent,
+                'avg_engagement': record.avg_engagement,
+                'avg_satisfaction': record.avg_satisfaction
             })
         
         # Format engagement data
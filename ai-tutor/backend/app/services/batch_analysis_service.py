@@ -0,0 +1,248 @@
+"""
+Batch analysis service
+Runs tutor assessments and post-session profile updates, which have no
+latency requirement, through provider batch APIs: pending jobs are collected
+into a JSONL batch, the batch is polled, and results are applied to the
+sessions exactly once.
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from app.ai.batch import BatchProvider, get_batch_provider, write_jsonl, COMPLETED, FAILED, BATCH_PRICE_MULTIPLIER
+from app.ai.structured_output import structured_output
+from app.models.ai_batch import BatchStatus, BatchRequestStatus
+from app.repositories import ai_batch_repository, ai_usage_repository
+from app.services.session_service import SessionService
+from app.services.student_profile_ai_service import StudentProfileAIService
+from app.services.tutor_assessment_service import TutorAssessmentService
+
+logger = logging.getLogger(__name__)
+
+ASSESSMENT_KIND = 'tutor_assessment'
+UPDATE_KIND = 'post_session_update'
+
+# Batch windows are 24h: claimed sessions stay leased past that so realtime workers leave them alone
+BATCH_LEASE_SECONDS = 26 * 3600
+
+
+class BatchAnalysisService:
+    """Submits, polls and applies offline AI batches"""
+
+    def __init__(self, batch_provider: Optional[BatchProvider] = None):
+        self._batch_provider = batch_provider
+        self.session_service = SessionService()
+        self.profile_service = StudentProfileAIService()
+        self.assessment_service = TutorAssessmentService()
+        self.batch_dir = os.getenv('AI_BATCH_DIR', 'data/batches')
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Batch mode is opt-in via AI_BATCH_MODE=true"""
+        return os.getenv('AI_BATCH_MODE', 'false').lower() == 'true'
+
+    @property
+    def batch_provider(self) -> BatchProvider:
+        if self._batch_provider is None:
+            self._batch_provider = get_batch_provider()
+        return self._batch_provider
+
+    @staticmethod
+    def lease_owner(input_path: str) -> str:
+        """Processing lease owner for a batch's profile updates, derived from its request file"""
+        return f"ai-batch:{os.path.basename(input_path or '')}"
+
+    def submit_pending(self, max_requests: int = 500) -> Dict[str, Any]:
+        """
+        Collect pending assessment and profile-update jobs into one batch
+
+        Args:
+            max_requests: Maximum jobs per batch
+
+        Returns:
+            Dictionary with the batch (if one was submitted) and job counts
+        """
+        provider = self.batch_provider
+        requests = []
+        jobs = []
+        skipped = 0
+
+        # Profile updates come from the session processing queue, leased for the batch window
+        input_path = os.path.join(self.batch_dir, f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+        owner = self.lease_owner(input_path)
+        update_ids = self.session_service.claim_sessions_for_ai_update(owner, max_requests // 2 or 1,
+                                                                       BATCH_LEASE_SECONDS)
+        for session_id in update_ids:
+            prepared = self.profile_service.prepare_update_prompt(session_id)
+            if not prepared['success']:
+                # Sessions triage skips are finished; other failures go back to the queue
+                self.session_service.complete_session_processing(session_id, owner, bool(prepared.get('skipped')),
+                                                                 prepared['error'])
+                skipped += 1
+                continue
+            custom_id = f"{UPDATE_KIND}-{session_id}"
+            requests.append(provider.build_request(custom_id, UPDATE_KIND, prepared['prompt']))
+            jobs.append({'kind': UPDATE_KIND, 'session_id': session_id, 'custom_id': custom_id})
+
+        for session_id in ai_batch_repository.get_pending_assessment_session_ids(max_requests - len(jobs)):
+            prepared = self.assessment_service.prepare_assessment_prompt(session_id)
+            if not prepared['success']:
+                # Empty and low-information sessions were recorded as skipped; other failures stay pending
+                logger.warning(f"Skipping batch assessment for session {session_id}: {prepared['error']}")
+                skipped += 1
+                continue
+            custom_id = f"{ASSESSMENT_KIND}-{session_id}"
+            requests.append(provider.build_request(custom_id, ASSESSMENT_KIND, prepared['prompt'],
+                                                   prepared['system_prompt']))
+            jobs.append({'kind': ASSESSMENT_KIND, 'session_id': session_id, 'custom_id': custom_id})
+
+        if not requests:
+            return {'success': True, 'submitted': 0, 'skipped': skipped}
+
+        try:
+            write_jsonl(input_path, requests)
+            provider_batch_id = provider.submit(input_path)
+        except Exception as e:
+            logger.error(f"Failed to submit AI batch: {e}")
+            for session_id in update_ids:
+                self.session_service.complete_session_processing(session_id, owner, False,
+                                                                 f"Batch submission failed: {e}")
+            return {'success': False, 'error': str(e), 'submitted': 0, 'skipped': skipped}
+
+        batch = ai_batch_repository.create_batch(provider.name, provider_batch_id, input_path, jobs)
+        logger.info(f"Submitted AI batch {provider_batch_id} with {len(jobs)} requests "
+                    f"({sum(job['kind'] == UPDATE_KIND for job in jobs)} profile updates)")
+        return {'success': True, 'batch': batch, 'submitted': len(jobs), 'skipped': skipped}
+
+    def poll_batches(self) -> Dict[str, Any]:
+        """
+        Check every open batch and apply the results of finished ones
+
+        Returns:
+            Dictionary with per-batch outcomes
+        """
+        outcomes = []
+        for batch in ai_batch_repository.get_open_batches():
+            try:
+                state = self.batch_provider.poll(batch['provider_batch_id'])
+            except Exception as e:
+                logger.error(f"Failed to poll AI batch {batch['provider_batch_id']}: {e}")
+                outcomes.append({'batch_id': batch['id'], 'state': 'error', 'error': str(e)})
+                continue
+
+            if state == COMPLETED:
+                outcomes.append({'batch_id': batch['id'], 'state': state, **self.apply_results(batch)})
+            elif state == FAILED:
+                self._fail_batch(batch, "Provider batch failed or expired")
+                outcomes.append({'batch_id': batch['id'], 'state': state})
+            else:
+                outcomes.append({'batch_id': batch['id'], 'state': state})
+
+        return {'batches': outcomes}
+
+    def apply_results(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply a completed batch's results to their sessions
+
+        Requests that were already applied (or failed) are skipped, so this is
+        safe to run again after a crash part-way through.
+
+        Args:
+            batch: Batch dictionary
+
+        Returns:
+            Counts of applied and failed requests and the batch spend
+        """
+        pending = ai_batch_repository.get_submitted_requests(batch['id'])
+        owner = self.lease_owner(batch['input_path'])
+        applied = 0
+        failed = 0
+        cost = 0.0
+
+        for result in self.batch_provider.results(batch['provider_batch_id']):
+            request = pending.pop(result.custom_id, None)
+            if request is None:
+                continue
+
+            if result.usage:
+                cost += self._record_usage(request, result)
+
+            error = result.error or self._apply_result(request, result.text)
+            if error:
+                failed += 1
+                self._fail_request(request, error, owner)
+                logger.warning(f"Batch request {request['custom_id']} failed: {error}")
+            else:
+                applied += 1
+                ai_batch_repository.mark_request(request['id'], BatchRequestStatus.applied.value)
+                if request['kind'] == UPDATE_KIND:
+                    self.session_service.complete_session_processing(request['session_id'], owner, True)
+
+        # Requests the provider returned nothing for
+        for request in pending.values():
+            failed += 1
+            self._fail_request(request, "No result in batch output", owner)
+
+        results = {'applied': applied, 'failed': failed, 'cost': cost}
+        ai_batch_repository.mark_batch(batch['id'], BatchStatus.applied.value, results=results)
+        logger.info(f"Applied AI batch {batch['provider_batch_id']}: {applied} applied, {failed} failed, ${cost:.4f}")
+        return results
+
+    def _apply_result(self, request: Dict[str, Any], text: Optional[str]) -> Optional[str]:
+        """Validate and apply one result; returns an error message or None"""
+        result = structured_output.parse(text, request['kind'])
+        if not result.success:
+            return f"Invalid {request['kind']} response: {'; '.join(result.errors[:3])}"
+
+        if request['kind'] == ASSESSMENT_KIND:
+            outcome = self.assessment_service.assess_tutor_performance(
+                request['session_id'], precomputed_response=result.data)
+        else:
+            outcome = self.profile_service.post_session_ai_update(
+                request['session_id'], precomputed_response=result.data)
+
+        return None if outcome.get('success') else (outcome.get('error') or 'Unknown error')
+
+    def _fail_request(self, request: Dict[str, Any], error: str, owner: str) -> None:
+        """Mark a request failed and hand a leased session back to the processing queue"""
+        ai_batch_repository.mark_request(request['id'], BatchRequestStatus.failed.value, error)
+        if request['kind'] == UPDATE_KIND:
+            self.session_service.complete_session_processing(request['session_id'], owner, False, error)
+
+    def _fail_batch(self, batch: Dict[str, Any], error: str) -> None:
+        """Fail every request of a batch the provider couldn't complete"""
+        owner = self.lease_owner(batch['input_path'])
+        for request in ai_batch_repository.get_submitted_requests(batch['id']).values():
+            self._fail_request(request, error, owner)
+        ai_batch_repository.mark_batch(batch['id'], BatchStatus.failed.value, error=error)
+        logger.error(f"AI batch {batch['provider_batch_id']} failed: {error}")
+
+    def _record_usage(self, request: Dict[str, Any], result) -> float:
+        """Record a result's tokens and discounted spend; returns the spend"""
+        from app.ai.providers import provider_manager
+
+        provider = self.batch_provider
+        cost = result.usage.cost(provider.name, provider.model) * BATCH_PRICE_MULTIPLIER
+        try:
+            provider_manager.cost_budget.record(cost, result.usage.total_tokens)
+            ai_usage_repository.create({
+                'provider': provider.name,
+                'model': provider.model,
+                'task': f"{request['kind']}_batch",
+                'session_id': request['session_id'],
+                'input_tokens': result.usage.input_tokens,
+                'output_tokens': result.usage.output_tokens,
+                'cache_read_tokens': result.usage.cache_read_tokens,
+                'cache_write_tokens': result.usage.cache_write_tokens,
+                'actual_cost': cost,
+                'usage_source': result.usage.source
+            })
+        except Exception as e:
+            logger.warning(f"Could not record batch usage for {request['custom_id']}: {e}")
+        return cost
+
+    def get_batches(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent batches with their status and results"""
+        return ai_batch_repository.get_batches(limit)
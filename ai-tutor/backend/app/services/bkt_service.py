@@ -0,0 +1,242 @@
+"""
+BKT mastery service
+Fits per-KC Bayesian Knowledge Tracing parameters from the answer counts
+recorded on mastery_events, turns a session's answer counts into KC mastery
+instead of taking the LLM's percentage, and recomputes every student's KC
+mastery from history without any LLM calls.
+
+The LLM still reports per-KC correct/incorrect counts in its mastery delta;
+setting MASTERY_UPDATER=bkt makes those counts (rather than its percentages)
+drive mastery.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from app import db
+from app.ai.bkt import (
+    BKT_AVAILABLE, BKTParameters, fit_em, observation_counts, pad_sequences, session_observations, trace
+)
+from app.models.mastery_tracking import CurriculumGoal, KCBKTParameters, StudentKCProgress
+
+if BKT_AVAILABLE:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Answer history per KC, in the order BKT consumes it
+OBSERVATIONS_SQL = text("""
+    SELECT goal_id, kc_code, student_id, correct_count, incorrect_count
+    FROM mastery_events
+    WHERE kc_code IS NOT NULL
+      AND COALESCE(correct_count, 0) + COALESCE(incorrect_count, 0) > 0
+    ORDER BY goal_id, kc_code, student_id, recorded_at, id
+""")
+
+# Bulk mastery write; rows whose mastery doesn't change are left alone
+APPLY_MASTERY_SQL = text("""
+    UPDATE student_kc_progress p
+    SET mastery_percentage = r.mastery, last_updated = now()
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb))
+         AS r(student_id integer, goal_id integer, kc_code text, mastery double precision)
+    WHERE p.student_id = r.student_id AND p.goal_id = r.goal_id AND p.kc_code = r.kc_code
+      AND abs(p.mastery_percentage - r.mastery) >= 0.01
+    RETURNING p.student_id, p.goal_id
+""")
+
+KCKey = Tuple[int, str]
+
+
+class BKTService:
+    """Fits BKT parameters and computes KC mastery from answer history"""
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """BKT drives mastery when MASTERY_UPDATER=bkt and numpy is installed"""
+        if os.getenv('MASTERY_UPDATER', 'llm').lower() != 'bkt':
+            return False
+        if not BKT_AVAILABLE:
+            logger.warning("MASTERY_UPDATER=bkt but numpy is not installed; using LLM mastery")
+            return False
+        return True
+
+    def get_parameters(self, kc_keys: Optional[List[KCKey]] = None) -> Dict[KCKey, BKTParameters]:
+        """Fitted parameters by (goal_id, kc_code); KCs without a fit are absent"""
+        query = KCBKTParameters.query
+        if kc_keys is not None:
+            if not kc_keys:
+                return {}
+            query = query.filter(KCBKTParameters.goal_id.in_({goal_id for goal_id, _ in kc_keys}))
+        return {(row.goal_id, row.kc_code): BKTParameters(row.p_init, row.p_learn, row.p_slip, row.p_guess)
+                for row in query.all()}
+
+    def load_sequences(self) -> Dict[KCKey, Dict[int, List[int]]]:
+        """Every student's 0/1 answer sequence per KC, streamed from mastery_events"""
+        sequences: Dict[KCKey, Dict[int, List[int]]] = {}
+        result = db.session.execute(OBSERVATIONS_SQL, execution_options={'stream_results': True,
+                                                                         'yield_per': 10000})
+        for partition in result.partitions():
+            for goal_id, kc_code, student_id, correct, incorrect in partition:
+                sequences.setdefault((goal_id, kc_code), {}).setdefault(student_id, []).extend(
+                    session_observations(correct or 0, incorrect or 0))
+        return sequences
+
+    def fit_parameters(self, min_sequences: int = 10, max_iterations: int = 50) -> Dict[str, Any]:
+        """
+        Fit each KC's parameters by EM over its students' answer sequences
+
+        Args:
+            min_sequences: KCs answered by fewer students keep the defaults
+            max_iterations: EM iteration cap per KC
+
+        Returns:
+            Dictionary with KCs fitted and skipped and the elapsed time
+        """
+        started = time.monotonic()
+        sequences = self.load_sequences()
+        rows = []
+        skipped = 0
+        for (goal_id, kc_code), by_student in sequences.items():
+            if len(by_student) < min_sequences:
+                skipped += 1
+                continue
+            observations, mask = pad_sequences(list(by_student.values()))
+            params, log_likelihood = fit_em(observations, mask, max_iterations=max_iterations)
+            rows.append({
+                'goal_id': goal_id, 'kc_code': kc_code,
+                'p_init': params.p_init, 'p_learn': params.p_learn,
+                'p_slip': params.p_slip, 'p_guess': params.p_guess,
+                'sequences': len(by_student), 'observations': int(mask.sum()),
+                'log_likelihood': log_likelihood
+            })
+
+        try:
+            # Chunked to stay under the driver's bind parameter limit
+            for start in range(0, len(rows), 5000):
+                statement = insert(KCBKTParameters).values(rows[start:start + 5000])
+                updates = {column: statement.excluded[column] for column in
+                           ('p_init', 'p_learn', 'p_slip', 'p_guess', 'sequences', 'observations', 'log_likelihood')}
+                updates['fitted_at'] = db.func.now()
+                db.session.execute(statement.on_conflict_do_update(constraint='pk_kc_bkt_parameters', set_=updates))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error saving BKT parameters: {e}")
+            raise
+
+        summary = {'fitted': len(rows), 'skipped': skipped, 'seconds': round(time.monotonic() - started, 2)}
+        logger.info(f"Fitted BKT parameters: {summary}")
+        return summary
+
+    def apply_to_patches(self, student_id: int, kc_patches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace the LLM's mastery with BKT mastery on patches that report answers
+
+        Each KC's current mastery is the prior and the session's answers are
+        filtered through it in one vectorised step. Patches without answer
+        counts are returned unchanged.
+
+        Args:
+            student_id: The student ID
+            kc_patches: KC patches from the AI delta (goal_code, kc_code, correct, incorrect, ...)
+
+        Returns:
+            New patch list
+        """
+        observed = [(index, patch, observation_counts(patch)) for index, patch in enumerate(kc_patches)
+                    if patch.get('goal_code') and patch.get('kc_code')]
+        observed = [(index, patch, counts) for index, patch, counts in observed if counts]
+        if not observed:
+            return kc_patches
+
+        goal_ids = {goal.goal_code: goal.id for goal in CurriculumGoal.query.filter(
+            CurriculumGoal.goal_code.in_({patch['goal_code'] for _, patch, _ in observed})).all()}
+        observed = [(index, patch, counts) for index, patch, counts in observed if patch['goal_code'] in goal_ids]
+        if not observed:
+            return kc_patches
+        keys = [(goal_ids[patch['goal_code']], patch['kc_code']) for _, patch, _ in observed]
+
+        current = {(row.goal_id, row.kc_code): row.mastery_percentage for row in StudentKCProgress.query.filter(
+            StudentKCProgress.student_id == student_id,
+            StudentKCProgress.goal_id.in_({goal_id for goal_id, _ in keys})).all()}
+        fitted = self.get_parameters(keys)
+        params = [fitted.get(key, BKTParameters()) for key in keys]
+
+        prior = [current[key] / 100.0 if key in current else param.p_init for key, param in zip(keys, params)]
+        observations, mask = pad_sequences([session_observations(*counts) for _, _, counts in observed])
+        p_known = trace(np.clip(prior, 1e-4, 1 - 1e-4), observations, mask,
+                        np.array([param.p_learn for param in params]),
+                        np.array([param.p_slip for param in params]),
+                        np.array([param.p_guess for param in params]))
+
+        patches = list(kc_patches)
+        for (index, patch, _), mastery in zip(observed, p_known):
+            patches[index] = dict(patch, mastery_percentage=round(float(mastery) * 100, 2),
+                                  llm_mastery_percentage=patch.get('mastery_percentage'), mastery_source='bkt')
+        return patches
+
+    def recompute_mastery(self, chunk_rows: int = 50000) -> Dict[str, Any]:
+        """
+        Recompute every KC mastery that has answer history, from scratch
+
+        All student x KC sequences are traced from each KC's p_init in
+        vectorised chunks (sorted by length to keep padding small), written
+        back in bulk, and the goal rollups of changed rows are refreshed.
+
+        Args:
+            chunk_rows: Sequences per vectorised chunk and bulk write
+
+        Returns:
+            Dictionary with sequences traced, rows changed and elapsed time
+        """
+        from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+
+        started = time.monotonic()
+        sequences = self.load_sequences()
+        fitted = self.get_parameters()
+        default = BKTParameters()
+
+        pairs = [(len(sequence), student_id, key, sequence)
+                 for key, by_student in sequences.items() for student_id, sequence in by_student.items()]
+        pairs.sort(key=lambda pair: pair[0])
+
+        touched: Dict[int, set] = {}
+        changed = 0
+        try:
+            for start in range(0, len(pairs), chunk_rows):
+                chunk = pairs[start:start + chunk_rows]
+                params = [fitted.get(key, default) for _, _, key, _ in chunk]
+                observations, mask = pad_sequences([sequence for *_, sequence in chunk])
+                p_known = trace(np.array([param.p_init for param in params]), observations, mask,
+                                np.array([param.p_learn for param in params]),
+                                np.array([param.p_slip for param in params]),
+                                np.array([param.p_guess for param in params]))
+                rows = [{'student_id': student_id, 'goal_id': key[0], 'kc_code': key[1],
+                         'mastery': round(float(mastery) * 100, 2)}
+                        for (_, student_id, key, _), mastery in zip(chunk, p_known)]
+                for student_id, goal_id in db.session.execute(APPLY_MASTERY_SQL, {'rows': json.dumps(rows)}):
+                    touched.setdefault(student_id, set()).add(goal_id)
+                    changed += 1
+
+            rollups = StudentGoalProgressRepository(db.session)
+            for student_id, goal_ids in touched.items():
+                rollups.refresh_rollup(student_id, goal_ids, commit=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recomputing BKT mastery: {e}")
+            raise
+
+        summary = {'sequences': len(pairs), 'changed': changed, 'students': len(touched),
+                   'fitted_kcs': len(fitted), 'seconds': round(time.monotonic() - started, 2)}
+        logger.info(f"Recomputed BKT mastery: {summary}")
+        return summary
+
+
+bkt_service = BKTService()
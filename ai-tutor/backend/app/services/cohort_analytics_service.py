@@ -0,0 +1,364 @@
+"""
+Cohort analytics service
+Class- and school-level mastery analytics. A cohort's student_kc_progress
+rows are streamed into a student x KC matrix (coordinate form, densified on
+request) and per-KC distributions, difficulty rankings and struggling
+students are computed with numpy vector operations. Results are cached per
+cohort and reused until the cohort's data version changes.
+
+numpy is optional: without it the service reports itself unavailable.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app import db
+from app.repositories.mastery_event_repository import MASTERED_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    logger.info("numpy not installed; cohort mastery analytics are unavailable")
+
+# KC mastery below this counts as struggling
+STRUGGLING_THRESHOLD = 40.0
+
+# Distribution buckets: 0-20, 20-40, 40-60, 60-80, 80-100
+BUCKET_WIDTH = 20.0
+BUCKET_COUNT = 5
+
+# Difficulty shrinks each KC's mean toward the cohort mean by this many pseudo-observations
+DIFFICULTY_PRIOR_WEIGHT = 5.0
+
+# Largest matrix dense() will allocate (cells)
+DENSE_CELL_LIMIT = 20_000_000
+
+STREAM_BATCH_ROWS = 10000
+
+
+@dataclass(frozen=True)
+class CohortFilter:
+    """Which students form a cohort; unset fields don't filter"""
+    school_id: Optional[int] = None
+    grade_level: Optional[int] = None
+    curriculum_id: Optional[int] = None
+    subject: Optional[str] = None
+
+    def student_clauses(self) -> Tuple[List[str], Dict[str, Any]]:
+        """WHERE clauses over students s, with their parameters"""
+        clauses, params = [], {}
+        if self.school_id is not None:
+            clauses.append("s.school_id = :school_id")
+            params['school_id'] = self.school_id
+        if self.grade_level is not None:
+            clauses.append("s.grade_level = :grade_level")
+            params['grade_level'] = self.grade_level
+        if self.curriculum_id is not None:
+            clauses.append("""s.id IN (SELECT ss.student_id FROM student_subjects ss
+                                       JOIN curriculum_details cd ON cd.id = ss.curriculum_detail_id
+                                       WHERE cd.curriculum_id = :curriculum_id)""")
+            params['curriculum_id'] = self.curriculum_id
+        return clauses, params
+
+    def progress_sql(self, columns: str) -> Tuple[str, Dict[str, Any]]:
+        """SELECT over the cohort's student_kc_progress p rows"""
+        clauses, params = self.student_clauses()
+        joins = "JOIN students s ON s.id = p.student_id"
+        if self.subject is not None:
+            joins += " JOIN curriculum_goals g ON g.id = p.goal_id"
+            clauses.append("g.subject = :subject")
+            params['subject'] = self.subject
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return f"SELECT {columns} FROM student_kc_progress p {joins} {where}", params
+
+    def students_sql(self, columns: str) -> Tuple[str, Dict[str, Any]]:
+        clauses, params = self.student_clauses()
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return f"SELECT {columns} FROM students s {where}", params
+
+
+class CohortMatrix:
+    """
+    Student x KC mastery matrix in coordinate form
+
+    Row i is student_ids[i], column j is kc_keys[j] ((goal_id, kc_code));
+    rows/cols/values hold the observed cells. Unobserved cells are missing,
+    not zero.
+    """
+
+    def __init__(self, student_ids: List[int], kc_keys: List[Tuple[int, str]], rows, cols, values):
+        self.student_ids = student_ids
+        self.kc_keys = kc_keys
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float32)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.student_ids), len(self.kc_keys)
+
+    @property
+    def density(self) -> float:
+        cells = self.shape[0] * self.shape[1]
+        return float(len(self.values)) / cells if cells else 0.0
+
+    def dense(self):
+        """Dense float32 matrix with NaN for unobserved cells"""
+        students, kcs = self.shape
+        if students * kcs > DENSE_CELL_LIMIT:
+            raise ValueError(f"Cohort matrix {students}x{kcs} is too large to densify")
+        matrix = np.full((students, kcs), np.nan, dtype=np.float32)
+        matrix[self.rows, self.cols] = self.values
+        return matrix
+
+    def kc_stats(self) -> Dict[str, Any]:
+        """Per-KC arrays: students, mean, median, std, distribution, struggling/mastered share, difficulty"""
+        kcs = self.shape[1]
+        values = self.values.astype(np.float64)
+        count = np.bincount(self.cols, minlength=kcs).astype(np.float64)
+        total = np.bincount(self.cols, weights=values, minlength=kcs)
+        squares = np.bincount(self.cols, weights=values * values, minlength=kcs)
+        observed = count > 0
+        safe = np.where(observed, count, 1.0)
+        mean = np.where(observed, total / safe, np.nan)
+        std = np.where(observed, np.sqrt(np.maximum(squares / safe - (total / safe) ** 2, 0.0)), np.nan)
+
+        # Medians from values sorted within each column
+        order = np.lexsort((values, self.cols))
+        ordered = values[order]
+        starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+        counts = count.astype(np.int64)
+        low = np.minimum(starts + (counts - 1) // 2, max(len(ordered) - 1, 0))
+        high = np.minimum(starts + counts // 2, max(len(ordered) - 1, 0))
+        median = np.full(kcs, np.nan)
+        if len(ordered):
+            median[observed] = (ordered[low[observed]] + ordered[high[observed]]) / 2
+
+        buckets = np.minimum((values // BUCKET_WIDTH).astype(np.int64), BUCKET_COUNT - 1)
+        distribution = np.bincount(self.cols * BUCKET_COUNT + buckets,
+                                   minlength=kcs * BUCKET_COUNT).reshape(kcs, BUCKET_COUNT)
+        struggling = np.bincount(self.cols, weights=values < STRUGGLING_THRESHOLD, minlength=kcs)
+        mastered = np.bincount(self.cols, weights=values >= MASTERED_THRESHOLD, minlength=kcs)
+
+        # Shrunk mean: KCs seen by few students rank near the cohort average
+        cohort_mean = values.mean() if len(values) else 0.0
+        shrunk = (total + DIFFICULTY_PRIOR_WEIGHT * cohort_mean) / (count + DIFFICULTY_PRIOR_WEIGHT)
+
+        return {
+            'students': counts,
+            'mean': mean,
+            'median': median,
+            'std': std,
+            'distribution': distribution,
+            'struggling_share': np.where(observed, struggling / safe, 0.0),
+            'mastered_share': np.where(observed, mastered / safe, 0.0),
+            'difficulty': 100.0 - shrunk
+        }
+
+    def student_stats(self) -> Dict[str, Any]:
+        """Per-student arrays: KCs tracked, mean mastery, struggling KCs"""
+        students = self.shape[0]
+        values = self.values.astype(np.float64)
+        count = np.bincount(self.rows, minlength=students)
+        total = np.bincount(self.rows, weights=values, minlength=students)
+        struggling = np.bincount(self.rows, weights=values < STRUGGLING_THRESHOLD, minlength=students)
+        return {
+            'kcs_tracked': count,
+            'mean': np.where(count > 0, total / np.maximum(count, 1), np.nan),
+            'struggling_kcs': struggling.astype(np.int64)
+        }
+
+
+def _round(value: float) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 2)
+
+
+class CohortAnalyticsService:
+    """Cohort mastery matrix, KC difficulty and struggling students, cached per data version"""
+
+    def __init__(self, max_cached_cohorts: int = 32):
+        self.max_cached_cohorts = max_cached_cohorts
+        self._cache: 'OrderedDict[CohortFilter, Tuple[Any, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_available() -> bool:
+        return NUMPY_AVAILABLE
+
+    def get_data_version(self, cohort: CohortFilter) -> Tuple:
+        """
+        Stamp that changes whenever the cohort's matrix could change
+
+        Progress row count and latest update, cohort size and latest student
+        update, plus the curriculum version (KC labels and subjects).
+        """
+        from app.services.kc_recommendation_service import get_curriculum_version
+
+        progress_sql, params = cohort.progress_sql("COUNT(*), MAX(p.last_updated)")
+        students_sql, student_params = cohort.students_sql("COUNT(*), MAX(s.updated_at)")
+        params.update(student_params)
+        stamp = db.session.execute(text(
+            f"SELECT * FROM ({progress_sql}) progress_version, ({students_sql}) students_version"
+        ), params).one()
+        return tuple(str(value) for value in stamp) + get_curriculum_version()
+
+    def load_matrix(self, cohort: CohortFilter) -> Tuple[CohortMatrix, Dict[int, str]]:
+        """
+        Stream a cohort's KC progress into a matrix
+
+        Returns:
+            The matrix and a student ID -> name map
+        """
+        students_sql, params = cohort.students_sql("s.id, s.first_name, s.last_name")
+        names = {row[0]: f"{row[1]} {row[2]}".strip()
+                 for row in db.session.execute(text(f"{students_sql} ORDER BY s.id"), params)}
+        student_index = {student_id: index for index, student_id in enumerate(names)}
+
+        kc_index: Dict[Tuple[int, str], int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+        progress_sql, params = cohort.progress_sql("p.student_id, p.goal_id, p.kc_code, p.mastery_percentage")
+        result = db.session.execute(text(progress_sql), params,
+                                    execution_options={'stream_results': True, 'yield_per': STREAM_BATCH_ROWS})
+        for partition in result.partitions():
+            for student_id, goal_id, kc_code, mastery in partition:
+                column = kc_index.setdefault((goal_id, kc_code), len(kc_index))
+                rows.append(student_index[student_id])
+                cols.append(column)
+                values.append(mastery)
+
+        return CohortMatrix(list(names), list(kc_index), rows, cols, values), names
+
+    def get_cohort_mastery(self, school_id: Optional[int] = None, grade_level: Optional[int] = None,
+                           curriculum_id: Optional[int] = None, subject: Optional[str] = None,
+                           limit: int = 50) -> Dict[str, Any]:
+        """
+        Mastery analytics for a cohort of students
+
+        Args:
+            school_id: Only students of this school
+            grade_level: Only students in this grade
+            curriculum_id: Only students enrolled in a subject of this curriculum
+            subject: Only KCs of this subject
+            limit: Maximum KCs and struggling students to list
+
+        Returns:
+            Dictionary with cohort size, KCs hardest first (with distributions)
+            and struggling students, or success False with an error
+        """
+        if not NUMPY_AVAILABLE:
+            return {'success': False, 'error': 'numpy is not installed'}
+
+        cohort = CohortFilter(school_id, grade_level, curriculum_id, subject)
+        try:
+            version = self.get_data_version(cohort)
+            with self._lock:
+                cached = self._cache.get(cohort)
+                if cached and cached[0] == version:
+                    self._cache.move_to_end(cohort)
+                    return self._limit(dict(cached[1], cached=True), limit)
+
+            analytics = self._analyse(cohort)
+            with self._lock:
+                self._cache[cohort] = (version, analytics)
+                self._cache.move_to_end(cohort)
+                while len(self._cache) > self.max_cached_cohorts:
+                    self._cache.popitem(last=False)
+            return self._limit(dict(analytics, cached=False), limit)
+
+        except Exception as e:
+            logger.error(f"Error computing cohort mastery for {cohort}: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def _analyse(self, cohort: CohortFilter) -> Dict[str, Any]:
+        """Full (unlimited) analytics for a cohort"""
+        from app.models.mastery_tracking import CurriculumGoal, GoalKC
+
+        started = datetime.utcnow()
+        matrix, names = self.load_matrix(cohort)
+        kc_stats = matrix.kc_stats()
+        student_stats = matrix.student_stats()
+
+        goal_ids = sorted({goal_id for goal_id, _ in matrix.kc_keys})
+        labels = {}
+        if goal_ids:
+            for goal_kc, goal in db.session.query(GoalKC, CurriculumGoal)\
+                                           .join(CurriculumGoal, GoalKC.goal_id == CurriculumGoal.id)\
+                                           .filter(GoalKC.goal_id.in_(goal_ids)).all():
+                labels[(goal_kc.goal_id, goal_kc.kc_code)] = (goal.goal_code, goal.subject, goal_kc.kc_name)
+
+        # Hardest first; ties by KC order
+        kcs = []
+        for column in np.argsort(-kc_stats['difficulty'], kind='stable'):
+            goal_id, kc_code = matrix.kc_keys[column]
+            goal_code, goal_subject, kc_name = labels.get((goal_id, kc_code), (None, None, None))
+            kcs.append({
+                'goal_id': goal_id,
+                'goal_code': goal_code,
+                'subject': goal_subject,
+                'kc_code': kc_code,
+                'kc_name': kc_name,
+                'students': int(kc_stats['students'][column]),
+                'mean_mastery': _round(kc_stats['mean'][column]),
+                'median_mastery': _round(kc_stats['median'][column]),
+                'std_mastery': _round(kc_stats['std'][column]),
+                'distribution': kc_stats['distribution'][column].tolist(),
+                'struggling_share': _round(kc_stats['struggling_share'][column]),
+                'mastered_share': _round(kc_stats['mastered_share'][column]),
+                'difficulty': _round(kc_stats['difficulty'][column])
+            })
+
+        # Most struggling KCs first, then lowest mean mastery
+        struggling = np.nonzero(student_stats['struggling_kcs'])[0]
+        order = struggling[np.lexsort((student_stats['mean'][struggling], -student_stats['struggling_kcs'][struggling]))]
+        struggling_students = [{
+            'student_id': matrix.student_ids[row],
+            'name': names[matrix.student_ids[row]],
+            'kcs_tracked': int(student_stats['kcs_tracked'][row]),
+            'struggling_kcs': int(student_stats['struggling_kcs'][row]),
+            'mean_mastery': _round(student_stats['mean'][row])
+        } for row in order]
+
+        students, kc_count = matrix.shape
+        return {
+            'success': True,
+            'filters': asdict(cohort),
+            'cohort': {
+                'students': students,
+                'students_with_progress': int(np.count_nonzero(student_stats['kcs_tracked'])),
+                'kcs': kc_count,
+                'observations': len(matrix.values),
+                'density': round(matrix.density, 4),
+                'mean_mastery': _round(matrix.values.mean()) if len(matrix.values) else None
+            },
+            'distribution_buckets': [f"{int(low)}-{int(low + BUCKET_WIDTH)}"
+                                     for low in np.arange(BUCKET_COUNT) * BUCKET_WIDTH],
+            'kcs': kcs,
+            'struggling_students': struggling_students,
+            'total_struggling_students': len(struggling_students),
+            'thresholds': {'struggling': STRUGGLING_THRESHOLD, 'mastered': MASTERED_THRESHOLD},
+            'computed_at': started.isoformat(),
+            'compute_seconds': round((datetime.utcnow() - started).total_seconds(), 3)
+        }
+
+    @staticmethod
+    def _limit(analytics: Dict[str, Any], limit: Optional[int]) -> Dict[str, Any]:
+        if limit is None:
+            return analytics
+        return dict(analytics, kcs=analytics['kcs'][:limit],
+                    struggling_students=analytics['struggling_students'][:limit])
+
+
+cohort_analytics_service = CohortAnalyticsService()
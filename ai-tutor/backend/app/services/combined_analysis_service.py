@@ -0,0 +1,237 @@
+"""
+Combined post-call analysis service
+Optionally replaces the three separate post-call LLM requests (profile
+extraction, post-session profile/memory/mastery update, tutor assessment)
+with one structured request that sends the transcript and student context
+once. Each section of the response is checked with its consumer's own
+validator; consumers fall back to their separate call only for sections
+that fail.
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from app.ai.event_loop import run_async
+from app.ai.providers import provider_manager
+from app.services.student_service import StudentService
+from app.services.student_profile_ai_service import StudentProfileAIService
+from app.services.tutor_assessment_service import TutorAssessmentService
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SECTION = 'profile_extraction'
+UPDATE_SECTION = 'post_session_update'
+ASSESSMENT_SECTION = 'tutor_assessment'
+SECTIONS = (PROFILE_SECTION, UPDATE_SECTION, ASSESSMENT_SECTION)
+
+COMBINED_INSTRUCTIONS = """## COMBINED POST-SESSION ANALYSIS
+
+You will be given the student's current context and one tutoring session transcript.
+Produce three independent analyses of that transcript in a single JSON object.
+
+### 1. profile_extraction
+Student identity and preferences stated in the conversation. Extract only what is explicitly said
+(e.g. "Hi, I'm Emma" -> first_name "Emma"). age and grade are integers; grade words become numbers
+("third grade" -> 3). Use null for unknown single values and [] for empty lists.
+
+### 2. post_session_update
+Updates to the student's profile, tutor memories and curriculum mastery:
+- profile_updates: narrative_changes (or null) and trait_updates
+- memory_updates by scope: personal_fact (persistent personal details), game_state (temporary game
+  progress), strategy_log (teaching strategies that work for this student)
+- mastery_updates: goal_patches and kc_patches with mastery_percentage 0-100 and evidence; only for
+  goals/KCs clearly covered in the session (25 exposure, 50 partial, 75 good, 100 mastery). For each
+  KC patch, count the student's answers or attempts in this session that were correct and incorrect
+  (correct, incorrect; use 0 when there were none of that kind)
+Only include information explicitly mentioned or clearly demonstrated.
+
+### 3. tutor_assessment
+The assessment task described above: a detailed assessment of the AI tutor and specific,
+actionable prompt/approach changes. Base it on evidence from the transcript, reference specific
+examples, and keep suggestions implementable in an AI tutoring context.
+
+## REQUIRED OUTPUT FORMAT
+
+Respond with ONLY a valid JSON object with exactly these three sections:
+
+```json
+{
+  "profile_extraction": {
+    "first_name": null,
+    "last_name": null,
+    "age": null,
+    "grade": null,
+    "interests": [],
+    "learning_preferences": [],
+    "favorite_subjects": [],
+    "challenging_subjects": [],
+    "confidence_score": 0.0
+  },
+  "post_session_update": {
+    "profile_updates": {"narrative_changes": null, "trait_updates": {}},
+    "memory_updates": {"personal_fact": {}, "game_state": {}, "strategy_log": {}},
+    "mastery_updates": {
+      "goal_patches": [],
+      "kc_patches": [
+        {"goal_code": "4.NBT.A.1", "kc_code": "place-value-thousands", "mastery_percentage": 75.0,
+         "correct": 3, "incorrect": 1, "evidence": "Explained thousands place value after one mistake"}
+      ]
+    },
+    "should_create_new_profile_version": false,
+    "update_reasoning": "Brief explanation of what was updated and why",
+    "confidence_score": 0.0
+  },
+  "tutor_assessment": {
+    "assessment-of-ai-tutor": "Detailed assessment paragraph(s)",
+    "suggested-changes": "Specific, actionable suggestions"
+  }
+}
+```"""
+
+
+class CombinedAnalysisService:
+    """Runs one structured LLM request covering all post-call analyses"""
+
+    def __init__(self):
+        self.provider_manager = provider_manager
+        self.student_service = StudentService()
+        self.assessment_service = TutorAssessmentService()
+        self.profile_service = StudentProfileAIService()
+        self._system_prompt = None
+        self._system_prompt_sources = (None, None)
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """Combined mode is opt-in via AI_COMBINED_ANALYSIS=true"""
+        return os.getenv('AI_COMBINED_ANALYSIS', 'false').lower() == 'true'
+
+    def analyze(self, student_id: int, transcript: str,
+                session_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze a transcript once for every post-call consumer
+
+        Args:
+            student_id: The student the session belongs to
+            transcript: Session transcript
+            session_info: Session metadata for the assessment (duration, type, start time)
+
+        Returns:
+            Dictionary with 'sections' (only sections that passed validation) and
+            'failed_sections' that consumers must compute with their separate calls
+        """
+        start_time = datetime.now()
+        result = {
+            'success': False,
+            'sections': {},
+            'failed_sections': list(SECTIONS)
+        }
+
+        try:
+            student_context = self.student_service.get_full_context(student_id)
+            if 'error' in student_context:
+                result['error'] = f"Failed to get student context: {student_context['error']}"
+                return result
+
+            system_prompt = self._get_system_prompt()
+            if not system_prompt:
+                result['error'] = "Could not load assessment guidelines"
+                return result
+
+            prompt = self._build_prompt(transcript, student_context, session_info or {})
+            analysis = run_async(self.provider_manager.analyze_session(transcript, {
+                'prompt': prompt,
+                'system_prompt': system_prompt,
+                'task': 'combined_session_analysis',
+                'student_id': student_id
+            }))
+
+            if not analysis or not analysis.raw_response:
+                result['error'] = "No response from AI provider"
+                return result
+
+            # Parsed (and schema-checked) once by the provider
+            response = analysis.parsed_response
+            if not isinstance(response, dict):
+                result['error'] = "Failed to parse combined response"
+                result['raw_response'] = analysis.raw_response
+                return result
+
+            result['sections'] = self._validate_sections(response)
+            result['failed_sections'] = [name for name in SECTIONS if name not in result['sections']]
+            result['success'] = bool(result['sections'])
+            result['processing_time'] = (datetime.now() - start_time).total_seconds()
+            result['cost_estimate'] = analysis.cost_estimate
+            result['provider_used'] = analysis.provider_used
+
+            logger.info(f"Combined analysis for student {student_id}: "
+                        f"{len(result['sections'])}/{len(SECTIONS)} sections valid"
+                        + (f", falling back for {', '.join(result['failed_sections'])}"
+                           if result['failed_sections'] else ""))
+            return result
+
+        except Exception as e:
+            logger.error(f"Error in combined analysis for student {student_id}: {e}")
+            result['error'] = str(e)
+            return result
+
+    def _validate_sections(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply each consumer's validator to its section; invalid sections are left out"""
+        from transcript_analyzer import TranscriptAnalyzer
+
+        if not isinstance(response, dict):
+            return {}
+
+        sections = {}
+
+        profile = TranscriptAnalyzer.validate_profile_section(response.get(PROFILE_SECTION))
+        if profile is not None:
+            sections[PROFILE_SECTION] = profile
+
+        update = response.get(UPDATE_SECTION)
+        if StudentProfileAIService.validate_update_response(update):
+            sections[UPDATE_SECTION] = update
+
+        assessment = response.get(ASSESSMENT_SECTION)
+        if isinstance(assessment, dict) and \
+                self.assessment_service._parse_assessment_response(assessment)['success']:
+            sections[ASSESSMENT_SECTION] = assessment
+
+        return sections
+
+    def _get_system_prompt(self) -> Optional[str]:
+        """Static, cacheable prefix: assessment context (no output format) plus the combined schema"""
+        guidelines = self.assessment_service._read_guidelines_file()
+        ai_tutor_prompt = self.assessment_service._read_ai_tutor_prompt()
+        if not guidelines or not ai_tutor_prompt:
+            return None
+
+        sources = (guidelines, ai_tutor_prompt)
+        if self._system_prompt is None or sources[0] is not self._system_prompt_sources[0] \
+                or sources[1] is not self._system_prompt_sources[1]:
+            assessment_context = self.assessment_service._create_assessment_context(guidelines, ai_tutor_prompt)
+            self._system_prompt = f"{assessment_context}\n\n{COMBINED_INSTRUCTIONS}"
+            self._system_prompt_sources = sources
+        return self._system_prompt
+
+    def _build_prompt(self, transcript: str, student_context: Dict[str, Any],
+                      session_info: Dict[str, Any]) -> str:
+        """Per-session part of the request: context (budgeted as for the separate update call) and the transcript"""
+        context = self.profile_service.render_update_context(student_context)
+        return f"""## CURRENT STUDENT CONTEXT
+- Basic Info: {context['basic_info']}
+- Current Profile: {context['current_profile']}
+- Existing Memories: {context['existing_memories']}
+- Recent Session Summaries: {context['recent_sessions']}
+- Mastery Context: {context['mastery_context']}
+
+## SESSION INFORMATION
+- Duration: {session_info.get('duration', 'Unknown')} seconds
+- Session Type: {session_info.get('session_type', 'phone')}
+- Date: {session_info.get('start_datetime', 'Unknown')}
+
+## SESSION TRANSCRIPT
+{transcript}
+
+Respond with the combined JSON object only."""
@@ -0,0 +1,362 @@
+"""
+KC recommendation service
+Recommends the knowledge components a student is ready to learn next. The
+goal prerequisite graph is loaded once into compact integer arrays with the
+goals in topological order, and rebuilt only when the curriculum changes; a
+student's ready frontier is then found in one pass over their mastery vector
+and the goal order.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app import db
+from app.repositories.mastery_event_repository import MASTERED_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 15
+
+# Statuses of recommended KCs
+IN_PROGRESS = 'in_progress'
+NEW = 'new'
+
+# Cheap change detector for the tables the graph is built from
+CURRICULUM_VERSION_SQL = text("""
+    SELECT (SELECT COUNT(*) FROM curriculum_goals) AS goals,
+           (SELECT MAX(updated_at) FROM curriculum_goals) AS goals_updated,
+           (SELECT COUNT(*) FROM goal_kcs) AS kcs,
+           (SELECT MAX(created_at) FROM goal_kcs) AS kcs_created,
+           (SELECT COUNT(*) FROM goal_prerequisites) AS prerequisites,
+           (SELECT MAX(id) FROM goal_prerequisites) AS last_prerequisite
+""")
+
+
+class CurriculumGraph:
+    """
+    Goal prerequisite DAG in flat arrays
+
+    Goals are numbered by their topological position (ties broken by grade,
+    subject and goal code) and KCs are numbered so that each goal's KCs are a
+    contiguous range in the same order. A prerequisite is a tuple of KC
+    numbers: one KC when the prerequisite names its goal, otherwise every KC
+    with that code, any of which satisfies it.
+    """
+
+    def __init__(self, goals: Iterable[Sequence[Any]], kcs: Iterable[Sequence[Any]],
+                 prerequisites: Iterable[Sequence[Any]], version: Any = None):
+        """
+        Args:
+            goals: (goal_id, goal_code, title, subject, grade_level) rows
+            kcs: (goal_id, kc_code, kc_name) rows
+            prerequisites: (goal_id, prerequisite_kc_code, prerequisite_goal_id) rows
+            version: Curriculum version the graph was built from
+        """
+        self.version = version
+        goal_rows = {row[0]: tuple(row) for row in goals}
+        kcs_by_goal: Dict[int, List[Tuple[str, str]]] = {}
+        goals_by_code: Dict[str, List[int]] = {}
+        known_kcs = set()
+        for goal_id, kc_code, kc_name in kcs:
+            if goal_id in goal_rows:
+                kcs_by_goal.setdefault(goal_id, []).append((kc_code, kc_name))
+                goals_by_code.setdefault(kc_code, []).append(goal_id)
+                known_kcs.add((goal_id, kc_code))
+
+        # Resolve prerequisites to (goal_id, kc_code) options
+        required: Dict[int, List[Tuple[Tuple[int, str], ...]]] = {}
+        self.unresolved_prerequisites = 0
+        for goal_id, kc_code, prerequisite_goal_id in prerequisites:
+            if goal_id not in goal_rows:
+                continue
+            if prerequisite_goal_id is not None:
+                options = ((prerequisite_goal_id, kc_code),) if (prerequisite_goal_id, kc_code) in known_kcs else ()
+            else:
+                options = tuple((other, kc_code) for other in goals_by_code.get(kc_code, ()) if other != goal_id)
+            if options:
+                required.setdefault(goal_id, []).append(options)
+            else:
+                self.unresolved_prerequisites += 1
+
+        order, self.cyclic_goals = self._topological_order(goal_rows, required)
+
+        # Flat arrays in topological order
+        self.goal_ids: List[int] = []
+        self.goal_info: List[Tuple[str, str, str, int]] = []  # code, title, subject, grade
+        self.kc_start: List[int] = [0]  # KCs of goal g are kc_start[g]:kc_start[g + 1]
+        self.kc_codes: List[str] = []
+        self.kc_names: List[str] = []
+        self.kc_goal: List[int] = []
+        self.kc_index: Dict[Tuple[int, str], int] = {}
+        for position, goal_id in enumerate(order):
+            _, goal_code, title, subject, grade_level = goal_rows[goal_id]
+            self.goal_ids.append(goal_id)
+            self.goal_info.append((goal_code, title, subject, grade_level))
+            for kc_code, kc_name in sorted(kcs_by_goal.get(goal_id, ())):
+                self.kc_index[(goal_id, kc_code)] = len(self.kc_codes)
+                self.kc_codes.append(kc_code)
+                self.kc_names.append(kc_name)
+                self.kc_goal.append(position)
+            self.kc_start.append(len(self.kc_codes))
+
+        self.goal_position = {goal_id: position for position, goal_id in enumerate(self.goal_ids)}
+        self.goal_requires: List[Tuple[Tuple[int, ...], ...]] = [
+            tuple(tuple(self.kc_index[option] for option in options) for options in required.get(goal_id, ()))
+            for goal_id in self.goal_ids
+        ]
+
+        # Goals that can be ready without any mastery, and the goals each KC helps unlock
+        self.root_goals: List[int] = [position for position in range(self.goal_count)
+                                      if not self.goal_requires[position]
+                                      and self.kc_start[position] < self.kc_start[position + 1]]
+        unlocks: Dict[int, set] = {}
+        for position, requirements in enumerate(self.goal_requires):
+            if self.kc_start[position] == self.kc_start[position + 1]:
+                continue
+            for options in requirements:
+                for index in options:
+                    unlocks.setdefault(index, set()).add(position)
+        self.kc_unlocks: Dict[int, Tuple[int, ...]] = {index: tuple(sorted(positions))
+                                                       for index, positions in unlocks.items()}
+
+    @staticmethod
+    def _topological_order(goal_rows: Dict[int, Tuple], required: Dict[int, List[Tuple[Tuple[int, str], ...]]]):
+        """Kahn's algorithm; goals on cycles are appended last and returned separately"""
+        dependents: Dict[int, set] = {}
+        indegree = {goal_id: 0 for goal_id in goal_rows}
+        for goal_id, requirements in required.items():
+            sources = {other for options in requirements for other, _ in options if other != goal_id}
+            for source in sources:
+                dependents.setdefault(source, set()).add(goal_id)
+            indegree[goal_id] = len(sources)
+
+        def key(goal_id):
+            _, goal_code, _, subject, grade_level = goal_rows[goal_id]
+            return (grade_level or 0, subject or '', goal_code or '', goal_id)
+
+        heap = [key(goal_id) for goal_id, degree in indegree.items() if degree == 0]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            goal_id = heapq.heappop(heap)[-1]
+            order.append(goal_id)
+            for dependent in dependents.get(goal_id, ()):
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    heapq.heappush(heap, key(dependent))
+
+        cyclic = sorted((goal_id for goal_id, degree in indegree.items() if degree > 0), key=key)
+        if cyclic:
+            logger.warning(f"Curriculum prerequisites contain cycles through {len(cyclic)} goals; "
+                           f"they are ordered last")
+        return order + cyclic, cyclic
+
+    @property
+    def goal_count(self) -> int:
+        return len(self.goal_ids)
+
+    @property
+    def kc_count(self) -> int:
+        return len(self.kc_codes)
+
+    def mastery_vector(self, rows: Iterable[Tuple[int, str, float]]) -> Dict[int, float]:
+        """Sparse KC number -> mastery map from (goal_id, kc_code, mastery_percentage) rows"""
+        vector = {}
+        for goal_id, kc_code, mastery in rows:
+            index = self.kc_index.get((goal_id, kc_code))
+            if index is not None:
+                vector[index] = mastery
+        return vector
+
+    def ready_frontier(self, mastery: Dict[int, float], limit: int = DEFAULT_LIMIT,
+                       threshold: float = MASTERED_THRESHOLD,
+                       max_grade_level: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        Rank the KCs a student is ready to learn
+
+        A goal is ready when every prerequisite is mastered. Started but
+        unmastered KCs of ready goals come first (curriculum order, then
+        closest to mastery), followed by unstarted KCs of ready goals in
+        curriculum order. Only goals without prerequisites and goals the
+        student's mastered KCs unlock are scanned, and the scan stops once
+        the limit is filled.
+
+        Args:
+            mastery: Sparse KC number -> mastery percentage
+            limit: Maximum KCs to return
+            threshold: Mastery percentage at which a KC counts as mastered
+            max_grade_level: Skip unstarted KCs of goals above this grade
+
+        Returns:
+            List of (KC number, status) pairs, best first
+        """
+        goal_ready: Dict[int, bool] = {}
+
+        def is_ready(position: int) -> bool:
+            ready = goal_ready.get(position)
+            if ready is None:
+                ready = all(max(mastery.get(option, 0.0) for option in options) >= threshold
+                            for options in self.goal_requires[position])
+                goal_ready[position] = ready
+            return ready
+
+        started = sorted((self.kc_goal[index], -value, index) for index, value in mastery.items()
+                         if value < threshold and is_ready(self.kc_goal[index]))
+        frontier = [(index, IN_PROGRESS) for _, _, index in started[:limit]]
+
+        unlocked = {position for index, value in mastery.items() if value >= threshold
+                    for position in self.kc_unlocks.get(index, ())}
+        for position in heapq.merge(self.root_goals, sorted(unlocked)):
+            if len(frontier) >= limit:
+                break
+            if max_grade_level is not None and self.goal_info[position][3] > max_grade_level:
+                continue
+            start, end = self.kc_start[position], self.kc_start[position + 1]
+            if not is_ready(position):
+                continue
+            for index in range(start, end):
+                if index not in mastery:
+                    frontier.append((index, NEW))
+                    if len(frontier) >= limit:
+                        break
+        return frontier
+
+    def describe(self, index: int, mastery: Dict[int, float], status: str) -> Dict[str, Any]:
+        """Recommendation dictionary for one KC number"""
+        position = self.kc_goal[index]
+        goal_code, title, subject, grade_level = self.goal_info[position]
+        return {
+            'goal_id': self.goal_ids[position],
+            'goal_code': goal_code,
+            'goal_title': title,
+            'subject': subject,
+            'grade_level': grade_level,
+            'kc_code': self.kc_codes[index],
+            'kc_name': self.kc_names[index],
+            'mastery_percentage': mastery.get(index, 0.0),
+            'status': status,
+            'curriculum_position': position
+        }
+
+
+_graph: Optional[CurriculumGraph] = None
+_graph_checked_at = 0.0
+_graph_lock = threading.Lock()
+
+
+def get_curriculum_version() -> Tuple:
+    """Row counts and latest change times of the curriculum graph tables"""
+    return tuple(db.session.execute(CURRICULUM_VERSION_SQL).one())
+
+
+def load_curriculum_graph(version: Any = None) -> CurriculumGraph:
+    """Build the graph from the database in three column-only queries"""
+    goals = db.session.execute(text(
+        "SELECT id, goal_code, title, subject, grade_level FROM curriculum_goals")).all()
+    kcs = db.session.execute(text("SELECT goal_id, kc_code, kc_name FROM goal_kcs")).all()
+    prerequisites = db.session.execute(text(
+        "SELECT goal_id, prerequisite_kc_code, prerequisite_goal_id FROM goal_prerequisites")).all()
+    graph = CurriculumGraph(goals, kcs, prerequisites, version)
+    logger.info(f"Loaded curriculum graph: {graph.goal_count} goals, {graph.kc_count} KCs, "
+                f"{graph.unresolved_prerequisites} unresolved prerequisites")
+    return graph
+
+
+def get_curriculum_graph() -> CurriculumGraph:
+    """
+    The cached curriculum graph, rebuilt when the curriculum version changes
+
+    The version is re-read at most every CURRICULUM_GRAPH_CHECK_SECONDS
+    (default 60) per process.
+    """
+    global _graph, _graph_checked_at
+    interval = float(os.getenv('CURRICULUM_GRAPH_CHECK_SECONDS', 60))
+    with _graph_lock:
+        now = time.monotonic()
+        if _graph is not None and now - _graph_checked_at < interval:
+            return _graph
+        version = get_curriculum_version()
+        if _graph is None or _graph.version != version:
+            _graph = load_curriculum_graph(version)
+        _graph_checked_at = now
+        return _graph
+
+
+def invalidate_curriculum_graph() -> None:
+    """Force the next get_curriculum_graph call to re-check the curriculum version"""
+    global _graph_checked_at
+    with _graph_lock:
+        _graph_checked_at = 0.0
+
+
+class KCRecommendationService:
+    """Recommends next knowledge components from the prerequisite graph"""
+
+    def __init__(self, graph: Optional[CurriculumGraph] = None):
+        self._graph = graph
+
+    @property
+    def graph(self) -> CurriculumGraph:
+        return self._graph if self._graph is not None else get_curriculum_graph()
+
+    def get_mastery_vectors(self, graph: CurriculumGraph, student_ids: List[int]) -> Dict[int, Dict[int, float]]:
+        """Sparse mastery vectors for a batch of students in one query"""
+        from app.models.mastery_tracking import StudentKCProgress
+
+        vectors: Dict[int, Dict[int, float]] = {student_id: {} for student_id in student_ids}
+        if not student_ids:
+            return vectors
+        rows = db.session.query(StudentKCProgress.student_id, StudentKCProgress.goal_id,
+                                StudentKCProgress.kc_code, StudentKCProgress.mastery_percentage)\
+                         .filter(StudentKCProgress.student_id.in_(student_ids))\
+                         .all()
+        for student_id, goal_id, kc_code, mastery in rows:
+            index = graph.kc_index.get((goal_id, kc_code))
+            if index is not None:
+                vectors[student_id][index] = mastery
+        return vectors
+
+    def recommend_for_students(self, student_ids: List[int], limit: int = DEFAULT_LIMIT,
+                               threshold: float = MASTERED_THRESHOLD,
+                               max_grade_level: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Ranked ready-to-learn KCs for a batch of students
+
+        Args:
+            student_ids: Student IDs
+            limit: Maximum KCs per student
+            threshold: Mastery percentage at which a KC counts as mastered
+            max_grade_level: Skip unstarted KCs of goals above this grade
+
+        Returns:
+            Dictionary of student ID -> recommendation dictionaries, best first
+        """
+        graph = self.graph
+        vectors = self.get_mastery_vectors(graph, student_ids)
+        return {
+            student_id: [graph.describe(index, vector, status) for index, status in
+                         graph.ready_frontier(vector, limit, threshold, max_grade_level)]
+            for student_id, vector in vectors.items()
+        }
+
+    def recommend(self, student_id: int, limit: int = DEFAULT_LIMIT, threshold: float = MASTERED_THRESHOLD,
+                  max_grade_level: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked ready-to-learn KCs for one student (see recommend_for_students)
+
+        Returns an empty list if the curriculum graph can't be loaded.
+        """
+        try:
+            return self.recommend_for_students([student_id], limit, threshold, max_grade_level)[student_id]
+        except Exception as e:
+            logger.error(f"Error recommending KCs for student {student_id}: {e}")
+            return []
+
+
+kc_recommendation_service = KCRecommendationService()
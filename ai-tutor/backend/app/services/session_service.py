@@ -8,8 +8,9 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 from app import db
-from app.models.session import Session
+from app.models.session import Session, ProcessingState
 from app.models.student import Student
+from app.repositories import session_repository
 
 
 class SessionService:
@@ -266,32 +267,18 @@ class SessionService:
             Tuple of (session_data, transcript, analysis)
         """
         try:
-            # For now, fallback to file-based approach
-            session_path = f"data/students/{student_id}/sessions/{session_file}"
-            
-            session_data = None
-            transcript = None
-            analysis = None
-            
-            # Try to read session file
-            if os.path.exists(session_path):
-                with open(session_path, 'r', encoding='utf-8') as f:
-                    session_data = json.load(f)
-            
-            # Try to read transcript
-            transcript_file = session_data.get('transcript_file') if session_data else None
-            if transcript_file:
-                transcript_path = f"data/students/{student_id}/sessions/{transcript_file}"
-                if os.path.exists(transcript_path):
-                    with open(transcript_path, 'r', encoding='utf-8') as f:
-                        transcript = f.read()
-            
-            # Try to read analysis
+            from app.storage import artifact_manager
+            
             analysis_file = session_file.replace('.json', '_analysis.json')
-            analysis_path = f"data/students/{student_id}/sessions/{analysis_file}"
-            if os.path.exists(analysis_path):
-                with open(analysis_path, 'r', encoding='utf-8') as f:
-                    analysis = json.load(f)
+            
+            session_data = artifact_manager.load_json(student_id, session_file)
+            if session_data is None:
+                # Sessions saved before the artifact store live on local disk
+                return self._get_legacy_session_details(student_id, session_file, analysis_file)
+            
+            transcript_file = session_data.get('transcript_file')
+            transcript = artifact_manager.load_text(student_id, transcript_file) if transcript_file else None
+            analysis = artifact_manager.load_json(student_id, analysis_file)
             
             return session_data, transcript, analysis
             
@@ -299,6 +286,33 @@ class SessionService:
             print(f"Error getting session details for {student_id}/{session_file}: {e}")
             return None, None, None
     
+    def _get_legacy_session_details(self, student_id: str, session_file: str, analysis_file: str) -> tuple:
+        """Read session files from the legacy data/students/<id>/sessions directory"""
+        sessions_dir = f"data/students/{student_id}/sessions"
+        
+        session_data = None
+        transcript = None
+        analysis = None
+        
+        session_path = f"{sessions_dir}/{session_file}"
+        if os.path.exists(session_path):
+            with open(session_path, 'r', encoding='utf-8') as f:
+                session_data = json.load(f)
+        
+        transcript_file = session_data.get('transcript_file') if session_data else None
+        if transcript_file:
+            transcript_path = f"{sessions_dir}/{transcript_file}"
+            if os.path.exists(transcript_path):
+                with open(transcript_path, 'r', encoding='utf-8') as f:
+                    transcript = f.read()
+        
+        analysis_path = f"{sessions_dir}/{analysis_file}"
+        if os.path.exists(analysis_path):
+            with open(analysis_path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f)
+        
+        return session_data, transcript, analysis
+    
     def process_vapi_end_of_call(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process VAPI end-of-call webhook
@@ -369,7 +383,7 @@ class SessionService:
                     'id': session.id,
                     'date': session.start_datetime.isoformat() if session.start_datetime else None,
                     'summary': session.summary,
-                    'duration_minutes': session.duration_seconds // 60 if session.duration_seconds else 0,
+                    'duration_minutes': session.duration // 60 if session.duration else 0,
                     'session_type': session.session_type or 'phone',
                     'created_at': session.created_at.isoformat() if session.created_at else None
                 }
@@ -432,24 +446,9 @@ class SessionService:
                 print(f"ℹ️ Session {session_id} already has summary")
                 return True
             
-            # Generate summary from transcript if available
-            if session.transcript and session.transcript.strip():
-                # Create a basic summary from transcript
-                transcript_lines = session.transcript.split('\n')
-                # Take first few lines as a basic summary
-                summary_lines = transcript_lines[:3]
-                basic_summary = ' '.join(summary_lines).strip()
-                
-                if basic_summary:
-                    session.summary = f"Session summary (auto-generated): {basic_summary}"
-                    db.session.commit()
-                    print(f"✅ Created basic summary for session {session_id}")
-                    return True
-            
-            # Fallback: create minimal summary
-            session.summary = f"Session conducted on {session.start_datetime.strftime('%Y-%m-%d %H:%M') if session.start_datetime else 'unknown date'}"
+            session.summary = self.build_basic_summary(session)
             db.session.commit()
-            print(f"✅ Created minimal summary for session {session_id}")
+            print(f"✅ Created basic summary for session {session_id}")
             return True
             
         except Exception as e:
@@ -457,10 +456,32 @@ class SessionService:
             print(f"Error ensuring summary for session {session_id}: {e}")
             return False
     
+    @staticmethod
+    def build_basic_summary(session: Session) -> str:
+        """
+        Build a cheap, non-AI summary for a session
+        Used when no AI-generated summary is available
+        
+        Args:
+            session: The session model instance
+            
+        Returns:
+            Summary text
+        """
+        if session.transcript and session.transcript.strip():
+            # Take first few lines of the transcript as a basic summary
+            summary_lines = session.transcript.split('\n')[:3]
+            basic_summary = ' '.join(summary_lines).strip()
+            if basic_summary:
+                return f"Session summary (auto-generated): {basic_summary}"
+        
+        return f"Session conducted on {session.start_datetime.strftime('%Y-%m-%d %H:%M') if session.start_datetime else 'unknown date'}"
+    
     def get_sessions_needing_ai_update(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get sessions that need AI-driven profile/memory updates
-        Used for batch processing of sessions
+        Read-only view of the pending part of the processing queue; workers
+        should use claim_sessions_for_ai_update to actually take work
         
         Args:
             limit: Maximum number of sessions to return
@@ -469,29 +490,93 @@ class SessionService:
             List of session dictionaries that need AI processing
         """
         try:
-            # Get recent sessions with transcripts but potentially needing AI updates
-            sessions = Session.query.filter(Session.transcript.isnot(None))\
-                                  .filter(Session.transcript != '')\
-                                  .order_by(Session.start_datetime.desc())\
+            sessions = Session.query.filter(Session.processing_state == ProcessingState.pending.value)\
+                                  .order_by(Session.id)\
                                   .limit(limit).all()
             
-            session_data = []
-            for session in sessions:
-                if hasattr(session, 'to_dict'):
-                    session_data.append(session.to_dict())
-                else:
-                    session_data.append({
-                        'id': session.id,
-                        'student_id': session.student_id,
-                        'start_datetime': session.start_datetime.isoformat() if session.start_datetime else None,
-                        'transcript': session.transcript,
-                        'summary': session.summary,
-                        'session_type': session.session_type
-                    })
+            session_data = [session.to_dict() for session in sessions]
             
             print(f"✅ Found {len(session_data)} sessions needing AI updates")
             return session_data
             
         except Exception as e:
             print(f"Error getting sessions needing AI update: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def claim_sessions_for_ai_update(self, owner: str, batch_size: int = 10,
+                                     lease_seconds: int = session_repository.DEFAULT_LEASE_SECONDS) -> List[int]:
+        """
+        Claim a batch of sessions for AI processing
+        Safe to call from any number of workers concurrently - each session
+        is handed to exactly one worker until its lease expires
+        
+        Args:
+            owner: Lease owner token (session_repository.new_lease_owner)
+            batch_size: Maximum number of sessions to claim
+            lease_seconds: Seconds before an unfinished claim can be retaken
+            
+        Returns:
+            List of claimed session IDs
+        """
+        try:
+            claimed_ids = session_repository.claim_processing_batch(owner, batch_size, lease_seconds)
+            if claimed_ids:
+                print(f"✅ Claimed {len(claimed_ids)} sessions for AI processing")
+            return claimed_ids
+        except Exception as e:
+            print(f"Error claiming sessions for AI update: {e}")
+            return []
+    
+    def complete_session_processing(self, session_id: int, owner: str, success: bool, error: str = None) -> bool:
+        """
+        Record the outcome of AI processing for a claimed session
+        
+        Args:
+            session_id: The session ID
+            owner: Lease owner token the session was claimed with
+            success: Whether processing succeeded
+            error: Error message when processing failed
+            
+        Returns:
+            True if the state was recorded, False otherwise (including when
+            the lease expired and another worker has reclaimed the session)
+        """
+        try:
+            if success:
+                return session_repository.mark_processing_done(session_id, owner)
+            return session_repository.mark_processing_failed(session_id, error or 'Unknown error', owner)
+        except Exception as e:
+            print(f"Error recording processing outcome for session {session_id}: {e}")
+            return False
+    
+    def search_sessions(self, query: str, limit: int = 20, cursor: Optional[str] = None,
+                        student_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ranked full-text search over session transcripts and summaries
+        
+        Args:
+            query: Search text
+            limit: Maximum number of results per page
+            cursor: Opaque cursor from a previous page's next_cursor
+            student_id: Optionally restrict the search to one student
+            
+        Returns:
+            Dictionary with results and next_cursor (None on the last page)
+        """
+        after_rank = after_id = None
+        if cursor:
+            try:
+                rank_part, id_part = cursor.rsplit(':', 1)
+                after_rank, after_id = float(rank_part), int(id_part)
+            except ValueError:
+                raise ValueError(f"Invalid search cursor: {cursor}")
+        
+        results = session_repository.search(query, limit=limit, after_rank=after_rank,
+                                            after_id=after_id, student_id=student_id)
+        
+        next_cursor = None
+        if len(results) == limit:
+            last = results[-1]
+            next_cursor = f"{last['rank']!r}:{last['session_id']}"
+        
+        return {'results': results, 'next_cursor': next_cursor}
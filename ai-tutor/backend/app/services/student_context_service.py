@@ -7,11 +7,16 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 from app import db
+from app.ai.context_budget import (
+    ContextAssembler, ContextSection, DEFAULT_SESSION_BUDGET, first_sentences, get_token_budget, rank_items
+)
 from app.models.student import Student
 from app.models.curriculum import Curriculum
 from app.repositories import student_repository, student_profile_repository, student_memory_repository
 from app.repositories.curriculum_repository import get_grade_atlas
 
+# Ranked lists inside the progress block, budgeted as separate sections
+PROGRESS_LISTS = ('incomplete_goals', 'incomplete_knowledge_components', 'next_knowledge_components')
 
 class StudentContextService:
     """Service class for building v4 student context for AI tutoring"""
@@ -19,12 +24,14 @@ class StudentContextService:
     def __init__(self):
         pass
     
-    def build(self, student_id: int) -> Dict[str, Any]:
+    def build(self, student_id: int, token_budget: Optional[int] = None) -> Dict[str, Any]:
         """
         Build comprehensive v4 student context for AI tutoring
         
         Args:
             student_id: The student ID
+            token_budget: Token budget for the context (default AI_CONTEXT_TOKENS
+                or 6000; 0 disables budgeting)
             
         Returns:
             Dictionary containing v4 context structure with:
@@ -34,6 +41,7 @@ class StudentContextService:
             - progress
             - _curriculum (curriculum atlas)
             - context_version: 4
+            - _context_budget (which sections were truncated, summarised or dropped)
         """
         try:
             # Get basic student data
@@ -72,6 +80,10 @@ class StudentContextService:
                 'generated_at': datetime.utcnow().isoformat()
             }
             
+            if token_budget is None:
+                token_budget = get_token_budget('AI_CONTEXT_TOKENS', DEFAULT_SESSION_BUDGET)
+            context = self._apply_token_budget(context, token_budget)
+            
             print(f"✅ Built v4 context for student {student_id}")
             return context
             
@@ -164,6 +176,7 @@ class StudentContextService:
         try:
             from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
             from app.repositories.student_kc_progress_repository import StudentKCProgressRepository
+            from app.services.kc_recommendation_service import kc_recommendation_service
             
             # Initialize repositories
             goal_progress_repo = StudentGoalProgressRepository(db.session)
@@ -177,6 +190,9 @@ class StudentContextService:
             incomplete_goals = goal_progress_repo.get_incomplete_goals(student_id, threshold=100.0)[:10]
             incomplete_kcs = kc_progress_repo.get_incomplete_kcs(student_id, threshold=100.0)[:15]
             
+            # KCs whose prerequisites are mastered, ranked in curriculum order
+            next_kcs = kc_recommendation_service.recommend(student_id, limit=15)
+            
             # Build progress structure
             progress = {
                 'overall_mastery': {
@@ -188,6 +204,7 @@ class StudentContextService:
                 'mastery_by_subject': goal_mastery_map.get('mastery_by_subject', {}),
                 'incomplete_goals': incomplete_goals,
                 'incomplete_knowledge_components': incomplete_kcs,
+                'next_knowledge_components': next_kcs,
                 'progress_summary': f"Tracking {goal_mastery_map.get('total_goals_tracked', 0)} goals and {kc_mastery_map.get('total_kcs_tracked', 0)} knowledge components"
             }
             
@@ -205,6 +222,7 @@ class StudentContextService:
                 'mastery_by_subject': {},
                 'incomplete_goals': [],
                 'incomplete_knowledge_components': [],
+                'next_knowledge_components': [],
                 'progress_summary': 'Error loading progress data',
                 'error': str(e)
             }
@@ -221,9 +239,7 @@ class StudentContextService:
                 }
             
             # Get student's grade level
-            grade_level = student.get_grade()
-            if not grade_level or grade_level == 'Unknown':
-                grade_level = 1  # Default to grade 1 if unknown
+            grade_level = student.grade_level or 1  # Default to grade 1 if unknown
             
             # Get curriculum atlas using the new repository method (with Redis caching)
             curriculum_atlas = get_grade_atlas(default_curriculum.id, grade_level)
@@ -243,6 +259,79 @@ class StudentContextService:
                 'atlas_generated_at': datetime.utcnow().isoformat()
             }
     
+    def _apply_token_budget(self, context: Dict[str, Any], token_budget: int) -> Dict[str, Any]:
+        """
+        Fit the context blocks into a token budget, keeping the v4 shape
+        
+        Demographics, profile and mastery totals go first; memories and
+        incomplete goals/KCs are ranked by recency and need, and the curriculum
+        atlas is summarised (codes and titles only) or dropped last.
+        """
+        profile = context['profile']
+        memories = context['memories']
+        progress = context['progress']
+        atlas = context['_curriculum']
+        
+        def needs_work(item: Dict[str, Any]) -> float:
+            return 1.0 - min(max(item.get('mastery_percentage') or 0.0, 0.0), 100.0) / 100.0
+        
+        progress_overview = {key: value for key, value in progress.items()
+                             if key not in PROGRESS_LISTS}
+        sections = [
+            ContextSection('demographics', context['demographics'], priority=100),
+            ContextSection('profile', profile, priority=90, summary=dict(
+                profile, current_narrative=first_sentences(profile.get('current_narrative'), 3))),
+            ContextSection('progress', progress_overview, priority=85),
+            ContextSection('memories.personal_facts', rank_items(memories.get('personal_facts', []), 'updated_at'),
+                           priority=80),
+            ContextSection('memories.strategy_logs', rank_items(memories.get('strategy_logs', []), 'updated_at'),
+                           priority=70),
+            ContextSection('progress.incomplete_goals', rank_items(
+                progress.get('incomplete_goals', []), 'last_updated', needs_work), priority=65),
+            ContextSection('progress.next_knowledge_components', progress.get('next_knowledge_components', []),
+                           priority=62),
+            ContextSection('progress.incomplete_knowledge_components', rank_items(
+                progress.get('incomplete_knowledge_components', []), 'last_updated', needs_work), priority=60),
+            ContextSection('memories.game_states', rank_items(memories.get('game_states', []), 'updated_at'),
+                           priority=40),
+            ContextSection('_curriculum', atlas, priority=30, summary=self._summarize_atlas(atlas))
+        ]
+        assembled = ContextAssembler(token_budget).assemble(sections)
+        kept = assembled.sections
+        
+        budgeted = dict(context)
+        budgeted['profile'] = kept.get('profile', profile)
+        budgeted['memories'] = dict(memories, **{
+            scope: kept.get(f"memories.{scope}", []) for scope in ('personal_facts', 'strategy_logs', 'game_states')
+        })
+        budgeted['progress'] = dict(kept.get('progress', progress_overview), **{
+            key: kept.get(f"progress.{key}", []) for key in PROGRESS_LISTS
+        })
+        budgeted['_curriculum'] = kept.get('_curriculum', {
+            'subjects': {}, 'omitted': 'Curriculum atlas dropped to fit the token budget'
+        })
+        budgeted['_context_budget'] = assembled.report
+        return budgeted
+    
+    def _summarize_atlas(self, atlas: Dict[str, Any]) -> Dict[str, Any]:
+        """Curriculum atlas without descriptions: goal codes, titles and KC codes per subject"""
+        summary = {key: value for key, value in atlas.items() if key != 'subjects'}
+        summary['summarised'] = True
+        summary['subjects'] = {
+            subject_name: {
+                'subject_name': subject_name,
+                'goals': {
+                    goal_code: {
+                        'goal_title': goal.get('goal_title'),
+                        'kc_codes': list(goal.get('knowledge_components', {}).keys())
+                    }
+                    for goal_code, goal in subject.get('goals', {}).items()
+                }
+            }
+            for subject_name, subject in atlas.get('subjects', {}).items()
+        }
+        return summary
+    
     def get_context_summary(self, student_id: int) -> Dict[str, Any]:
         """
         Get a lightweight summary of the student context (for performance)
@@ -8,7 +8,14 @@ import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
-from ai.providers import provider_manager
+from app.ai.providers import provider_manager
+from app.ai.event_loop import run_async
+from app.ai.structured_output import structured_output, extract_json, get_parse_stats
+from app.ai.transcript_triage import transcript_triage
+from app.ai.context_budget import (
+    AssembledContext, ContextAssembler, ContextSection, DEFAULT_UPDATE_BUDGET,
+    first_sentences, get_token_budget, rank_items, render
+)
 from ai.prompts_file_loader import load_prompt_template
 from app.services.student_service import StudentService
 from app.services.session_service import SessionService
@@ -16,6 +23,9 @@ from app.repositories import student_profile_repository, student_memory_reposito
 
 logger = logging.getLogger(__name__)
 
+# Memory scopes in the update prompt, by priority under the token budget
+MEMORY_PRIORITIES = {'personal_fact': 80, 'strategy_log': 70, 'game_state': 40}
+
 
 class StudentProfileAIService:
     """Service for AI-driven student profile and memory updates"""
@@ -25,12 +35,15 @@ class StudentProfileAIService:
         self.session_service = SessionService()
         self.provider_manager = provider_manager
     
-    def post_session_ai_update(self, session_id: int) -> Dict[str, Any]:
+    def post_session_ai_update(self, session_id: int,
+                               precomputed_response: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Perform AI-driven profile and memory updates after a tutoring session
         
         Args:
             session_id: The session ID to process
+            precomputed_response: Update section from combined analysis; used instead of
+                a separate LLM call when it passes validation
             
         Returns:
             Dictionary with update results and status
@@ -68,8 +81,27 @@ class StudentProfileAIService:
                     'session_id': session_id
                 }
             
+            # Skip low-information calls (hang-ups, only a name and age) unless analysis already ran
+            if precomputed_response is None:
+                triage = transcript_triage.triage(session.transcript)
+                if triage.skip_llm:
+                    transcript_triage.record_avoided('post_session_update')
+                    logger.info(f"Skipping AI update for session {session_id} - {triage.reason}")
+                    return {
+                        'success': True,
+                        'skipped': True,
+                        'reason': f"Low-information call: {triage.reason}",
+                        'session_id': session_id
+                    }
+            
             logger.info(f"Starting AI-driven post-session update for session {session_id}, student {session.student_id}")
             
+            if self.validate_update_response(precomputed_response):
+                logger.info(f"Using combined analysis result for session {session_id}")
+                return self._complete_update(session, precomputed_response, analysis=None)
+            if precomputed_response is not None:
+                logger.warning(f"Combined update section for session {session_id} invalid, running separate update")
+            
             # Get full student context
             student_context = self.student_service.get_full_context(session.student_id)
             if 'error' in student_context:
@@ -91,12 +123,13 @@ class StudentProfileAIService:
                 'session_id': session_id
             }
             
-            analysis = self.provider_manager.analyze_session(session.transcript, ai_context)
+            analysis = run_async(self.provider_manager.analyze_session(session.transcript, ai_context))
             
-            # Parse JSON response
+            # Use the response the provider already parsed; fall back to extracting it from text
             try:
-                if analysis.raw_response:
-                    # Try to extract JSON from the response
+                if isinstance(analysis.parsed_response, dict):
+                    ai_response = analysis.parsed_response
+                elif analysis.raw_response:
                     ai_response = self._extract_json_from_response(analysis.raw_response)
                 else:
                     raise ValueError("No raw response from AI provider")
@@ -112,26 +145,7 @@ class StudentProfileAIService:
                     'raw_response': analysis.raw_response
                 }
             
-            # Apply updates
-            update_results = self._apply_ai_updates(session.student_id, ai_response)
-            
-            # Ensure session has summary
-            self.session_service.ensure_session_summary(session_id)
-            
-            # Log successful completion
-            logger.info(f"✅ AI post-session update completed for session {session_id}")
-            
-            return {
-                'success': True,
-                'session_id': session_id,
-                'student_id': session.student_id,
-                'ai_response': ai_response,
-                'update_results': update_results,
-                'processing_time': analysis.processing_time,
-                'cost_estimate': analysis.cost_estimate,
-                'provider_used': analysis.provider_used,
-                'confidence_score': ai_response.get('confidence_score', 0.0)
-            }
+            return self._complete_update(session, ai_response, analysis)
             
         except Exception as e:
             logger.error(f"Error in post-session AI update for session {session_id}: {e}")
@@ -144,10 +158,93 @@ class StudentProfileAIService:
                 'student_id': getattr(session, 'student_id', None) if 'session' in locals() else None
             }
     
+    def prepare_update_prompt(self, session_id: int) -> Dict[str, Any]:
+        """
+        Build the post-session update prompt without calling the AI provider,
+        for offline batch submission
+        
+        Args:
+            session_id: The session ID to process
+            
+        Returns:
+            Dictionary with success, prompt and student_id, or an error
+        """
+        from app.models.session import Session
+        
+        session = Session.query.get(session_id)
+        if not session or not session.student_id:
+            return {'success': False, 'error': f'Session {session_id} has no student'}
+        if not session.transcript or len(session.transcript.strip()) < 50:
+            return {'success': False, 'error': 'Insufficient transcript'}
+        
+        triage = transcript_triage.triage(session.transcript)
+        if triage.skip_llm:
+            transcript_triage.record_avoided('post_session_update')
+            return {'success': False, 'skipped': True, 'error': f"Low-information call: {triage.reason}"}
+        
+        student_context = self.student_service.get_full_context(session.student_id)
+        if 'error' in student_context:
+            return {'success': False, 'error': f"Failed to get student context: {student_context['error']}"}
+        
+        return {
+            'success': True,
+            'prompt': self._build_update_prompt(session.transcript, student_context),
+            'student_id': session.student_id
+        }
+    
+    def _complete_update(self, session, ai_response: Dict[str, Any], analysis=None) -> Dict[str, Any]:
+        """
+        Apply a parsed update response and build the result
+        
+        Args:
+            session: The session being processed
+            ai_response: Parsed update response
+            analysis: Provider analysis for the separate call (None for combined analysis)
+            
+        Returns:
+            Dictionary with update results and status
+        """
+        # Apply updates
+        update_results = self._apply_ai_updates(session.student_id, ai_response, session.id)
+        
+        # Ensure session has summary
+        self.session_service.ensure_session_summary(session.id)
+        
+        # Log successful completion
+        logger.info(f"✅ AI post-session update completed for session {session.id}")
+        
+        return {
+            'success': True,
+            'session_id': session.id,
+            'student_id': session.student_id,
+            'ai_response': ai_response,
+            'update_results': update_results,
+            'processing_time': analysis.processing_time if analysis else 0.0,
+            'cost_estimate': analysis.cost_estimate if analysis else 0.0,
+            'provider_used': analysis.provider_used if analysis else 'combined_analysis',
+            'confidence_score': ai_response.get('confidence_score', 0.0)
+        }
+    
+    @staticmethod
+    def validate_update_response(response: Any) -> bool:
+        """
+        Check that a response has the post-session update structure
+        
+        Args:
+            response: Parsed update response (or combined analysis section)
+            
+        Returns:
+            True if the response can be applied
+        """
+        return isinstance(response, dict) and not structured_output.validate('post_session_update', response)
+    
     def _build_update_prompt(self, transcript: str, student_context: Dict[str, Any]) -> str:
         """
         Build the AI prompt for post-session updates
         
+        The student context is fitted into AI_UPDATE_CONTEXT_TOKENS (default
+        3000) so prompt size doesn't grow with the student's history.
+        
         Args:
             transcript: Session transcript
             student_context: Full student context
@@ -155,21 +252,15 @@ class StudentProfileAIService:
         Returns:
             Formatted prompt string
         """
+        values = self.render_update_context(student_context)
+        
         try:
-            # Load the prompt template
+            # Load the prompt template; placeholders are replaced by name because
+            # the template's JSON examples contain literal braces
             template = load_prompt_template('post_session_update.md')
-            
-            # Format with student context
-            formatted_prompt = template.format(
-                basic_info=json.dumps(student_context.get('basic_info', {}), indent=2),
-                current_profile=json.dumps(student_context.get('current_profile', {}), indent=2),
-                existing_memories=json.dumps(student_context.get('memories', {}), indent=2),
-                recent_sessions=json.dumps(student_context.get('recent_sessions', []), indent=2),
-                mastery_context=json.dumps(student_context.get('mastery_context', {}), indent=2),
-                transcript=transcript
-            )
-            
-            return formatted_prompt
+            for key, value in dict(values, transcript=transcript).items():
+                template = template.replace('{' + key + '}', value)
+            return template
             
         except Exception as e:
             logger.error(f"Error building update prompt: {e}")
@@ -177,7 +268,7 @@ class StudentProfileAIService:
             return f"""
             Analyze this tutoring session transcript and extract student profile and memory updates.
 
-            Student Context: {json.dumps(student_context, indent=2)}
+            Student Context: {json.dumps(values, indent=2)}
             
             Session Transcript:
             {transcript}
@@ -185,6 +276,83 @@ class StudentProfileAIService:
             Respond with a JSON object containing profile_updates and memory_updates.
             """
     
+    def render_update_context(self, student_context: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Render the budgeted student context for the update prompt placeholders
+        
+        Also used by combined analysis, so both paths send the same context
+        under the same AI_UPDATE_CONTEXT_TOKENS budget.
+        
+        Args:
+            student_context: Full student context from StudentService.get_full_context
+            
+        Returns:
+            Dictionary of placeholder name -> rendered text; mastery_context ends
+            with a note on anything cut to fit the budget
+        """
+        assembled = self._assemble_update_context(student_context)
+        context = assembled.sections
+        mastery_context = {key: context[key] for key in ('mastery_totals', 'incomplete_goals',
+                                                         'next_knowledge_components',
+                                                         'incomplete_knowledge_components') if key in context}
+        values = {
+            'basic_info': render(context.get('basic_info', {})),
+            'current_profile': render(context.get('current_profile', {})),
+            'existing_memories': render({scope: context[f"memories.{scope}"] for scope in MEMORY_PRIORITIES
+                                         if f"memories.{scope}" in context}),
+            'recent_sessions': render(context.get('recent_sessions', [])),
+            'mastery_context': render(mastery_context)
+        }
+        cuts = assembled.describe_cuts()
+        if cuts:
+            values['mastery_context'] += f"\n- Note: {cuts}"
+        logger.debug(f"Update prompt context: {assembled.report['used_tokens']}/{assembled.report['budget_tokens']} "
+                     f"tokens, dropped {assembled.report['dropped']}")
+        return values
+    
+    def _assemble_update_context(self, student_context: Dict[str, Any]) -> AssembledContext:
+        """
+        Rank and fit the student context into the update prompt's token budget
+        
+        Args:
+            student_context: Full student context from StudentService.get_full_context
+            
+        Returns:
+            AssembledContext keyed by section name
+        """
+        profile = student_context.get('current_profile') or {}
+        memories = student_context.get('memories') or {}
+        mastery = student_context.get('mastery_context') or {}
+        
+        def needs_work(item: Dict[str, Any]) -> float:
+            return 1.0 - min(max(item.get('mastery_percentage') or 0.0, 0.0), 100.0) / 100.0
+        
+        sections = [
+            ContextSection('basic_info', student_context.get('basic_info', {}), priority=100),
+            ContextSection('current_profile', profile, priority=90, summary={
+                'narrative': first_sentences(profile.get('narrative'), 3),
+                'traits': profile.get('traits', {})
+            } if profile else None),
+            ContextSection('mastery_totals', {
+                'total_incomplete_goals': mastery.get('total_incomplete_goals', 0),
+                'total_incomplete_kcs': mastery.get('total_incomplete_kcs', 0)
+            }, priority=85),
+            ContextSection('incomplete_goals', rank_items(
+                mastery.get('incomplete_goals', []), 'last_updated', needs_work), priority=65),
+            ContextSection('next_knowledge_components', mastery.get('next_knowledge_components', []),
+                           priority=62),
+            ContextSection('incomplete_knowledge_components', rank_items(
+                mastery.get('incomplete_knowledge_components', []), 'last_updated', needs_work), priority=60),
+            ContextSection('recent_sessions', rank_items(
+                student_context.get('recent_sessions', []), 'date'), priority=55)
+        ]
+        for scope, priority in MEMORY_PRIORITIES.items():
+            sections.append(ContextSection(f"memories.{scope}", rank_items(memories.get(scope, []), 'updated_at'),
+                                           priority=priority))
+        
+        budget = get_token_budget('AI_UPDATE_CONTEXT_TOKENS', DEFAULT_UPDATE_BUDGET)
+        return ContextAssembler(budget).assemble(sections)
+    
     def _extract_json_from_response(self, response: str) -> Dict[str, Any]:
         """
         Extract JSON object from AI response
@@ -195,38 +363,20 @@ class StudentProfileAIService:
         Returns:
             Parsed JSON object
         """
-        # Try to find JSON block in the response
-        import re
-        
-        # Look for JSON code blocks
-        json_match = re.search(r'```json\s*\n(.*?)\n```', response, re.DOTALL | re.IGNORECASE)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Look for standalone JSON object
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                # Try to parse the whole response
-                json_str = response.strip()
-        
         try:
-            parsed = json.loads(json_str)
-            return parsed
+            return json.loads(response)
         except json.JSONDecodeError:
-            # If parsing fails, try to clean up the string
-            cleaned = json_str.replace('\n', ' ').replace('\t', ' ')
-            cleaned = re.sub(r'\s+', ' ', cleaned)
-            return json.loads(cleaned)
+            return extract_json(response)
     
-    def _apply_ai_updates(self, student_id: int, ai_response: Dict[str, Any]) -> Dict[str, Any]:
+    def _apply_ai_updates(self, student_id: int, ai_response: Dict[str, Any],
+                          session_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Apply AI-generated updates to student profile, memories, and mastery
         
         Args:
             student_id: The student ID
             ai_response: Parsed AI response with updates
+            session_id: Session the updates came from
             
         Returns:
             Results of the update operations
@@ -274,7 +424,7 @@ class StudentProfileAIService:
             mastery_updates = ai_response.get('mastery_updates', {})
             if mastery_updates and (mastery_updates.get('goal_patches') or mastery_updates.get('kc_patches')):
                 try:
-                    mastery_results = self.student_service.update_mastery_from_ai_delta(student_id, mastery_updates)
+                    mastery_results = self.student_service.update_mastery_from_ai_delta(student_id, mastery_updates, session_id)
                     if mastery_results and (mastery_results.get('updated_goals') or mastery_results.get('updated_kcs')):
                         results['mastery_updated'] = True
                         results['mastery_results'] = mastery_results
@@ -318,7 +468,8 @@ class StudentProfileAIService:
                 'ai_provider': {
                     'current_provider': self.provider_manager.get_current_provider(),
                     'available_providers': self.provider_manager.get_available_providers(),
-                    'cost_summary': cost_summary
+                    'cost_summary': cost_summary,
+                    'parse_stats': get_parse_stats()
                 },
                 'profile_stats': profile_stats,
                 'memory_stats': memory_stats,
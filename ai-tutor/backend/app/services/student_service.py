@@ -285,7 +285,7 @@ class StudentService:
                 session_dict = session.to_dict() if hasattr(session, 'to_dict') else {
                     'id': session.id,
                     'start_datetime': session.start_datetime.isoformat() if session.start_datetime else None,
-                    'duration_seconds': session.duration_seconds,
+                    'duration': session.duration,
                     'session_type': session.session_type,
                     'transcript_file': session.transcript_file
                 }
@@ -302,6 +302,14 @@ class StudentService:
             print(f"Error getting student data for {student_id}: {e}")
             return None
     
+    def search_students(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Fuzzy search students by name or phone number, best matches first"""
+        try:
+            return student_repository.search(query, limit=limit)
+        except Exception as e:
+            print(f"Error searching students for '{query}': {e}")
+            return []
+    
     def get_student_phone(self, student_id) -> Optional[str]:
         """Get student's phone number"""
         try:
@@ -620,7 +628,7 @@ class StudentService:
                         'id': session.id,
                         'date': session.start_datetime.isoformat() if session.start_datetime else None,
                         'summary': session.summary,
-                        'duration_minutes': session.duration_seconds // 60 if session.duration_seconds else 0
+                        'duration_minutes': session.duration // 60 if session.duration else 0
                     }
                     for session in recent_sessions if session.summary
                 ]
@@ -792,6 +800,7 @@ class StudentService:
         try:
             from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
             from app.repositories.student_kc_progress_repository import StudentKCProgressRepository
+            from app.services.kc_recommendation_service import kc_recommendation_service
             
             # Initialize repositories
             goal_progress_repo = StudentGoalProgressRepository(db.session)
@@ -803,6 +812,9 @@ class StudentService:
             # Get incomplete knowledge components (below 100% mastery)
             incomplete_kcs = kc_progress_repo.get_incomplete_kcs(student_id, threshold=100.0)
             
+            # KCs whose prerequisites are mastered, ranked in curriculum order
+            next_kcs = kc_recommendation_service.recommend(student_id, limit=15)
+            
             # Limit the data for AI context (avoid overwhelming the prompt)
             max_goals = 10
             max_kcs = 15
@@ -810,6 +822,7 @@ class StudentService:
             return {
                 'incomplete_goals': incomplete_goals[:max_goals],
                 'incomplete_knowledge_components': incomplete_kcs[:max_kcs],
+                'next_knowledge_components': next_kcs,
                 'total_incomplete_goals': len(incomplete_goals),
                 'total_incomplete_kcs': len(incomplete_kcs),
                 'mastery_context_note': 'This shows goals and knowledge components where the student has not yet achieved 100% mastery'
@@ -820,12 +833,14 @@ class StudentService:
             return {
                 'incomplete_goals': [],
                 'incomplete_knowledge_components': [],
+                'next_knowledge_components': [],
                 'total_incomplete_goals': 0,
                 'total_incomplete_kcs': 0,
                 'mastery_context_note': f'Error loading mastery data: {str(e)}'
             }
     
-    def update_mastery_from_ai_delta(self, student_id: int, mastery_delta: Dict[str, Any]) -> Dict[str, Any]:
+    def update_mastery_from_ai_delta(self, student_id: int, mastery_delta: Dict[str, Any],
+                                     session_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Update student mastery progress based on AI-generated delta changes
         
@@ -837,9 +852,11 @@ class StudentService:
                                   {"goal_code": "4.NBT.A.1", "mastery_percentage": 75.0}
                               ],
                               "kc_patches": [
-                                  {"goal_code": "4.NBT.A.1", "kc_code": "place-value", "mastery_percentage": 85.0}
+                                  {"goal_code": "4.NBT.A.1", "kc_code": "place-value", "mastery_percentage": 85.0,
+                                   "correct": 3, "incorrect": 1}
                               ]
                           }
+            session_id: Session the delta came from (recorded in the mastery history)
             
         Returns:
             Dictionary with update results
@@ -847,6 +864,7 @@ class StudentService:
         try:
             from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
             from app.repositories.student_kc_progress_repository import StudentKCProgressRepository
+            from app.services.bkt_service import BKTService, bkt_service
             
             # Initialize repositories
             goal_progress_repo = StudentGoalProgressRepository(db.session)
@@ -862,7 +880,7 @@ class StudentService:
             goal_patches = mastery_delta.get('goal_patches', [])
             if goal_patches:
                 try:
-                    updated_goals = goal_progress_repo.update_from_ai_delta(student_id, goal_patches)
+                    updated_goals = goal_progress_repo.update_from_ai_delta(student_id, goal_patches, session_id)
                     results['updated_goals'] = [goal.to_dict() for goal in updated_goals]
                     print(f"✅ Updated {len(updated_goals)} goal progress records from AI delta")
                 except Exception as goal_error:
@@ -870,11 +888,13 @@ class StudentService:
                     results['errors'].append(error_msg)
                     print(f"❌ {error_msg}")
             
-            # Process KC patches
+            # Process KC patches (answer counts drive mastery when BKT is the mastery updater)
             kc_patches = mastery_delta.get('kc_patches', [])
             if kc_patches:
                 try:
-                    updated_kcs = kc_progress_repo.update_from_ai_delta(student_id, kc_patches)
+                    if BKTService.is_enabled():
+                        kc_patches = bkt_service.apply_to_patches(student_id, kc_patches)
+                    updated_kcs = kc_progress_repo.update_from_ai_delta(student_id, kc_patches, session_id)
                     results['updated_kcs'] = [kc.to_dict() for kc in updated_kcs]
                     print(f"✅ Updated {len(updated_kcs)} KC progress records from AI delta")
                 except Exception as kc_error:
@@ -0,0 +1,245 @@
+"""
+Summary backfill service for historical sessions
+Generates missing session summaries in resumable, rate-limited batches so
+summaries never have to be produced while a page is being viewed
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from app import db
+from app.models.session import Session
+from app.models.job_checkpoint import JobCheckpoint
+from app.services.session_service import SessionService
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Summarize this tutoring session for the student's history.
+Mention the topics covered, how the student did, and anything to follow up on next time.
+Keep it to 2-4 sentences.
+
+Session Transcript:
+{transcript}
+
+Respond with ONLY valid JSON: {{"summary": "..."}}"""
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly to at most N per minute"""
+
+    def __init__(self, calls_per_minute: float):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute and calls_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller may make its next call"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SummaryBackfillService:
+    """Service that fills in missing summaries for historical sessions"""
+
+    JOB_NAME = 'session_summary_backfill'
+
+    def __init__(self, concurrency: int = None, rate_limit_per_minute: float = None,
+                 batch_size: int = None):
+        self.concurrency = concurrency or int(os.getenv('SUMMARY_BACKFILL_CONCURRENCY', '4'))
+        self.rate_limit_per_minute = rate_limit_per_minute if rate_limit_per_minute is not None \
+            else float(os.getenv('SUMMARY_BACKFILL_RATE_PER_MINUTE', '30'))
+        self.batch_size = batch_size or int(os.getenv('SUMMARY_BACKFILL_BATCH_SIZE', '50'))
+        self.rate_limiter = RateLimiter(self.rate_limit_per_minute)
+        self.session_service = SessionService()
+
+    def _missing_summary_query(self, after_id: int):
+        """Query for sessions without a summary past the keyset cursor"""
+        return Session.query.filter(
+            db.or_(Session.summary.is_(None), Session.summary == ''),
+            Session.id > after_id
+        )
+
+    def _retry_ids(self, checkpoint: JobCheckpoint) -> List[int]:
+        """IDs that failed in earlier runs and still have no summary"""
+        failed_ids = (checkpoint.data or {}).get('failed_ids') or []
+        if not failed_ids:
+            return []
+        rows = self._missing_summary_query(0).filter(Session.id.in_(failed_ids))\
+            .with_entities(Session.id).order_by(Session.id).all()
+        return [row.id for row in rows]
+
+    def count_remaining(self, after_id: int = 0) -> int:
+        """
+        Count sessions still needing a summary
+
+        Args:
+            after_id: Only count sessions after this ID
+
+        Returns:
+            Number of sessions without a summary
+        """
+        return self._missing_summary_query(after_id).count()
+
+    def run(self, max_sessions: Optional[int] = None, reset: bool = False) -> Dict[str, Any]:
+        """
+        Generate summaries for sessions that have none, resuming from the last checkpoint
+
+        Sessions that failed in earlier runs are kept in the checkpoint and
+        retried before the keyset cursor moves on.
+
+        Args:
+            max_sessions: Stop after this many sessions (None for no limit)
+            reset: Start again from the first session instead of the checkpoint
+
+        Returns:
+            Progress report with throughput and ETA
+        """
+        checkpoint = JobCheckpoint.get_or_create(self.JOB_NAME)
+        if reset:
+            checkpoint.last_id = 0
+            checkpoint.processed_count = 0
+            checkpoint.failed_count = 0
+            checkpoint.data = {}
+        db.session.commit()
+
+        retry_ids = self._retry_ids(checkpoint)
+        failed_ids = []
+        remaining = len(retry_ids) + self.count_remaining(checkpoint.last_id)
+        total = min(remaining, max_sessions) if max_sessions else remaining
+        logger.info(f"Starting summary backfill from session {checkpoint.last_id}: {total} sessions to process, "
+                    f"{len(retry_ids)} retries (concurrency={self.concurrency}, rate={self.rate_limit_per_minute}/min)")
+
+        started = time.monotonic()
+        processed = 0
+        failed = 0
+        report = self._build_report(checkpoint, processed, failed, total, started)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while processed + failed < total:
+                limit = min(self.batch_size, total - processed - failed)
+                retrying = bool(retry_ids)
+                if retrying:
+                    # Earlier failures go first; the cursor is already past them
+                    batch_ids, retry_ids = retry_ids[:limit], retry_ids[limit:]
+                    query = self._missing_summary_query(0).filter(Session.id.in_(batch_ids))
+                else:
+                    query = self._missing_summary_query(checkpoint.last_id)
+                batch = query.with_entities(Session.id, Session.transcript, Session.start_datetime)\
+                    .order_by(Session.id).limit(limit).all()
+                if not batch:
+                    if retrying:
+                        continue
+                    break
+
+                # LLM calls run in worker threads; all database writes stay on this thread
+                summaries = list(executor.map(self._summarize_row, batch))
+
+                batch_failed = 0
+                for row, summary in zip(batch, summaries):
+                    if summary is None:
+                        batch_failed += 1
+                        failed_ids.append(row.id)
+                        continue
+                    Session.query.filter_by(id=row.id).update(
+                        {'summary': summary[:5000]}, synchronize_session=False
+                    )
+
+                processed += len(batch) - batch_failed
+                failed += batch_failed
+                if not retrying:
+                    checkpoint.last_id = batch[-1].id
+                checkpoint.processed_count += len(batch) - batch_failed
+                checkpoint.failed_count += batch_failed
+                report = self._build_report(checkpoint, processed, failed, total, started)
+                # Retries not reached yet plus this run's failures are picked up first next run
+                checkpoint.data = {'last_run': report, 'failed_ids': retry_ids + failed_ids}
+                db.session.commit()
+
+                logger.info(f"Summary backfill: {processed + failed}/{total} sessions "
+                            f"({report['throughput_per_minute']:.1f}/min, ETA {report['eta_seconds']:.0f}s, "
+                            f"{failed} failed)")
+
+        report['completed'] = processed + failed >= total
+        logger.info(f"Summary backfill finished: {processed} summarized, {failed} failed, "
+                    f"{report['elapsed_seconds']:.1f}s")
+        return report
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the backfill checkpoint and the number of sessions still to process
+
+        Returns:
+            Checkpoint dictionary with remaining count
+        """
+        checkpoint = JobCheckpoint.query.get(self.JOB_NAME)
+        if not checkpoint:
+            return {'job_name': self.JOB_NAME, 'last_id': 0, 'remaining': self.count_remaining(0)}
+        status = checkpoint.to_dict()
+        status['remaining'] = len(self._retry_ids(checkpoint)) + self.count_remaining(checkpoint.last_id)
+        return status
+
+    def _summarize_row(self, row) -> Optional[str]:
+        """Generate a summary for one session row; returns None on failure"""
+        try:
+            if not row.transcript or len(row.transcript.strip()) < 50:
+                # Nothing worth sending to the LLM
+                return self.session_service.build_basic_summary(row)
+
+            self.rate_limiter.acquire()
+            return self._generate_ai_summary(row.transcript) or self.session_service.build_basic_summary(row)
+        except Exception as e:
+            logger.error(f"Error generating summary for session {row.id}: {e}")
+            return None
+
+    def _generate_ai_summary(self, transcript: str) -> Optional[str]:
+        """Ask the current AI provider for a summary of the transcript"""
+        from app.ai.providers import provider_manager
+        from app.ai.event_loop import run_async
+
+        if not provider_manager.get_available_providers():
+            return None
+
+        analysis = run_async(provider_manager.analyze_session(transcript, {
+            'prompt': SUMMARY_PROMPT.format(transcript=transcript),
+            'task': 'session_summary'
+        }))
+        if not analysis.raw_response:
+            return None
+
+        try:
+            return json.loads(analysis.raw_response).get('summary') or None
+        except (json.JSONDecodeError, AttributeError):
+            return analysis.raw_response.strip() or None
+
+    def _build_report(self, checkpoint: JobCheckpoint, processed: int, failed: int,
+                      total: int, started: float) -> Dict[str, Any]:
+        """Build a throughput/ETA progress report"""
+        elapsed = time.monotonic() - started
+        done = processed + failed
+        per_second = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(total - done, 0)
+        return {
+            'job_name': self.JOB_NAME,
+            'last_id': checkpoint.last_id,
+            'processed': processed,
+            'failed': failed,
+            'total': total,
+            'remaining': remaining,
+            'elapsed_seconds': round(elapsed, 2),
+            'throughput_per_minute': per_second * 60,
+            'eta_seconds': (remaining / per_second) if per_second > 0 else 0.0,
+            'updated_at': datetime.utcnow().isoformat()
+        }
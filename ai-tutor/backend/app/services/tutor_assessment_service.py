@@ -2,7 +2,6 @@
 Service for AI tutor performance assessment.
 """
 
-import json
 import logging
 import os
 from pathlib import Path
@@ -12,24 +11,65 @@ from app import db
 from app.models.session import Session
 from app.models.student import Student
 from app.services.mcp_interaction_service import MCPInteractionService
-from ai.session_processor import SessionProcessor
+from app.ai.event_loop import run_async
+from app.ai.static_context import CachedTextFile, estimate_tokens
+from app.ai.providers import provider_manager
+from app.ai.structured_output import structured_output
+from app.ai.transcript_triage import transcript_triage
 
 logger = logging.getLogger(__name__)
 
+GUIDELINES_PATH = Path(__file__).parent.parent / "ai" / "resources" / "guidelines-for-ai-tutor.md"
+AI_TUTOR_PROMPT_PATH = Path(__file__).parent.parent.parent.parent / "docs" / "AI_ASSISTANT_PROMPT_SYSTEM.md"
+
+# Static assessment context, read once per process and refreshed when the files change.
+# TUTOR_ASSESSMENT_USE_DIGEST=true sends a condensed digest of the guidelines instead.
+_guidelines_file = CachedTextFile(
+    GUIDELINES_PATH,
+    digest=os.getenv('TUTOR_ASSESSMENT_USE_DIGEST', 'false').lower() == 'true'
+)
+_ai_tutor_prompt_file = CachedTextFile(AI_TUTOR_PROMPT_PATH)
+
+# Output contract for the standalone assessment; combined analysis defines its own
+ASSESSMENT_OUTPUT_FORMAT = """## REQUIRED OUTPUT FORMAT
+
+Respond with ONLY a valid JSON object containing exactly these two fields:
+
+```json
+{
+  "assessment-of-ai-tutor": "Your detailed assessment paragraph(s) here. Discuss what the AI tutor did well and what could be improved. Reference specific examples from the transcript and guidelines.",
+  "suggested-changes": "Specific, actionable suggestions for improving the VAPI/chat prompt or tutoring approach. Focus on concrete changes that could enhance effectiveness based on your analysis."
+}
+```
+
+## IMPORTANT REQUIREMENTS
+
+- Provide ONLY the JSON response, no additional text
+- Base your assessment on evidence from the transcript
+- Reference specific examples where possible
+- Be constructive and specific in your feedback
+- Consider the student's age and learning needs
+- Focus on actionable improvements for the prompt/approach
+- Ensure suggestions are implementable in an AI tutoring context"""
+
 class TutorAssessmentService:
     """Service for assessing AI tutor performance using post-session analysis."""
     
     def __init__(self):
         """Initialize the tutor assessment service."""
-        self.processor = SessionProcessor()
+        self.provider_manager = provider_manager
         self.mcp_service = MCPInteractionService()
+        self._static_prefix = None
+        self._static_prefix_sources = (None, None)
         
-    def assess_tutor_performance(self, session_id: int) -> Dict:
+    def assess_tutor_performance(self, session_id: int, precomputed_response: Optional[Dict] = None) -> Dict:
         """
         Assess AI tutor performance for a completed tutoring session.
         
         Args:
             session_id (int): The ID of the session to assess
+            precomputed_response (Dict): Assessment section from combined analysis; used
+                instead of a separate LLM call when it passes validation
             
         Returns:
             Dict: Assessment results containing success status and any errors
@@ -60,23 +100,47 @@ class TutorAssessmentService:
                 logger.warning(error_msg)
                 return {"success": False, "error": error_msg}
             
-            # Gather assessment data
-            assessment_data = self._gather_assessment_data(session)
-            if not assessment_data["success"]:
-                return assessment_data
-            
-            # Generate assessment prompt
-            assessment_prompt = self._create_assessment_prompt(assessment_data["data"])
-            
-            # Call AI model for assessment
-            assessment_result = self._call_ai_for_assessment(assessment_prompt, session_id)
-            if not assessment_result["success"]:
-                return assessment_result
-            
-            # Parse and validate JSON response
-            parsed_assessment = self._parse_assessment_response(assessment_result["response"])
-            if not parsed_assessment["success"]:
-                return parsed_assessment
+            # Low-information calls (hang-ups, only a name and age) aren't worth an assessment call
+            if not precomputed_response:
+                skipped = self._skip_low_information(session)
+                if skipped:
+                    return skipped
+            
+            # Use the combined analysis section if it is valid
+            parsed_assessment = None
+            token_report = None
+            if precomputed_response:
+                parsed_assessment = self._parse_assessment_response(precomputed_response)
+                if parsed_assessment["success"]:
+                    logger.info(f"Using combined analysis assessment for session {session_id}")
+                else:
+                    logger.warning(f"Combined assessment for session {session_id} invalid "
+                                   f"({parsed_assessment['error']}), running separate assessment")
+                    parsed_assessment = None
+            
+            if parsed_assessment is None:
+                # Gather assessment data
+                assessment_data = self._gather_assessment_data(session)
+                if not assessment_data["success"]:
+                    return assessment_data
+                
+                # Generate assessment prompt: static guidelines/prompt system go in a stable
+                # system prefix (provider prompt caching), only session data varies per call
+                system_prompt = self._get_static_prefix(assessment_data["data"])
+                assessment_prompt = self._create_assessment_prompt(assessment_data["data"])
+                token_report = self._build_token_report(system_prompt, assessment_prompt)
+                
+                # Call AI model for assessment
+                assessment_result = self._call_ai_for_assessment(assessment_prompt, session_id,
+                                                                 system_prompt, token_report)
+                if not assessment_result["success"]:
+                    return assessment_result
+                
+                # Parse and validate JSON response
+                parsed_assessment = self._parse_assessment_response(
+                    assessment_result.get("parsed") or assessment_result["response"])
+                if not parsed_assessment["success"]:
+                    return parsed_assessment
             
             # Save assessment to database
             session.tutor_assessment = parsed_assessment["data"]["assessment-of-ai-tutor"]
@@ -100,7 +164,8 @@ class TutorAssessmentService:
                 return {
                     "success": True,
                     "session_id": session_id,
-                    "assessment_saved": True
+                    "assessment_saved": True,
+                    "token_report": token_report
                 }
                 
             except Exception as e:
@@ -122,6 +187,76 @@ class TutorAssessmentService:
             
             return {"success": False, "error": error_msg}
     
+    def prepare_assessment_prompt(self, session_id: int) -> Dict:
+        """
+        Build the assessment request for a session without calling the AI model,
+        for offline batch submission
+        
+        Args:
+            session_id (int): The ID of the session to assess
+            
+        Sessions with nothing to assess or a low-information transcript get a
+        skip note as their assessment, so they leave the pending batch queue.
+        Other failures leave the session pending so a later submit retries it.
+        
+        Returns:
+            Dict: success, system_prompt and prompt, or error information
+        """
+        session = Session.query.get(session_id)
+        if not session:
+            return {"success": False, "error": f"Session {session_id} not found"}
+        if not session.student_id or not session.transcript or len(session.transcript.strip()) < 50:
+            error = f"Session {session_id} has nothing to assess"
+            self._record_skipped_assessment(session, "nothing to assess")
+            return {"success": False, "skipped": True, "error": error}
+        
+        skipped = self._skip_low_information(session)
+        if skipped:
+            return {**skipped, "success": False, "error": skipped["reason"]}
+        
+        try:
+            assessment_data = self._gather_assessment_data(session)
+            if not assessment_data["success"]:
+                return assessment_data
+            
+            return {
+                "success": True,
+                "system_prompt": self._get_static_prefix(assessment_data["data"]),
+                "prompt": self._create_assessment_prompt(assessment_data["data"])
+            }
+        except Exception as e:
+            return {"success": False, "error": f"Error preparing assessment for session {session_id}: {e}"}
+    
+    def _skip_low_information(self, session: Session) -> Optional[Dict]:
+        """
+        Record a skipped assessment for a session triage marks as low-information
+        
+        Returns:
+            Dict: Skip result, or None if the session should be assessed
+        """
+        triage = transcript_triage.triage(session.transcript)
+        if not triage.skip_llm:
+            return None
+        
+        transcript_triage.record_avoided('tutor_assessment')
+        self._record_skipped_assessment(session, f"low-information call ({triage.reason})")
+        
+        logger.info(f"Skipping assessment for session {session.id}: {triage.reason}")
+        return {"success": True, "skipped": True, "reason": f"Low-information call: {triage.reason}"}
+    
+    def _record_skipped_assessment(self, session: Session, reason: str) -> None:
+        """
+        Save a "Not assessed" note as the session's assessment
+        
+        The note keeps the session out of the pending assessment (batch) queue.
+        """
+        session.tutor_assessment = f"Not assessed: {reason}"
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not record skipped assessment for session {session.id}: {e}")
+    
     def _gather_assessment_data(self, session: Session) -> Dict:
         """
         Gather all data needed for tutor assessment.
@@ -152,7 +287,7 @@ class TutorAssessmentService:
             student_profile = {
                 "name": f"{student.first_name} {student.last_name}",
                 "age": student.age,
-                "grade": student.grade,
+                "grade": student.get_grade(),
                 "phone_number": student.phone_number,
                 "interests": student.interests or [],
                 "learning_preferences": student.learning_preferences,
@@ -183,122 +318,161 @@ class TutorAssessmentService:
             return {"success": False, "error": error_msg}
     
     def _read_guidelines_file(self) -> Optional[str]:
-        """Read the AI tutor guidelines file."""
+        """Read the AI tutor guidelines file (cached, reloaded when it changes)."""
         try:
-            # Path to guidelines file
-            guidelines_path = Path(__file__).parent.parent / "ai" / "resources" / "guidelines-for-ai-tutor.md"
-            
-            if not guidelines_path.exists():
-                logger.error(f"Guidelines file not found at {guidelines_path}")
-                return None
-            
-            with open(guidelines_path, 'r', encoding='utf-8') as f:
-                return f.read()
-                
+            return _guidelines_file.read()
         except Exception as e:
             logger.error(f"Error reading guidelines file: {str(e)}")
             return None
     
     def _read_ai_tutor_prompt(self) -> Optional[str]:
-        """Read the current AI tutor prompt system."""
+        """Read the current AI tutor prompt system (cached, reloaded when it changes)."""
         try:
-            # Path to AI assistant prompt file
-            prompt_path = Path(__file__).parent.parent.parent.parent / "docs" / "AI_ASSISTANT_PROMPT_SYSTEM.md"
-            
-            if not prompt_path.exists():
-                logger.error(f"AI prompt file not found at {prompt_path}")
-                return None
-            
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                return f.read()
-                
+            return _ai_tutor_prompt_file.read()
         except Exception as e:
             logger.error(f"Error reading AI prompt file: {str(e)}")
             return None
     
-    def _create_assessment_prompt(self, assessment_data: Dict) -> str:
+    def _get_static_prefix(self, assessment_data: Dict) -> str:
         """
-        Create the prompt for AI tutor performance assessment.
+        Get the system prompt holding everything that is identical across assessments.
+        
+        The prefix is rebuilt only when the guidelines or prompt system change, so
+        consecutive calls send byte-identical prefixes that providers can cache.
         
         Args:
-            assessment_data (Dict): All gathered data for assessment
+            assessment_data (Dict): Gathered data including guidelines and prompt system
             
         Returns:
-            str: The assessment prompt
+            str: The static system prompt
         """
-        prompt = f"""You are an expert educational consultant specializing in AI tutoring effectiveness. Your task is to assess the performance of an AI tutor during a tutoring session and provide constructive feedback.
-
-## ASSESSMENT CONTEXT
-
-### SESSION INFORMATION
-- Session ID: {assessment_data['session_info']['session_id']}
-- Duration: {assessment_data['session_info']['duration']} seconds
-- Session Type: {assessment_data['session_info']['session_type']}
-- Date: {assessment_data['session_info']['start_datetime']}
-
-### STUDENT PROFILE
-- Name: {assessment_data['student_profile']['name']}
-- Age: {assessment_data['student_profile']['age']} years old
-- Grade: {assessment_data['student_profile']['grade']}
-- Interests: {', '.join(assessment_data['student_profile']['interests']) if assessment_data['student_profile']['interests'] else 'Not specified'}
-- Learning Preferences: {assessment_data['student_profile']['learning_preferences'] or 'Not specified'}
+        sources = (assessment_data['guidelines'], assessment_data['ai_tutor_prompt'])
+        if self._static_prefix is None or sources[0] is not self._static_prefix_sources[0] \
+                or sources[1] is not self._static_prefix_sources[1]:
+            self._static_prefix = self._create_static_prefix(*sources)
+            self._static_prefix_sources = sources
+        return self._static_prefix
+    
+    def _create_static_prefix(self, guidelines: str, ai_tutor_prompt: str) -> str:
+        """
+        Create the static part of the assessment prompt.
+        
+        Args:
+            guidelines (str): The AI tutor guidelines
+            ai_tutor_prompt (str): The current AI tutor prompt system
+            
+        Returns:
+            str: The static system prompt
+        """
+        return f"{self._create_assessment_context(guidelines, ai_tutor_prompt)}\n\n{ASSESSMENT_OUTPUT_FORMAT}"
+    
+    def _create_assessment_context(self, guidelines: str, ai_tutor_prompt: str) -> str:
+        """
+        Create the assessment role, guidelines, prompt system and criteria, without an output format.
+        
+        Shared with prompts that define their own output contract.
+        
+        Args:
+            guidelines (str): The AI tutor guidelines
+            ai_tutor_prompt (str): The current AI tutor prompt system
+            
+        Returns:
+            str: The assessment context
+        """
+        return f"""You are an expert educational consultant specializing in AI tutoring effectiveness. Your task is to assess the performance of an AI tutor during a tutoring session and provide constructive feedback.
 
 ### AI TUTOR GUIDELINES
 The AI tutor should follow these evidence-based best practices:
 
-{assessment_data['guidelines']}
+{guidelines}
 
 ### CURRENT AI TUTOR PROMPT SYSTEM
 The AI tutor is operating with this prompt configuration:
 
-{assessment_data['ai_tutor_prompt']}
-
-### SESSION TRANSCRIPT
-Here is the actual conversation transcript to assess:
-
-{assessment_data['transcript']}
+{ai_tutor_prompt}
 
 ## ASSESSMENT TASK
 
-Please analyze the AI tutor's performance in this session and provide feedback in JSON format only. Evaluate how well the tutor:
+You will be given session information, the student profile and the session transcript. Analyze the AI tutor's performance in that session and provide feedback in JSON format only. Evaluate how well the tutor:
 
 1. **Followed the guidelines**: Applied evidence-based teaching strategies
 2. **Personalized the experience**: Used student interests and learning preferences
 3. **Maintained engagement**: Kept the student actively participating
 4. **Provided effective instruction**: Delivered clear, age-appropriate content
 5. **Used appropriate tone and approach**: Matched the student's personality and needs
-6. **Managed the session structure**: Balanced content, pacing, and interaction
+6. **Managed the session structure**: Balanced content, pacing, and interaction"""
+    
+    def _create_assessment_prompt(self, assessment_data: Dict) -> str:
+        """
+        Create the per-session part of the assessment prompt.
+        
+        Args:
+            assessment_data (Dict): All gathered data for assessment
+            
+        Returns:
+            str: The assessment prompt
+        """
+        prompt = f"""## ASSESSMENT CONTEXT
 
-## REQUIRED OUTPUT FORMAT
+### SESSION INFORMATION
+- Session ID: {assessment_data['session_info']['session_id']}
+- Duration: {assessment_data['session_info']['duration']} seconds
+- Session Type: {assessment_data['session_info']['session_type']}
+- Date: {assessment_data['session_info']['start_datetime']}
 
-Respond with ONLY a valid JSON object containing exactly these two fields:
+### STUDENT PROFILE
+- Name: {assessment_data['student_profile']['name']}
+- Age: {assessment_data['student_profile']['age']} years old
+- Grade: {assessment_data['student_profile']['grade']}
+- Interests: {', '.join(assessment_data['student_profile']['interests']) if assessment_data['student_profile']['interests'] else 'Not specified'}
+- Learning Preferences: {assessment_data['student_profile']['learning_preferences'] or 'Not specified'}
 
-```json
-{{
-  "assessment-of-ai-tutor": "Your detailed assessment paragraph(s) here. Discuss what the AI tutor did well and what could be improved. Reference specific examples from the transcript and guidelines.",
-  "suggested-changes": "Specific, actionable suggestions for improving the VAPI/chat prompt or tutoring approach. Focus on concrete changes that could enhance effectiveness based on your analysis."
-}}
-```
+### SESSION TRANSCRIPT
+Here is the actual conversation transcript to assess:
 
-## IMPORTANT REQUIREMENTS
+{assessment_data['transcript']}
 
-- Provide ONLY the JSON response, no additional text
-- Base your assessment on evidence from the transcript
-- Reference specific examples where possible
-- Be constructive and specific in your feedback
-- Consider the student's age and learning needs
-- Focus on actionable improvements for the prompt/approach
-- Ensure suggestions are implementable in an AI tutoring context"""
+Assess the AI tutor's performance in this session and respond with the required JSON object only."""
 
         return prompt
     
-    def _call_ai_for_assessment(self, prompt: str, session_id: int) -> Dict:
+    def _build_token_report(self, system_prompt: str, prompt: str) -> Dict:
+        """
+        Estimate per-call input tokens against the previous single-prompt layout.
+        
+        Args:
+            system_prompt (str): The static prefix
+            prompt (str): The per-session prompt
+            
+        Returns:
+            Dict: Token estimates for the legacy layout and the current call
+        """
+        prefix_tokens = estimate_tokens(system_prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        
+        # Before: full guidelines and prompt system pasted into every user message, never cached
+        static_source_tokens = _guidelines_file.source_tokens + _ai_tutor_prompt_file.source_tokens
+        static_sent_tokens = estimate_tokens(_guidelines_file.read()) + estimate_tokens(_ai_tutor_prompt_file.read())
+        legacy_tokens = prefix_tokens - static_sent_tokens + static_source_tokens + prompt_tokens
+        
+        return {
+            "legacy_input_tokens": legacy_tokens,
+            "input_tokens": prefix_tokens + prompt_tokens,
+            "cacheable_prefix_tokens": prefix_tokens,
+            "uncached_input_tokens": prompt_tokens,
+            "guidelines_digest": _guidelines_file.digest
+        }
+    
+    def _call_ai_for_assessment(self, prompt: str, session_id: int, system_prompt: str = None,
+                                token_report: Dict = None) -> Dict:
         """
         Call the AI model to perform the assessment.
         
         Args:
-            prompt (str): The assessment prompt
+            prompt (str): The per-session assessment prompt
             session_id (int): Session ID for logging
+            system_prompt (str): Static prefix sent as the system prompt
+            token_report (Dict): Input token estimates to log with the call
             
         Returns:
             Dict: AI response or error information
@@ -309,17 +483,24 @@ Respond with ONLY a valid JSON object containing exactly these two fields:
                 interaction_type="tutor_assessment_ai_call",
                 data={
                     "session_id": session_id,
-                    "prompt_length": len(prompt)
+                    "prompt_length": len(prompt),
+                    "system_prompt_length": len(system_prompt) if system_prompt else 0,
+                    "token_report": token_report
                 },
                 session_id=session_id
             )
-            
-            # Use the existing AI processor
-            response = self.processor.process(prompt, {
-                "max_tokens": 1500,
-                "temperature": 0.3,
-                "model": "gpt-4"
-            })
+            if token_report:
+                logger.info(f"Tutor assessment input tokens for session {session_id}: "
+                            f"{token_report['input_tokens']} ({token_report['uncached_input_tokens']} uncached), "
+                            f"previously {token_report['legacy_input_tokens']}")
+            
+            analysis = run_async(self.provider_manager.analyze_session(prompt, {
+                "prompt": prompt,
+                "system_prompt": system_prompt,
+                "task": "tutor_assessment",
+                "session_id": session_id
+            }))
+            response = analysis.raw_response if analysis else None
             
             if not response:
                 return {"success": False, "error": "No response from AI model"}
@@ -334,7 +515,7 @@ Respond with ONLY a valid JSON object containing exactly these two fields:
                 session_id=session_id
             )
             
-            return {"success": True, "response": response}
+            return {"success": True, "response": response, "parsed": analysis.parsed_response}
             
         except Exception as e:
             error_msg = f"Error calling AI for assessment: {str(e)}"
@@ -352,32 +533,15 @@ Respond with ONLY a valid JSON object containing exactly these two fields:
             Dict: Parsed assessment data or error information
         """
         try:
-            # Convert response to string if needed
-            response_text = str(response).strip()
-            
-            # Try to find JSON in the response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start == -1 or json_end == 0:
+            # Already-decoded responses (provider-parsed or combined sections) skip text extraction;
+            # parse statistics were recorded where the response was first parsed
+            result = structured_output.parse(response, 'tutor_assessment', record=False)
+            if result.data is None:
                 return {"success": False, "error": "No JSON found in AI response"}
+            if result.errors:
+                return {"success": False, "error": f"Invalid assessment response: {result.errors[0]}"}
             
-            json_text = response_text[json_start:json_end]
-            
-            # Parse JSON
-            try:
-                parsed_data = json.loads(json_text)
-            except json.JSONDecodeError as e:
-                return {"success": False, "error": f"Invalid JSON in AI response: {str(e)}"}
-            
-            # Validate required fields
-            required_fields = ["assessment-of-ai-tutor", "suggested-changes"]
-            for field in required_fields:
-                if field not in parsed_data:
-                    return {"success": False, "error": f"Missing required field: {field}"}
-                if not isinstance(parsed_data[field], str) or not parsed_data[field].strip():
-                    return {"success": False, "error": f"Field {field} must be a non-empty string"}
-            
+            parsed_data = result.data
             return {
                 "success": True,
                 "data": {
@@ -0,0 +1,12 @@
+"""
+Artifact storage package
+"""
+
+from .artifact_store import ArtifactStore, LocalArtifactStore, SessionArtifactManager, artifact_manager
+
+__all__ = [
+    'ArtifactStore',
+    'LocalArtifactStore',
+    'SessionArtifactManager',
+    'artifact_manager'
+]
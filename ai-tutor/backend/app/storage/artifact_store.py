@@ -0,0 +1,300 @@
+"""
+Pluggable artifact store for session files
+Replaces the per-student data/students/<id>/sessions directories with
+content-addressed blobs plus a metadata table, so web nodes stay stateless
+and listings never touch the disk
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore(ABC):
+    """Minimal blob store interface - content is addressed by its SHA-256 hash"""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store data under key (idempotent - same key always means same content)"""
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the data stored under key, or None if missing"""
+        pass
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether key is stored"""
+        pass
+
+    @abstractmethod
+    def get_backend_name(self) -> str:
+        """Return backend name"""
+        pass
+
+    @staticmethod
+    def compute_key(data: bytes) -> str:
+        """Content address for data"""
+        return hashlib.sha256(data).hexdigest()
+
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    Local filesystem backend with a sharded layout: <root>/ab/cd/abcd...
+    Point the root at shared storage to use it from several hosts.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv('ARTIFACT_STORE_ROOT', 'data/artifacts')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            # Content-addressed: an existing blob already has these bytes
+            return
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get_backend_name(self) -> str:
+        return f"local ({self.root})"
+
+
+class ArtifactWriter:
+    """
+    Background writer thread so request handlers never block on blob I/O.
+    Pending blobs stay readable from memory in this process until they are
+    written; each write reports its outcome through an optional callback.
+    """
+
+    def __init__(self, store: ArtifactStore):
+        self.store = store
+        self._queue = queue.Queue()
+        self._pending = {}  # key -> [data, queued write count]
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='artifact-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, key: str, data: bytes,
+               on_done: Optional[Callable[[Optional[Exception]], None]] = None) -> None:
+        """
+        Queue data for writing
+
+        Args:
+            key: Store key for the data
+            data: Bytes to write
+            on_done: Called from the writer thread with None on success or the write error
+        """
+        with self._lock:
+            entry = self._pending.setdefault(key, [data, 0])
+            entry[1] += 1
+            self._ensure_started()
+        self._queue.put((key, data, on_done))
+
+    def get_pending(self, key: str) -> Optional[bytes]:
+        """Return data still waiting to be written, if any"""
+        with self._lock:
+            entry = self._pending.get(key)
+            return entry[0] if entry else None
+
+    def flush(self) -> None:
+        """Block until every queued blob has been written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            key, data, on_done = self._queue.get()
+            error = None
+            try:
+                self.store.put(key, data)
+            except Exception as e:
+                logger.error(f"Error writing artifact {key}: {e}")
+                error = e
+            finally:
+                with self._lock:
+                    entry = self._pending.get(key)
+                    if entry:
+                        entry[1] -= 1
+                        if entry[1] <= 0:
+                            del self._pending[key]
+
+            try:
+                if on_done:
+                    on_done(error)
+            except Exception as e:
+                logger.error(f"Error recording artifact {key} write result: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class SessionArtifactManager:
+    """Saves and loads named session artifacts through the configured store"""
+
+    def __init__(self, store: ArtifactStore = None, async_writes: bool = None):
+        self.store = store or self._create_store()
+        if async_writes is None:
+            async_writes = os.getenv('ARTIFACT_STORE_ASYNC_WRITES', 'true').lower() == 'true'
+        self.writer = ArtifactWriter(self.store) if async_writes else None
+        if self.writer:
+            atexit.register(self.writer.flush)
+
+    def _create_store(self) -> ArtifactStore:
+        """Create the store backend selected by ARTIFACT_STORE_BACKEND"""
+        backend = os.getenv('ARTIFACT_STORE_BACKEND', 'local')
+        if backend == 'local':
+            return LocalArtifactStore()
+        raise ValueError(f"Unsupported artifact store backend: {backend}")
+
+    def save(self, student_id, name: str, content: Union[str, bytes], kind: str,
+             content_type: str = 'text/plain', call_id: str = None) -> Dict[str, Any]:
+        """
+        Save an artifact and record it in the metadata index
+
+        With synchronous writes the blob is stored before the row is
+        committed and write errors propagate. With the background writer the
+        row is committed as 'pending' and marked 'stored' or 'failed' once
+        the write finishes.
+
+        Args:
+            student_id: Student the artifact belongs to
+            name: Logical file name
+            content: Text or bytes to store
+            kind: Artifact kind ('session', 'transcript', 'analysis')
+            content_type: MIME type of the content
+            call_id: Optional VAPI call ID
+
+        Returns:
+            The artifact metadata
+        """
+        from app.repositories import session_artifact_repository
+
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        key = ArtifactStore.compute_key(data)
+        metadata = {
+            'student_id': student_id,
+            'call_id': call_id,
+            'name': name,
+            'kind': kind,
+            'content_type': content_type,
+            'storage_key': key,
+            'size_bytes': len(data),
+            'error': None
+        }
+
+        if not self.writer:
+            self.store.put(key, data)
+            return session_artifact_repository.create({**metadata, 'status': 'stored'})
+
+        artifact = session_artifact_repository.create({**metadata, 'status': 'pending'})
+        self.writer.submit(key, data, self._confirm_callback(artifact['id'], key))
+        return artifact
+
+    def _confirm_callback(self, artifact_id: int, key: str) -> Callable[[Optional[Exception]], None]:
+        """Build the writer callback that records a blob write's outcome on the artifact row"""
+        from flask import current_app, has_app_context
+
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def on_done(error: Optional[Exception]) -> None:
+            from app.repositories import session_artifact_repository
+
+            if app is None:
+                logger.warning(f"No app context to record artifact {artifact_id} write result")
+                return
+            with app.app_context():
+                if error is None:
+                    session_artifact_repository.set_status(artifact_id, key, 'stored')
+                else:
+                    session_artifact_repository.set_status(artifact_id, key, 'failed', str(error))
+
+        return on_done
+
+    def save_json(self, student_id, name: str, obj: Any, kind: str = 'session',
+                  call_id: str = None) -> Dict[str, Any]:
+        """Save a JSON-serialisable object as an artifact"""
+        content = json.dumps(obj, indent=2, ensure_ascii=False, default=str)
+        return self.save(student_id, name, content, kind, 'application/json', call_id)
+
+    def load(self, student_id, name: str) -> Optional[bytes]:
+        """
+        Load an artifact's content by student and name
+
+        Args:
+            student_id: Student the artifact belongs to
+            name: Logical file name
+
+        Returns:
+            The stored bytes, or None if not found
+        """
+        from app.repositories import session_artifact_repository
+
+        artifact = session_artifact_repository.get_by_name(student_id, name)
+        if not artifact:
+            return None
+        if artifact.get('status') == 'failed':
+            logger.warning(f"Artifact {student_id}/{name} failed to store: {artifact.get('error')}")
+            return None
+
+        key = artifact['storage_key']
+        if self.writer:
+            pending = self.writer.get_pending(key)
+            if pending is not None:
+                return pending
+        return self.store.get(key)
+
+    def load_text(self, student_id, name: str) -> Optional[str]:
+        """Load an artifact as text"""
+        data = self.load(student_id, name)
+        return data.decode('utf-8') if data is not None else None
+
+    def load_json(self, student_id, name: str) -> Optional[Any]:
+        """Load an artifact as parsed JSON"""
+        text = self.load_text(student_id, name)
+        return json.loads(text) if text is not None else None
+
+    def flush(self) -> None:
+        """Wait for queued writes to finish"""
+        if self.writer:
+            self.writer.flush()
+
+
+# Global artifact manager instance
+artifact_manager = SessionArtifactManager()
@@ -3,7 +3,6 @@ Background tasks for AI processing.
 """
 
 from app import celery
-from app.ai.session_processor import SessionProcessor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,14 +20,16 @@ def process_ai_response(self, prompt, model_params, session_id=None):
     Returns:
         dict: The processed AI response
     """
+    from app.ai.event_loop import run_async
+    from app.ai.session_processor import session_processor
+    
     try:
         logger.info(f"Processing AI response for session {session_id}")
         
-        # Initialize session processor
-        processor = SessionProcessor()
-        
-        # Process the prompt
-        response = processor.process(prompt, model_params)
+        # Analyse the transcript with the model parameters as student context
+        analysis, validation = run_async(session_processor.process_session_transcript(
+            prompt, model_params or {}, save_results=False))
+        response = {'analysis': analysis.to_dict(), 'quality_score': validation.score}
         
         logger.info(f"AI response processed successfully for session {session_id}")
         return response
@@ -87,4 +88,113 @@ def cleanup_old_sessions(days=30):
     cleaned_count = 0
     
     logger.info(f"Cleaned up {cleaned_count} old sessions")
-    return cleaned_count
\ No newline at end of file
+    return cleaned_count
+
+@celery.task
+def process_pending_sessions(batch_size=10, lease_seconds=600):
+    """
+    Drain the post-session AI processing queue.
+    
+    Claims a batch with SELECT ... FOR UPDATE SKIP LOCKED so any number of
+    workers can run this concurrently without analysing a session twice.
+    
+    Args:
+        batch_size (int): Number of sessions to claim per run
+        lease_seconds (int): Seconds before an unfinished claim can be retaken
+        
+    Returns:
+        dict: Counts of claimed, completed and failed sessions
+    """
+    from app.services.batch_analysis_service import BatchAnalysisService
+    from app.repositories import session_repository
+    from app.services.session_service import SessionService
+    from app.services.student_profile_ai_service import student_profile_ai_service
+    
+    # In batch mode the queue is drained by submit_ai_batch instead
+    if BatchAnalysisService.is_enabled():
+        return {"claimed": 0, "completed": 0, "failed": 0, "deferred_to_batch": True}
+    
+    session_service = SessionService()
+    owner = session_repository.new_lease_owner('worker')
+    claimed_ids = session_service.claim_sessions_for_ai_update(owner, batch_size, lease_seconds)
+    
+    completed = 0
+    failed = 0
+    for session_id in claimed_ids:
+        try:
+            result = student_profile_ai_service.post_session_ai_update(session_id)
+            success = bool(result.get('success'))
+            error = result.get('error')
+        except Exception as exc:
+            success = False
+            error = str(exc)
+        
+        session_service.complete_session_processing(session_id, owner, success, error)
+        if success:
+            completed += 1
+        else:
+            failed += 1
+            logger.error(f"AI processing failed for session {session_id}: {error}")
+    
+    logger.info(f"Processed session queue batch: {len(claimed_ids)} claimed, {completed} completed, {failed} failed")
+    return {"claimed": len(claimed_ids), "completed": completed, "failed": failed}
+
+
+@celery.task
+def backfill_session_summaries(max_sessions=None, concurrency=None, rate_limit_per_minute=None, reset=False):
+    """
+    Generate summaries for historical sessions that have none.
+    
+    Resumes from the last checkpoint, so it can be scheduled repeatedly or
+    restarted after a crash without redoing finished sessions.
+    
+    Args:
+        max_sessions (int, optional): Stop after this many sessions
+        concurrency (int, optional): Maximum parallel LLM calls
+        rate_limit_per_minute (float, optional): Maximum LLM calls per minute
+        reset (bool): Start again from the first session
+        
+    Returns:
+        dict: Progress report with throughput and ETA
+    """
+    from app.services.summary_backfill_service import SummaryBackfillService
+    
+    service = SummaryBackfillService(concurrency=concurrency, rate_limit_per_minute=rate_limit_per_minute)
+    return service.run(max_sessions=max_sessions, reset=reset)
+
+
+@celery.task
+def submit_ai_batch(max_requests=500):
+    """
+    Submit pending tutor assessments and profile updates as one provider batch.
+    
+    Batch jobs are billed at the provider's batch discount and don't count
+    against the realtime rate limits; results arrive within 24 hours.
+    
+    Args:
+        max_requests (int): Maximum jobs in the batch
+        
+    Returns:
+        dict: Submitted batch and job counts
+    """
+    from app.services.batch_analysis_service import BatchAnalysisService
+    
+    if not BatchAnalysisService.is_enabled():
+        return {"success": True, "submitted": 0, "skipped": 0, "batch_mode": False}
+    
+    result = BatchAnalysisService().submit_pending(max_requests=max_requests)
+    logger.info(f"AI batch submission: {result.get('submitted', 0)} requests, {result.get('skipped', 0)} skipped")
+    return result
+
+
+@celery.task
+def poll_ai_batches():
+    """
+    Poll open AI batches and apply the results of completed ones.
+    
+    Returns:
+        dict: Per-batch state and applied/failed counts
+    """
+    from app.services.batch_analysis_service import BatchAnalysisService
+    
+    return BatchAnalysisService().poll_batches()
@@ -50,13 +50,14 @@ def aggregate_daily_stats(date=None):
         
         if not sessions:
             logger.info(f"No sessions found for {target_date}")
+            _refresh_dashboards()
             return f"No sessions found for {target_date}"
         
         # Calculate metrics
         total_sessions = len(sessions)
         
         # Calculate total duration and average
-        total_duration = sum(s.duration_seconds for s in sessions if s.duration_seconds)
+        total_duration = sum(s.duration for s in sessions if s.duration)
         avg_duration = total_duration / total_sessions if total_sessions > 0 else 0
         
         # Count unique students
@@ -120,6 +121,7 @@ def aggregate_daily_stats(date=None):
         db.session.commit()
         
         logger.info(f"Successfully aggregated stats for {target_date}")
+        _refresh_dashboards()
         return f"Aggregated stats for {target_date}: {total_sessions} sessions, {total_users} users"
     
     except Exception as e:
@@ -128,6 +130,44 @@ def aggregate_daily_stats(date=None):
         raise
 
 
+def _refresh_dashboards():
+    """Recompute the cached dashboard for every time range after aggregation."""
+    from app.services.analytics_service import AnalyticsService, TIME_RANGE_DAYS
+    
+    service = AnalyticsService(db.session)
+    for time_range in TIME_RANGE_DAYS:
+        try:
+            service.refresh_dashboard_data(time_range)
+        except Exception as e:
+            # A stale dashboard is better than a failed aggregation
+            logger.error(f"Error refreshing {time_range} dashboard: {str(e)}")
+            db.session.rollback()
+
+
+@celery.task
+def refresh_dashboard_cache(time_range=None):
+    """
+    Recompute cached analytics dashboard data.
+    
+    Args:
+        time_range: Range to refresh (defaults to all ranges)
+        
+    Returns:
+        String with the refreshed ranges
+    """
+    from app.services.analytics_service import AnalyticsService, TIME_RANGE_DAYS, dashboard_cache
+    
+    time_ranges = [time_range] if time_range else list(TIME_RANGE_DAYS)
+    try:
+        service = AnalyticsService(db.session)
+        for name in time_ranges:
+            service.refresh_dashboard_data(name)
+        return f"Refreshed dashboard cache for {', '.join(time_ranges)}"
+    finally:
+        for name in time_ranges:
+            dashboard_cache.release_refresh(name)
+
+
 @celery.task
 def calculate_student_progress(student_id, days=30):
     """
@@ -140,6 +180,8 @@ def calculate_student_progress(student_id, days=30):
     Returns:
         Dictionary with progress data
     """
+    from app.repositories.analytics_repository import compute_student_progress
+    
     logger.info(f"Calculating progress for student {student_id}")
     
     try:
@@ -147,94 +189,90 @@ def calculate_student_progress(student_id, days=30):
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get all sessions for this student in the time period
-        sessions = db.session.query(Session).filter(
-            Session.student_id == student_id,
-            Session.created_at.between(start_date, end_date)
-        ).order_by(Session.created_at).all()
-        
-        if not sessions:
+        progress = compute_student_progress([student_id], start_date, end_date).get(int(student_id))
+        if not progress:
             logger.info(f"No sessions found for student {student_id}")
             return {"student_id": student_id, "progress": {}, "message": "No sessions found"}
         
-        # Get session metrics
-        session_ids = [s.id for s in sessions]
-        metrics = db.session.query(SessionMetrics).filter(
-            SessionMetrics.session_id.in_(session_ids)
-        ).all()
-        
-        # Create a lookup for metrics by session_id
-        metrics_by_session = {m.session_id: m for m in metrics}
-        
-        # Aggregate topics and calculate progress by subject
-        topics_count = {}
-        subjects = {}
-        total_duration = 0
-        
-        for session in sessions:
-            # Add duration
-            duration = session.duration_seconds or 0
-            total_duration += duration
-            
-            # Get metrics for this session
-            metrics = metrics_by_session.get(session.id)
-            if metrics and metrics.topics_covered:
-                for topic in metrics.topics_covered:
-                    topics_count[topic] = topics_count.get(topic, 0) + 1
-                    
-                    # Extract subject from topic (assuming format like "Math: Fractions")
-                    subject = topic.split(':')[0].strip() if ':' in topic else topic
-                    
-                    if subject not in subjects:
-                        subjects[subject] = {
-                            "sessions": 0,
-                            "duration": 0,
-                            "engagement": [],
-                            "satisfaction": []
-                        }
-                    
-                    subjects[subject]["sessions"] += 1
-                    subjects[subject]["duration"] += duration
-                    
-                    if metrics.student_engagement is not None:
-                        subjects[subject]["engagement"].append(metrics.student_engagement)
-                    
-                    if metrics.student_satisfaction is not None:
-                        subjects[subject]["satisfaction"].append(metrics.student_satisfaction)
-        
-        # Calculate averages for each subject
-        progress_by_subject = {}
-        for subject, data in subjects.items():
-            avg_engagement = sum(data["engagement"]) / len(data["engagement"]) if data["engagement"] else None
-            avg_satisfaction = sum(data["satisfaction"]) / len(data["satisfaction"]) if data["satisfaction"] else None
-            
-            progress_by_subject[subject] = {
-                "sessions": data["sessions"],
-                "total_duration": data["duration"],
-                "avg_engagement": avg_engagement,
-                "avg_satisfaction": avg_satisfaction,
-                "percentage_of_total": (data["duration"] / total_duration * 100) if total_duration > 0 else 0
-            }
-        
-        # Get top topics
-        top_topics = sorted(topics_count.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        result = {
-            "student_id": student_id,
-            "total_sessions": len(sessions),
-            "total_duration": total_duration,
-            "progress_by_subject": progress_by_subject,
-            "top_topics": dict(top_topics)
-        }
-        
         logger.info(f"Successfully calculated progress for student {student_id}")
-        return result
+        return progress
     
     except Exception as e:
         logger.error(f"Error calculating student progress: {str(e)}")
         raise
 
 
+@celery.task
+def calculate_progress_chunk(student_ids, days=30, as_of=None):
+    """
+    Calculate and store progress for a chunk of students with one query.
+    
+    Args:
+        student_ids: IDs of the students in the chunk
+        days: Number of days to analyze
+        as_of: Day the window ends on ('YYYY-MM-DD', defaults to today)
+        
+    Returns:
+        Dictionary with the chunk size and rows written
+    """
+    from app.repositories.analytics_repository import compute_student_progress, save_student_progress
+    
+    as_of_date = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else datetime.utcnow().date()
+    end_date = datetime.combine(as_of_date, datetime.max.time())
+    start_date = end_date - timedelta(days=days)
+    
+    try:
+        progress = compute_student_progress(student_ids, start_date, end_date)
+        rows = save_student_progress(progress, as_of_date, days)
+        logger.info(f"Stored progress for {len(progress)} of {len(student_ids)} students ({rows} subject rows)")
+        return {"students": len(student_ids), "computed": len(progress), "rows": rows}
+    except Exception as e:
+        logger.error(f"Error calculating progress for chunk starting at student {student_ids[0]}: {str(e)}")
+        db.session.rollback()
+        raise
+
+
+@celery.task
+def calculate_all_student_progress(days=30, chunk_size=200):
+    """
+    Fan out progress calculation over every student active in the window.
+    
+    Active students are paged by ID and each page is computed and stored by a
+    calculate_progress_chunk task, so chunks run in parallel across workers.
+    
+    Args:
+        days: Number of days to analyze
+        chunk_size: Students per chunk task
+        
+    Returns:
+        Dictionary with the number of students and chunks dispatched
+    """
+    from celery import group
+    from app.repositories.analytics_repository import get_active_student_ids
+    
+    as_of = datetime.utcnow().date()
+    end_date = datetime.combine(as_of, datetime.max.time())
+    start_date = end_date - timedelta(days=days)
+    
+    chunks = []
+    last_id = 0
+    while True:
+        student_ids = get_active_student_ids(start_date, end_date, after_id=last_id, limit=chunk_size)
+        if not student_ids:
+            break
+        chunks.append(student_ids)
+        last_id = student_ids[-1]
+    
+    if chunks:
+        group(
+            calculate_progress_chunk.s(student_ids, days, as_of.isoformat()) for student_ids in chunks
+        ).apply_async()
+    
+    students = sum(len(student_ids) for student_ids in chunks)
+    logger.info(f"Dispatched progress calculation for {students} students in {len(chunks)} chunks")
+    return {"students": students, "chunks": len(chunks), "as_of": as_of.isoformat()}
+
+
 @celery.task
 def generate_system_report(days=30):
     """
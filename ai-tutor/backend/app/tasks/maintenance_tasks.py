@@ -150,6 +150,93 @@ def purge_expired_memory():
         return purge_summary
 
 
+@celery.task
+def check_goal_mastery_rollup(fix=False):
+    """
+    Verify goal mastery rollups against a full recomputation from KC progress.
+    
+    Args:
+        fix: Recompute the rollup of every inconsistent goal
+        
+    Returns:
+        dict: Consistency report (problem counts, sample rows, rows fixed)
+    """
+    from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+    
+    try:
+        report = StudentGoalProgressRepository(db.session).check_rollup_consistency(fix=fix)
+        if report['consistent']:
+            logger.info("Goal mastery rollup is consistent with KC progress")
+        else:
+            logger.warning(f"Goal mastery rollup has {report['inconsistent_rows']} inconsistent rows "
+                           f"{report['problems']}; fixed {report['fixed']}")
+        return report
+    
+    except Exception as e:
+        logger.error(f"Error checking goal mastery rollup: {str(e)}")
+        db.session.rollback()
+        return {'consistent': False, 'error': str(e)}
+
+
+@celery.task
+def compact_mastery_snapshots(since=None):
+    """
+    Compact mastery events into weekly per-student snapshots.
+    
+    Args:
+        since: ISO date to recompact from (None resumes from the last run)
+        
+    Returns:
+        dict: Compacted date range and number of snapshot rows written
+    """
+    from app.repositories import mastery_event_repository
+    
+    try:
+        since_date = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+        result = mastery_event_repository.compact_weekly_snapshots(since_date)
+        logger.info(f"Compacted mastery events from {result['from_date']}: {result['snapshots']} weekly snapshots")
+        return result
+    
+    except Exception as e:
+        logger.error(f"Error compacting mastery snapshots: {str(e)}")
+        db.session.rollback()
+        return {'error': str(e)}
+
+
+@celery.task
+def refresh_bkt_mastery(fit=True, min_sequences=10):
+    """
+    Nightly BKT refresh: refit per-KC parameters from answer history, then
+    recompute every student's KC mastery and goal rollups. No LLM calls.
+    Does nothing unless BKT drives mastery (MASTERY_UPDATER=bkt).
+    
+    Args:
+        fit: Refit parameters before recomputing
+        min_sequences: Students a KC needs before its parameters are fitted
+        
+    Returns:
+        dict: Fit and recompute summaries
+    """
+    from app.services.bkt_service import BKTService, bkt_service
+    
+    if not BKTService.is_enabled():
+        logger.info("Skipping BKT refresh: BKT mastery is not enabled")
+        return {'skipped': True, 'reason': 'BKT mastery is not enabled'}
+    
+    try:
+        result = {}
+        if fit:
+            result['fit'] = bkt_service.fit_parameters(min_sequences=min_sequences)
+        result['recompute'] = bkt_service.recompute_mastery()
+        logger.info(f"BKT mastery refresh completed: {result}")
+        return result
+    
+    except Exception as e:
+        logger.error(f"Error refreshing BKT mastery: {str(e)}")
+        db.session.rollback()
+        return {'error': str(e)}
+
+
 @celery.task
 def sync_legacy_arrays():
     """
@@ -267,4 +354,55 @@ def sync_legacy_arrays():
         error_msg = f"Error during legacy array sync: {str(e)}"
         logger.error(error_msg)
         sync_summary['errors'].append(error_msg)
-        return sync_summary
\ No newline at end of file
+        return sync_summary
+
+@celery.task
+def backfill_session_search_vectors(batch_size=500, max_batches=None, reset=False):
+    """
+    Build full-text search vectors for sessions created before search existed.
+    
+    New and edited sessions are indexed by a database trigger; this task only
+    catches up the history, in small keyset batches so it never holds long
+    locks. Progress is checkpointed, so it can be rerun until nothing is left.
+    
+    Args:
+        batch_size (int): Sessions updated per transaction
+        max_batches (int, optional): Stop after this many batches
+        reset (bool): Start again from the first session
+        
+    Returns:
+        dict: Summary of backfill progress
+    """
+    from app.models.job_checkpoint import JobCheckpoint
+    from app.repositories import session_repository
+    
+    checkpoint = JobCheckpoint.get_or_create('session_search_backfill')
+    if reset:
+        checkpoint.last_id = 0
+        checkpoint.processed_count = 0
+    db.session.commit()
+    
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = session_repository.backfill_search_vectors(checkpoint.last_id, batch_size)
+            if batch is None:
+                break
+            
+            checkpoint.last_id = batch['last_id']
+            checkpoint.processed_count += batch['updated']
+            db.session.commit()
+            batches += 1
+        
+        remaining = session_repository.count_missing_search_vectors(checkpoint.last_id)
+        logger.info(f"Session search backfill: {batches} batches, last session {checkpoint.last_id}, "
+                    f"{remaining} remaining")
+        return {
+            'batches': batches,
+            'last_id': checkpoint.last_id,
+            'remaining': remaining,
+            'completed': remaining == 0
+        }
+    except Exception as e:
+        logger.error(f"Error backfilling session search vectors: {e}")
+        return {'error': str(e), 'batches': batches, 'last_id': checkpoint.last_id}
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the KC recommender on a synthetic curriculum
+Defaults to 5,000 goals with 10 KCs each (50,000 KCs), up to 3 prerequisites
+per goal, and a batch of 1,000 students with 300 KC progress rows each.
+Runs in memory; no database needed.
+
+Usage: python benchmark_kc_recommendation.py [goals] [students]
+"""
+
+import os
+import random
+import sys
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.services.kc_recommendation_service import CurriculumGraph
+
+KCS_PER_GOAL = 10
+PREREQUISITES_PER_GOAL = 3
+PROGRESS_ROWS_PER_STUDENT = 300
+
+
+def build_curriculum(goal_count, rng):
+    goals = [(goal_id, f"G{goal_id}", f"Goal {goal_id}", ('Mathematics', 'English', 'Science')[goal_id % 3],
+              1 + goal_id * 8 // goal_count) for goal_id in range(1, goal_count + 1)]
+    kcs = [(goal_id, f"kc-{goal_id}-{n}", f"KC {goal_id}.{n}")
+           for goal_id in range(1, goal_count + 1) for n in range(KCS_PER_GOAL)]
+    prerequisites = []
+    for goal_id in range(2, goal_count + 1):
+        for source in rng.sample(range(max(1, goal_id - 200), goal_id), min(PREREQUISITES_PER_GOAL, goal_id - 1)):
+            prerequisites.append((goal_id, f"kc-{source}-{rng.randrange(KCS_PER_GOAL)}", source))
+    return goals, kcs, prerequisites
+
+
+def build_progress(graph, student_count, rng):
+    students = []
+    for _ in range(student_count):
+        # Students work through a window of the curriculum: mastered early, partial later
+        start = rng.randrange(max(1, graph.kc_count - PROGRESS_ROWS_PER_STUDENT))
+        rows = []
+        for offset, index in enumerate(range(start, min(start + PROGRESS_ROWS_PER_STUDENT, graph.kc_count))):
+            goal_id = graph.goal_ids[graph.kc_goal[index]]
+            mastery = 100.0 if offset < PROGRESS_ROWS_PER_STUDENT * 0.7 else rng.uniform(0, 100)
+            rows.append((goal_id, graph.kc_codes[index], mastery))
+        students.append(rows)
+    return students
+
+
+def main():
+    goal_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    student_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(42)
+
+    goals, kcs, prerequisites = build_curriculum(goal_count, rng)
+    started = time.perf_counter()
+    graph = CurriculumGraph(goals, kcs, prerequisites)
+    build_seconds = time.perf_counter() - started
+    print(f"📊 Graph: {graph.goal_count} goals, {graph.kc_count} KCs, {len(prerequisites)} prerequisites "
+          f"built in {build_seconds * 1000:.0f} ms")
+
+    progress = build_progress(graph, student_count, rng)
+    started = time.perf_counter()
+    vectors = [graph.mastery_vector(rows) for rows in progress]
+    vector_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frontiers = [graph.ready_frontier(vector) for vector in vectors]
+    rank_seconds = time.perf_counter() - started
+
+    sizes = [len(frontier) for frontier in frontiers]
+    print(f"📊 Batch of {student_count} students: vectors {vector_seconds * 1000:.0f} ms, "
+          f"frontiers {rank_seconds * 1000:.0f} ms ({rank_seconds / student_count * 1000:.2f} ms/student), "
+          f"{min(sizes)}-{max(sizes)} KCs each")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Create the ai_batches and ai_batch_requests tables
+Track offline provider batches of tutor assessments and profile updates and
+which session each batch request belongs to
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.ai_batch import AIBatch, AIBatchRequest
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        for model in (AIBatch, AIBatchRequest):
+            try:
+                model.__table__.create(db.engine, checkfirst=True)
+                print(f"✓ {model.__tablename__} table ready")
+            except Exception as e:
+                print(f"✗ Error creating {model.__tablename__} table: {e}")
+                sys.exit(1)
+
+        print("🎉 AI batch migration completed successfully!")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Create the ai_usage_records table
+Stores estimated (local tokenizer) vs actual (provider usage) tokens and
+spend for every AI provider call
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.ai_usage import AIUsageRecord
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        try:
+            AIUsageRecord.__table__.create(db.engine, checkfirst=True)
+            print("✓ ai_usage_records table ready")
+        except Exception as e:
+            print(f"✗ Error creating ai_usage_records table: {e}")
+            sys.exit(1)
+
+        print("🎉 AI usage migration completed successfully!")
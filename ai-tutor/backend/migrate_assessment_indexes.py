@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Database migration script for assessment analytics indexes
+Adds the indexes behind the grouped SQL aggregation in assessment_repository
+(active enrollments by curriculum detail/student, curriculum details by subject/grade)
+"""
+
+import os
+import sys
+import logging
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    ('ix_student_subjects_detail_in_use', 'student_subjects', '(curriculum_detail_id, is_in_use)'),
+    ('ix_student_subjects_student_in_use', 'student_subjects', '(student_id, is_in_use)'),
+    ('ix_curriculum_details_subject_grade', 'curriculum_details', '(subject_id, grade_level)'),
+    ('ix_curriculum_details_grade', 'curriculum_details', '(grade_level)'),
+]
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def create_indexes(engine):
+    """Create analytics indexes if they don't exist"""
+    for index_name, table_name, columns in INDEXES:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} {columns}"))
+            logger.info(f"✓ {index_name} ready on {table_name}")
+        except SQLAlchemyError as e:
+            logger.error(f"✗ Error creating {index_name} on {table_name}: {e}")
+            raise
+    return True
+
+def main():
+    """Main migration function"""
+    logger.info("Starting assessment analytics index migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        create_indexes(engine)
+        logger.info("🎉 Assessment analytics index migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
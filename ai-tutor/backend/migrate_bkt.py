@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Add Bayesian Knowledge Tracing storage
+Adds answer-count columns to mastery_events and creates the
+kc_bkt_parameters table filled by the refresh_bkt_mastery task
+"""
+
+import os
+import sys
+
+from sqlalchemy import text
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.mastery_tracking import KCBKTParameters
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        try:
+            for column in ('correct_count', 'incorrect_count'):
+                db.session.execute(text(f"ALTER TABLE mastery_events ADD COLUMN IF NOT EXISTS {column} INTEGER"))
+            db.session.commit()
+            print("✓ mastery_events answer-count columns ready")
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ Error adding answer-count columns to mastery_events: {e}")
+            sys.exit(1)
+
+        try:
+            KCBKTParameters.__table__.create(db.engine, checkfirst=True)
+            print(f"✓ {KCBKTParameters.__tablename__} table ready")
+        except Exception as e:
+            print(f"✗ Error creating {KCBKTParameters.__tablename__} table: {e}")
+            sys.exit(1)
+
+        print("🎉 BKT migration completed successfully!")
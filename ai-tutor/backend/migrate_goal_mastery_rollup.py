@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Database migration script for the goal mastery rollup
+Adds rollup and goal detail columns to student_goal_progress, copies goal
+details onto existing rows and rebuilds every goal with knowledge components
+from its KC progress rows
+"""
+
+import os
+import sys
+import logging
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def check_column_exists(engine, table_name, column_name):
+    """Check if a column exists in a table"""
+    inspector = inspect(engine)
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    return column_name in columns
+
+def add_column_safe(engine, table_name, column_name, column_definition):
+    """Safely add a column if it doesn't exist. Returns True if it was added."""
+    try:
+        if not check_column_exists(engine, table_name, column_name):
+            sql = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}"
+            logger.info(f"Adding column {column_name} to {table_name}")
+            with engine.begin() as conn:
+                conn.execute(text(sql))
+            logger.info(f"✓ Successfully added {column_name} to {table_name}")
+            return True
+        logger.info(f"✓ Column {column_name} already exists in {table_name}")
+        return False
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error adding column {column_name} to {table_name}: {e}")
+        raise
+
+def migrate_goal_progress_table(engine):
+    """Add rollup columns and copy goal details onto existing rows"""
+    logger.info("Migrating student_goal_progress table...")
+
+    add_column_safe(engine, 'student_goal_progress', 'mastery_source', "VARCHAR(10) NOT NULL DEFAULT 'direct'")
+    add_column_safe(engine, 'student_goal_progress', 'total_kcs', 'INTEGER NOT NULL DEFAULT 0')
+    add_column_safe(engine, 'student_goal_progress', 'kcs_with_progress', 'INTEGER NOT NULL DEFAULT 0')
+    add_column_safe(engine, 'student_goal_progress', 'kc_average_mastery', 'FLOAT')
+    add_column_safe(engine, 'student_goal_progress', 'goal_code', 'VARCHAR(50)')
+    add_column_safe(engine, 'student_goal_progress', 'goal_title', 'VARCHAR(200)')
+    add_column_safe(engine, 'student_goal_progress', 'subject', 'VARCHAR(50)')
+    add_column_safe(engine, 'student_goal_progress', 'grade_level', 'INTEGER')
+
+    with engine.begin() as conn:
+        result = conn.execute(text("""
+            UPDATE student_goal_progress sgp
+            SET goal_code = g.goal_code, goal_title = g.title, subject = g.subject, grade_level = g.grade_level
+            FROM curriculum_goals g
+            WHERE g.id = sgp.goal_id
+        """))
+        logger.info(f"✓ Copied goal details onto {result.rowcount} progress rows")
+
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_student_goal_progress_student_subject "
+            "ON student_goal_progress (student_id, subject, grade_level, goal_code)"
+        ))
+        logger.info("✓ ix_student_goal_progress_student_subject index ready")
+
+    return True
+
+def rebuild_rollups():
+    """Recompute every KC-derived goal row through the consistency checker"""
+    from app import create_app, db
+    from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+
+    app = create_app()
+    with app.app_context():
+        report = StudentGoalProgressRepository(db.session).check_rollup_consistency(fix=True)
+        logger.info(f"✓ Rebuilt {report['fixed']} goal rollups {report['problems']}")
+
+        report = StudentGoalProgressRepository(db.session).check_rollup_consistency()
+        if not report['consistent']:
+            logger.error(f"✗ {report['inconsistent_rows']} goal rollups still inconsistent")
+            return False
+    return True
+
+def main():
+    """Main migration function"""
+    logger.info("Starting goal mastery rollup migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        if migrate_goal_progress_table(engine) and rebuild_rollups():
+            logger.info("🎉 Goal mastery rollup migration completed successfully!")
+        else:
+            logger.error("❌ Migration completed with errors. Please check the logs above.")
+            sys.exit(1)
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Create the mastery_events and mastery_weekly_snapshots tables
+mastery_events is the append-only history of mastery changes; the
+compact_mastery_snapshots task rolls it up into weekly snapshots
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.mastery_tracking import MasteryEvent, MasteryWeeklySnapshot
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        for model in (MasteryEvent, MasteryWeeklySnapshot):
+            try:
+                model.__table__.create(db.engine, checkfirst=True)
+                print(f"✓ {model.__tablename__} table ready")
+            except Exception as e:
+                print(f"✗ Error creating {model.__tablename__} table: {e}")
+                sys.exit(1)
+
+        print("🎉 Mastery history migration completed successfully!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Import legacy session files into the artifact store
+Copies data/students/<id>/sessions/* into the content-addressed store and
+records them in session_artifacts so the admin file browser and session
+detail pages can find them without reading the local directories
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.session_artifact import SessionArtifact
+from app.storage import artifact_manager
+
+LEGACY_ROOT = 'data/students'
+
+def artifact_kind(name):
+    """Guess the artifact kind from a legacy file name"""
+    if name.endswith('_analysis.json'):
+        return 'analysis'
+    if name.endswith('.txt'):
+        return 'transcript'
+    return 'session'
+
+def import_legacy_sessions(root=LEGACY_ROOT):
+    """Import every legacy session file that isn't indexed yet"""
+    imported = 0
+    skipped = 0
+
+    if not os.path.isdir(root):
+        print(f"ℹ️ No legacy session directory at {root}")
+        return imported, skipped
+
+    for student_id in sorted(os.listdir(root)):
+        sessions_dir = os.path.join(root, student_id, 'sessions')
+        if not os.path.isdir(sessions_dir):
+            continue
+
+        for name in sorted(os.listdir(sessions_dir)):
+            path = os.path.join(sessions_dir, name)
+            if not os.path.isfile(path):
+                continue
+
+            if SessionArtifact.query.filter_by(student_id=student_id, name=name).first():
+                skipped += 1
+                continue
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            content_type = 'application/json' if name.endswith('.json') else 'text/plain'
+            artifact_manager.save(student_id, name, data, artifact_kind(name), content_type)
+            imported += 1
+
+    artifact_manager.flush()
+    return imported, skipped
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        # Ensure the session_artifacts table exists
+        db.create_all()
+
+        imported, skipped = import_legacy_sessions()
+        print(f"🎉 Imported {imported} legacy session files ({skipped} already indexed)")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Database migration script for the session AI processing work queue
+Adds processing state, attempt count and lease columns to sessions plus the
+partial index used by claim_processing_batch (FOR UPDATE SKIP LOCKED)
+"""
+
+import os
+import sys
+import logging
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def check_column_exists(engine, table_name, column_name):
+    """Check if a column exists in a table"""
+    inspector = inspect(engine)
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    return column_name in columns
+
+def add_column_safe(engine, table_name, column_name, column_definition):
+    """Safely add a column if it doesn't exist. Returns True if it was added."""
+    try:
+        if not check_column_exists(engine, table_name, column_name):
+            sql = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}"
+            logger.info(f"Adding column {column_name} to {table_name}")
+            with engine.begin() as conn:
+                conn.execute(text(sql))
+            logger.info(f"✓ Successfully added {column_name} to {table_name}")
+            return True
+        logger.info(f"✓ Column {column_name} already exists in {table_name}")
+        return False
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error adding column {column_name} to {table_name}: {e}")
+        raise
+
+def migrate_sessions_table(engine):
+    """Add processing queue columns and index to sessions table"""
+    logger.info("Migrating sessions table...")
+
+    state_added = add_column_safe(engine, 'sessions', 'processing_state',
+                                  "VARCHAR(20) NOT NULL DEFAULT 'pending'")
+    add_column_safe(engine, 'sessions', 'processing_attempts', 'INTEGER NOT NULL DEFAULT 0')
+    add_column_safe(engine, 'sessions', 'processing_lease_owner', 'VARCHAR(100)')
+    add_column_safe(engine, 'sessions', 'processing_lease_expires_at', 'TIMESTAMP')
+    add_column_safe(engine, 'sessions', 'processing_error', 'TEXT')
+
+    with engine.begin() as conn:
+        if state_added:
+            # Existing sessions were already processed inline by the webhook;
+            # don't hand the whole history to the workers on first deploy
+            result = conn.execute(text("UPDATE sessions SET processing_state = 'done'"))
+            logger.info(f"✓ Marked {result.rowcount} existing sessions as done")
+
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_sessions_processing_queue "
+            "ON sessions (processing_state, id) "
+            "WHERE processing_state IN ('pending', 'processing')"
+        ))
+        logger.info("✓ ix_sessions_processing_queue index ready")
+
+    logger.info("✓ sessions table migration completed")
+    return True
+
+def main():
+    """Main migration function"""
+    logger.info("Starting session processing state migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        if migrate_sessions_table(engine):
+            logger.info("🎉 Session processing state migration completed successfully!")
+        else:
+            logger.error("❌ Migration completed with errors. Please check the logs above.")
+            sys.exit(1)
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Database migration script for session full-text search
+Adds the search_vector column, its GIN index and the trigger that keeps it
+current on insert/update. Existing rows are filled in afterwards, in batches,
+by the backfill_session_search_vectors task (or --backfill here)
+"""
+
+import os
+import sys
+import logging
+from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.session import SEARCH_VECTOR_EXPRESSION, SEARCH_VECTOR_TRIGGER_DDL
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def check_column_exists(engine, table_name, column_name):
+    """Check if a column exists in a table"""
+    inspector = inspect(engine)
+    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    return column_name in columns
+
+def migrate_sessions_table(engine):
+    """Add search vector column, GIN index and maintenance trigger to sessions"""
+    logger.info("Migrating sessions table...")
+
+    try:
+        if not check_column_exists(engine, 'sessions', 'search_vector'):
+            logger.info("Adding column search_vector to sessions")
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE sessions ADD COLUMN search_vector TSVECTOR"))
+            logger.info("✓ Successfully added search_vector to sessions")
+        else:
+            logger.info("✓ Column search_vector already exists in sessions")
+
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_sessions_search_vector "
+                "ON sessions USING GIN (search_vector)"
+            ))
+            logger.info("✓ ix_sessions_search_vector index ready")
+
+            for statement in SEARCH_VECTOR_TRIGGER_DDL:
+                conn.execute(text(statement))
+            logger.info("✓ sessions_search_vector_trigger installed")
+
+        logger.info("✓ sessions table migration completed")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error migrating sessions table: {e}")
+        return False
+
+def backfill_search_vectors(engine, batch_size=BACKFILL_BATCH_SIZE):
+    """Fill search_vector for existing sessions in keyset batches"""
+    last_id = 0
+    total = 0
+    update_sql = text(
+        f"UPDATE sessions SET search_vector = {SEARCH_VECTOR_EXPRESSION.format(prefix='')} "
+        "WHERE id IN (SELECT id FROM sessions WHERE id > :last_id AND search_vector IS NULL "
+        "ORDER BY id LIMIT :batch_size) RETURNING id"
+    )
+
+    while True:
+        with engine.begin() as conn:
+            ids = [row[0] for row in conn.execute(update_sql, {'last_id': last_id, 'batch_size': batch_size})]
+        if not ids:
+            break
+        last_id = max(ids)
+        total += len(ids)
+        logger.info(f"✓ Indexed {total} sessions (up to id {last_id})")
+
+    logger.info(f"✓ Search vector backfill complete: {total} sessions")
+
+def main():
+    """Main migration function"""
+    logger.info("Starting session search migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        if not migrate_sessions_table(engine):
+            logger.error("❌ Migration completed with errors. Please check the logs above.")
+            sys.exit(1)
+
+        if '--backfill' in sys.argv:
+            backfill_search_vectors(engine)
+        else:
+            logger.info("ℹ️ Run with --backfill or schedule backfill_session_search_vectors to index existing sessions")
+
+        logger.info("🎉 Session search migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Database migration script for typed student age and grade
+Indexes students.grade_level and students.date_of_birth (age is derived from
+it) for roster queries, and backfills both from the legacy "age:"/"grade:"
+entries in learning_preferences, removing those entries
+"""
+
+import os
+import sys
+import logging
+from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.student import split_profile_attributes
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_students_grade_level ON students (grade_level)",
+    "CREATE INDEX IF NOT EXISTS ix_students_date_of_birth ON students (date_of_birth)",
+    "CREATE INDEX IF NOT EXISTS ix_students_school_grade ON students (school_id, grade_level)",
+]
+
+LEGACY_ROWS_SQL = text("""
+    SELECT id, learning_preferences
+    FROM students
+    WHERE id > :last_id
+      AND EXISTS (SELECT 1 FROM unnest(learning_preferences) AS pref
+                  WHERE pref LIKE '%:%'
+                    AND btrim(lower(split_part(pref, ':', 1))) IN ('age', 'grade'))
+    ORDER BY id
+    LIMIT :batch_size
+""")
+
+# Real columns win: a legacy entry only fills a missing date_of_birth or grade_level
+UPDATE_SQL = text("""
+    UPDATE students
+    SET date_of_birth = COALESCE(date_of_birth, :date_of_birth),
+        grade_level = COALESCE(grade_level, :grade_level),
+        learning_preferences = CAST(:learning_preferences AS varchar[])
+    WHERE id = :id
+""")
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def create_indexes(engine):
+    """Create the roster indexes on students"""
+    logger.info("Creating student attribute indexes...")
+
+    try:
+        with engine.begin() as conn:
+            for statement in INDEX_DDL:
+                conn.execute(text(statement))
+                logger.info(f"✓ {statement.split(' ON ')[0]}")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error creating student attribute indexes: {e}")
+        return False
+
+def backfill_attributes(engine, batch_size=BACKFILL_BATCH_SIZE):
+    """Move legacy age/grade preference entries into the typed columns, in keyset batches"""
+    last_id = 0
+    total = 0
+    this_year = date.today().year
+
+    try:
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(LEGACY_ROWS_SQL, {'last_id': last_id, 'batch_size': batch_size}).fetchall()
+                if not rows:
+                    break
+
+                updates = []
+                for student_id, preferences in rows:
+                    age, grade, remaining = split_profile_attributes(preferences)
+                    if age is None and grade is None:
+                        logger.warning(f"⚠️ Student {student_id}: unparseable age/grade entries left in place")
+                        continue
+                    updates.append({
+                        'id': student_id,
+                        'date_of_birth': date(this_year - age, 1, 1) if age is not None else None,
+                        'grade_level': grade,
+                        'learning_preferences': remaining
+                    })
+                if updates:
+                    conn.execute(UPDATE_SQL, updates)
+
+            last_id = rows[-1][0]
+            total += len(updates)
+            logger.info(f"✓ Backfilled {total} students (up to id {last_id})")
+
+        logger.info(f"✓ Student attribute backfill complete: {total} students")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error backfilling student attributes: {e}")
+        return False
+
+def main():
+    """Main migration function"""
+    logger.info("Starting student attributes migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        if not create_indexes(engine) or not backfill_attributes(engine):
+            logger.error("❌ Migration completed with errors. Please check the logs above.")
+            sys.exit(1)
+
+        logger.info("🎉 Student attributes migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
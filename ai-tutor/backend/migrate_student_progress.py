@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Create the student_progress table
+Stores per-student, per-subject progress computed by the
+calculate_all_student_progress task for the analytics pages
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.analytics import StudentProgress
+
+if __name__ == '__main__':
+    app = create_app()
+
+    with app.app_context():
+        print("🔗 Connected to database")
+
+        try:
+            StudentProgress.__table__.create(db.engine, checkfirst=True)
+            print(f"✓ {StudentProgress.__tablename__} table ready")
+        except Exception as e:
+            print(f"✗ Error creating {StudentProgress.__tablename__} table: {e}")
+            sys.exit(1)
+
+        print("🎉 Student progress migration completed successfully!")
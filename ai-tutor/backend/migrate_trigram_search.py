@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Database migration script for fuzzy search
+Enables the pg_trgm extension and adds the trigram GIN and prefix indexes
+used by goal, knowledge component and student search
+"""
+
+import os
+import sys
+import logging
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.repositories.trigram import TRIGRAM_INDEX_DDL
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    """Get database URL from environment variables"""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not found")
+        sys.exit(1)
+    return database_url
+
+def create_trigram_indexes(engine):
+    """Enable pg_trgm and create the search indexes"""
+    logger.info("Creating trigram search indexes...")
+
+    try:
+        with engine.begin() as conn:
+            for statement in TRIGRAM_INDEX_DDL:
+                conn.execute(text(statement))
+                logger.info(f"✓ {statement.split(' ON ')[0]}")
+            conn.execute(text("ANALYZE curriculum_goals"))
+            conn.execute(text("ANALYZE goal_kcs"))
+            conn.execute(text("ANALYZE students"))
+
+        logger.info("✓ Trigram search indexes ready")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"✗ Error creating trigram search indexes: {e}")
+        return False
+
+def main():
+    """Main migration function"""
+    logger.info("Starting trigram search migration...")
+
+    try:
+        engine = create_engine(get_database_url())
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("✓ Database connection successful")
+
+        if not create_trigram_indexes(engine):
+            logger.error("❌ Migration completed with errors. Please check the logs above.")
+            sys.exit(1)
+
+        logger.info("🎉 Trigram search migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
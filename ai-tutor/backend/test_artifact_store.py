@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test the session artifact store.
+Writes artifacts to a temporary local store with an in-memory SQLite index
+and checks the content-addressed layout, synchronous and background writes,
+and how write results are recorded on the metadata rows.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.session_artifact import SessionArtifact
+from app.repositories import session_artifact_repository
+from app.storage import ArtifactStore, LocalArtifactStore, SessionArtifactManager
+
+
+class BlockingStore(LocalArtifactStore):
+    """Local store whose writes wait until the test releases them"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.release = threading.Event()
+        self.error = None
+
+    def put(self, key, data):
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        super().put(key, data)
+
+
+class TestLocalArtifactStore(unittest.TestCase):
+    """Test cases for LocalArtifactStore"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = LocalArtifactStore(self.root)
+
+    def test_sharded_content_addressed_layout(self):
+        """Blobs live under <root>/ab/cd/<sha256> and read back unchanged"""
+        data = b'{"summary": "Practised fractions"}'
+        key = ArtifactStore.compute_key(data)
+        self.assertFalse(self.store.exists(key))
+        self.assertIsNone(self.store.get(key))
+
+        self.store.put(key, data)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, key[:2], key[2:4], key)))
+        self.assertEqual(self.store.get(key), data)
+
+    def test_put_is_idempotent_and_atomic(self):
+        """Writing an existing key is a no-op and leaves no temp files behind"""
+        data = b'transcript text'
+        key = ArtifactStore.compute_key(data)
+        self.store.put(key, data)
+        with mock.patch('app.storage.artifact_store.tempfile.mkstemp') as mkstemp:
+            self.store.put(key, data)
+            mkstemp.assert_not_called()
+        self.assertEqual(os.listdir(os.path.join(self.root, key[:2], key[2:4])), [key])
+
+
+class TestSessionArtifactManager(unittest.TestCase):
+    """Test cases for SessionArtifactManager and the metadata index"""
+
+    def setUp(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:'):
+            self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=[SessionArtifact.__table__])
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def _row(self, name):
+        db.session.expire_all()
+        return session_artifact_repository.get_by_name(7, name)
+
+    def test_synchronous_save_and_load(self):
+        """Without the writer the blob is stored before the row is committed"""
+        manager = SessionArtifactManager(LocalArtifactStore(self.root), async_writes=False)
+        artifact = manager.save_json(7, 'session.json', {'topic': 'fractions'}, call_id='call-1')
+        self.assertEqual(artifact['status'], 'stored')
+        self.assertEqual(artifact['student_id'], '7')
+        self.assertTrue(manager.store.exists(artifact['storage_key']))
+        self.assertEqual(manager.load_json(7, 'session.json'), {'topic': 'fractions'})
+        self.assertIsNone(manager.load(7, 'missing.json'))
+
+        manager.save(7, 'session.json', 'replaced', 'session')
+        self.assertEqual(manager.load_text(7, 'session.json'), 'replaced')
+        self.assertEqual(SessionArtifact.query.count(), 1)
+
+    def test_background_write_is_readable_while_pending(self):
+        """A queued blob is served from memory and the row is marked stored once written"""
+        store = BlockingStore(self.root)
+        manager = SessionArtifactManager(store, async_writes=True)
+        artifact = manager.save(7, 'transcript.txt', 'Tutor: hello', 'transcript')
+        self.assertEqual(artifact['status'], 'pending')
+        self.assertFalse(store.exists(artifact['storage_key']))
+        self.assertEqual(manager.load_text(7, 'transcript.txt'), 'Tutor: hello')
+
+        store.release.set()
+        manager.flush()
+        self.assertEqual(self._row('transcript.txt')['status'], 'stored')
+        self.assertIsNone(manager.writer.get_pending(artifact['storage_key']))
+        self.assertEqual(manager.load_text(7, 'transcript.txt'), 'Tutor: hello')
+
+    def test_failed_write_is_recorded(self):
+        """A write error marks the row failed and the artifact isn't served"""
+        store = BlockingStore(self.root)
+        store.error = OSError('disk full')
+        store.release.set()
+        manager = SessionArtifactManager(store, async_writes=True)
+        manager.save(7, 'session.json', '{}', 'session')
+        manager.flush()
+
+        row = self._row('session.json')
+        self.assertEqual(row['status'], 'failed')
+        self.assertIn('disk full', row['error'])
+        self.assertIsNone(manager.load(7, 'session.json'))
+
+    def test_late_result_for_replaced_content_is_ignored(self):
+        """A write result only applies while the row still points at that key"""
+        manager = SessionArtifactManager(LocalArtifactStore(self.root), async_writes=False)
+        old = manager.save(7, 'session.json', 'first', 'session')
+        new = manager.save(7, 'session.json', 'second', 'session')
+        self.assertEqual(old['id'], new['id'])
+
+        self.assertFalse(session_artifact_repository.set_status(old['id'], old['storage_key'], 'failed', 'late'))
+        self.assertEqual(self._row('session.json')['status'], 'stored')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test offline batch analysis.
+Runs submit, poll and apply against the local stub batch provider and an
+in-memory SQLite database, with the assessment and profile-update services
+faked, and checks that each result is applied exactly once and which
+assessment failures leave the pending queue.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app, db
+from app.ai.batch import COMPLETED, IN_PROGRESS, LocalStubBatchProvider
+from app.config import TestingConfig
+from app.models.ai_batch import AIBatch, AIBatchRequest, BatchRequestStatus, BatchStatus
+from app.models.ai_usage import AIUsageRecord
+from app.models.session import ProcessingState, Session
+from app.repositories import ai_batch_repository
+from app.services.batch_analysis_service import BatchAnalysisService
+from app.services.tutor_assessment_service import TutorAssessmentService
+
+TRANSCRIPT = ("Student: My name is Emma and I'm nine. Can we practise fractions? "
+              "AI: Sure! What is 1/2 + 1/4? Student: Three quarters, because 1/2 is 2/4.")
+
+
+class BatchTestCase(unittest.TestCase):
+    """Creates the batch tables in an in-memory database with three sessions"""
+
+    def setUp(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:'):
+            self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=[
+            Session.__table__, AIBatch.__table__, AIBatchRequest.__table__, AIUsageRecord.__table__
+        ])
+        db.session.add_all([Session(id=i, student_id=1, transcript=TRANSCRIPT) for i in range(1, 4)])
+        db.session.commit()
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def _session(self, session_id):
+        db.session.expire_all()
+        return db.session.get(Session, session_id)
+
+
+class TestBatchAnalysisService(BatchTestCase):
+    """Test cases for BatchAnalysisService with the stub provider"""
+
+    def setUp(self):
+        super().setUp()
+        self.provider = LocalStubBatchProvider(directory=os.path.join(self.tmp, 'stub'), turnaround_seconds=3600)
+        self.service = BatchAnalysisService(self.provider)
+        self.service.batch_dir = os.path.join(self.tmp, 'requests')
+
+        self.profile = self._patch(self.service.profile_service, 'prepare_update_prompt',
+                                   side_effect=lambda session_id: {'success': True, 'prompt': f"update {session_id}"})
+        self.apply_update = self._patch(self.service.profile_service, 'post_session_ai_update',
+                                        return_value={'success': True})
+        self.prepare = self._patch(self.service.assessment_service, 'prepare_assessment_prompt',
+                                   side_effect=self._prepare_assessment)
+        self.apply_assessment = self._patch(self.service.assessment_service, 'assess_tutor_performance',
+                                            side_effect=self._save_assessment)
+
+    def _patch(self, target, name, **kwargs):
+        patcher = mock.patch.object(target, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def _prepare_assessment(self, session_id):
+        if session_id == 3:
+            return {'success': False, 'error': 'Could not read guidelines file'}
+        return {'success': True, 'system_prompt': 'Assess the tutor', 'prompt': f"assess {session_id}"}
+
+    def _save_assessment(self, session_id, precomputed_response):
+        session = db.session.get(Session, session_id)
+        session.tutor_assessment = precomputed_response['assessment-of-ai-tutor']
+        db.session.commit()
+        return {'success': True}
+
+    def test_submit_poll_apply_exactly_once(self):
+        """Results are applied once when the batch completes, and never again"""
+        submitted = self.service.submit_pending(max_requests=10)
+        self.assertEqual((submitted['submitted'], submitted['skipped']), (5, 1))
+        self.assertEqual(self._session(1).processing_state, ProcessingState.processing.value)
+
+        self.assertEqual(self.service.poll_batches()['batches'][0]['state'], IN_PROGRESS)
+        self.apply_assessment.assert_not_called()
+
+        self.provider.turnaround_seconds = 0
+        outcome = self.service.poll_batches()['batches'][0]
+        self.assertEqual((outcome['state'], outcome['applied'], outcome['failed']), (COMPLETED, 5, 0))
+        self.assertEqual(sorted(call.args[0] for call in self.apply_assessment.call_args_list), [1, 2])
+        self.assertEqual(sorted(call.args[0] for call in self.apply_update.call_args_list), [1, 2, 3])
+        self.assertTrue(self._session(1).tutor_assessment.startswith('Stub batch assessment'))
+        for session_id in (1, 2, 3):
+            self.assertEqual(self._session(session_id).processing_state, ProcessingState.done.value)
+        self.assertEqual(AIUsageRecord.query.count(), 5)
+
+        batch = ai_batch_repository.get_batches()[0]
+        self.assertEqual(batch['status'], BatchStatus.applied.value)
+        self.assertEqual(self.service.apply_results(batch)['applied'], 0)
+        self.assertEqual(self.service.poll_batches()['batches'], [])
+        self.assertEqual(self.apply_assessment.call_count, 2)
+        self.assertEqual(self.apply_update.call_count, 3)
+        self.assertEqual({request.status for request in AIBatchRequest.query},
+                         {BatchRequestStatus.applied.value})
+
+    def test_unprepared_assessment_stays_pending(self):
+        """A session whose assessment couldn't be prepared is offered to the next batch"""
+        self.service.submit_pending(max_requests=10)
+        self.assertIsNone(self._session(3).tutor_assessment)
+        self.assertEqual(ai_batch_repository.get_pending_assessment_session_ids(), [3])
+
+    def test_invalid_result_fails_the_request(self):
+        """A result that fails validation is recorded as failed, not applied"""
+        self.service.submit_pending(max_requests=10)
+        self.provider.turnaround_seconds = 0
+        with mock.patch.dict('app.ai.batch.STUB_RESPONSES', {'tutor_assessment': {'unexpected': 'shape'}}):
+            outcome = self.service.poll_batches()['batches'][0]
+        self.assertEqual((outcome['applied'], outcome['failed']), (3, 2))
+        self.apply_assessment.assert_not_called()
+        self.assertEqual(ai_batch_repository.get_pending_assessment_session_ids(), [1, 2, 3])
+
+
+class TestPrepareAssessmentPrompt(BatchTestCase):
+    """Test cases for which preparation failures are recorded as skips"""
+
+    def setUp(self):
+        super().setUp()
+        self.service = TutorAssessmentService()
+
+    def test_low_information_session_is_skipped(self):
+        """A transcript triage marks as low-information gets a "Not assessed" note"""
+        self._session(1).transcript = "AI: Let's practise fractions and multiplication homework today! Hello?"
+        db.session.commit()
+        prepared = self.service.prepare_assessment_prompt(1)
+        self.assertTrue(prepared['skipped'])
+        self.assertTrue(self._session(1).tutor_assessment.startswith('Not assessed: low-information call'))
+
+    def test_transient_failure_is_not_skipped(self):
+        """Errors while gathering data return a failure without a skip note"""
+        for result in ({'success': False, 'error': 'Student 1 not found'}, RuntimeError('connection reset')):
+            with self.subTest(result=result):
+                with mock.patch.object(self.service, '_gather_assessment_data', side_effect=[result]):
+                    prepared = self.service.prepare_assessment_prompt(2)
+                self.assertFalse(prepared['success'])
+                self.assertNotIn('skipped', prepared)
+                self.assertIsNone(self._session(2).tutor_assessment)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test that the Celery task modules import and register.
+Creates the testing app, imports every task module the worker loads and checks
+that each periodic task in the beat schedule is a registered task.
+"""
+
+import importlib
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app
+from app.celery_app import BEAT_SCHEDULE, TASK_MODULES
+
+
+class TestCeleryTasks(unittest.TestCase):
+    """Import smoke tests for the background task modules"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app('testing')
+        for module in TASK_MODULES:
+            importlib.import_module(module)
+
+    def test_queue_backfill_and_batch_tasks_register(self):
+        """The session queue, summary backfill and batch tasks are registered"""
+        for name in ('process_pending_sessions', 'backfill_session_summaries', 'submit_ai_batch', 'poll_ai_batches'):
+            self.assertIn(f"app.tasks.ai_tasks.{name}", self.app.celery.tasks)
+
+    def test_dashboard_refresh_task_registers(self):
+        """Stale dashboards queue refresh_dashboard_cache, so workers must know it"""
+        self.assertIn('app.tasks.analytics_tasks.refresh_dashboard_cache', self.app.celery.tasks)
+        self.assertIn('app.tasks.analytics_tasks.aggregate_daily_stats', self.app.celery.tasks)
+
+    def test_beat_schedule_tasks_are_registered(self):
+        """Every scheduled task exists, so beat never sends an unknown task"""
+        self.assertEqual(self.app.celery.conf.CELERYBEAT_SCHEDULE, BEAT_SCHEDULE)
+        for entry in BEAT_SCHEDULE.values():
+            self.assertIn(entry['task'], self.app.celery.tasks)
+
+
+if __name__ == '__main__':
+    unittest.main()
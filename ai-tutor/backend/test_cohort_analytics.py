@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test the cohort mastery matrix.
+Checks the vectorised per-KC and per-student statistics against values
+worked out by hand for a small cohort.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.services.cohort_analytics_service import CohortFilter, NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from app.services.cohort_analytics_service import CohortMatrix
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+class TestCohortAnalytics(unittest.TestCase):
+    """Test cases for CohortMatrix"""
+
+    def setUp(self):
+        # 3 students x 3 KCs; student 30 has never practised KC 2
+        cells = [(0, 0, 90.0), (1, 0, 30.0), (2, 0, 60.0),
+                 (0, 1, 10.0), (1, 1, 20.0), (2, 1, 100.0),
+                 (0, 2, 85.0), (1, 2, 35.0)]
+        rows, cols, values = zip(*cells)
+        self.matrix = CohortMatrix([10, 20, 30], [(1, 'a'), (1, 'b'), (2, 'c')], rows, cols, values)
+
+    def test_dense_marks_missing_cells(self):
+        """Unobserved cells are NaN, not zero"""
+        dense = self.matrix.dense()
+        self.assertEqual(dense.shape, (3, 3))
+        self.assertTrue(np.isnan(dense[2, 2]))
+        self.assertEqual(dense[1, 0], 30.0)
+        self.assertAlmostEqual(self.matrix.density, 8 / 9)
+
+    def test_kc_stats(self):
+        """Means, medians, distributions and shares per KC"""
+        stats = self.matrix.kc_stats()
+        self.assertEqual(stats['students'].tolist(), [3, 3, 2])
+        self.assertEqual(stats['mean'].tolist(), [60.0, 130 / 3, 60.0])
+        self.assertEqual(stats['median'].tolist(), [60.0, 20.0, 60.0])
+        self.assertAlmostEqual(stats['std'][0], np.std([90, 30, 60]))
+        self.assertEqual(stats['distribution'][1].tolist(), [1, 1, 0, 0, 1])  # 100 falls in the top bucket
+        self.assertAlmostEqual(stats['struggling_share'][1], 2 / 3)
+        self.assertAlmostEqual(stats['mastered_share'][2], 0.5)
+        self.assertEqual(int(np.argmax(stats['difficulty'])), 1)
+
+    def test_student_stats(self):
+        """KCs tracked, mean mastery and struggling KCs per student"""
+        stats = self.matrix.student_stats()
+        self.assertEqual(stats['kcs_tracked'].tolist(), [3, 3, 2])
+        self.assertEqual(stats['struggling_kcs'].tolist(), [1, 3, 0])
+        self.assertAlmostEqual(stats['mean'][2], 80.0)
+
+    def test_filter_sql(self):
+        """Cohort filters become parameterised clauses"""
+        sql, params = CohortFilter(school_id=3, subject='Mathematics').progress_sql('COUNT(*)')
+        self.assertIn('s.school_id = :school_id', sql)
+        self.assertIn('g.subject = :subject', sql)
+        self.assertEqual(params, {'school_id': 3, 'subject': 'Mathematics'})
+
+
+if __name__ == '__main__':
+    unittest.main()
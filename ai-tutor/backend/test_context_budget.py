@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test the token-budgeted context assembler.
+Checks that sections are kept in priority order, lists are truncated to their
+most relevant items, and the report names what was cut.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai.context_budget import (
+    ContextAssembler, ContextSection, DROPPED, FULL, SUMMARISED, TRUNCATED, rank_items, render
+)
+from app.ai.token_accounting import count_tokens
+
+
+def make_memories(count):
+    return [{'memory_key': f"fact_{i}", 'value': f"Student mentioned detail number {i} about their week",
+             'updated_at': f"2025-01-{i + 1:02d}T10:00:00"} for i in range(count)]
+
+
+class TestContextBudget(unittest.TestCase):
+    """Test cases for ContextAssembler and rank_items"""
+
+    def test_everything_fits(self):
+        """Small contexts are passed through untouched"""
+        sections = [ContextSection('basic_info', {'name': 'Emma', 'age': 9}, priority=100),
+                    ContextSection('memories', make_memories(3), priority=50)]
+        assembled = ContextAssembler(2000).assemble(sections)
+        self.assertEqual(assembled.sections['memories'], sections[1].content)
+        self.assertEqual(assembled.report['dropped'], [])
+        self.assertEqual(assembled.describe_cuts(), '')
+
+    def test_budget_is_respected_and_lists_truncated(self):
+        """Lower-priority lists keep their head items; the total stays within budget"""
+        memories = rank_items(make_memories(30), 'updated_at')
+        sections = [ContextSection('basic_info', {'name': 'Emma', 'age': 9}, priority=100),
+                    ContextSection('memories', memories, priority=50)]
+        assembled = ContextAssembler(150).assemble(sections)
+
+        report = assembled.report
+        self.assertLessEqual(report['used_tokens'], 150)
+        self.assertEqual(report['sections']['basic_info']['status'], FULL)
+        self.assertEqual(report['sections']['memories']['status'], TRUNCATED)
+        kept = assembled.sections['memories']
+        self.assertEqual(kept, memories[:len(kept)])
+        self.assertEqual(kept[0]['memory_key'], 'fact_29')  # newest first
+        self.assertIn('memories (most relevant', assembled.describe_cuts())
+        self.assertEqual(sum(count_tokens(render(content)) for content in assembled.sections.values()),
+                         report['used_tokens'])
+
+    def test_summary_then_drop(self):
+        """Sections that can't be truncated fall back to their summary, then are dropped"""
+        atlas = {'subjects': {f"Subject {i}": {'goals': 'x' * 400} for i in range(5)}}
+        sections = [ContextSection('profile', {'narrative': 'Curious and kind.'}, priority=90),
+                    ContextSection('atlas', atlas, priority=30, summary={'subjects': list(atlas['subjects'])}),
+                    ContextSection('extra', {'blob': 'y' * 2000}, priority=10)]
+        assembled = ContextAssembler(120).assemble(sections)
+        self.assertEqual(assembled.report['sections']['atlas']['status'], SUMMARISED)
+        self.assertEqual(assembled.report['sections']['extra']['status'], DROPPED)
+        self.assertEqual(assembled.report['dropped'], ['extra'])
+        self.assertNotIn('extra', assembled.sections)
+
+    def test_deterministic(self):
+        """The same context always assembles the same way"""
+        items = make_memories(20)
+        sections = [ContextSection('memories', rank_items(items, 'updated_at'), priority=50)]
+        first = ContextAssembler(100).assemble(sections)
+        second = ContextAssembler(100).assemble(sections)
+        self.assertEqual(first.sections, second.sections)
+        self.assertEqual(first.report, second.report)
+
+    def test_rank_blends_relevance_and_recency(self):
+        """Low mastery outranks slightly newer high mastery when relevance is weighted"""
+        items = [{'kc': 'a', 'mastery_percentage': 90, 'last_updated': '2025-03-02T00:00:00'},
+                 {'kc': 'b', 'mastery_percentage': 10, 'last_updated': '2025-03-01T00:00:00'}]
+        ranked = rank_items(items, 'last_updated', lambda item: 1 - item['mastery_percentage'] / 100)
+        self.assertEqual([item['kc'] for item in ranked], ['b', 'a'])
+        self.assertEqual(rank_items(items, 'last_updated')[0]['kc'], 'a')
+
+
+class TestCombinedPromptBudget(unittest.TestCase):
+    """Test cases for the budgeted context in the combined analysis prompt"""
+
+    def setUp(self):
+        from app.services.combined_analysis_service import CombinedAnalysisService
+        self.service = CombinedAnalysisService()
+        self.student_context = {
+            'basic_info': {'first_name': 'Emma', 'grade': 3},
+            'current_profile': {'narrative': 'Curious and kind.', 'traits': {}},
+            'memories': {'personal_fact': make_memories(200)},
+            'recent_sessions': [],
+            'mastery_context': {}
+        }
+
+    def test_context_fits_update_budget(self):
+        """The combined prompt trims context like the separate update prompt and says so"""
+        with mock.patch.dict(os.environ, {'AI_UPDATE_CONTEXT_TOKENS': '300'}):
+            prompt = self.service._build_prompt('Tutor: Hi!', self.student_context, {'duration': 600})
+            update_context = self.service.profile_service.render_update_context(self.student_context)
+
+        self.assertIn(update_context['existing_memories'], prompt)
+        self.assertIn('Context trimmed to fit the token budget: memories.personal_fact (most relevant', prompt)
+        self.assertNotIn('fact_0"', prompt)
+        self.assertLess(count_tokens(prompt), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
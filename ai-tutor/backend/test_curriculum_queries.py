@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test the curriculum goal and progress repository reads.
+Runs against an in-memory SQLite database and checks that goals with KCs and
+the statistics come back in the expected shape from a fixed number of queries.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import db
+from app.models.mastery_tracking import CurriculumGoal, GoalKC, StudentGoalProgress, StudentKCProgress
+from app.repositories.curriculum_goal_repository import CurriculumGoalRepository
+from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+from app.repositories.student_kc_progress_repository import StudentKCProgressRepository
+
+TABLES = [CurriculumGoal.__table__, GoalKC.__table__, StudentGoalProgress.__table__, StudentKCProgress.__table__]
+
+
+class TestCurriculumQueries(unittest.TestCase):
+    """Test cases for single-query curriculum reads"""
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        db.metadata.create_all(self.engine, tables=TABLES)
+        self.session = sessionmaker(bind=self.engine)()
+
+        self.session.add_all([
+            CurriculumGoal(id=1, goal_code='3.NBT.1', title='Place value', subject='Mathematics', grade_level=3),
+            CurriculumGoal(id=2, goal_code='3.NBT.2', title='Addition', subject='Mathematics', grade_level=3),
+            CurriculumGoal(id=3, goal_code='4.NBT.1', title='Regrouping', subject='Mathematics', grade_level=4),
+            CurriculumGoal(id=4, goal_code='3.RL.1', title='Reading', subject='English', grade_level=3),
+        ])
+        self.session.add_all([
+            GoalKC(goal_id=1, kc_code='rounding', kc_name='Rounding'),
+            GoalKC(goal_id=1, kc_code='place-value', kc_name='Place value'),
+            GoalKC(goal_id=2, kc_code='add-within-100', kc_name='Add within 100'),
+            GoalKC(goal_id=4, kc_code='main-idea', kc_name='Main idea'),
+        ])
+        self.session.add_all([
+            StudentKCProgress(student_id=1, goal_id=1, kc_code='rounding', mastery_percentage=90.0),
+            StudentKCProgress(student_id=1, goal_id=1, kc_code='place-value', mastery_percentage=60.0),
+            StudentKCProgress(student_id=2, goal_id=1, kc_code='rounding', mastery_percentage=20.0),
+            StudentGoalProgress(student_id=1, goal_id=1, mastery_percentage=75.0),
+            StudentGoalProgress(student_id=2, goal_id=1, mastery_percentage=10.0),
+        ])
+        self.session.commit()
+        self.session.expunge_all()
+
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+        self.session.close()
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def test_goals_with_kcs_in_one_query(self):
+        """Goals come back in code order with their KCs, including goals without KCs"""
+        goals = CurriculumGoalRepository(self.session).get_goals_with_kcs(subject='Mathematics')
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual([goal['goal_code'] for goal in goals], ['3.NBT.1', '3.NBT.2', '4.NBT.1'])
+        self.assertEqual([kc['kc_code'] for kc in goals[0]['knowledge_components']], ['place-value', 'rounding'])
+        self.assertEqual(goals[0]['knowledge_components'][0]['goal_code'], '3.NBT.1')
+        self.assertEqual(goals[2]['knowledge_components'], [])
+
+        goals = CurriculumGoalRepository(self.session).get_goals_with_kcs(subject='Mathematics', grade_level=4)
+        self.assertEqual([goal['goal_code'] for goal in goals], ['4.NBT.1'])
+
+    def test_goal_statistics_in_one_query(self):
+        """Goal counts by subject and grade and KC totals come from one grouped query"""
+        stats = CurriculumGoalRepository(self.session).get_statistics()
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(stats['total_goals'], 4)
+        self.assertEqual(stats['unique_subjects'], 2)
+        self.assertEqual(stats['goals_by_subject'], {'Mathematics': 3, 'English': 1})
+        self.assertEqual(stats['goals_by_grade'], {3: 3, 4: 1})
+        self.assertEqual(stats['total_knowledge_components'], 4)
+        self.assertEqual(stats['average_kcs_per_goal'], 1.0)
+
+    def test_progress_statistics_in_one_query(self):
+        """Progress totals and mastery distributions come from one aggregate query each"""
+        kc_stats = StudentKCProgressRepository(self.session).get_statistics()
+        goal_stats = StudentGoalProgressRepository(self.session).get_statistics()
+        self.assertEqual(len(self.statements), 2)
+
+        self.assertEqual(kc_stats['total_kc_progress_records'], 3)
+        self.assertEqual(kc_stats['students_with_kc_progress'], 2)
+        self.assertEqual(kc_stats['unique_kcs_tracked'], 2)
+        self.assertEqual(kc_stats['average_kc_mastery_percentage'], 56.67)
+        self.assertEqual(kc_stats['kc_mastery_distribution'],
+                         {'high_mastery_80_plus': 1, 'medium_mastery_50_79': 1, 'low_mastery_below_50': 1})
+
+        self.assertEqual(goal_stats['total_progress_records'], 2)
+        self.assertEqual(goal_stats['mastery_distribution'],
+                         {'high_mastery_80_plus': 0, 'medium_mastery_50_79': 1, 'low_mastery_below_50': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the analytics dashboard cache.
+Uses the in-process cache (no Redis) and checks when entries go stale, that
+only one refresh per range can hold the lock, and that stale dashboards are
+served while a single background refresh is queued.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app
+
+# The analytics tasks are declared on the Celery app create_app builds
+create_app('testing')
+
+from app.services import analytics_service
+from app.services.analytics_service import AnalyticsService, DashboardCache
+from app.tasks import analytics_tasks
+
+
+def memory_cache(**kwargs):
+    cache = DashboardCache(**kwargs)
+    cache._connected = True  # Skip the Redis probe; use process memory
+    return cache
+
+
+class TestDashboardCache(unittest.TestCase):
+    """Test cases for DashboardCache staleness and refresh locking"""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch.object(analytics_service.time, 'time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.cache = memory_cache(ttl_seconds=60, refresh_lock_seconds=30)
+
+    def test_entry_goes_stale_after_ttl(self):
+        """Entries are fresh until the TTL has passed"""
+        self.cache.set('week', {'sessions': 3})
+        entry = self.cache.get('week')
+        self.assertEqual(entry['data'], {'sessions': 3})
+        self.assertFalse(self.cache.is_stale(entry))
+
+        self.now += 61
+        self.assertTrue(self.cache.is_stale(entry))
+
+    def test_entry_goes_stale_on_a_new_day(self):
+        """An entry computed yesterday is stale even within the TTL"""
+        self.cache.set('week', {'sessions': 3})
+        entry = dict(self.cache.get('week'), day='2000-01-01')
+        self.assertTrue(self.cache.is_stale(entry))
+        self.assertEqual(self.cache.get('week')['day'], datetime.utcnow().strftime('%Y-%m-%d'))
+
+    def test_refresh_lock(self):
+        """One refresh per range until released or the lock expires"""
+        self.assertTrue(self.cache.acquire_refresh('week'))
+        self.assertFalse(self.cache.acquire_refresh('week'))
+        self.assertTrue(self.cache.acquire_refresh('month'))
+
+        self.cache.release_refresh('week')
+        self.assertTrue(self.cache.acquire_refresh('week'))
+
+        # A crashed refresh doesn't hold the range forever
+        self.now += 31
+        self.assertTrue(self.cache.acquire_refresh('week'))
+
+    def test_stale_dashboard_is_served_while_one_refresh_is_queued(self):
+        """Readers get the stale payload; only the first one queues a refresh"""
+        cache = memory_cache(ttl_seconds=60)
+        service = AnalyticsService(mock.Mock())
+        with mock.patch.object(analytics_service, 'dashboard_cache', cache), \
+                mock.patch.object(service, '_build_dashboard_data', return_value={'sessions': 3}) as build, \
+                mock.patch.object(analytics_tasks.refresh_dashboard_cache, 'delay') as delay:
+            self.assertEqual(service.get_dashboard_data('week'), {'sessions': 3})
+            self.assertEqual(build.call_count, 1)  # Cold cache: computed inline
+
+            self.now += 61
+            self.assertEqual(service.get_dashboard_data('week'), {'sessions': 3})
+            self.assertEqual(service.get_dashboard_data('week'), {'sessions': 3})
+            delay.assert_called_once_with('week')
+            self.assertEqual(build.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the background event loop for synchronous AI callers.
+Checks that coroutines from many threads share one long-lived loop, that
+results, exceptions and timeouts come back to the caller, and that the loop
+is restarted after a fork.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai.event_loop import BackgroundEventLoop
+
+
+async def current_loop():
+    return asyncio.get_running_loop()
+
+
+class TestBackgroundEventLoop(unittest.TestCase):
+    """Test cases for BackgroundEventLoop"""
+
+    def setUp(self):
+        self.loop = BackgroundEventLoop(name='test-event-loop')
+        self.addCleanup(self.loop.stop)
+
+    def test_calls_share_one_loop(self):
+        """Every call, from any thread, runs on the same loop thread"""
+        first = self.loop.run(current_loop())
+        self.assertIs(self.loop.run(current_loop()), first)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            loops = list(pool.map(lambda _: self.loop.run(current_loop()), range(32)))
+        self.assertTrue(all(loop is first for loop in loops))
+        self.assertTrue(self.loop.is_running())
+
+    def test_results_and_exceptions(self):
+        """Results are returned and exceptions re-raised in the caller"""
+        async def add(a, b):
+            await asyncio.sleep(0)
+            return a + b
+
+        async def fail():
+            raise KeyError('missing')
+
+        self.assertEqual(self.loop.run(add(2, 3)), 5)
+        with self.assertRaises(KeyError):
+            self.loop.run(fail())
+        self.assertEqual(self.loop.run(add(1, 1)), 2)
+
+    def test_timeout_cancels_the_coroutine(self):
+        """A timed-out call raises and its coroutine is cancelled on the loop"""
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            self.loop.run(slow(), timeout=0.05)
+        self.assertTrue(cancelled.wait(2))
+
+    def test_run_from_loop_thread_is_refused(self):
+        """Blocking on the loop from inside it would deadlock, so it raises"""
+        async def nested():
+            return self.loop.run(current_loop())
+
+        with self.assertRaises(RuntimeError):
+            self.loop.run(nested())
+
+    def test_restarted_after_fork(self):
+        """A child process gets its own loop instead of the parent's dead thread"""
+        parent_loop = self.loop.run(current_loop())
+        with mock.patch('app.ai.event_loop.os.getpid', return_value=os.getpid() + 1):
+            self.assertFalse(self.loop.is_running())
+            child_loop = self.loop.run(current_loop())
+            self.loop.stop()
+        self.assertIsNot(child_loop, parent_loop)
+        parent_loop.call_soon_threadsafe(parent_loop.stop)
+
+    def test_stop(self):
+        """Stopping joins the thread; the next call starts a new loop"""
+        first = self.loop.run(current_loop())
+        self.loop.stop()
+        self.assertFalse(self.loop.is_running())
+        self.assertIsNot(self.loop.run(current_loop()), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
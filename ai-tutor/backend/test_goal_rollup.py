@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the goal mastery rollup consistency checker.
+Runs the checker's recomputation query against an in-memory SQLite database
+and checks that missing, orphaned, mismatched and stale rollup rows are found.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import db
+from app.models.mastery_tracking import CurriculumGoal, GoalKC, StudentGoalProgress, StudentKCProgress
+from app.repositories.student_goal_progress_repository import StudentGoalProgressRepository
+
+TABLES = [CurriculumGoal.__table__, GoalKC.__table__, StudentGoalProgress.__table__, StudentKCProgress.__table__]
+
+
+def _register_least(dbapi_connection, connection_record):
+    # PostgreSQL's LEAST, which SQLite doesn't have
+    dbapi_connection.create_function('LEAST', 2, min)
+
+
+class TestGoalRollupConsistency(unittest.TestCase):
+    """Test cases for check_rollup_consistency"""
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        event.listen(self.engine, 'connect', _register_least)
+        db.metadata.create_all(self.engine, tables=TABLES)
+        self.session = sessionmaker(bind=self.engine)()
+        self.repo = StudentGoalProgressRepository(self.session)
+
+        self.session.add_all([
+            CurriculumGoal(id=1, goal_code='3.NBT.1', title='Place value', subject='Mathematics', grade_level=3),
+            CurriculumGoal(id=2, goal_code='3.NBT.2', title='Addition', subject='Mathematics', grade_level=3),
+            GoalKC(goal_id=1, kc_code='rounding', kc_name='Rounding'),
+            GoalKC(goal_id=1, kc_code='place-value', kc_name='Place value'),
+            GoalKC(goal_id=2, kc_code='add-within-100', kc_name='Add within 100'),
+            StudentKCProgress(student_id=1, goal_id=1, kc_code='rounding', mastery_percentage=90.0),
+            StudentKCProgress(student_id=1, goal_id=2, kc_code='add-within-100', mastery_percentage=40.0),
+        ])
+        self.session.add_all([
+            # Goal 1 has two KCs and only one is practised: (90 + 0) / 2
+            self._rollup(1, 1, 45.0, total_kcs=2, kcs_with_progress=1),
+            self._rollup(1, 2, 40.0, total_kcs=1, kcs_with_progress=1, goal_title='Addition'),
+        ])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _rollup(self, student_id, goal_id, mastery, total_kcs, kcs_with_progress, goal_title='Place value'):
+        return StudentGoalProgress(
+            student_id=student_id, goal_id=goal_id, mastery_percentage=mastery, mastery_source='kc',
+            total_kcs=total_kcs, kcs_with_progress=kcs_with_progress,
+            goal_code=f"3.NBT.{goal_id}", goal_title=goal_title, subject='Mathematics', grade_level=3
+        )
+
+    def test_consistent_rollups(self):
+        """Stored rollups that match the KC rows report no problems"""
+        report = self.repo.check_rollup_consistency()
+        self.assertTrue(report['consistent'])
+        self.assertEqual(report['problems'], {})
+
+    def test_detects_each_problem(self):
+        """Missing, orphaned, mismatched and stale rows are classified"""
+        self.session.query(StudentGoalProgress).filter_by(student_id=1, goal_id=1).update(
+            {'mastery_percentage': 90.0})
+        self.session.query(StudentGoalProgress).filter_by(student_id=1, goal_id=2).update(
+            {'goal_title': 'Old title'})
+        self.session.add_all([
+            StudentKCProgress(student_id=2, goal_id=1, kc_code='place-value', mastery_percentage=60.0),
+            self._rollup(3, 2, 50.0, total_kcs=1, kcs_with_progress=1),
+        ])
+        self.session.commit()
+
+        report = self.repo.check_rollup_consistency()
+        problems = {(row['student_id'], row['goal_id']): row['problem'] for row in report['samples']}
+        self.assertEqual(problems, {(1, 1): 'mismatch', (1, 2): 'stale_metadata',
+                                    (2, 1): 'missing', (3, 2): 'orphaned'})
+        self.assertEqual(report['problems'], {'mismatch': 1, 'stale_metadata': 1, 'missing': 1, 'orphaned': 1})
+        self.assertAlmostEqual(report['samples'][0]['expected_mastery'], 45.0)
+
+        self.assertEqual(self.repo.check_rollup_consistency(student_id=2)['problems'], {'missing': 1})
+
+    def test_tolerance_and_direct_goals(self):
+        """Small drift within tolerance and directly set goals are not flagged"""
+        self.session.query(StudentGoalProgress).filter_by(student_id=1, goal_id=1).update(
+            {'mastery_percentage': 45.005})
+        self.session.add(StudentGoalProgress(student_id=4, goal_id=2, mastery_percentage=70.0,
+                                             mastery_source='direct'))
+        self.session.commit()
+
+        self.assertTrue(self.repo.check_rollup_consistency(tolerance=0.01)['consistent'])
+        self.assertFalse(self.repo.check_rollup_consistency(tolerance=0.001)['consistent'])
+
+    def test_fix_refreshes_inconsistent_goals(self):
+        """fix recomputes each inconsistent goal once, grouped by student"""
+        self.session.query(StudentGoalProgress).filter_by(student_id=1, goal_id=1).update(
+            {'mastery_percentage': 10.0})
+        self.session.add(StudentKCProgress(student_id=2, goal_id=2, kc_code='add-within-100',
+                                           mastery_percentage=30.0))
+        self.session.commit()
+
+        with mock.patch.object(self.repo, 'refresh_rollup') as refresh:
+            report = self.repo.check_rollup_consistency(fix=True)
+        self.assertEqual(report['fixed'], 2)
+        refresh.assert_has_calls([mock.call(1, [1], commit=False), mock.call(2, [2], commit=False)])
+        self.assertEqual(refresh.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the prerequisite-aware KC recommender.
+Builds a small curriculum graph in memory and checks the topological order,
+prerequisite resolution and the ranked ready-to-learn frontier.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.services.kc_recommendation_service import CurriculumGraph, IN_PROGRESS, NEW
+
+GOALS = [
+    (1, '3.NBT.1', 'Place value', 'Mathematics', 3),
+    (2, '3.NBT.2', 'Addition', 'Mathematics', 3),
+    (3, '4.NBT.1', 'Multi-digit addition', 'Mathematics', 4),
+    (4, '3.RL.1', 'Reading', 'English', 3),
+]
+KCS = [
+    (1, 'place-value', 'Place value'),
+    (1, 'rounding', 'Rounding'),
+    (2, 'add-within-100', 'Add within 100'),
+    (3, 'add-with-regrouping', 'Add with regrouping'),
+    (4, 'main-idea', 'Main idea'),
+]
+PREREQUISITES = [
+    (3, 'add-within-100', 2),  # names its goal
+    (3, 'place-value', None),  # any goal with this KC
+    (2, 'place-value', 1),
+]
+
+
+class TestKCRecommendation(unittest.TestCase):
+    """Test cases for CurriculumGraph"""
+
+    def setUp(self):
+        self.graph = CurriculumGraph(GOALS, KCS, PREREQUISITES)
+
+    def codes(self, frontier):
+        return [(self.graph.kc_codes[index], status) for index, status in frontier]
+
+    def test_topological_order(self):
+        """Prerequisite goals come first; ties follow grade, subject and code"""
+        self.assertEqual(self.graph.goal_ids, [4, 1, 2, 3])
+        self.assertEqual(self.graph.cyclic_goals, [])
+        self.assertEqual(self.graph.unresolved_prerequisites, 0)
+        for position, goal_id in enumerate(self.graph.goal_ids):
+            start, end = self.graph.kc_start[position], self.graph.kc_start[position + 1]
+            self.assertTrue(all(self.graph.kc_goal[index] == position for index in range(start, end)))
+
+    def test_new_student_gets_unblocked_kcs(self):
+        """Only KCs of goals without unmastered prerequisites are recommended"""
+        frontier = self.codes(self.graph.ready_frontier({}))
+        self.assertEqual(frontier, [('main-idea', NEW), ('place-value', NEW), ('rounding', NEW)])
+
+    def test_started_kcs_first_and_blocked_kcs_excluded(self):
+        """Started KCs lead; a started KC whose prerequisites are unmastered is held back"""
+        mastery = self.graph.mastery_vector([(1, 'place-value', 90.0), (1, 'rounding', 40.0),
+                                             (2, 'add-within-100', 50.0), (3, 'add-with-regrouping', 20.0)])
+        frontier = self.codes(self.graph.ready_frontier(mastery))
+        self.assertEqual(frontier, [('rounding', IN_PROGRESS), ('add-within-100', IN_PROGRESS),
+                                    ('main-idea', NEW)])
+
+        mastery[self.graph.kc_index[(2, 'add-within-100')]] = 85.0
+        frontier = self.codes(self.graph.ready_frontier(mastery, limit=2))
+        self.assertEqual(frontier, [('rounding', IN_PROGRESS), ('add-with-regrouping', IN_PROGRESS)])
+
+    def test_grade_cap_and_cycles(self):
+        """Unstarted KCs above the grade cap are skipped; cyclic goals are ordered last"""
+        mastery = self.graph.mastery_vector([(1, 'place-value', 100.0), (2, 'add-within-100', 100.0)])
+        frontier = self.codes(self.graph.ready_frontier(mastery, max_grade_level=3))
+        self.assertNotIn(('add-with-regrouping', NEW), frontier)
+
+        cyclic = CurriculumGraph(GOALS, KCS, PREREQUISITES + [(1, 'add-with-regrouping', 3)])
+        self.assertEqual(cyclic.cyclic_goals, [1, 2, 3])
+        self.assertEqual(cyclic.goal_ids, [4, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
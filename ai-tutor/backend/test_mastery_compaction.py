@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test the weekly mastery snapshot compaction.
+Runs against an in-memory SQLite database with the PostgreSQL compaction
+statement stubbed out, and checks the weeks each run covers, the checkpoint
+it resumes from and the trajectory read from the snapshots.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.mastery_tracking import MasteryEvent, MasteryWeeklySnapshot
+from app.repositories import mastery_event_repository
+
+# A Thursday; its week starts on Monday 2026-10-12
+NOW = datetime(2026, 10, 15, 9, 30)
+
+
+class TestMasteryCompaction(unittest.TestCase):
+    """Test cases for compact_weekly_snapshots and get_trajectory"""
+
+    def setUp(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:'):
+            self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=[
+            JobCheckpoint.__table__, MasteryEvent.__table__, MasteryWeeklySnapshot.__table__
+        ])
+
+        clock = mock.patch.object(mastery_event_repository, 'datetime', wraps=datetime)
+        clock.start().utcnow.return_value = NOW
+        self.addCleanup(clock.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def _compact(self, since=None, written=3):
+        with mock.patch.object(db.session, 'execute', return_value=mock.Mock(rowcount=written)) as execute:
+            result = mastery_event_repository.compact_weekly_snapshots(since)
+        return result, execute
+
+    def test_nothing_to_compact(self):
+        """Without events no statement runs"""
+        result, execute = self._compact()
+        self.assertEqual(result, {'from_date': None, 'to_date': None, 'snapshots': 0})
+        execute.assert_not_called()
+
+    def test_first_run_starts_at_first_event_week(self):
+        """The first run covers the week of the first event through the current week"""
+        db.session.add(MasteryEvent(id=1, student_id=1, goal_id=1, kc_code='rounding', session_id=7,
+                                    mastery_percentage=40.0, recorded_at=datetime(2026, 9, 24, 15, 0)))
+        db.session.commit()
+
+        result, execute = self._compact()
+        self.assertEqual(result, {'from_date': '2026-09-21', 'to_date': '2026-10-19', 'snapshots': 3})
+        statement, params = execute.call_args.args
+        self.assertIs(statement, mastery_event_repository.COMPACT_SNAPSHOTS_SQL)
+        self.assertEqual(params['from_date'], date(2026, 9, 21))
+        self.assertEqual(params['to_date'], date(2026, 10, 19))
+        self.assertEqual(params['mastered_threshold'], mastery_event_repository.MASTERED_THRESHOLD)
+
+        checkpoint = db.session.get(JobCheckpoint, mastery_event_repository.COMPACTION_JOB)
+        self.assertEqual(checkpoint.data, {'last_week': '2026-10-12', 'last_run_snapshots': 3})
+        self.assertEqual(checkpoint.processed_count, 3)
+
+    def test_later_runs_resume_from_last_week(self):
+        """Regular runs only recompact the last, possibly partial, week"""
+        db.session.add(JobCheckpoint(job_name=mastery_event_repository.COMPACTION_JOB, last_id=0,
+                                     processed_count=10, failed_count=0, data={'last_week': '2026-10-05'}))
+        db.session.commit()
+
+        result, _ = self._compact(written=2)
+        self.assertEqual(result['from_date'], '2026-10-05')
+        checkpoint = db.session.get(JobCheckpoint, mastery_event_repository.COMPACTION_JOB)
+        self.assertEqual(checkpoint.processed_count, 12)
+        self.assertEqual(checkpoint.data['last_week'], '2026-10-12')
+
+        result, _ = self._compact(since=date(2026, 8, 6))
+        self.assertEqual(result['from_date'], '2026-08-03')
+
+    def test_trajectory_groups_snapshots_by_subject(self):
+        """Trajectories come back per subject, oldest week first"""
+        db.session.add_all([
+            MasteryWeeklySnapshot(student_id=1, week_start=date(2026, 10, 5), subject='Mathematics', avg_mastery=60.0),
+            MasteryWeeklySnapshot(student_id=1, week_start=date(2026, 9, 28), subject='Mathematics', avg_mastery=50.0),
+            MasteryWeeklySnapshot(student_id=1, week_start=date(2026, 10, 5), subject='English', avg_mastery=30.0),
+            MasteryWeeklySnapshot(student_id=2, week_start=date(2026, 10, 5), subject='English', avg_mastery=90.0),
+        ])
+        db.session.commit()
+
+        trajectory = mastery_event_repository.get_trajectory(1)
+        self.assertEqual(sorted(trajectory), ['English', 'Mathematics'])
+        self.assertEqual([week['avg_mastery'] for week in trajectory['Mathematics']], [50.0, 60.0])
+
+        # A start date mid-week includes that whole week
+        trajectory = mastery_event_repository.get_trajectory(1, start_date=date(2026, 10, 8), subject='Mathematics')
+        self.assertEqual([week['week_start'] for week in trajectory['Mathematics']], ['2026-10-05'])
+
+
+if __name__ == '__main__':
+    unittest.main()
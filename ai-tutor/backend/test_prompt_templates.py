@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test the compiled prompt templates.
+Renders every prompt file with the compiled render plan and checks that the
+output matches str.format rendering by the baseline loader. Also checks that
+the on-disk index is reused while files are unchanged and refreshed when one
+changes.
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai.prompts_file_loader import DEFAULT_PARAMETERS, CompiledTemplate, FileBasedPromptManager
+
+PROMPTS_DIR = Path(__file__).parent / 'app' / 'ai' / 'prompts'
+
+
+def baseline_section(content, header):
+    """The baseline loader's section extraction"""
+    lines, in_section = [], False
+    for line in content.split('\n'):
+        if line.strip() == header:
+            in_section = True
+        elif in_section and line.startswith('## '):
+            break
+        elif in_section:
+            lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def baseline_metadata(content, name):
+    """The baseline loader's metadata extraction"""
+    match = re.search(rf'\*\*{name}:\*\*\s*(.+?)(?:\n|$)', content)
+    return match.group(1).strip() if match else None
+
+
+def baseline_format(template, **kwargs):
+    """The baseline loader's rendering: defaults overridden by kwargs, then str.format"""
+    return template.format(**{**DEFAULT_PARAMETERS, **kwargs})
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    """Test cases for CompiledTemplate rendering"""
+
+    def test_escapes_and_literal_braces(self):
+        """{{ and }} are escapes; braces around non-identifiers are literal"""
+        compiled = CompiledTemplate.compile('Hi {name}! {{name}} {"score": 3} {0} {}')
+        self.assertEqual(compiled.placeholders, ['name'])
+        self.assertEqual(compiled.render({'name': 'Emma'}), 'Hi Emma! {name} {"score": 3} {0} {}')
+
+    def test_matches_str_format(self):
+        """Templates str.format accepts render identically"""
+        template = 'Student {student_name} ({student_age}) {{json}}\n{transcript}\n{{"a": {subject_focus}}}'
+        params = {'student_name': 'Emma', 'transcript': 'Tutor: what is {x}?', 'subject_focus': 7}
+        self.assertEqual(CompiledTemplate.compile(template).render(params, DEFAULT_PARAMETERS),
+                         baseline_format(template, **params))
+
+    def test_missing_value_raises(self):
+        """A placeholder without a value or default raises KeyError"""
+        with self.assertRaises(KeyError):
+            CompiledTemplate.compile('{unknown}').render({}, DEFAULT_PARAMETERS)
+
+    def test_index_round_trip(self):
+        """The serialized render plan rebuilds the same segments"""
+        compiled = CompiledTemplate.compile('A {b} c {{d}}')
+        self.assertEqual(CompiledTemplate.from_list(compiled.to_list()).segments, compiled.segments)
+
+
+class TestPromptFiles(unittest.TestCase):
+    """Test cases for FileBasedPromptManager against the baseline loader"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.prompts_dir = Path(self.tmp) / 'prompts'
+        shutil.copytree(PROMPTS_DIR, self.prompts_dir)
+        self.index_path = Path(self.tmp) / 'prompt_index.json'
+        self.manager = FileBasedPromptManager(str(self.prompts_dir), str(self.index_path))
+
+    def test_every_prompt_matches_baseline(self):
+        """Parsing and rendering of each prompt file match the baseline loader"""
+        self.assertEqual(set(self.manager.prompts), set(FileBasedPromptManager.PROMPT_FILES.values()))
+        rendered_by_both = 0
+        for key, prompt in self.manager.prompts.items():
+            with self.subTest(prompt=key):
+                content = Path(prompt.file_path).read_text(encoding='utf-8')
+                self.assertEqual(prompt.system_prompt, baseline_section(content, '## System Prompt'))
+                self.assertEqual(prompt.user_prompt_template, baseline_section(content, '## User Prompt Template'))
+                self.assertEqual(prompt.version, baseline_metadata(content, 'Version') or '1.0')
+                self.assertEqual(prompt.description, baseline_metadata(content, 'Description') or 'No description')
+
+                params = {name: f"<{name} value with {{braces}}>" for name in prompt.compiled.placeholders}
+                params['transcript'] = 'Tutor: What is 3/4 of {12}?\nStudent: 9'
+                rendered = self.manager.format_prompt(key, **params)['user_prompt']
+                try:
+                    expected = baseline_format(prompt.user_prompt_template, **params)
+                except (KeyError, IndexError, ValueError):
+                    # The baseline couldn't render templates with single-brace JSON examples
+                    self.assertNotIn('{transcript}', rendered)
+                    continue
+                self.assertEqual(rendered, expected)
+                rendered_by_both += 1
+        self.assertGreater(rendered_by_both, 0)
+
+    def test_defaults_fill_optional_parameters(self):
+        """Omitted optional parameters use the same defaults as before"""
+        prompt = self.manager.get_prompt('introductory_analysis')
+        rendered = self.manager.format_prompt('introductory_analysis', transcript='Hello')['user_prompt']
+        params = {name: DEFAULT_PARAMETERS[name] for name in prompt.compiled.placeholders
+                  if name in DEFAULT_PARAMETERS}
+        self.assertEqual(rendered, prompt.compiled.render(dict(params, transcript='Hello')))
+
+    def test_index_is_reused_until_a_file_changes(self):
+        """A second manager loads from the index; an edited file is re-parsed"""
+        self.assertTrue(self.index_path.exists())
+        with mock.patch.object(FileBasedPromptManager, '_load_prompt_from_file') as parse:
+            reloaded = FileBasedPromptManager(str(self.prompts_dir), str(self.index_path))
+            parse.assert_not_called()
+        self.assertEqual(reloaded.get_prompt('quick_assessment').compiled.segments,
+                         self.manager.get_prompt('quick_assessment').compiled.segments)
+
+        path = self.prompts_dir / 'quick_assessment.md'
+        path.write_text(path.read_text(encoding='utf-8').replace('{student_name}', '{student_name} (edited)'),
+                        encoding='utf-8')
+        os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+        params = {name: 'x' for name in self.manager.get_prompt('quick_assessment').compiled.placeholders}
+        rendered = reloaded.format_prompt('quick_assessment', **dict(params, student_name='Emma'))['user_prompt']
+        self.assertIn('Emma (edited)', rendered)
+
+
+if __name__ == '__main__':
+    unittest.main()
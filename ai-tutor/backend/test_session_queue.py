@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the session processing work queue.
+Runs the claim, lease and completion functions against an in-memory SQLite
+database and checks that only the current lease owner can complete a claim.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.session import Session, ProcessingState
+from app.repositories import session_repository
+
+
+class TestSessionQueue(unittest.TestCase):
+    """Test cases for claiming and completing session processing"""
+
+    def setUp(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:'):
+            self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=[Session.__table__])
+        db.session.add_all([Session(id=i, student_id=1, transcript=f"Session {i}") for i in range(1, 5)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def _state(self, session_id):
+        db.session.expire_all()
+        return db.session.get(Session, session_id)
+
+    def _expire_lease(self, session_id):
+        Session.query.filter_by(id=session_id).update(
+            {'processing_lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+    def test_claims_do_not_overlap(self):
+        """A second worker only gets sessions the first one didn't claim"""
+        first = session_repository.claim_processing_batch('worker-a', batch_size=3)
+        second = session_repository.claim_processing_batch('worker-b', batch_size=3)
+
+        self.assertEqual(first, [1, 2, 3])
+        self.assertEqual(second, [4])
+        session = self._state(1)
+        self.assertEqual(session.processing_state, ProcessingState.processing.value)
+        self.assertEqual(session.processing_attempts, 1)
+        self.assertEqual(session.processing_lease_owner, 'worker-a')
+        self.assertEqual(session_repository.claim_processing_batch('worker-c'), [])
+
+    def test_owner_completes_claim(self):
+        """The lease owner can mark its session done; other workers can't"""
+        session_repository.claim_processing_batch('worker-a', batch_size=1)
+
+        self.assertFalse(session_repository.mark_processing_done(1, 'worker-b'))
+        self.assertEqual(self._state(1).processing_state, ProcessingState.processing.value)
+
+        self.assertTrue(session_repository.mark_processing_done(1, 'worker-a'))
+        session = self._state(1)
+        self.assertEqual(session.processing_state, ProcessingState.done.value)
+        self.assertIsNone(session.processing_lease_owner)
+        self.assertIsNone(session.processing_lease_expires_at)
+
+    def test_expired_lease_is_reclaimed(self):
+        """After a lease expires the old owner can no longer complete the session"""
+        session_repository.claim_processing_batch('worker-a', batch_size=1)
+        self._expire_lease(1)
+
+        self.assertEqual(session_repository.claim_processing_batch('worker-b', batch_size=1), [1])
+        self.assertFalse(session_repository.mark_processing_done(1, 'worker-a'))
+        self.assertFalse(session_repository.mark_processing_failed(1, 'timeout', 'worker-a'))
+
+        session = self._state(1)
+        self.assertEqual(session.processing_state, ProcessingState.processing.value)
+        self.assertEqual(session.processing_lease_owner, 'worker-b')
+        self.assertEqual(session.processing_attempts, 2)
+        self.assertTrue(session_repository.mark_processing_done(1, 'worker-b'))
+
+    def test_failures_retry_until_budget_is_spent(self):
+        """Failed sessions go back to pending, then to failed after max_attempts"""
+        for attempt in range(1, 3):
+            self.assertEqual(session_repository.claim_processing_batch('worker-a', batch_size=1, max_attempts=2), [1])
+            self.assertTrue(session_repository.mark_processing_failed(1, f"error {attempt}", 'worker-a', max_attempts=2))
+
+        session = self._state(1)
+        self.assertEqual(session.processing_state, ProcessingState.failed.value)
+        self.assertEqual(session.processing_attempts, 2)
+        self.assertEqual(session.processing_error, 'error 2')
+        self.assertIsNone(session.processing_lease_owner)
+        self.assertEqual(session_repository.claim_processing_batch('worker-a', batch_size=1, max_attempts=2), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test keyset paging of the session full-text search.
+Pages through results with tied ranks using the service's opaque cursor and
+checks that every session is returned exactly once.
+"""
+
+import os
+import sys
+import struct
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from sqlalchemy.dialects import postgresql
+
+from app.repositories import session_repository
+from app.services.session_service import SessionService
+
+
+def as_real(value):
+    """A rank as PostgreSQL computes it (real), returned as double precision"""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+
+class FakeSearch:
+    """In-memory stand-in for session_repository.search with the same keyset filter"""
+
+    def __init__(self, ranks):
+        self.rows = sorted(({'session_id': session_id, 'rank': rank} for session_id, rank in ranks.items()),
+                           key=lambda row: (row['rank'], row['session_id']), reverse=True)
+
+    def __call__(self, query, limit=20, after_rank=None, after_id=None, student_id=None):
+        rows = self.rows
+        if after_rank is not None and after_id is not None:
+            rows = [row for row in rows if row['rank'] < after_rank
+                    or (row['rank'] == after_rank and row['session_id'] < after_id)]
+        return rows[:limit]
+
+
+class StopQuery(Exception):
+    pass
+
+
+class TestSessionSearch(unittest.TestCase):
+    """Test cases for search_sessions cursor paging"""
+
+    def test_paging_with_tied_ranks(self):
+        """Ties span page boundaries without skipping or repeating sessions"""
+        ranks = {1: as_real(0.1), 2: as_real(0.1), 3: as_real(0.1), 4: as_real(0.3),
+                 5: as_real(0.1), 6: as_real(0.0333), 7: as_real(0.3)}
+        service = SessionService()
+
+        seen, cursor, pages = [], None, 0
+        with mock.patch.object(session_repository, 'search', FakeSearch(ranks)):
+            while True:
+                page = service.search_sessions('fractions', limit=2, cursor=cursor)
+                seen.extend(result['session_id'] for result in page['results'])
+                pages += 1
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+
+        self.assertEqual(seen, [7, 4, 5, 3, 2, 1, 6])
+        self.assertEqual(pages, 4)
+
+    def test_invalid_cursor(self):
+        """Malformed cursors are rejected"""
+        with self.assertRaises(ValueError):
+            SessionService().search_sessions('fractions', cursor='not-a-cursor')
+
+    def test_rank_is_double_precision(self):
+        """The rank is cast from real so it equals the float cursor value on the next page"""
+        fake_db = mock.Mock()
+        fake_db.session.query.side_effect = StopQuery
+        with mock.patch.object(session_repository, 'db', fake_db), self.assertRaises(StopQuery):
+            session_repository.search('fractions')
+
+        rank = fake_db.session.query.call_args.args[1]
+        sql = str(rank.compile(dialect=postgresql.dialect()))
+        self.assertRegex(sql, r'^CAST\(ts_rank_cd\(.*\) AS FLOAT\)$')
+
+
+if __name__ == '__main__':
+    unittest.main()
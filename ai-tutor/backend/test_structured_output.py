@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test the structured AI output layer.
+Checks JSON extraction from free text, the compiled schema validators, the
+local-only rules and the per-prompt parse statistics.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai.structured_output import StructuredOutputParser, compile_schema, extract_json
+
+
+class TestExtractJson(unittest.TestCase):
+    """Test cases for extract_json"""
+
+    def test_fenced_object_in_prose(self):
+        """Code fences and surrounding prose are skipped"""
+        text = 'Here is the analysis:\n```json\n{"summary": "Fractions", "score": 4}\n```\nThanks!'
+        self.assertEqual(extract_json(text), {'summary': 'Fractions', 'score': 4})
+
+    def test_braces_and_quotes_inside_strings(self):
+        """Braces and escaped quotes in string literals don't affect matching"""
+        text = 'Result: {"note": "use {x} and \\"}\\" here", "nested": {"a": [1, {"b": 2}]}} done'
+        self.assertEqual(extract_json(text), {'note': 'use {x} and "}" here', 'nested': {'a': [1, {'b': 2}]}})
+
+    def test_stray_brace_before_object(self):
+        """An unclosed brace in prose doesn't hide the object after it"""
+        self.assertEqual(extract_json('Set notation { like this. Answer: {"a": 1}'), {'a': 1})
+
+    def test_invalid_span_then_valid(self):
+        """A balanced span that isn't JSON is skipped for the next one"""
+        text = 'The set {1, 2} has two elements. {"elements": 2}'
+        self.assertEqual(extract_json(text), {'elements': 2})
+
+    def test_first_object_wins(self):
+        """Only the first decodable top-level object is returned"""
+        self.assertEqual(extract_json('{"a": {"b": 1}} and {"c": 2}'), {'a': {'b': 1}})
+
+    def test_no_json(self):
+        """Text without a decodable object raises ValueError"""
+        for text in ('no braces at all', 'unclosed {"a": 1', '{not json}', '{"a": "unterminated}'):
+            with self.assertRaises(ValueError):
+                extract_json(text)
+
+    def test_many_unbalanced_braces_is_linear(self):
+        """Thousands of stray braces are scanned once, not once per brace"""
+        text = 'x {' * 100000 + '{"a": 1}'
+        started = time.perf_counter()
+        self.assertEqual(extract_json(text), {'a': 1})
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+
+class TestSchemaValidation(unittest.TestCase):
+    """Test cases for compile_schema and StructuredOutputParser"""
+
+    def setUp(self):
+        self.parser = StructuredOutputParser()
+
+    def _errors(self, schema, value):
+        errors = []
+        compile_schema(schema)(value, '$', errors)
+        return errors
+
+    def test_types_ranges_and_required(self):
+        """Each supported keyword reports a path and message"""
+        schema = {'type': 'object', 'required': ['name'], 'properties': {
+            'name': {'type': 'string', 'minLength': 1},
+            'age': {'type': ['integer', 'null'], 'minimum': 0},
+            'tags': {'type': 'array', 'items': {'type': 'string'}},
+            'level': {'enum': ['low', 'high']}
+        }}
+        self.assertEqual(self._errors(schema, {'name': 'Emma', 'age': None, 'tags': ['a']}), [])
+        errors = self._errors(schema, {'age': -1, 'tags': ['a', 2], 'level': 'mid'})
+        self.assertEqual(errors, [
+            "$: missing required field 'name'",
+            '$.age: -1 is below minimum 0',
+            '$.tags[1]: expected string, got int',
+            "$.level: 'mid' not in ['low', 'high']"
+        ])
+        self.assertEqual(self._errors({'type': 'integer'}, True), ['$: expected integer, got bool'])
+        self.assertEqual(self._errors({'type': 'string', 'minLength': 1}, '  '),
+                         ['$: shorter than 1 characters'])
+
+    def test_any_of(self):
+        """anyOf passes when one alternative matches"""
+        schema = {'anyOf': [{'type': 'string'}, {'type': 'integer'}]}
+        self.assertEqual(self._errors(schema, 3), [])
+        self.assertEqual(self._errors(schema, 3.5), ['$: does not match any allowed form'])
+
+    def test_update_needs_a_section(self):
+        """The local-only rule rejects updates without any update section"""
+        self.assertEqual(self.parser.validate('post_session_update', {'memory_updates': {}}), [])
+        errors = self.parser.validate('post_session_update', {'update_reasoning': 'nothing'})
+        self.assertEqual(len(errors), 1)
+        self.assertIn('needs at least one of', errors[0])
+        self.assertEqual(self.parser.validate('unknown_task', {'anything': 1}), [])
+
+    def test_parse_methods_and_stats(self):
+        """Parses are classified by method and counted per prompt"""
+        valid = '{"summary": "Practised fractions"}'
+        self.assertEqual(self.parser.parse(valid, 'session_summary').method, 'direct')
+        self.assertEqual(self.parser.parse(valid, 'session_summary', native=True).method, 'native')
+        extracted = self.parser.parse(f"Sure!\n{valid}", 'session_summary')
+        self.assertTrue(extracted.success)
+        self.assertEqual(extracted.method, 'extracted')
+        self.assertFalse(self.parser.parse('{"summary": ""}', 'session_summary').success)
+        self.assertEqual(self.parser.parse('no json', 'session_summary').data, None)
+        self.assertTrue(self.parser.parse({'summary': 'From a tool call'}, 'session_summary').success)
+
+        stats = self.parser.stats.summary()['session_summary']
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual(stats['parse_failures'], 1)
+        self.assertEqual(stats['schema_failures'], 1)
+        self.assertAlmostEqual(stats['failure_rate'], 2 / 6)
+        self.assertEqual(stats['methods'], {'direct': 2, 'native': 2, 'extracted': 1, 'failed': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
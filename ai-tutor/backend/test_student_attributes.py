@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test typed student age and grade.
+Checks parsing of legacy "age:"/"grade:" learning preferences and that age
+and grade come from the date_of_birth and grade_level columns.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.models.student import Student, split_profile_attributes
+
+
+class TestStudentAttributes(unittest.TestCase):
+    """Test cases for Student age/grade attributes"""
+
+    def test_split_profile_attributes(self):
+        """Legacy entries are parsed out; everything else is kept in order"""
+        age, grade, remaining = split_profile_attributes(['visual', 'age:12', 'grade:7th', 'short sessions'])
+        self.assertEqual((age, grade), (12, 7))
+        self.assertEqual(remaining, ['visual', 'short sessions'])
+
+        age, grade, remaining = split_profile_attributes(['grade:unknown', 'age: 9 years'])
+        self.assertEqual((age, grade), (9, None))
+        self.assertEqual(remaining, ['grade:unknown'])
+
+        age, grade, remaining = split_profile_attributes(['Age: 12', ' GRADE :6', 'Ages of empires'])
+        self.assertEqual((age, grade), (12, 6))
+        self.assertEqual(remaining, ['Ages of empires'])
+
+        self.assertEqual(split_profile_attributes(None), (None, None, []))
+
+    def test_age_comes_from_date_of_birth(self):
+        """Age ignores preference entries and set_age round-trips"""
+        student = Student(first_name='Ada', last_name='L', learning_preferences=['age:30'])
+        self.assertIsNone(student.age)
+
+        student.set_age(10)
+        self.assertEqual(student.date_of_birth, date(date.today().year - 10, 1, 1))
+        self.assertEqual(student.age, 10)
+
+    def test_grade_comes_from_grade_level(self):
+        """get_grade reflects the grade_level column only"""
+        student = Student(first_name='Ada', last_name='L', learning_preferences=['grade:5'])
+        self.assertIsNone(student.get_grade())
+        student.grade_level = 4
+        self.assertEqual(student.get_grade(), '4')
+
+
+if __name__ == '__main__':
+    unittest.main()
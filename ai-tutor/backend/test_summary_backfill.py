@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the resumable session summary backfill.
+Runs the backfill against an in-memory SQLite database with a fake summary
+generator and checks that runs resume from the checkpoint and retry failures.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models.job_checkpoint import JobCheckpoint
+from app.models.session import Session
+from app.services.summary_backfill_service import SummaryBackfillService
+
+
+class TestSummaryBackfill(unittest.TestCase):
+    """Test cases for SummaryBackfillService checkpointing"""
+
+    def setUp(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:'):
+            self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=[Session.__table__, JobCheckpoint.__table__])
+        db.session.add_all([
+            Session(id=i, student_id=1, transcript=f"Session {i}: " + 'we practised fractions together. ' * 3)
+            for i in range(1, 6)
+        ])
+        db.session.add(Session(id=6, student_id=1, transcript='hi', summary='Already summarized'))
+        db.session.commit()
+
+        self.failing_ids = set()
+        self.service = SummaryBackfillService(concurrency=1, rate_limit_per_minute=0, batch_size=2)
+        generate = mock.patch.object(self.service, '_generate_ai_summary', side_effect=self._fake_summary)
+        generate.start()
+        self.addCleanup(generate.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def _fake_summary(self, transcript):
+        session_id = int(transcript.split(':')[0].split()[1])
+        if session_id in self.failing_ids:
+            raise RuntimeError('provider timeout')
+        return f"Summary of session {session_id}"
+
+    def _summaries(self):
+        db.session.expire_all()
+        return {session.id: session.summary for session in Session.query.order_by(Session.id)}
+
+    def test_run_resumes_from_checkpoint(self):
+        """A limited run stops at its cursor and the next run carries on from there"""
+        first = self.service.run(max_sessions=3)
+        self.assertEqual((first['processed'], first['last_id']), (3, 3))
+        self.assertIsNone(self._summaries()[4])
+        self.assertEqual(self.service.get_status()['remaining'], 2)
+
+        with mock.patch.object(self.service, '_summarize_row', wraps=self.service._summarize_row) as summarize:
+            second = self.service.run()
+        self.assertEqual([call.args[0].id for call in summarize.call_args_list], [4, 5])
+        self.assertTrue(second['completed'])
+
+        summaries = self._summaries()
+        self.assertEqual(summaries[5], 'Summary of session 5')
+        self.assertEqual(summaries[6], 'Already summarized')
+        self.assertEqual(self.service.get_status()['remaining'], 0)
+
+    def test_failed_sessions_are_retried_first(self):
+        """Failures stay in the checkpoint and are retried on the next run"""
+        self.failing_ids = {2}
+        first = self.service.run()
+        self.assertEqual((first['processed'], first['failed'], first['last_id']), (4, 1, 5))
+        checkpoint = db.session.get(JobCheckpoint, SummaryBackfillService.JOB_NAME)
+        self.assertEqual(checkpoint.data['failed_ids'], [2])
+        self.assertEqual(self.service.get_status()['remaining'], 1)
+
+        self.failing_ids = set()
+        second = self.service.run()
+        self.assertEqual((second['processed'], second['failed']), (1, 0))
+        self.assertEqual(self._summaries()[2], 'Summary of session 2')
+        checkpoint = db.session.get(JobCheckpoint, SummaryBackfillService.JOB_NAME)
+        self.assertEqual(checkpoint.data['failed_ids'], [])
+        self.assertEqual((checkpoint.processed_count, checkpoint.failed_count), (5, 1))
+
+    def test_reset_starts_over(self):
+        """reset clears the cursor and counters"""
+        self.service.run(max_sessions=2)
+        Session.query.update({'summary': None})
+        db.session.commit()
+
+        report = self.service.run(reset=True)
+        self.assertEqual((report['processed'], report['total']), (6, 6))
+        self.assertEqual(self._summaries()[1], 'Summary of session 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test token accounting and pricing.
+Checks how OpenAI and Anthropic usage fields map to token counts, how cached
+input is priced, and the segment count cache.
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai import token_accounting
+from app.ai.token_accounting import (
+    TokenUsage, count_message_tokens, count_tokens, get_model_price, usage_from_anthropic, usage_from_openai
+)
+
+
+class TestUsageMapping(unittest.TestCase):
+    """Test cases for usage_from_openai and usage_from_anthropic"""
+
+    def test_openai_cached_tokens_come_out_of_prompt_tokens(self):
+        """OpenAI's prompt_tokens includes cached tokens; they are counted once, as cache reads"""
+        usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=300,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+        tokens = usage_from_openai(usage)
+        self.assertEqual((tokens.input_tokens, tokens.cache_read_tokens, tokens.output_tokens), (176, 1024, 300))
+        self.assertEqual(tokens.cache_write_tokens, 0)
+        self.assertEqual(tokens.total_tokens, 1500)
+        self.assertEqual(tokens.source, 'usage')
+
+    def test_openai_without_details(self):
+        """Older responses have no prompt_tokens_details"""
+        tokens = usage_from_openai(SimpleNamespace(prompt_tokens=100, completion_tokens=None))
+        self.assertEqual((tokens.input_tokens, tokens.cache_read_tokens, tokens.output_tokens), (100, 0, 0))
+        tokens = usage_from_openai(SimpleNamespace(prompt_tokens=100, completion_tokens=5,
+                                                   prompt_tokens_details=SimpleNamespace(cached_tokens=None)))
+        self.assertEqual(tokens.input_tokens, 100)
+        self.assertIsNone(usage_from_openai(None))
+
+    def test_anthropic_cache_fields(self):
+        """Anthropic's input_tokens already excludes cache reads and writes"""
+        usage = SimpleNamespace(input_tokens=50, output_tokens=200,
+                                cache_read_input_tokens=3000, cache_creation_input_tokens=400)
+        tokens = usage_from_anthropic(usage)
+        self.assertEqual((tokens.input_tokens, tokens.cache_read_tokens, tokens.cache_write_tokens,
+                          tokens.output_tokens), (50, 3000, 400, 200))
+        self.assertEqual(tokens.total_tokens, 3650)
+
+        tokens = usage_from_anthropic(SimpleNamespace(input_tokens=10, output_tokens=2))
+        self.assertEqual((tokens.cache_read_tokens, tokens.cache_write_tokens), (0, 0))
+        self.assertIsNone(usage_from_anthropic(None))
+
+
+class TestPricing(unittest.TestCase):
+    """Test cases for model prices and TokenUsage.cost"""
+
+    def test_longest_prefix_wins(self):
+        """gpt-4o-mini isn't priced as gpt-4o; unknown models use the default"""
+        self.assertEqual(get_model_price('gpt-4o-mini-2024-07-18'), (0.15, 0.60))
+        self.assertEqual(get_model_price('gpt-4o-2024-08-06'), (2.50, 10.00))
+        self.assertEqual(get_model_price('claude-3-5-sonnet-20241022'), (3.00, 15.00))
+        self.assertEqual(get_model_price('some-new-model'), token_accounting.DEFAULT_PRICE)
+        self.assertEqual(get_model_price(None), token_accounting.DEFAULT_PRICE)
+
+    def test_cached_input_multipliers(self):
+        """Cache reads and writes are billed relative to the input price per provider"""
+        usage = TokenUsage(input_tokens=1_000_000, output_tokens=1_000_000,
+                           cache_read_tokens=1_000_000, cache_write_tokens=1_000_000)
+        # gpt-4o: 2.50 in + 10.00 out + reads at 50% + writes at 100%
+        self.assertAlmostEqual(usage.cost('openai', 'gpt-4o'), 2.50 + 10.00 + 1.25 + 2.50)
+        # claude-3-5-sonnet: 3 in + 15 out + reads at 10% + writes at 125%
+        self.assertAlmostEqual(usage.cost('anthropic', 'claude-3-5-sonnet'), 3.00 + 15.00 + 0.30 + 3.75)
+        self.assertEqual(TokenUsage().cost('openai', 'gpt-4o'), 0.0)
+
+
+class TestTokenCounting(unittest.TestCase):
+    """Test cases for count_tokens and the segment cache"""
+
+    def test_empty_and_messages(self):
+        """Empty text is free; messages add a fixed overhead each"""
+        self.assertEqual(count_tokens(''), 0)
+        self.assertEqual(count_tokens(None), 0)
+        text = 'Let us practise adding fractions with unlike denominators.'
+        expected = 2 * count_tokens(text) + 2 * token_accounting.MESSAGE_OVERHEAD_TOKENS
+        self.assertEqual(count_message_tokens([{'role': 'user', 'content': text}, text]), expected)
+        blocks = [{'role': 'user', 'content': [{'type': 'text', 'text': text}]}]
+        self.assertEqual(count_message_tokens(blocks), count_tokens(text) + token_accounting.MESSAGE_OVERHEAD_TOKENS)
+
+    def test_segments_are_tokenized_once(self):
+        """Repeated segments are served from the digest-keyed cache"""
+        text = 'A static system prompt block that is sent with every request. ' * 20
+        with mock.patch.object(token_accounting, '_tokenize_count', wraps=token_accounting._tokenize_count) as tokenize:
+            first = count_tokens(text)
+            self.assertEqual(count_tokens(text), first)
+            self.assertEqual(tokenize.call_count, 1)
+        self.assertGreater(first, 100)
+
+    def test_cache_is_bounded(self):
+        """The least recently used segments are evicted"""
+        with mock.patch.object(token_accounting, 'SEGMENT_CACHE_SIZE', 3):
+            token_accounting._segment_counts.clear()
+            for index in range(5):
+                count_tokens(f"segment number {index}")
+            self.assertEqual(len(token_accounting._segment_counts), 3)
+            # Cache keys are digests, not the prompt text
+            self.assertTrue(all(isinstance(key[0], bytes) for key in token_accounting._segment_counts))
+
+
+if __name__ == '__main__':
+    unittest.main()
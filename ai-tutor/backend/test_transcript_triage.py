@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test the pre-LLM transcript triage.
+Checks the rule-based name/age/grade extraction and skip decisions against the
+labelled corpus in app/ai/resources/triage_corpus.json (built from the
+transcripts and profiles used by the other test scripts).
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai.transcript_triage import (
+    TranscriptTriage, TriageStats, evaluate_corpus, extract_basic_profile, split_turns
+)
+from app.ai.usage_limits import MemoryUsageBackend
+
+
+class TestTranscriptTriage(unittest.TestCase):
+    """Test cases for transcript triage and rule-based extraction"""
+
+    def setUp(self):
+        self.triage = TranscriptTriage(stats=TriageStats(backend=MemoryUsageBackend()), min_score=0.25)
+
+    def test_corpus_accuracy(self):
+        """Every labelled corpus field and skip decision matches"""
+        report = evaluate_corpus(triage=self.triage)
+        self.assertGreaterEqual(report['entries'], 10)
+        for field, accuracy in report['accuracy'].items():
+            self.assertEqual(accuracy, 1.0, f"{field} mismatches: {report['mismatches']}")
+
+    def test_split_turns_inline_and_unlabelled(self):
+        """Inline speaker labels split into turns; unlabelled text is the student's"""
+        turns = split_turns("Student: Hi there. AI: Hello! Student: My name is Emma.")
+        self.assertEqual([speaker for speaker, _ in turns], ['student', 'ai', 'student'])
+        self.assertEqual(split_turns("just some words"), [('user', 'just some words')])
+
+    def test_extraction_ignores_non_names(self):
+        """'I'm good' and 'I'm in 4th grade' don't produce names"""
+        found, _ = extract_basic_profile("I'm good. I'm in 4th grade and I'm nine years old.")
+        self.assertNotIn('first_name', found)
+        self.assertEqual(found['grade'], 4)
+        self.assertEqual(found['age'], 9)
+
+    def test_only_assistant_speech_is_skipped(self):
+        """Assistant speech never counts as student content"""
+        result = self.triage.triage("AI: Let's practise fractions and multiplication homework today!")
+        self.assertTrue(result.skip_llm)
+        self.assertEqual(result.reason, 'Student said nothing')
+
+    def test_stats_count_avoided_calls(self):
+        """Skipped calls and avoided LLM calls are counted"""
+        result = self.triage.triage("User: My name is Sarah. I'm 10.")
+        self.triage.record_call(result)
+        self.triage.record_avoided('profile_extraction')
+        self.triage.record_avoided('tutor_assessment')
+
+        stats = self.triage.get_stats()
+        self.assertEqual(stats['triaged_calls'], 1)
+        self.assertEqual(stats['skipped_calls'], 1)
+        self.assertEqual(stats['rule_extractions'], 1)
+        self.assertEqual(stats['llm_calls_avoided'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the fuzzy search helpers and queries.
+Trigram matching needs PostgreSQL, so this checks LIKE escaping, the
+prefix-only path for short terms against SQLite and the compiled
+PostgreSQL shape of the fuzzy queries.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, sessionmaker
+
+from app import db
+from app.models.mastery_tracking import CurriculumGoal, GoalKC
+from app.repositories.curriculum_goal_repository import CurriculumGoalRepository
+from app.repositories.trigram import contains_pattern, prefix_pattern
+
+
+class TestTrigramSearch(unittest.TestCase):
+    """Test cases for trigram-backed goal and KC search"""
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        db.metadata.create_all(self.engine, tables=[CurriculumGoal.__table__, GoalKC.__table__])
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.add_all([
+            CurriculumGoal(id=1, goal_code='3.NBT.1', title='Place value', subject='Mathematics', grade_level=3),
+            CurriculumGoal(id=2, goal_code='3.NBT.2', title='Addition', subject='Mathematics', grade_level=3),
+            CurriculumGoal(id=3, goal_code='4.NBT.1', title='3-digit regrouping', subject='Mathematics', grade_level=4),
+            CurriculumGoal(id=4, goal_code='3_X', title='Underscore code', subject='English', grade_level=3),
+        ])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_like_patterns_escape_wildcards(self):
+        """User input can't inject LIKE wildcards"""
+        self.assertEqual(prefix_pattern('50%_A/b'), '50/%/_a//b%')
+        self.assertEqual(contains_pattern('07_'), '%07/_%')
+
+    def test_short_terms_use_prefix_match(self):
+        """Terms under three characters match code or title prefixes, in code order, limited in SQL"""
+        repository = CurriculumGoalRepository(self.session)
+        self.assertEqual([goal.goal_code for goal in repository.search_goals('3.')], ['3.NBT.1', '3.NBT.2'])
+        self.assertEqual([goal.goal_code for goal in repository.search_goals('3', limit=2)], ['3.NBT.1', '3.NBT.2'])
+        self.assertEqual([goal.goal_code for goal in repository.search_goals('3_')], ['3_X'])
+        self.assertEqual([goal['goal_code'] for goal in repository.autocomplete_goals('ad')], ['3.NBT.2'])
+
+    def test_fuzzy_query_shape(self):
+        """Longer terms use word similarity, rank prefix matches first and keep the limit in SQL"""
+        statements = []
+
+        def capture(query):
+            statements.append(str(query.statement.compile(dialect=postgresql.dialect())))
+            return []
+
+        original = Query.all
+        Query.all = capture
+        try:
+            self.session.execute = lambda *args, **kwargs: None
+            CurriculumGoalRepository(self.session).search_goals('multiplcation', limit=5)
+        finally:
+            Query.all = original
+
+        sql = statements[0]
+        self.assertIn('<%% curriculum_goals.title', sql)
+        self.assertIn('word_similarity(', sql)
+        self.assertIn('LIMIT', sql)
+        self.assertLess(sql.index('LIKE'), sql.index('word_similarity('))
+
+
+if __name__ == '__main__':
+    unittest.main()
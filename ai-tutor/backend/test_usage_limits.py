@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test the shared AI usage limits.
+Runs the token buckets, provider rate limits and daily cost budget on the
+in-memory backend with a fake clock, and checks the refill, wait and shed
+maths and the budget check and record.
+"""
+
+import asyncio
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AI_USAGE_BACKEND', 'memory')
+
+from app.ai import usage_limits
+from app.ai.usage_limits import (
+    BudgetExceededError, CostBudget, MemoryUsageBackend, ProviderRateLimits, RateLimitExceeded,
+    TokenBucketLimiter, UnavailableUsageBackend, UsageBackendUnavailable, create_usage_backend
+)
+
+
+class FakeClockTestCase(unittest.TestCase):
+    """Replaces the module's time and asyncio.sleep with a clock the test advances"""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        self.sleeps = []
+
+        async def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        patches = [
+            mock.patch.object(usage_limits, 'time', types.SimpleNamespace(time=lambda: self.now)),
+            mock.patch.object(usage_limits, 'asyncio', types.SimpleNamespace(sleep=sleep))
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.backend = MemoryUsageBackend()
+
+
+class TestTokenBucket(FakeClockTestCase):
+    """Test cases for TokenBucketLimiter refill maths"""
+
+    def test_refill_and_wait(self):
+        """A 60/minute bucket refills one token per second"""
+        limiter = TokenBucketLimiter(self.backend, 'bucket', per_minute=60)
+        for _ in range(60):
+            self.assertEqual(limiter.try_acquire(), 0)
+        self.assertAlmostEqual(limiter.try_acquire(), 1.0)
+
+        self.now += 0.5
+        self.assertAlmostEqual(limiter.try_acquire(), 0.5)
+        self.now += 0.5
+        self.assertEqual(limiter.try_acquire(), 0)
+
+    def test_refill_is_capped_at_capacity(self):
+        """Idle time never fills the bucket past its burst size"""
+        limiter = TokenBucketLimiter(self.backend, 'bucket', per_minute=60, burst=10)
+        self.assertEqual(limiter.try_acquire(10), 0)
+        self.now += 3600
+        self.assertEqual(limiter.try_acquire(10), 0)
+        self.assertAlmostEqual(limiter.try_acquire(5), 5.0)
+
+    def test_oversized_request_takes_full_bucket(self):
+        """A request larger than the bucket waits for a full bucket instead of forever"""
+        limiter = TokenBucketLimiter(self.backend, 'bucket', per_minute=600)
+        self.assertEqual(limiter.try_acquire(5000), 0)
+        self.assertAlmostEqual(limiter.try_acquire(5000), 60.0)
+
+
+class TestProviderRateLimits(FakeClockTestCase):
+    """Test cases for ProviderRateLimits wait and shed modes"""
+
+    def setUp(self):
+        super().setUp()
+        env = mock.patch.dict(os.environ, {'OPENAI_RPM': '60', 'OPENAI_TPM': '600',
+                                           'AI_RATE_LIMIT_MAX_WAIT': '5', 'AI_RATE_LIMIT_MODE': 'wait'})
+        env.start()
+        self.addCleanup(env.stop)
+        self.limits = ProviderRateLimits(self.backend)
+
+    def acquire(self, tokens, mode=None, provider='openai'):
+        return asyncio.run(self.limits.acquire(provider, 'gpt-4o', tokens, mode))
+
+    def test_wait_mode_sleeps_for_token_capacity(self):
+        """Waiting sleeps exactly until the token bucket has refilled enough"""
+        self.assertEqual(self.acquire(600), 0.0)
+        self.assertAlmostEqual(self.acquire(30), 3.0)
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_shed_mode_raises_with_retry_after(self):
+        """Shedding fails at once and says when capacity returns"""
+        self.acquire(600)
+        with self.assertRaises(RateLimitExceeded) as raised:
+            self.acquire(60, mode='shed')
+        self.assertAlmostEqual(raised.exception.retry_after, 6.0)
+        self.assertIn('tokens', str(raised.exception))
+        self.assertEqual(self.sleeps, [])
+
+    def test_wait_beyond_max_wait_is_shed(self):
+        """A wait longer than AI_RATE_LIMIT_MAX_WAIT raises instead of sleeping"""
+        self.acquire(600)
+        with self.assertRaises(RateLimitExceeded):
+            self.acquire(100)
+        self.assertEqual(self.sleeps, [])
+
+    def test_unconfigured_provider_is_unlimited(self):
+        """Providers without RPM/TPM settings never wait"""
+        for _ in range(100):
+            self.assertEqual(self.acquire(10000, provider='anthropic'), 0.0)
+
+
+class TestCostBudget(FakeClockTestCase):
+    """Test cases for CostBudget check and record"""
+
+    def test_check_and_record(self):
+        """Spend accumulates until the daily limit is reached"""
+        budget = CostBudget(self.backend, daily_limit=1.0)
+        budget.check()
+        self.assertAlmostEqual(budget.record(0.4, tokens=1000), 0.4)
+        self.assertAlmostEqual(budget.record(0.5, tokens=500), 0.9)
+        budget.check()
+        budget.record(0.1)
+        with self.assertRaises(BudgetExceededError):
+            budget.check()
+
+        summary = budget.summary()
+        self.assertAlmostEqual(summary['daily_cost'], 1.0)
+        self.assertEqual(summary['daily_tokens'], 1500)
+        self.assertAlmostEqual(summary['remaining_budget'], 0.0)
+
+        budget.reset()
+        budget.check()
+        self.assertEqual(budget.summary()['daily_cost'], 0.0)
+
+    def test_counters_expire(self):
+        """Daily counters disappear once their TTL has passed"""
+        budget = CostBudget(self.backend, daily_limit=1.0)
+        budget.record(2.0)
+        self.now += usage_limits.DAILY_KEY_TTL_SECONDS + 1
+        budget.check()
+
+    def test_unavailable_backend_denies_calls(self):
+        """Without shared counters every call is denied as over budget"""
+        budget = CostBudget(UnavailableUsageBackend('connection refused'), daily_limit=1.0)
+        with self.assertRaises(UsageBackendUnavailable):
+            budget.check()
+        with self.assertRaises(BudgetExceededError):
+            budget.record(0.1)
+
+    def test_memory_backend_is_selected_by_env(self):
+        """AI_USAGE_BACKEND=memory opts in to per-process counters"""
+        with mock.patch.dict(os.environ, {'AI_USAGE_BACKEND': 'memory'}):
+            self.assertIsInstance(create_usage_backend(), MemoryUsageBackend)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,8 +7,7 @@ Extracts student information from conversation transcripts using AI
 import json
 import os
 import logging
-import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 # Import database models and repositories
 from app import db
@@ -17,9 +16,11 @@ from app import db
 from app.ai.session_processor import session_processor
 from app.ai.prompts import prompt_manager
 from app.ai.providers import provider_manager
-from app.ai.call_type_detector import default_prompt_selector, CallType
+from app.ai.call_type_detector import default_prompt_selector, default_call_type_detector, CallType
+from app.ai.transcript_triage import transcript_triage, TriageResult
 from app.ai.prompts_file_loader import file_prompt_manager
 from app.ai.data_models import AIExtractedProfile, ValidationError
+from app.ai.event_loop import run_async
 
 logger = logging.getLogger(__name__)
 
@@ -149,9 +150,30 @@ Do not include any explanatory text in your response, ONLY the JSON object.
         Returns:
             Dictionary containing extracted information and analysis results
         """
+        extracted_info, _ = await self._analyze_with_conditional_prompts(
+            transcript, phone_number, subject_hint, additional_context, session_id
+        )
+        return extracted_info
+    
+    async def _analyze_with_conditional_prompts(
+        self,
+        transcript: str,
+        phone_number: Optional[str] = None,
+        subject_hint: Optional[str] = None,
+        additional_context: Optional[Dict[str, Any]] = None,
+        session_id: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Conditional prompt analysis that also returns the provider's raw response,
+        so callers can re-parse it instead of paying for a second LLM call
+        
+        Returns:
+            Tuple of (extracted information, raw AI response or None)
+        """
         if not transcript:
-            return {}
+            return {}, None
         
+        raw_response = None
         try:
             logger.info(f"Analyzing transcript with conditional prompts. Phone: {phone_number}, Subject: {subject_hint}")
             
@@ -195,7 +217,7 @@ Do not include any explanatory text in your response, ONLY the JSON object.
             if not formatted_prompt:
                 logger.error(f"Failed to format prompt: {selected_prompt}")
                 # Fallback to legacy method
-                return await self.analyze_transcript_with_ai(transcript)
+                return await self.analyze_transcript_with_ai(transcript), None
             
             logger.info(f"Successfully formatted {selected_prompt} prompt")
             
@@ -206,6 +228,7 @@ Do not include any explanatory text in your response, ONLY the JSON object.
             # Create analysis context
             analysis_context = {
                 "prompt_type": selected_prompt,
+                "task": selected_prompt,
                 "call_type": call_type_result.call_type.value if call_type_result else "unknown",
                 "formatted_prompt": formatted_prompt['user_prompt']
             }
@@ -223,6 +246,7 @@ Do not include any explanatory text in your response, ONLY the JSON object.
             
             # Get AI analysis
             analysis = await provider.analyze_session(transcript, analysis_context)
+            raw_response = analysis.raw_response
             logger.info(f"Received analysis response from provider")
             
             # Store AI processing debug information if session_id provided
@@ -253,7 +277,6 @@ Do not include any explanatory text in your response, ONLY the JSON object.
             
             # Extract and process the JSON response using new data model
             try:
-                raw_response = analysis.raw_response
                 logger.info(f"Received AI response with {len(raw_response) if raw_response else 0} characters")
                 
                 # Use the new data model for robust parsing and validation
@@ -273,27 +296,100 @@ Do not include any explanatory text in your response, ONLY the JSON object.
                     }
                     
                     logger.info(f"Successfully processed conditional prompt analysis with data model")
-                    return extracted_info
+                    return extracted_info, raw_response
                     
                 except ValidationError as ve:
                     logger.error(f"Data validation failed: {ve}")
                     logger.error(f"Raw response: {raw_response}")
-                    return {}
+                    return {}, raw_response
                 except ValueError as ve:
                     logger.error(f"Data parsing failed: {ve}")
                     logger.error(f"Raw response: {raw_response}")
-                    return {}
+                    return {}, raw_response
                 
             except Exception as e:
                 logger.error(f"Error parsing conditional prompt response: {e}")
                 logger.error(f"Raw response: {analysis.raw_response if hasattr(analysis, 'raw_response') else 'No raw response'}")
-                return {}
+                return {}, raw_response
                 
         except Exception as e:
             logger.error(f"Error in conditional prompt analysis: {e}")
+            
+            # A response we already paid for may still be usable
+            if raw_response:
+                reparsed = self._reparse_raw_response(raw_response)
+                if reparsed:
+                    return reparsed, raw_response
+            
             # Fallback to legacy analysis
             logger.info("Falling back to legacy analysis method")
-            return await self.analyze_transcript_with_ai(transcript)
+            return await self.analyze_transcript_with_ai(transcript), raw_response
+
+    @staticmethod
+    def validate_profile_section(section: Any) -> Optional[Dict[str, Any]]:
+        """
+        Validate a profile extraction section produced by combined analysis
+        
+        Args:
+            section: The 'profile_extraction' section of a combined response
+            
+        Returns:
+            Extracted information in the same shape as analyze_transcript, or None if invalid
+        """
+        if not isinstance(section, dict):
+            return None
+        
+        try:
+            profile = AIExtractedProfile.from_ai_response(json.dumps(section))
+        except ValueError as e:
+            logger.warning(f"Combined profile section failed validation: {e}")
+            return None
+        
+        extracted_info = profile.to_dict()
+        extracted_info['_analysis_metadata'] = {'prompt_used': 'combined_session_analysis'}
+        return extracted_info
+    
+    def _reparse_raw_response(self, raw_response: str) -> Dict[str, Any]:
+        """
+        Re-parse a conditional prompt response before falling back to a second LLM call
+        
+        The conditional prompts nest the profile under "student_profile", so the
+        profile fields are lifted to the top level before validation.
+        
+        Args:
+            raw_response: Raw AI response from the first attempt
+            
+        Returns:
+            Extracted information, or an empty dictionary if nothing usable was found
+        """
+        if not raw_response:
+            return {}
+        
+        try:
+            data = AIExtractedProfile._parse_json_from_response(raw_response)
+            if not isinstance(data, dict):
+                return {}
+            
+            flattened = {}
+            for key in ('student_profile', 'student_info', 'profile'):
+                if isinstance(data.get(key), dict):
+                    flattened.update(data[key])
+            flattened.update({k: v for k, v in data.items() if not isinstance(v, dict)})
+            
+            profile = AIExtractedProfile.from_ai_response(json.dumps(flattened))
+            if not profile.has_any_data():
+                return {}
+            
+            extracted_info = profile.to_dict()
+            extracted_info['_analysis_metadata'] = {
+                'reparsed_from_first_attempt': True,
+                'provider_used': self.provider_manager.current_provider
+            }
+            logger.info(f"Recovered profile by re-parsing first response: {profile}")
+            return extracted_info
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Re-parsing first AI response failed: {e}")
+            return {}
 
     async def analyze_transcript_with_ai(self, transcript: str) -> Dict[str, Any]:
         """Analyze transcript and extract student information using AI"""
@@ -443,17 +539,10 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
             logger.warning(f"🔍 DEBUG: No session_id found in additional_context: {additional_context}")
             print(f"🔍 DEBUG: No session_id found in additional_context: {additional_context}")
         
-        # Create event loop if needed
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Run the async conditional analysis
+        # Run the async conditional analysis on the shared background loop
         try:
-            extracted_info = loop.run_until_complete(
-                self.analyze_transcript_with_conditional_prompts(
+            extracted_info, raw_response = run_async(
+                self._analyze_with_conditional_prompts(
                     transcript=transcript,
                     phone_number=phone_number,
                     subject_hint=subject_hint,
@@ -477,6 +566,16 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
                 
                 return extracted_info
             else:
+                # Re-parse the response we already have before paying for a second LLM call
+                reparsed_info = self._reparse_raw_response(raw_response)
+                if reparsed_info:
+                    from system_logger import log_ai_analysis
+                    log_ai_analysis("Recovered information by re-parsing conditional prompt response",
+                                   extracted_fields=list(k for k in reparsed_info.keys() if not k.startswith('_')),
+                                   student_id=student_id,
+                                   provider=self.provider_manager.current_provider)
+                    return reparsed_info
+                
                 logger.warning("No information extracted from transcript with conditional prompts - trying fallback")
                 
                 # Try fallback to legacy analysis if conditional prompts failed
@@ -534,6 +633,12 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
         if not transcript:
             return {}
         
+        # Low-information calls get rule-based extraction instead of an LLM call
+        triage = transcript_triage.triage(transcript)
+        if triage.skip_llm:
+            transcript_triage.record_avoided('profile_extraction')
+            return self._rule_based_profile(triage, phone_number, additional_context)
+        
         # Use conditional prompts if phone number is provided
         if phone_number:
             logger.info(f"Using conditional prompt analysis for phone: {phone_number}")
@@ -548,16 +653,9 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
         # Fallback to legacy analysis for backwards compatibility
         logger.info("Using legacy analysis method (no phone number provided)")
         
-        # Create event loop if needed
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        # Run the async analysis
+        # Run the async analysis on the shared background loop
         try:
-            extracted_info = loop.run_until_complete(self.analyze_transcript_with_ai(transcript))
+            extracted_info = run_async(self.analyze_transcript_with_ai(transcript))
             
             # Log the result
             if extracted_info:
@@ -590,6 +688,36 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
             logger.error(f"Error in transcript analysis: {e}")
             return {}
     
+    def _rule_based_profile(self, triage: TriageResult, phone_number: Optional[str] = None,
+                            additional_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Profile from the triage extractors for a call too thin to send to the LLM
+        
+        Only introductory calls (or calls whose type can't be told without a phone
+        number, as in the legacy path) use the extraction; a known student's
+        profile isn't touched on the strength of a greeting.
+        
+        Args:
+            triage: Triage result for the transcript
+            phone_number: Caller's phone number for call type detection
+            additional_context: Additional context for call type detection
+            
+        Returns:
+            Extracted information, or an empty dictionary
+        """
+        call_type = CallType.INTRODUCTORY
+        if phone_number:
+            call_type = default_call_type_detector.detect_call_type(phone_number, additional_context).call_type
+        
+        logger.info(f"Skipped LLM profile extraction ({triage.reason}); call type {call_type.value}, "
+                    f"rule-based fields: {triage.signals.get('extracted_fields')}")
+        if call_type == CallType.TUTORING or not triage.profile:
+            return {}
+        
+        extracted_info = dict(triage.profile)
+        extracted_info['_analysis_metadata'] = dict(extracted_info.get('_analysis_metadata', {}), call_type=call_type.value)
+        return extracted_info
+    
     def update_student_profile(self, student_id, extracted_info):
         """Update student profile with extracted information using Student model directly (Profile model removed)"""
         if not extracted_info:
@@ -601,7 +729,7 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
         
         try:
             # Import models and app context
-            from app.models.student import Student
+            from app.models.student import Student, split_profile_attributes
             from app import db
             import flask
             
@@ -669,22 +797,23 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
             else:
                 logger.info("No valid first name in extracted profile data")
             
+            # Age and grade are stored in typed columns; "age:"/"grade:" entries in the
+            # extracted learning preferences are written through to them rather than kept
+            pref_age, pref_grade, extracted_prefs = split_profile_attributes(profile_data.learning_preferences)
+            age = profile_data.age if profile_data.age is not None else pref_age
+            grade = profile_data.grade if profile_data.grade is not None else pref_grade
+            
             # Update age by calculating date_of_birth if provided
-            if profile_data.age is not None:
-                from datetime import date
-                current_year = date.today().year
-                birth_year = current_year - profile_data.age
-                calculated_dob = date(birth_year, 1, 1)
-                
-                student.date_of_birth = calculated_dob
+            if age is not None:
+                student.set_age(age)
                 updated_fields.append('date_of_birth')
-                logger.info(f"Updated date_of_birth to {calculated_dob} (age {profile_data.age})")
+                logger.info(f"Updated date_of_birth to {student.date_of_birth} (age {age})")
             
             # Update grade_level in Student model if provided
-            if profile_data.grade is not None:
-                student.grade_level = profile_data.grade
+            if grade is not None:
+                student.grade_level = grade
                 updated_fields.append('grade_level')
-                logger.info(f"Updated grade_level to {profile_data.grade}")
+                logger.info(f"Updated grade_level to {grade}")
             
             # Handle interests directly in Student model (migrated from Profile)
             if profile_data.interests:
@@ -702,11 +831,11 @@ DO NOT use nested "subjects" object. Use flat "favorite_subjects" and "challengi
                     logger.info(f"Added new interests to Student model: {new_interests}")
             
             # Handle learning_preferences directly in Student model (migrated from Profile)
-            if profile_data.learning_preferences:
+            if extracted_prefs:
                 # Initialize learning_preferences array if None
                 current_prefs = student.learning_preferences or []
                 new_prefs = []
-                for pref in profile_data.learning_preferences:
+                for pref in extracted_prefs:
                     if pref and pref not in current_prefs:
                         new_prefs.append(pref)
                         current_prefs.append(pref)
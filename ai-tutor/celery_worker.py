@@ -6,6 +6,10 @@ Run this script to start the Celery worker process:
 
     celery -A celery_worker.celery worker --loglevel=info
 
+Periodic tasks (session queue, AI batches, summary backfill, daily stats) need beat:
+
+    celery -A celery_worker.celery beat --loglevel=info
+
 For monitoring, you can also run Flower:
 
     celery -A celery_worker.celery flower
@@ -22,6 +26,7 @@ app_context.push()
 # Import tasks to ensure they are registered with Celery
 import app.tasks.ai_tasks
 import app.tasks.maintenance_tasks
+import app.tasks.analytics_tasks
 
 # Export the Celery app for the worker to use
 celery = app.celery
\ No newline at end of file